@@ -1,11 +1,17 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from prompts import PROMPT_CEO
+from core.cache import cache_responses
+from core.clients import chat_model
+from core.knowledge import aknowledge_context, knowledge_context, knowledge_version
+from core.metrics import instrumented
+from core.prompting import agent_prompt
+from core.scheduler import scheduled
+from core.singleflight import coalesce
+from core.tiers import acall_tiered, budget_model, call_tiered
 
 # Load environment
 load_dotenv()
@@ -13,14 +19,28 @@ OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_KEY:
     raise RuntimeError("OPENAI_API_KEY not set in environment")
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.5, api_key=OPENAI_KEY)
+# Initialize LLM (shares the process-wide connection pool)
+llm = chat_model(model="gpt-4o", temperature=0.5, api_key=OPENAI_KEY)
 
+# Static system prefix and token budgets, built once
+prompt = agent_prompt("CEO", PROMPT_CEO, llm.model_name)
+
+@instrumented("agent", "CEO")
+@coalesce("CEO")
+@cache_responses("CEO", PROMPT_CEO, llm, knowledge_version)
+@scheduled("CEO", PROMPT_CEO, llm, budget_model)
 def run_ceo(user_query: str) -> str:
     """Run CEO on the given user query."""
-    messages = [
-        SystemMessage(content=PROMPT_CEO),
-        HumanMessage(content=user_query)
-    ]
-    response = llm.invoke(messages)
+    messages = prompt.messages(user_query, context=knowledge_context(user_query))
+    response = call_tiered("CEO", llm, user_query, messages)
+    return response.content
+
+@instrumented("agent", "CEO")
+@coalesce("CEO")
+@cache_responses("CEO", PROMPT_CEO, llm, knowledge_version)
+@scheduled("CEO", PROMPT_CEO, llm, budget_model)
+async def arun_ceo(user_query: str) -> str:
+    """Run CEO on the given user query without blocking the event loop."""
+    messages = prompt.messages(user_query, context=await aknowledge_context(user_query))
+    response = await acall_tiered("CEO", llm, user_query, messages)
     return response.content
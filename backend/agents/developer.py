@@ -1,11 +1,16 @@
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from prompts import PROMPT_DEVELOPER
+from core.cache import cache_responses
+from core.clients import chat_model
+from core.metrics import instrumented
+from core.prompting import agent_prompt
+from core.scheduler import scheduled
+from core.singleflight import coalesce
+from core.tiers import acall_tiered, budget_model, call_tiered
 
 # Load environment
 load_dotenv()
@@ -14,14 +19,28 @@ if not OPENAI_KEY:
     raise RuntimeError("OPENAI_API_KEY not set in environment")
 
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.3, api_key=OPENAI_KEY)
+# Initialize LLM (shares the process-wide connection pool)
+llm = chat_model(model="gpt-4o", temperature=0.3, api_key=OPENAI_KEY)
 
+# Static system prefix and token budgets, built once
+prompt = agent_prompt("Developer", PROMPT_DEVELOPER, llm.model_name)
+
+@instrumented("agent", "Developer")
+@coalesce("Developer")
+@cache_responses("Developer", PROMPT_DEVELOPER, llm)
+@scheduled("Developer", PROMPT_DEVELOPER, llm, budget_model)
 def run_developer(user_query: str) -> str:
     """Run the developer agent on the given user query."""
-    messages = [
-        SystemMessage(content=PROMPT_DEVELOPER),
-        HumanMessage(content=user_query)
-    ]
-    response = llm.invoke(messages)
+    messages = prompt.messages(user_query)
+    response = call_tiered("Developer", llm, user_query, messages)
+    return response.content
+
+@instrumented("agent", "Developer")
+@coalesce("Developer")
+@cache_responses("Developer", PROMPT_DEVELOPER, llm)
+@scheduled("Developer", PROMPT_DEVELOPER, llm, budget_model)
+async def arun_developer(user_query: str) -> str:
+    """Run the developer agent on the given user query without blocking the event loop."""
+    messages = prompt.messages(user_query)
+    response = await acall_tiered("Developer", llm, user_query, messages)
     return response.content
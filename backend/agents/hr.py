@@ -1,14 +1,23 @@
+import logging
 import os
 from dotenv import load_dotenv
-from langchain_openai import ChatOpenAI
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_community.tools import Tool
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_core.prompts import ChatPromptTemplate
 
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from prompts import PROMPT_HR
+from core.cache import cache_responses
+from core.clients import chat_model
+from core.knowledge import aknowledge_context, knowledge_context, knowledge_version
+from core.metrics import instrumented
+from core.prompting import agent_prompt
+from core.resilience import acall_llm, call_llm
+from core.scheduler import scheduled
+from core.singleflight import coalesce
+from core.tiers import acall_tiered, budget_model, call_tiered
+from core.search import search_tools
+from core.sessions import history_messages
+
+logger = logging.getLogger("HRAgent")
 
 # Load environment
 load_dotenv()
@@ -17,45 +26,97 @@ OPENAI_KEY = os.getenv("OPENAI_API_KEY")
 if not OPENAI_KEY:
     raise RuntimeError("OPENAI_API_KEY not set in environment")
 
-# Initialize LLM
-llm = ChatOpenAI(model="gpt-4o", temperature=0.0, api_key=OPENAI_KEY)
+# Initialize LLM (shares the process-wide connection pool)
+llm = chat_model(model="gpt-4o", temperature=0.0, api_key=OPENAI_KEY)
+
+# Web search (core.search, on when SERPER_API_KEY is set) as LangChain tools
+tools = search_tools()
+
+# Static system prefix and token budgets, built once. The note stays out of
+# the tool-calling prompt, and it is fixed text so the prefix never varies.
+prompt = agent_prompt("HR", PROMPT_HR if tools else PROMPT_HR + " (Note: Web search unavailable)", llm.model_name)
+
+# The tool-calling agent is built once and shared by all requests (it keeps
+# no per-run state). The agent machinery is only imported when tools exist.
+# It is create_tool_calling_agent() with each model step going through
+# call_llm / acall_llm, so tool steps get the deadline, hedging, circuit
+# breaker and fallback model too.
+agent_executor = None
+if tools:
+    from langchain.agents import AgentExecutor
+    from langchain.agents.format_scratchpad.tools import format_to_tool_messages
+    from langchain.agents.output_parsers.tools import ToolsAgentOutputParser
+    from langchain_core.runnables import RunnableLambda, RunnablePassthrough
 
-# Web search tool using Serper API (if available)
-tools = []
+    async def _acall_with_tools(messages):
+        return await acall_llm(llm, messages, tools)
 
+    agent_executor = AgentExecutor(
+        agent=(
+            RunnablePassthrough.assign(agent_scratchpad=lambda x: format_to_tool_messages(x["intermediate_steps"]))
+            | prompt.template
+            | RunnableLambda(lambda messages: call_llm(llm, messages, tools), afunc=_acall_with_tools)
+            | ToolsAgentOutputParser()
+        ),
+        tools=tools,
+        max_iterations=int(os.getenv("HR_MAX_TOOL_ITERATIONS", "5")),
+        verbose=False,
+    )
 
+# Cache keys name the system prompt HR actually answers with, and whether it
+# could search the web: answers made with and without tools never mix
+cache_prompt = prompt.system_message.content + (f"\n[tools: {', '.join(tool.name for tool in tools)}]" if tools else "")
+
+# The tool agent answers on gpt-4o, so its slot reserves gpt-4o's rate
+# budget; without tools, tiered calls reserve their own
+hr_budget = None if agent_executor is not None else budget_model
+
+
+@instrumented("agent", "HR")
+@coalesce("HR")
+@cache_responses("HR", cache_prompt, llm, knowledge_version)
+@scheduled("HR", PROMPT_HR, llm, hr_budget)
 def run_hr(user_query: str) -> str:
     """Run HR on the given user query."""
-    if tools:
+    # Handbook and policy passages (core.knowledge), if an index has been built
+    context = knowledge_context(user_query)
+    if agent_executor is not None:
+        # Use agent with tools if search is available
+        try:
+            query = prompt.fit_input(user_query)
+            history = prompt.fit_history(history_messages(), context + query) + prompt.context_messages(context)
+            result = agent_executor.invoke({"input": query, "chat_history": history})
+            return result["output"]
+        except Exception as e:
+            # Fallback to basic chat if agent fails
+            logger.warning("⚠️  HR tool agent failed (%s), answering without search", e)
+
+    # Basic chat without tools
+    messages = prompt.messages(user_query, context=context)
+    response = call_tiered("HR", llm, user_query, messages)
+    return response.content
+
+
+@instrumented("agent", "HR")
+@coalesce("HR")
+@cache_responses("HR", cache_prompt, llm, knowledge_version)
+@scheduled("HR", PROMPT_HR, llm, hr_budget)
+async def arun_hr(user_query: str) -> str:
+    """Run HR on the given user query without blocking the event loop; tool calls of one step run concurrently."""
+    # Handbook and policy passages (core.knowledge), if an index has been built
+    context = await aknowledge_context(user_query)
+    if agent_executor is not None:
         # Use agent with tools if search is available
         try:
-            # Create a prompt template for the agent
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", PROMPT_HR),
-                ("placeholder", "{chat_history}"),
-                ("human", "{input}"),
-                ("placeholder", "{agent_scratchpad}"),
-            ])
-            
-            # Create the agent
-            agent = create_tool_calling_agent(llm, tools, prompt)
-            agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=False)
-            
-            result = agent_executor.invoke({"input": user_query})
+            query = prompt.fit_input(user_query)
+            history = prompt.fit_history(history_messages(), context + query) + prompt.context_messages(context)
+            result = await agent_executor.ainvoke({"input": query, "chat_history": history})
             return result["output"]
         except Exception as e:
             # Fallback to basic chat if agent fails
-            messages = [
-                SystemMessage(content=PROMPT_HR + " (Note: Web search unavailable due to error)"),
-                HumanMessage(content=user_query)
-            ]
-            response = llm.invoke(messages)
-            return response.content
-    else:
-        # Basic chat without tools
-        messages = [
-            SystemMessage(content=PROMPT_HR + " (Note: Web search unavailable)"),
-            HumanMessage(content=user_query)
-        ]
-        response = llm.invoke(messages)
-        return response.content
+            logger.warning("⚠️  HR tool agent failed (%s), answering without search", e)
+
+    # Basic chat without tools
+    messages = prompt.messages(user_query, context=context)
+    response = await acall_tiered("HR", llm, user_query, messages)
+    return response.content
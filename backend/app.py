@@ -1,10 +1,43 @@
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from chat import chat_router
+from chat import chat_router, run_job
+from core.jobs import start_job_workers, stop_job_workers
+from core.logs import RequestIdMiddleware
+from core.metrics import MetricsMiddleware
+from core.registry import preload
+
+logger = logging.getLogger("App")
+
+
+def _preload_in_background():
+    try:
+        preload()
+    except Exception as e:
+        # The first request will retry the import and report the error
+        logger.warning("⚠️  Agent preload failed: %s", e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Agents load lazily; PRELOAD_AGENTS=true warms them up in a background
+    # thread so the app answers /health immediately and the first chat is fast
+    if os.getenv("PRELOAD_AGENTS", "true").lower() == "true":
+        asyncio.get_running_loop().run_in_executor(None, _preload_in_background)
+    # Background job workers (JOBS_WORKERS per process; 0 leaves jobs to job_worker.py)
+    start_job_workers(run_job)
+    yield
+    # Unfinished jobs go back to the queue for the next worker
+    await stop_job_workers()
+
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS configuration for frontend (includes Docker container networking)
 origins = [
@@ -21,8 +54,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request duration by route and status for /metrics (see core.metrics)
+app.add_middleware(MetricsMiddleware)
+
+# Tags every log line of a request with its X-Request-ID (see core.logs)
+app.add_middleware(RequestIdMiddleware)
+
 # Register routers
 app.include_router(chat_router)
 
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Backpressure benchmark for /chat.
+Sends a burst of concurrent HR chats through the FastAPI app to a fake LLM
+that, like the real provider, answers 429 above a concurrency limit. Without
+admission control most of the burst fails; with the scheduler the calls
+queue up behind a per-agent limit, low-priority work waits behind
+high-priority work, and what cannot be served in time is shed right away
+with 503/429 and a Retry-After header.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from collections import Counter
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, point_backend_at
+
+
+async def burst(client, requests):
+    """Fire (message, priority) chats at once; return [(status, latency, priority, retry_after)]."""
+    async def one(message, priority):
+        start = time.perf_counter()
+        response = await client.post("/chat", json={"message": message, "agent": "HR", "priority": priority})
+        return response.status_code, time.perf_counter() - start, priority, response.headers.get("retry-after")
+
+    return await asyncio.gather(*[one(message, priority) for message, priority in requests])
+
+
+def report(name, results, server, wall):
+    statuses = Counter(status for status, _, _, _ in results)
+    ok = [latency for status, latency, _, _ in results if status == 200]
+    shed = [latency for status, latency, _, _ in results if status in (429, 503)]
+    print(f"{name:<34}{statuses[200]:>5}{statuses[429]:>6}{statuses[503]:>6}"
+          f"{sum(n for s, n in statuses.items() if s not in (200, 429, 503)):>7}"
+          f"{(percentile(ok, 50) * 1000 if ok else 0):>9.0f}{(percentile(ok, 95) * 1000 if ok else 0):>9.0f}"
+          f"{(statistics.median(shed) * 1000 if shed else 0):>10.0f}"
+          f"{server.app.state.usage['rate_limited']:>10}{wall:>8.1f}"
+          f"{'/'.join(sorted({r for _, _, _, r in results if r}, key=int)) or '-':>13}")
+
+
+async def main(burst_size: int, provider_limit: int, latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms, concurrency_limit=provider_limit) as server:
+        point_backend_at(server.base_url)
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+
+        import httpx
+        from app import app
+        from core.scheduler import Scheduler, set_scheduler
+        logging.disable(logging.ERROR)
+
+        print(f"Burst of {burst_size} HR chats; fake LLM: {latency_ms:.0f} ms per call, "
+              f"429 above {provider_limit} concurrent calls")
+        print(f"{'':<34}{'ok':>5}{'429':>6}{'503':>6}{'other':>7}{'p50 ms':>9}{'p95 ms':>9}"
+              f"{'shed ms':>10}{'prov 429':>10}{'wall s':>8}{'Retry-After':>13}")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            async def scenario(name, scheduler, requests, deadline="30"):
+                os.environ["SCHEDULER_DEADLINE_SECONDS"] = deadline
+                set_scheduler(scheduler)
+                server.app.state.usage.clear()
+                start = time.perf_counter()
+                results = await burst(client, requests)
+                report(name, results, server, time.perf_counter() - start)
+                return results
+
+            normal = [(f"How many vacation days do I get? #{i}", "normal") for i in range(burst_size)]
+            await scenario("warm-up", Scheduler(max_concurrency=provider_limit), normal[:provider_limit])
+            await scenario("no scheduler", None, normal)
+            await scenario(f"HR limit {provider_limit}", Scheduler(max_concurrency=provider_limit), normal)
+            await scenario(f"HR limit {provider_limit}, queue {burst_size // 4}",
+                           Scheduler(max_concurrency=provider_limit, max_queue=burst_size // 4), normal)
+            await scenario(f"HR limit {provider_limit}, deadline 1 s",
+                           Scheduler(max_concurrency=provider_limit), normal, deadline="1")
+            tokens_per_call = 600
+            await scenario(f"TPM {tokens_per_call * provider_limit}, deadline 2 s",
+                           Scheduler(max_concurrency=provider_limit, tpm=tokens_per_call * provider_limit,
+                                     completion_tokens=tokens_per_call),
+                           normal, deadline="2")
+
+            # Low-priority traffic arrives first; high-priority chats should still jump the queue
+            mixed = [(f"Explain the onboarding process #{i}", "low") for i in range(burst_size)]
+            mixed += [(f"Explain the review process #{i}", "high") for i in range(burst_size // 5)]
+            results = await scenario("priority lanes (low + high)", Scheduler(max_concurrency=provider_limit), mixed)
+            for priority in ("high", "low"):
+                latencies = [latency for status, latency, p, _ in results if status == 200 and p == priority]
+                print(f"  {priority:<6} p50 {percentile(latencies, 50) * 1000:6.0f} ms   "
+                      f"p95 {percentile(latencies, 95) * 1000:6.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=100)
+    parser.add_argument("--provider-limit", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.burst, args.provider_limit, args.latency_ms))
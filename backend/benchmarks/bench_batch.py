@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Batch throughput benchmark.
+Compares the sequential run_supreme_agent loop of test_routing.py with the
+batch API (run_supreme_batch and POST /chat/batch) on unique queries against
+the fake LLM. The memo, fast path and response cache are off, so every query
+needs routing: the batch path classifies them 20 per supervisor call and
+runs sub-agents concurrently.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+
+from bench_modes import FIXTURE
+from fake_llm import FakeLLMServer, ServerThread, point_backend_at
+
+
+def load_queries(count: int):
+    with open(FIXTURE) as f:
+        fixture = [json.loads(line)["query"] for line in f if line.strip()]
+    return [f"{fixture[i % len(fixture)]} (#{i})" for i in range(count)]
+
+
+async def http_batch(client, queries, body_format: str):
+    """POST /chat/batch; return (seconds to first result, total seconds, result lines)."""
+    if body_format == "json":
+        kwargs = {"json": {"queries": queries}}
+    else:
+        kwargs = {
+            "content": "\n".join(json.dumps({"message": query}) for query in queries),
+            "headers": {"content-type": "application/x-ndjson"},
+        }
+    start = time.perf_counter()
+    first, results = None, []
+    async with client.stream("POST", "/chat/batch", **kwargs) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            event = json.loads(line)
+            if event["type"] == "result":
+                first = first or time.perf_counter() - start
+                results.append(event)
+    return first, time.perf_counter() - start, results
+
+
+async def main(count: int, sequential_count: int, concurrency: int, latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms) as server:
+        point_backend_at(server.base_url)
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["SUPREME_BATCH_CONCURRENCY"] = str(concurrency)
+
+        import httpx
+        from app import app
+        from supreme import supreme
+        from supreme.batch import astream_supreme_batch, run_supreme_batch
+        logging.disable(logging.INFO)
+        supreme.routing_memo = None
+        supreme.FAST_ROUTER_ENABLED = False
+
+        queries = load_queries(count)
+        print(f"Fake LLM {latency_ms:.0f} ms per call; batch concurrency {concurrency}")
+        print(f"{'':<32}{'queries':>8}{'first (s)':>11}{'wall (s)':>10}{'queries/s':>11}{'LLM calls/q':>13}")
+
+        def row(name, n, first, wall, calls):
+            print(f"{name:<32}{n:>8}{first:>11.2f}{wall:>10.2f}{n / wall:>11.1f}{calls / n:>13.2f}")
+
+        def calls_since(before):
+            return server.app.state.usage["calls"] - before
+
+        # test_routing.py style: one query after another
+        sequential = queries[:sequential_count]
+        before, start, first = server.app.state.usage["calls"], time.perf_counter(), None
+        for query in sequential:
+            await asyncio.to_thread(supreme.run_supreme_agent, query)
+            first = first or time.perf_counter() - start
+        row("sequential run_supreme_agent", len(sequential), first, time.perf_counter() - start, calls_since(before))
+
+        before, start = server.app.state.usage["calls"], time.perf_counter()
+        results = await asyncio.to_thread(run_supreme_batch, queries)
+        assert [r["index"] for r in results] == list(range(count)) and not any("error" in r for r in results)
+        row("run_supreme_batch (ordered)", count, time.perf_counter() - start, time.perf_counter() - start,
+            calls_since(before))
+
+        for mode in ("routed", "combined"):
+            before, start, first = server.app.state.usage["calls"], time.perf_counter(), None
+            async for _ in astream_supreme_batch(queries, mode=mode):
+                first = first or time.perf_counter() - start
+            row(f"astream_supreme_batch {mode}", count, first, time.perf_counter() - start, calls_since(before))
+
+        # A real server: the in-process ASGI transport would buffer the stream
+        with ServerThread(app, port=8767) as backend:
+            async with httpx.AsyncClient(base_url=backend.base_url, timeout=600) as client:
+                for body_format in ("json", "jsonl"):
+                    before = server.app.state.usage["calls"]
+                    first, wall, results = await http_batch(client, queries, body_format)
+                    assert len(results) == count and not any("error" in r for r in results)
+                    row(f"POST /chat/batch ({body_format})", count, first, wall, calls_since(before))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--sequential", type=int, default=20, help="queries for the sequential baseline")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.queries, args.sequential, args.concurrency, args.latency_ms))
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing benchmark: an announcement burst.
+A handful of questions are each asked by many people within a second,
+through /chat and /chat/stream, with the response cache on (it only helps
+once a first answer has finished). Compared with coalescing off and on:
+LLM calls, p50/p95 latency and the coalescing ratio from /coalescing/stats.
+Then a disconnect check: half of a group of identical streams is cancelled
+mid-answer and the rest must still complete from one upstream call.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUESTIONS = [
+    "What does the reorganization mean for my team?",
+    "Is the office closed on Friday after the announcement?",
+    "How does the new bonus policy affect my salary review?",
+    "Will the deploy freeze change our release process?",
+    "Who do I talk to about the new travel policy?",
+]
+
+
+def burst(askers: int, window: float, seed: int = 0) -> list:
+    """(arrival offset, question) for every asker, all within `window` seconds."""
+    rng = random.Random(seed)
+    return sorted((rng.uniform(0, window), rng.choice(QUESTIONS)) for _ in range(askers))
+
+
+async def ask(client, path: str, question: str, tag: str) -> float:
+    body = {"message": f"{question} {tag}".strip()}
+    start = time.perf_counter()
+    if path == "/chat":
+        (await client.post(path, json=body)).raise_for_status()
+    else:
+        async with client.stream("POST", path, json=body) as response:
+            async for line in response.aiter_lines():
+                if line.startswith("data: ") and json.loads(line[6:])["type"] == "error":
+                    raise RuntimeError(line)
+    return time.perf_counter() - start
+
+
+async def run_burst(client, arrivals, path: str, tag: str) -> list:
+    began = time.perf_counter()
+
+    async def one(offset, question):
+        await asyncio.sleep(max(0.0, offset - (time.perf_counter() - began)))
+        return await ask(client, path, question, tag)
+
+    return await asyncio.gather(*[one(offset, question) for offset, question in arrivals])
+
+
+async def disconnect_check(client, server, group: int):
+    """Cancel half of `group` identical streams mid-answer; the rest must finish."""
+    calls = server.app.state.usage["calls"]
+    tasks = [asyncio.create_task(ask(client, "/chat/stream", "Is the parking garage open today?", "(disconnect)"))
+             for _ in range(group)]
+    await asyncio.sleep(0.3)
+    for task in tasks[::2]:
+        task.cancel()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    finished = sum(isinstance(result, float) for result in results)
+    print(f"\ndisconnect check: {group} identical streams, {len(tasks[::2])} cancelled mid-answer, "
+          f"{finished} completed, {server.app.state.usage['calls'] - calls} LLM calls")
+
+
+async def main(askers: int, window: float, latency_ms: float, token_latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms, token_latency_ms=token_latency_ms) as server:
+        point_backend_at(server.base_url)
+        os.environ["FAST_ROUTER_ENABLED"] = "false"
+        logging.disable(logging.WARNING)
+
+        import httpx
+        from app import app
+        from core.cache import build_response_cache, set_response_cache
+        from core.registry import preload
+        from core.singleflight import SingleFlight, set_singleflight
+        preload()
+
+        arrivals = burst(askers, window)
+        print(f"{askers} askers of {len(QUESTIONS)} questions within {window:.1f} s; fake LLM {latency_ms:.0f} ms "
+              f"+ {token_latency_ms:.0f} ms/token; response cache on")
+        print(f"{'':<32}{'LLM calls':>10}{'p50 ms':>9}{'p95 ms':>9}{'coalesced':>11}")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for path in ("/chat", "/chat/stream"):
+                for enabled in (False, True):
+                    # Fresh cache; the tag gives every run its own queries (and memo entries)
+                    set_response_cache(build_response_cache())
+                    set_singleflight(SingleFlight() if enabled else None)
+                    tag = f"({path} {'on' if enabled else 'off'})"
+                    calls = server.app.state.usage["calls"]
+                    latencies = await run_burst(client, arrivals, path, tag)
+                    stats = (await client.get("/coalescing/stats")).json()
+                    name = f"{path}, coalescing {'on' if enabled else 'off'}"
+                    print(f"{name:<32}{server.app.state.usage['calls'] - calls:>10}"
+                          f"{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+                          f"{stats.get('coalescing_ratio', 0.0):>11.0%}")
+            await disconnect_check(client, server, 10)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--askers", type=int, default=200)
+    parser.add_argument("--window", type=float, default=1.0, help="seconds over which the askers arrive")
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=10.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.askers, args.window, args.latency_ms, args.token_latency_ms))
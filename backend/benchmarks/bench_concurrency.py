@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for /chat.
+Fires batches of concurrent requests through the FastAPI app against the local
+fake LLM and reports how wall-clock time scales with the number of in-flight
+chats. With the async path the wall time should stay close to two LLM
+round trips regardless of concurrency; the blocking baseline grows linearly.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+
+async def run_async_batch(client, concurrency: int) -> float:
+    start = time.perf_counter()
+    responses = await asyncio.gather(*[
+        client.post("/chat", json={"message": f"What is the company vision? #{i}"})
+        for i in range(concurrency)
+    ])
+    elapsed = time.perf_counter() - start
+    assert all(r.status_code == 200 for r in responses), [r.text for r in responses if r.status_code != 200]
+    return elapsed
+
+
+async def run_blocking_batch(run_supreme_agent, concurrency: int) -> float:
+    # What the old handler did: a sync LLM call inside an async endpoint
+    async def blocking_handler(i: int):
+        return run_supreme_agent(f"What is the company vision? #{i}")
+
+    start = time.perf_counter()
+    await asyncio.gather(*[blocking_handler(i) for i in range(concurrency)])
+    return time.perf_counter() - start
+
+
+async def main(levels, latency_ms: float, baseline_max: int):
+    with FakeLLMServer(latency_ms=latency_ms) as server:
+        point_backend_at(server.base_url)
+
+        import httpx
+        from app import app
+        from supreme.supreme import run_supreme_agent
+        logging.disable(logging.INFO)
+
+        print(f"Fake LLM latency: {latency_ms:.0f} ms per call (2 calls per routed chat)")
+        print(f"{'concurrency':>12} {'async wall (s)':>15} {'async chats/s':>14} {'blocking wall (s)':>18}")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            await run_async_batch(client, 1)  # warm up clients and connection pools
+            for concurrency in levels:
+                async_wall = await run_async_batch(client, concurrency)
+                if concurrency <= baseline_max:
+                    blocking = f"{await run_blocking_batch(run_supreme_agent, concurrency):18.2f}"
+                else:
+                    blocking = f"{'(skipped)':>18}"
+                print(f"{concurrency:>12} {async_wall:15.2f} {concurrency / async_wall:14.1f} {blocking}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--levels", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--baseline-max", type=int, default=10,
+                        help="largest concurrency to run the blocking baseline at")
+    args = parser.parse_args()
+    asyncio.run(main(args.levels, args.latency_ms, args.baseline_max))
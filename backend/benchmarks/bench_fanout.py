@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Multi-agent fan-out benchmark.
+Cross-department questions (matching both HR and Developer keywords) go
+through the supreme agent against the fake LLM with lognormal latency, its
+supervisor naming every matching agent. Compared:
+- single agent: FANOUT_MAX_AGENTS=1, only the primary persona answers
+- sequential: supervisor, then each named agent awaited in turn
+- parallel fan-out: the graph's Send branches and aggregate node
+Reports p50/p95 latency, LLM calls and answer sections per request.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, point_backend_at
+
+TOPICS = [
+    "How should we store employee salary data in the database?",
+    "What onboarding docs should new hires get for our Python stack?",
+    "Can the review process for engineers include code quality metrics?",
+    "How do we deploy the vacation request API without downtime?",
+    "Which benefits matter most when hiring senior Docker engineers?",
+]
+
+
+def workload(requests: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [f"{rng.choice(TOPICS)} (case {i})" for i in range(requests)]
+
+
+async def sequential(supreme, query: str) -> str:
+    """Consult the supervisor's agents one after the other."""
+    decision = (await supreme.asupreme_agent({"query": query}))["decision"]
+    agents = supreme.decision_agents(decision)
+    messages = []
+    for agent in agents:
+        state = {"query": query, "decision": {**decision, "agent": agent}}
+        messages += (await supreme.ASYNC_AGENT_NODES[agent](state))["messages"]
+    return supreme.merge_answers(messages, agents)
+
+
+async def measure(run, queries, concurrency: int):
+    from supreme.supreme import split_answer
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, sections = {}, []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            answer = await run(query)
+            latencies[query] = time.perf_counter() - start
+            sections.append(len(split_answer(answer)[0]) or 1)
+
+    await asyncio.gather(*[one(query) for query in queries])
+    return latencies, sections
+
+
+async def main(requests: int, concurrency: int, latency_ms: float, sigma: float, width: int):
+    with FakeLLMServer(latency_ms=latency_ms, latency_sigma=sigma) as server:
+        point_backend_at(server.base_url)
+        server.app.state.fanout = True
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["ROUTING_MEMO_BACKEND"] = "off"
+        os.environ["FAST_ROUTER_ENABLED"] = "false"
+        logging.disable(logging.WARNING)
+
+        from supreme import supreme
+
+        print(f"{requests} cross-department requests, {concurrency} concurrent; fake LLM {latency_ms:.0f} ms "
+              f"(sigma {sigma}), fan-out width {width}")
+        print(f"{'':<20}{'p50 ms':>9}{'p95 ms':>9}{'LLM calls':>11}{'sections':>10}")
+        runs = [
+            ("single agent", 1, lambda query: supreme.arun_supreme_agent(query, "routed")),
+            ("sequential", width, lambda query: sequential(supreme, query)),
+            ("parallel fan-out", width, lambda query: supreme.arun_supreme_agent(query, "routed")),
+        ]
+        p50 = {}
+        for name, max_agents, run in runs:
+            supreme.FANOUT_MAX_AGENTS = max_agents
+            queries = [f"{query} [{name}]" for query in workload(requests)]
+            calls = server.app.state.usage["calls"]
+            latencies, sections = await measure(run, queries, concurrency)
+            values = list(latencies.values())
+            p50[name] = percentile(values, 50)
+            print(f"{name:<20}{p50[name] * 1000:>9.0f}{percentile(values, 95) * 1000:>9.0f}"
+                  f"{(server.app.state.usage['calls'] - calls) / requests:>11.1f}"
+                  f"{sum(sections) / len(sections):>10.1f}")
+
+        print(f"\np50 over single agent: sequential {(p50['sequential'] - p50['single agent']) * 1000:+.0f} ms, "
+              f"parallel fan-out {(p50['parallel fan-out'] - p50['single agent']) * 1000:+.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--sigma", type=float, default=0.5)
+    parser.add_argument("--width", type=int, default=2, help="FANOUT_MAX_AGENTS for the fan-out runs")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency_ms, args.sigma, args.width))
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+HR agent with web search: latency before and after reusing the agent.
+The fake LLM answers the first call of every HR request with parallel
+web_search tool calls and the second with the answer; its /search endpoint
+stands in for the Serper API. Compared with concurrent HR requests (half
+of them repeating an earlier question):
+- before: prompt, agent and AgentExecutor built per request, a sync search
+  tool (run on the default thread pool), no search cache
+- after: the executor built once in agents.hr, the async search tool
+- after + search cache: the same with core.search.CachedSearch
+Also reports the cost of building the agent per request.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUESTIONS = [
+    "What is the statutory parental leave in Germany?",
+    "How do other companies handle remote work stipends?",
+    "What is the average salary increase this year?",
+    "Which benefits do tech startups usually offer?",
+    "What are the rules for overtime pay in California?",
+]
+
+
+def workload(requests: int, seed: int = 0) -> list:
+    """Half new questions, half repeats of earlier ones."""
+    rng = random.Random(seed)
+    queries = []
+    for i in range(requests):
+        if queries and rng.random() < 0.5:
+            queries.append(rng.choice(queries))
+        else:
+            queries.append(f"{rng.choice(QUESTIONS)} (case {i})")
+    return queries
+
+
+def old_style_runner(hr, search):
+    """The pre-cache run path: everything built per request around a sync tool."""
+    from langchain.agents import AgentExecutor, create_tool_calling_agent
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_core.tools import StructuredTool
+    from core.search import SEARCH_TOOL_DESCRIPTION, format_results
+    from prompts import PROMPT_HR
+
+    def web_search(query: str) -> str:
+        return format_results(search.search(query))
+
+    tools = [StructuredTool.from_function(func=web_search, name="web_search", description=SEARCH_TOOL_DESCRIPTION)]
+
+    def build():
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", PROMPT_HR),
+            ("placeholder", "{chat_history}"),
+            ("human", "{input}"),
+            ("placeholder", "{agent_scratchpad}"),
+        ])
+        agent = create_tool_calling_agent(hr.llm, tools, prompt)
+        return AgentExecutor(agent=agent, tools=tools, verbose=False)
+
+    async def run(query: str) -> str:
+        return (await build().ainvoke({"input": query, "chat_history": []}))["output"]
+
+    return run, build
+
+
+async def measure(run, queries, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await run(query)
+            return time.perf_counter() - start
+
+    began = time.perf_counter()
+    latencies = await asyncio.gather(*[one(query) for query in queries])
+    return latencies, time.perf_counter() - began
+
+
+async def main(requests: int, concurrency: int, latency_ms: float, search_ms: float, tool_calls: int):
+    with FakeLLMServer(latency_ms=latency_ms) as server:
+        point_backend_at(server.base_url)
+        server.app.state.search_latency_ms = search_ms
+        server.app.state.tool_calls = tool_calls
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["SERPER_API_KEY"] = "fake-serper-key"
+        os.environ["SERPER_BASE_URL"] = server.base_url.rsplit("/v1", 1)[0]
+        logging.disable(logging.WARNING)
+
+        from agents import hr
+        from core.search import CachedSearch, SerperSearch, set_search
+
+        search = SerperSearch(os.environ["SERPER_API_KEY"], os.environ["SERPER_BASE_URL"])
+        old_run, build = old_style_runner(hr, search)
+        queries = workload(requests)
+
+        print(f"{requests} HR requests, {concurrency} concurrent; fake LLM {latency_ms:.0f} ms per call, "
+              f"{tool_calls} parallel searches of {search_ms:.0f} ms per request")
+        print(f"{'':<28}{'p50 ms':>9}{'p95 ms':>9}{'req/s':>8}{'searches':>10}")
+        runs = [
+            ("before", None, old_run),
+            ("after", search, hr.arun_hr),
+            ("after + search cache", CachedSearch(search), hr.arun_hr),
+        ]
+        for name, provider, run in runs:
+            set_search(provider)
+            searches = server.app.state.usage["searches"]
+            latencies, wall = await measure(run, queries, concurrency)
+            print(f"{name:<28}{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+                  f"{requests / wall:>8.1f}{server.app.state.usage['searches'] - searches:>10}")
+
+        iterations = 200
+        start = time.perf_counter()
+        for _ in range(iterations):
+            build()
+        print(f"building prompt + agent + AgentExecutor per request: {(time.perf_counter() - start) / iterations * 1e3:.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--search-ms", type=float, default=300.0)
+    parser.add_argument("--tool-calls", type=int, default=2)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.latency_ms, args.search_ms, args.tool_calls))
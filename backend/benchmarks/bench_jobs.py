@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Background job benchmark.
+A burst of long Developer answers (the fake LLM streams a few hundred
+words slowly) goes to the app in process, first as plain /chat requests
+behind a proxy timeout, then as POST /jobs with a fixed number of job
+workers. Reports:
+- HTTP latency: /chat response times (and requests the proxy would have
+  cut off) vs. the time POST /jobs takes to answer
+- job completion: queue wait and submit-to-done time, jobs per second
+- restarts: the same burst with the workers stopped mid-way, cleanly
+  (jobs handed back) and by a simulated crash (jobs recovered once their
+  lease runs out); every job must still finish exactly once
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUESTION = "Write code for a Python service that retries failed API calls, with tests (case {})"
+
+
+async def sync_burst(client, burst: int, proxy_timeout: float):
+    """Every request holds its connection until the answer is complete."""
+    async def one(i):
+        start = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                client.post("/chat", json={"message": QUESTION.format(f"sync {i}"), "agent": "developer",
+                                           "timeout": 300}), proxy_timeout)
+            return response.status_code, time.perf_counter() - start
+        except asyncio.TimeoutError:
+            return 504, time.perf_counter() - start
+
+    return await asyncio.gather(*[one(i) for i in range(burst)])
+
+
+async def submit(client, burst: int, tag: str):
+    """POST /jobs for the whole burst; returns {job_id: submit time} and the submit latencies."""
+    async def one(i):
+        start = time.perf_counter()
+        response = await client.post("/jobs", json={"message": QUESTION.format(f"{tag} {i}"), "agent": "developer"})
+        return response.json()["job_id"], start, time.perf_counter() - start
+
+    results = await asyncio.gather(*[one(i) for i in range(burst)])
+    return {job_id: start for job_id, start, _ in results}, [seconds for _, _, seconds in results]
+
+
+async def wait_done(client, submitted: dict, poll: float = 0.1, limit: float = 600):
+    """Poll until every job has finished; {job_id: job} plus when each was first seen done."""
+    finished, done_at = {}, {}
+    deadline = time.perf_counter() + limit
+    while len(finished) < len(submitted) and time.perf_counter() < deadline:
+        for job_id in [job_id for job_id in submitted if job_id not in finished]:
+            job = (await client.get(f"/jobs/{job_id}")).json()
+            if job["status"] in ("done", "failed", "cancelled"):
+                finished[job_id], done_at[job_id] = job, time.perf_counter()
+        await asyncio.sleep(poll)
+    return finished, done_at
+
+
+def report_jobs(name: str, submitted: dict, finished: dict, done_at: dict, started: float):
+    statuses = [job["status"] for job in finished.values()]
+    waits = [job["started_at"] - job["created_at"] for job in finished.values() if job.get("started_at")]
+    totals = [done_at[job_id] - submitted[job_id] for job_id in finished]
+    attempts = sum(job["attempts"] for job in finished.values())
+    elapsed = max(done_at.values(), default=started) - started
+    print(f"{name:<22}{statuses.count('done'):>5}/{len(submitted):<4}{len(submitted) - len(finished):>5}"
+          f"{percentile(waits, 50) * 1000:>9.0f}{percentile(totals, 50) * 1000:>9.0f}"
+          f"{percentile(totals, 95) * 1000:>9.0f}{len(finished) / max(elapsed, 1e-9):>8.1f}{attempts:>9}")
+
+
+async def main(burst: int, workers: int, proxy_timeout: float, answer_words: int, token_latency_ms: float):
+    root = tempfile.mkdtemp(prefix="bench_jobs_")
+    with FakeLLMServer(latency_ms=300, token_latency_ms=token_latency_ms) as server:
+        point_backend_at(server.base_url)
+        server.app.state.answer_words = answer_words
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["LOG_FILE"] = ""
+        os.environ["LOG_STDOUT"] = "false"
+        os.environ["JOBS_PATH"] = os.path.join(root, "jobs.sqlite3")
+        os.environ["JOBS_LEASE_SECONDS"] = "3"
+
+        import httpx
+        from app import app
+        from chat import run_job
+        import core.jobs as jobs
+        logging.disable(logging.CRITICAL)
+
+        print(f"burst of {burst} Developer chats, ~{answer_words} words at {token_latency_ms:.0f} ms/word; "
+              f"{workers} job workers; proxy timeout {proxy_timeout:.0f}s")
+        transport = httpx.ASGITransport(app=app)
+        try:
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+                results = await sync_burst(client, burst, proxy_timeout)
+                latencies = [seconds for _, seconds in results]
+                cut = sum(status == 504 for status, _ in results)
+                print(f"\n{'HTTP latency':<22}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}  cut off by the proxy")
+                print(f"{'/chat':<22}{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+                      f"{max(latencies) * 1000:>9.0f}  {cut}/{burst}")
+
+                jobs.start_job_workers(run_job, workers)
+                started = time.perf_counter()
+                submitted, submit_latencies = await submit(client, burst, "jobs")
+                print(f"{'POST /jobs':<22}{percentile(submit_latencies, 50) * 1000:>9.1f}"
+                      f"{percentile(submit_latencies, 95) * 1000:>9.1f}{max(submit_latencies) * 1000:>9.1f}  0/{burst}")
+
+                print(f"\n{'jobs':<22}{'done':>5}{'':5}{'lost':>5}{'wait p50':>9}{'end p50':>9}{'end p95':>9}"
+                      f"{'jobs/s':>8}{'attempts':>9}")
+                finished, done_at = await wait_done(client, submitted)
+                report_jobs("steady workers", submitted, finished, done_at, started)
+
+                for name, clean in (("clean restart", True), ("crash + lease expiry", False)):
+                    started = time.perf_counter()
+                    submitted, _ = await submit(client, burst, name)
+                    await asyncio.sleep(token_latency_ms * answer_words / 1000 / 2)
+                    pool = jobs.get_job_workers()
+                    if clean:
+                        await jobs.stop_job_workers()
+                    else:
+                        # Kill the workers without handing their jobs back, and drop the process's store
+                        pool._stopping = True
+                        for task in pool._tasks:
+                            task.cancel()
+                        await asyncio.gather(*pool._tasks, return_exceptions=True)
+                        jobs._job_workers = None
+                        jobs.set_job_store(jobs.build_job_store())
+                    jobs.start_job_workers(run_job, workers)
+                    finished, done_at = await wait_done(client, submitted)
+                    report_jobs(name, submitted, finished, done_at, started)
+                await jobs.stop_job_workers()
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--proxy-timeout", type=float, default=5.0, help="seconds before the proxy gives up on /chat")
+    parser.add_argument("--answer-words", type=int, default=300)
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.burst, args.workers, args.proxy_timeout, args.answer_words, args.token_latency_ms))
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Log viewer benchmark.
+Writes a synthetic text-format log (the narrative plus the core.logs stage
+events of many requests over the last day) split across a log and two
+rotated backups, then compares the old readlines-based viewer with
+core/logindex.py: tail time and peak memory, index build and incremental
+refresh, "Developer routings in the last hour", p95 latency by agent, a
+five-minute time range, and how quickly follow() sees an appended line
+(inotify vs. the old 100 ms polling), including across a rotation.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.logindex import LogIndex, follow, log_files, parse_line, tail_lines
+
+AGENTS = ["HR", "CEO", "Developer"]
+SOURCES = ["llm", "fast_path", "memo"]
+
+
+def request_block(ts: float, rng: random.Random) -> str:
+    """The log lines of one /chat request in LOG_FORMAT=text."""
+    stamp = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S") + f",{int(ts * 1000) % 1000:03d}"
+    agent, source = rng.choice(AGENTS), rng.choice(SOURCES)
+    request_id = f"{rng.getrandbits(64):016x}"
+    route_ms, agent_ms = rng.uniform(0.1, 900), rng.lognormvariate(7, 0.5)
+    chars = rng.randint(200, 2000)
+    lines = [
+        ("ChatRouter", f"🌐 NEW CHAT REQUEST: {rng.randint(10, 300)} characters, agent None (Supreme Agent)"),
+        ("office.events", f"request.received endpoint=/chat chars=42 agent=None mode=None session_id=None "
+                          f"request_id={request_id}"),
+        ("SupremeAgent", "🚀 SUPREME AGENT SYSTEM STARTED (mode routed)"),
+        ("SupremeAgent", "🧠 SUPREME AGENT - ROUTING DECISION"),
+        ("SupremeAgent", f"🐢 Fast-path not confident (0.41 < 0.6)"),
+        ("SupremeAgent", "🤔 Analyzing query with GPT-4o..."),
+        ("httpx", 'HTTP Request: POST https://api.openai.com/v1/chat/completions "HTTP/1.1 200 OK"'),
+        ("SupremeAgent", f"✅ Supervisor routed 'question number {request_id}' → {agent}"),
+        ("office.events", f"route.decided agent={agent} source={source} ms={route_ms:.1f} request_id={request_id}"),
+        ("SupremeAgent", f"🏢 AGENT {agent.upper()} - PROCESSING QUERY: processing with {agent} agent..."),
+        ("httpx", 'HTTP Request: POST https://api.openai.com/v1/chat/completions "HTTP/1.1 200 OK"'),
+        ("SupremeAgent", f"✅ Agent {agent} Response Generated: {chars} characters"),
+        ("office.events", f"agent.completed agent={agent} chars={chars} ms={agent_ms:.1f} request_id={request_id}"),
+        ("SupremeAgent", f"🎉 SUPREME AGENT SYSTEM COMPLETED: agent_{agent.lower()}, {chars} characters"),
+        ("ChatRouter", f"✅ CHAT REQUEST COMPLETED: {chars} characters from {agent}"),
+        ("office.events", f"request.completed endpoint=/chat agent={agent} chars={chars} "
+                          f"ms={route_ms + agent_ms:.1f} request_id={request_id}"),
+    ]
+    return "".join(f"{stamp} - {name} - INFO - {message}\n" for name, message in lines)
+
+
+def write_logs(path: str, megabytes: int, hours: float = 24.0):
+    """Write ~megabytes of requests spread over the last `hours`, as path.2, path.1 and path."""
+    rng = random.Random(7)
+    block_size = len(request_block(time.time(), rng).encode())
+    requests = megabytes * 1024 * 1024 // block_size
+    start = time.time() - hours * 3600
+    step = hours * 3600 / requests
+    names = [f"{path}.2", f"{path}.1", path]
+    per_file = requests // len(names) + 1
+    written = 0
+    for name in names:
+        with open(name, "w", encoding="utf-8") as f:
+            batch = []
+            for _ in range(min(per_file, requests - written)):
+                batch.append(request_block(start + written * step, rng))
+                written += 1
+                if len(batch) == 1000:
+                    f.write("".join(batch))
+                    batch = []
+            f.write("".join(batch))
+    return requests
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(fn, *args):
+    tracemalloc.start()
+    fn(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def old_tail(path: str, lines: int):
+    """What view_logs.tail_log_file used to do."""
+    with open(path) as f:
+        return f.readlines()[-lines:]
+
+
+def scan_all(paths, keep):
+    """Read every line of every file and keep the parsed ones `keep` accepts."""
+    kept = []
+    for path in paths:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parsed = parse_line(line)
+                if parsed and keep(parsed):
+                    kept.append(parsed)
+    return kept
+
+
+def follow_latency(path: str, use_inotify: bool, poll_interval: float, count: int = 40, rotate_at: int = 20):
+    """Seconds from write to yield for appended lines; the file is rotated halfway."""
+    seen, written = {}, {}
+    ready = threading.Event()
+
+    def reader():
+        lines = follow(path, poll_interval=poll_interval, use_inotify=use_inotify)
+        ready.set()
+        for line in lines:
+            if line.startswith("marker "):
+                seen[int(line.split()[1])] = time.perf_counter()
+                if len(seen) == count:
+                    return
+
+    thread = threading.Thread(target=reader, daemon=True)
+    thread.start()
+    ready.wait()
+    time.sleep(0.3)  # let the follower open the file and reach EOF
+    for i in range(count):
+        if i == rotate_at:
+            os.replace(path, path + ".rotated")
+            open(path, "w").close()
+        with open(path, "a") as f:
+            written[i] = time.perf_counter()
+            f.write(f"marker {i}\n")
+        time.sleep(0.02 + random.random() * 0.03)
+    thread.join(timeout=10)
+    delays = [seen[i] - written[i] for i in written if i in seen]
+    return delays, count - len(delays)
+
+
+def main(megabytes: int):
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "supreme_agent.log")
+        requests, seconds = timed(write_logs, path, megabytes)
+        files = log_files(path)
+        total = sum(os.path.getsize(name) for name in files)
+        print(f"{total / 1e6:.0f} MB over {len(files)} files, {requests} requests in the last 24 h "
+              f"(written in {seconds:.1f}s)\n")
+
+        print(f"{'tail -n 50':<44}{'time':>10}{'peak memory':>14}")
+        _, seconds = timed(old_tail, path, 50)
+        print(f"{'  old: readlines()':<44}{seconds * 1000:>8.0f}ms{peak_memory(old_tail, path, 50) / 1e6:>11.1f} MB")
+        _, seconds = timed(tail_lines, path, 50)
+        print(f"{'  new: seek back from EOF':<44}{seconds * 1000:>8.1f}ms"
+              f"{peak_memory(tail_lines, path, 50) / 1e6:>11.3f} MB")
+
+        index_path = os.path.join(directory, "index.sqlite3")
+        index = LogIndex(path, index_path)
+        stats, seconds = timed(index.refresh)
+        print(f"\nindex build: {stats['events']} events in {seconds:.1f}s ({total / 1e6 / seconds:.0f} MB/s), "
+              f"index {os.path.getsize(index_path) / 1e6:.1f} MB")
+        _, seconds = timed(index.refresh)
+        print(f"refresh, nothing new:      {seconds * 1000:8.1f} ms")
+        with open(path, "a", encoding="utf-8") as f:
+            rng = random.Random(1)
+            f.write("".join(request_block(time.time(), rng) for _ in range(500)))
+        stats, seconds = timed(index.refresh)
+        print(f"refresh, {stats['bytes'] / 1e6:.1f} MB appended:  {seconds * 1000:8.1f} ms")
+        os.replace(f"{path}.1", f"{path}.2")
+        os.replace(path, f"{path}.1")
+        open(path, "w").close()
+        stats, seconds = timed(index.refresh)
+        print(f"refresh after a rotation:  {seconds * 1000:8.1f} ms ({stats['bytes']} bytes re-read)")
+
+        files = log_files(path)
+        hour_ago = time.time() - 3600
+        print(f"\n{'query':<44}{'full scan':>12}{'index':>12}{'rows':>8}")
+        scanned, scan_seconds = timed(scan_all, files, lambda p: p[2] == "route.decided"
+                                      and p[3].get("agent") == "Developer" and p[0] >= hour_ago)
+        found, index_seconds = timed(index.events, "route.decided", "Developer", None, None, hour_ago)
+        assert len(found) == len(scanned), (len(found), len(scanned))
+        print(f"{'Developer routings in the last hour':<44}{scan_seconds * 1000:>10.0f}ms"
+              f"{index_seconds * 1000:>10.1f}ms{len(found):>8}")
+
+        def scan_percentiles():
+            by_agent = {}
+            for _, _, _, fields in scan_all(files, lambda p: p[2] == "request.completed"):
+                by_agent.setdefault(fields["agent"], []).append(float(fields["ms"]))
+            return {agent: sorted(values)[int(len(values) * 0.95)] for agent, values in by_agent.items()}
+
+        scanned, scan_seconds = timed(scan_percentiles)
+        report, index_seconds = timed(index.latency_percentiles)
+        print(f"{'p95 request latency by agent (24 h)':<44}{scan_seconds * 1000:>10.0f}ms"
+              f"{index_seconds * 1000:>10.1f}ms{sum(s['count'] for s in report.values()):>8}")
+
+        since = time.time() - 12 * 3600
+        until = since + 300
+        scanned, scan_seconds = timed(scan_all, files, lambda p: since <= p[0] <= until)
+        lines, index_seconds = timed(lambda: list(index.lines_between(since, until)))
+        assert len(lines) == len(scanned), (len(lines), len(scanned))
+        print(f"{'every line in a 5-minute window':<44}{scan_seconds * 1000:>10.0f}ms"
+              f"{index_seconds * 1000:>10.1f}ms{len(lines):>8}")
+        index.close()
+
+        print(f"\n{'follow: write → yield':<44}{'median':>10}{'max':>10}{'missed':>8}")
+        follow_path = os.path.join(directory, "follow.log")
+        open(follow_path, "w").close()
+        for name, inotify, interval in (("  polling every 100 ms (old)", False, 0.1), ("  inotify", True, 0.1)):
+            delays, missed = follow_latency(follow_path, inotify, interval)
+            print(f"{name:<44}{statistics.median(delays) * 1000:>8.1f}ms{max(delays) * 1000:>8.1f}ms{missed:>8}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--megabytes", type=int, default=300)
+    args = parser.parse_args()
+    main(args.megabytes)
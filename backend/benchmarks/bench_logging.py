@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Logging overhead benchmark.
+Sends warm /chat requests (routing memo and response cache hits, so no LLM
+call is made and logging is a large share of the work) under several
+logging setups, and reports the time per request plus the log lines and
+bytes written per request.
+
+Pass --backend with an older checkout of backend/ to measure the logging
+that predates core/logs.py (basicConfig, synchronous file and stdout writes;
+stdout goes to /dev/null here).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUERIES = [
+    "How many vacation days do I get?",
+    "What is the company vision for next year?",
+    "Why does my python deploy fail with a docker error?",
+    "Who approves parental leave requests?",
+]
+
+CONFIGS = [
+    ("logging disabled", None),
+    ("text, synchronous", {"LOG_FORMAT": "text", "LOG_ASYNC": "false"}),
+    ("text, queue", {"LOG_FORMAT": "text", "LOG_ASYNC": "true"}),
+    ("json, queue", {"LOG_FORMAT": "json", "LOG_ASYNC": "true"}),
+    ("json, queue, 10% sampled", {"LOG_FORMAT": "json", "LOG_ASYNC": "true", "LOG_SAMPLE_RATE": "0.1"}),
+]
+
+
+def install(log_file: str, settings):
+    """Point the backend's logging at log_file with the given LOG_* settings."""
+    logging.disable(logging.CRITICAL if settings is None else logging.NOTSET)
+    try:
+        from core.logs import configure_logging
+    except ImportError:
+        # Older tree: keep its basicConfig handlers but aim the file at log_file
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if type(handler) is logging.StreamHandler:
+                handler.setStream(sys.stdout)
+            elif isinstance(handler, logging.FileHandler):
+                root.removeHandler(handler)
+                handler.close()
+                replacement = logging.FileHandler(log_file, delay=True)
+                replacement.setFormatter(handler.formatter)
+                root.addHandler(replacement)
+        return
+    os.environ.update({"LOG_FILE": log_file, "LOG_STDOUT": "true", "LOG_SAMPLE_RATE": "1.0"})
+    os.environ.update(settings or {})
+    configure_logging(force=True)
+
+
+def flush():
+    try:
+        from core.logs import stop_logging
+        stop_logging()
+    except ImportError:
+        pass
+    for handler in logging.getLogger().handlers:
+        handler.flush()
+
+
+async def run(client, requests: int) -> float:
+    """Median seconds per /chat over `requests` warm requests."""
+    timings = []
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post("/chat", json={"message": QUERIES[i % len(QUERIES)]})
+        response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def main(requests: int, backend: str):
+    with FakeLLMServer(latency_ms=0) as server, tempfile.TemporaryDirectory() as directory, \
+            open(os.devnull, "w") as devnull:
+        point_backend_at(server.base_url)
+        sys.path.insert(0, os.path.abspath(backend))
+        os.environ["RESPONSE_CACHE_BACKEND"] = "memory"
+        os.environ["ROUTING_MEMO_BACKEND"] = "memory"
+        os.environ["RESPONSE_CACHE_ALLOW_NONDETERMINISTIC"] = "true"
+        os.environ["LOG_FILE"] = os.path.join(directory, "import.log")
+
+        import httpx
+        with contextlib.redirect_stdout(devnull):
+            from app import app
+
+        legacy = not os.path.exists(os.path.join(backend, "core", "logs.py"))
+        configs = [("legacy (before core/logs.py)", {})] if legacy else CONFIGS
+        print(f"{requests} warm /chat requests per setup (no LLM calls), log file in a temp directory")
+        print(f"{'':<30}{'µs/request':>12}{'lines/req':>11}{'bytes/req':>11}")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            with contextlib.redirect_stdout(devnull):
+                install(os.path.join(directory, "warmup.log"), None)
+                for query in QUERIES:  # fill the routing memo and the response cache
+                    (await client.post("/chat", json={"message": query})).raise_for_status()
+            if server.app.state.usage["calls"] == 0:
+                raise SystemExit("warm-up made no LLM calls; is the backend pointed at the stub?")
+            calls = server.app.state.usage["calls"]
+
+            for name, settings in configs:
+                log_file = os.path.join(directory, f"{len(os.listdir(directory))}.log")
+                with contextlib.redirect_stdout(devnull):
+                    # Handlers bound to sys.stdout now write to /dev/null
+                    install(log_file, settings)
+                    await run(client, 20)  # warm-up under this setup
+                    flush()
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(log_file)
+                    install(log_file, settings)
+                    seconds = await run(client, requests)
+                    flush()
+                size = os.path.getsize(log_file) if os.path.exists(log_file) else 0
+                lines = 0
+                if size:
+                    with open(log_file, "rb") as f:
+                        lines = sum(1 for _ in f)
+                print(f"{name:<30}{seconds * 1e6:>12.0f}{lines / requests:>11.1f}{size / requests:>11.0f}")
+
+            assert server.app.state.usage["calls"] == calls, "timed requests reached the LLM"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--backend", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        help="backend/ directory to import the app from")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.backend))
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Metrics overhead benchmark.
+Times the instrumentation primitives in core/metrics.py and the usage
+callback in core/clients.py, then sends /chat requests with metrics on and
+off: warm ones (routing memo and response cache hits, no LLM call) and cold
+ones (an agent call to the stub LLM, so the callback runs too). Logging is
+disabled so the difference is the instrumentation alone. Ends with the time
+to render /metrics.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUERIES = [
+    "How many vacation days do I get?",
+    "What is the company vision for next year?",
+    "Why does my python deploy fail with a docker error?",
+    "Who approves parental leave requests?",
+]
+
+
+def per_op(fn, loops: int) -> float:
+    """Best-of-five nanoseconds per call of fn()."""
+    best = float("inf")
+    for _ in range(5):
+        start = time.perf_counter_ns()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter_ns() - start) / loops)
+    return best
+
+
+def microbenchmarks(loops: int):
+    from langchain_core.messages import AIMessage
+    from langchain_core.outputs import ChatGeneration, LLMResult
+
+    from core import metrics
+    from core.clients import usage_callback
+
+    def empty():
+        pass
+
+    def stage():
+        with metrics.stage("bench", "Bench"):
+            pass
+
+    def inc():
+        metrics.ERRORS.inc("bench", "Bench")
+
+    def observe():
+        metrics.LLM_SECONDS.observe(0.42, "Bench", "gpt-4o")
+
+    message = AIMessage(content="ok", usage_metadata={"input_tokens": 50, "output_tokens": 40, "total_tokens": 90})
+    result = LLMResult(generations=[[ChatGeneration(message=message)]], llm_output={"model_name": "gpt-4o"})
+
+    run_id = uuid.uuid4()
+
+    def callback():
+        usage_callback.on_chat_model_start({}, [[]], run_id=run_id)
+        usage_callback.on_llm_end(result, run_id=run_id)
+
+    print(f"{'primitive':<40}{'ns/op':>10}")
+    baseline = per_op(empty, loops)
+    print(f"{'  empty function call':<40}{baseline:>10.0f}")
+    for name, fn in (("  with stage(...): pass", stage), ("  counter inc", inc), ("  histogram observe", observe),
+                     ("  usage callback start + end", callback)):
+        print(f"{name:<40}{per_op(fn, loops):>10.0f}")
+    metrics.METRICS_ENABLED = False
+    print(f"{'  with stage(...): pass, disabled':<40}{per_op(stage, loops):>10.0f}")
+    metrics.METRICS_ENABLED = True
+
+
+async def run(client, requests: int, cold: bool) -> float:
+    """Median seconds per /chat; cold requests carry a unique suffix so they miss every cache."""
+    timings = []
+    for i in range(requests):
+        message = QUERIES[i % len(QUERIES)]
+        if cold:
+            message = f"{message} (ticket {uuid.uuid4().hex[:8]})"
+        start = time.perf_counter()
+        response = await client.post("/chat", json={"message": message, "agent": "HR" if cold else None})
+        response.raise_for_status()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+async def main(requests: int, loops: int):
+    with FakeLLMServer(latency_ms=0) as server, tempfile.TemporaryDirectory() as directory, \
+            open(os.devnull, "w") as devnull:
+        point_backend_at(server.base_url)
+        sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        os.environ["RESPONSE_CACHE_BACKEND"] = "memory"
+        os.environ["ROUTING_MEMO_BACKEND"] = "memory"
+        os.environ["RESPONSE_CACHE_ALLOW_NONDETERMINISTIC"] = "true"
+        os.environ["LOG_FILE"] = os.path.join(directory, "bench.log")
+
+        import httpx
+        with contextlib.redirect_stdout(devnull):
+            from app import app
+        from core import metrics
+        logging.disable(logging.CRITICAL)
+
+        microbenchmarks(loops)
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for query in QUERIES:  # fill the routing memo and the response cache
+                (await client.post("/chat", json={"message": query})).raise_for_status()
+
+            print(f"\n{requests} /chat requests per row{'':<12}{'µs/request':>12}")
+            results = {}
+            for kind, cold in (("warm", False), ("cold", True)):
+                for enabled in (True, False, True, False):
+                    metrics.METRICS_ENABLED = enabled
+                    await run(client, 20, cold)  # warm-up under this setting
+                    seconds = await run(client, requests, cold)
+                    results.setdefault((kind, enabled), []).append(seconds)
+                for enabled in (False, True):
+                    name = f"  {kind}, metrics {'on' if enabled else 'off'}"
+                    print(f"{name:<40}{min(results[(kind, enabled)]) * 1e6:>12.0f}")
+                on, off = min(results[(kind, True)]), min(results[(kind, False)])
+                print(f"{'    overhead':<40}{(on - off) * 1e6:>12.0f}{(on - off) / off * 100:>9.1f}%")
+            metrics.METRICS_ENABLED = True
+
+            start = time.perf_counter()
+            response = await client.get("/metrics")
+            elapsed = time.perf_counter() - start
+            response.raise_for_status()
+            series = sum(1 for line in response.text.splitlines() if line and not line.startswith("#"))
+            print(f"\nGET /metrics: {series} series, {len(response.content) / 1024:.0f} KB in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--loops", type=int, default=100_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.loops))
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Routed vs. combined (single-call) mode benchmark.
+Replays the recorded query fixture through arun_supreme_agent against the
+fake LLM (lognormal latency, per-token generation time) and reports p50/p95
+latency, LLM calls and token usage per query for each execution mode.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+FIXTURE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "routing_eval.jsonl")
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def replay(supreme, queries, mode, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await supreme.arun_supreme_agent(query, mode)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(query) for query in queries])
+    return latencies
+
+
+async def main(rounds, concurrency, latency_ms, token_latency_ms, sigma):
+    with FakeLLMServer(latency_ms=latency_ms, token_latency_ms=token_latency_ms, latency_sigma=sigma) as server:
+        point_backend_at(server.base_url)
+
+        from supreme import supreme
+        from core.cache import set_response_cache
+        logging.disable(logging.INFO)
+        set_response_cache(None)
+        supreme.routing_memo = None
+
+        with open(FIXTURE) as f:
+            queries = [json.loads(line)["query"] for line in f if line.strip()] * rounds
+
+        runs = [
+            ("routed (LLM supervisor)", "routed", False),
+            ("routed + fast path", "routed", True),
+            ("combined (single call)", "combined", False),
+        ]
+        print(f"{len(queries)} queries, concurrency {concurrency}, fake LLM {latency_ms:.0f} ms "
+              f"(sigma {sigma}) + {token_latency_ms:.0f} ms/token")
+        print(f"{'mode':<26}{'p50 (ms)':>10}{'p95 (ms)':>10}{'calls/q':>9}{'prompt tok/q':>14}{'output tok/q':>14}")
+        for name, mode, fast_path in runs:
+            supreme.FAST_ROUTER_ENABLED = fast_path
+            before = dict(server.app.state.usage)
+            latencies = await replay(supreme, queries, mode, concurrency)
+            usage = {k: server.app.state.usage[k] - before.get(k, 0) for k in server.app.state.usage}
+            n = len(queries)
+            print(f"{name:<26}{statistics.median(latencies) * 1000:10.0f}{percentile(latencies, 95) * 1000:10.0f}"
+                  f"{usage['calls'] / n:9.2f}{usage['prompt_tokens'] / n:14.1f}{usage['completion_tokens'] / n:14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--sigma", type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.concurrency, args.latency_ms, args.token_latency_ms, args.sigma))
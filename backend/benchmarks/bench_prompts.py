@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Prompt assembly benchmark.
+1. Oversize inputs: routed /chat requests with pasted logs of growing size,
+   with the token budgets off and on. Reports latency and the prompt words
+   the supervisor and the agent received (the fake LLM charges prefill time
+   per uncached prompt word).
+2. Prefix caching: a long HR session through /chat with the fake LLM's
+   prompt cache disabled and enabled. Reports the cached share of prompt
+   tokens from /prompts/stats and the latency of the later turns.
+3. The cost of AgentPrompt.messages() itself for short and oversize inputs.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+LOG_LINES = [
+    "2024-05-02 10:14:03 ERROR api.orders request failed: database timeout after 30s",
+    "2024-05-02 10:14:03 WARN  api.orders retrying (attempt 2/3)",
+    "2024-05-02 10:14:04 INFO  pool size=20 busy=20 waiting=57",
+]
+
+
+def pasted_log(words: int, seed: int) -> str:
+    """A debugging question with a pasted log of about `words` words, half repeated lines."""
+    lines, count = [], 0
+    while count < words:
+        line = LOG_LINES[len(lines) % 3] if len(lines) % 2 else f"{LOG_LINES[0]} id={seed}-{len(lines)}"
+        lines.append(line)
+        count += len(line.split())
+    return f"Why does my Python API keep failing? Here is the log:\n" + "\n".join(lines)
+
+
+class _NoCache(set):
+    """A prefix cache that never remembers anything."""
+
+    def add(self, key):
+        pass
+
+
+def set_budgets(enabled: bool):
+    from core.prompting import _prompts
+
+    for prompt in _prompts.values():
+        if not hasattr(prompt, "_budgets"):
+            prompt._budgets = (prompt.input_tokens, prompt.max_tokens)
+        prompt.input_tokens, prompt.max_tokens = prompt._budgets if enabled else (0, 0)
+
+
+async def oversize_inputs(client, server, sizes, requests: int):
+    print(f"{'input words':<14}{'budgets':<10}{'p50 (ms)':>10}{'supervisor':>12}{'agent':>10}  prompt words")
+    for size in sizes:
+        for enabled in (False, True):
+            set_budgets(enabled)
+            latencies, prompts = [], {"supervisor": [], "agent": []}
+            for i in range(requests):
+                start = len(server.app.state.prompt_log)
+                began = time.perf_counter()
+                response = await client.post("/chat", json={"message": pasted_log(size, i + 1000 * size)})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - began)
+                for kind, words in server.app.state.prompt_log[start:]:
+                    if kind in prompts:
+                        prompts[kind].append(words)
+            medians = [statistics.median(prompts[kind]) if prompts[kind] else 0 for kind in ("supervisor", "agent")]
+            print(f"{size:<14}{'on' if enabled else 'off':<10}{statistics.median(latencies) * 1000:>10.0f}"
+                  + "".join(f"{words:>12.0f}" if i == 0 else f"{words:>10.0f}" for i, words in enumerate(medians)))
+
+
+async def prefix_caching(client, server, turns: int):
+    from core import metrics
+
+    set_budgets(True)
+    print(f"\n{turns}-turn HR session, answers of {server.app.state.answer_words} words")
+    print(f"{'provider cache':<16}{'cached share':>14}{'latency, last half (ms)':>26}")
+    for cache in (_NoCache(), set()):
+        server.app.state.prefix_cache = cache
+        before = {kind: metrics.LLM_TOKENS.value("HR", "gpt-4o", kind) or 0 for kind in ("prompt", "cached")}
+        session_id = f"bench-{time.monotonic_ns()}"
+        latencies = []
+        for turn in range(turns):
+            began = time.perf_counter()
+            response = await client.post("/chat", json={
+                "message": f"Follow-up question {turn} about my leave balance", "agent": "HR", "session_id": session_id,
+            })
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - began)
+        used = {kind: (metrics.LLM_TOKENS.value("HR", "gpt-4o", kind) or 0) - before[kind] for kind in before}
+        share = used["cached"] / used["prompt"] if used["prompt"] else 0.0
+        print(f"{'off' if isinstance(cache, _NoCache) else 'on':<16}{share:>13.0%}"
+              f"{statistics.median(latencies[turns // 2:]) * 1000:>26.0f}")
+
+
+def assembly_cost(iterations: int):
+    from core.prompting import agent_prompt
+    from prompts import PROMPT_HR
+
+    set_budgets(True)
+    prompt = agent_prompt("Bench", PROMPT_HR)
+    print(f"\n{'AgentPrompt.messages()':<28}{'µs per call':>12}")
+    for label, text in (("short question", "How many vacation days do I get?"),
+                        ("20k-word pasted log", pasted_log(20000, 0))):
+        count = iterations if len(text) < 1000 else max(1, iterations // 1000)
+        start = time.perf_counter()
+        for _ in range(count):
+            prompt.messages(text, history=[])
+        print(f"{label:<28}{(time.perf_counter() - start) / count * 1e6:>12.1f}")
+
+
+async def main(sizes, requests: int, turns: int, latency_ms: float, prefill: float, iterations: int):
+    with FakeLLMServer(latency_ms=latency_ms, prefill_ms_per_1k=prefill) as server:
+        point_backend_at(server.base_url)
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["ROUTING_MEMO_BACKEND"] = "off"
+        os.environ["FAST_ROUTER_ENABLED"] = "false"
+        os.environ["SESSION_SUMMARIZE"] = "false"
+        os.environ["SESSION_HISTORY_TOKENS"] = "4000"
+
+        import httpx
+        from app import app
+        from core.registry import preload
+        logging.disable(logging.WARNING)
+        preload()
+
+        print(f"fake LLM {latency_ms:.0f} ms + {prefill:.0f} ms per 1k uncached prompt words")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            await oversize_inputs(client, server, sizes, requests)
+            server.app.state.answer_words = 300
+            await prefix_caching(client, server, turns)
+        assembly_cost(iterations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 30000], help="pasted log sizes in words")
+    parser.add_argument("--requests", type=int, default=5)
+    parser.add_argument("--turns", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=50.0)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.sizes, args.requests, args.turns, args.latency_ms, args.prefill_ms_per_1k,
+                     args.iterations))
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Offline replay benchmark.
+Replays a recorded workload (see workloads.py) open-loop at a target QPS
+against the fake LLM and reports, per target, achieved throughput,
+p50/p95/p99 latency, errors, routing accuracy and LLM calls and tokens per
+request. Targets: /chat, /chat/stream (plus time to first token),
+arun_supreme_agent and each agent's arun_* function (--sync runs the sync
+run_supreme_agent / run_* entry points in a thread pool instead).
+
+Latency is measured from each request's scheduled arrival, so a backend that
+falls behind is charged for the queueing it causes. Caches, the routing memo
+and sessions start empty for every target.
+
+    python bench_replay.py --qps 20 --latency lognormal:300:0.4 --save baseline.json
+    python bench_replay.py --qps 20 --latency lognormal:300:0.4 --baseline baseline.json
+
+With --baseline the run exits with status 1 if a target got slower, lost
+throughput or routing accuracy, or failed more often than --tolerance allows.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from fake_llm import FakeLLMServer, point_backend_at
+from workloads import DEFAULT_WORKLOAD, load_workload
+
+TARGETS = ("chat", "stream", "supreme", "agents")
+AGENT_PREFIX_RE = re.compile(r"^Agent (\w+): ")
+MIN_LATENCY_DELTA = 0.005  # seconds; smaller changes are noise, whatever the percentage
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def plan_arrivals(rows, requests: int, qps: float, arrival: str, speed: float, seed: int) -> list:
+    """(offset seconds, row) for `requests` requests, cycling through the workload."""
+    rng = random.Random(seed)
+    span = max(row.get("t", 0) for row in rows) + 1 / qps
+    plan, t = [], 0.0
+    for i in range(requests):
+        row = rows[i % len(rows)]
+        if arrival == "recorded" and "t" in row:
+            t = (row["t"] + i // len(rows) * span) / speed
+        elif arrival == "poisson":
+            t += rng.expovariate(qps)
+        else:
+            t = i / qps
+        plan.append((t, row))
+    return plan
+
+
+def reset_state():
+    """Fresh response cache, routing memo and session memory for the next target."""
+    from core.cache import build_response_cache, set_response_cache
+    from core.registry import is_loaded
+    from core.sessions import build_session_memory, set_session_memory
+    set_response_cache(build_response_cache())
+    set_session_memory(build_session_memory())
+    if is_loaded("supreme.supreme"):
+        from supreme import supreme
+        from supreme.memo import build_memo
+        supreme.routing_memo = build_memo(supreme.PROMPT_SUPREME, supreme.supervisor_llm.model_name)
+
+
+def make_call(target: str, client, sync_pool):
+    """An async function row -> (agent used, seconds to first token or None)."""
+    from core.registry import get_agent_runner, get_supreme
+
+    async def chat(row):
+        response = await client.post("/chat", json={"message": row["query"], "session_id": row.get("session_id")})
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        return response.json()["agent_used"], None
+
+    async def stream(row):
+        start, first_token, agent = time.perf_counter(), None, None
+        payload = {"message": row["query"], "session_id": row.get("session_id")}
+        async with client.stream("POST", "/chat/stream", json=payload) as response:
+            if response.status_code != 200:
+                raise RuntimeError(f"HTTP {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                event = json.loads(line[len("data: "):])
+                if event["type"] == "agent":
+                    agent = event["agent_used"]
+                elif event["type"] == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+                elif event["type"] == "error":
+                    raise RuntimeError(f"HTTP {event.get('status', 500)}")
+        return agent, first_token
+
+    async def supreme(row):
+        if sync_pool:
+            loop = asyncio.get_running_loop()
+            answer = await loop.run_in_executor(sync_pool, get_supreme().run_supreme_agent, row["query"])
+        else:
+            answer = await get_supreme().arun_supreme_agent(row["query"])
+        match = AGENT_PREFIX_RE.match(answer)
+        return (match.group(1) if match else None), None
+
+    async def agents(row):
+        runner = get_agent_runner(row["agent"], asynchronous=not sync_pool)
+        if sync_pool:
+            await asyncio.get_running_loop().run_in_executor(sync_pool, runner, row["query"])
+        else:
+            await runner(row["query"])
+        return None, None  # the caller picked the agent, so there is no routing to score
+
+    return {"chat": chat, "stream": stream, "supreme": supreme, "agents": agents}[target]
+
+
+async def replay(call, plan) -> tuple:
+    """Send every request at its planned offset; returns (samples, wall seconds)."""
+    samples = []
+    start = time.perf_counter()
+
+    async def one(offset, row):
+        await asyncio.sleep(max(0.0, start + offset - time.perf_counter()))
+        scheduled = start + offset
+        sample = {"expected": row.get("agent"), "error": None, "agent": None, "ttft": None}
+        try:
+            sample["agent"], sample["ttft"] = await call(row)
+        except Exception as e:
+            sample["error"] = str(e) if str(e).startswith("HTTP ") else type(e).__name__
+        sample["latency"] = time.perf_counter() - scheduled
+        samples.append(sample)
+
+    await asyncio.gather(*[one(offset, row) for offset, row in plan])
+    return samples, time.perf_counter() - start
+
+
+def summarize(samples, wall: float, offered_qps: float, usage: Counter) -> dict:
+    ok = [s for s in samples if s["error"] is None]
+    latencies = [s["latency"] for s in ok]
+    scored = [s for s in ok if s["agent"] is not None and s["expected"]]
+    ttfts = [s["ttft"] for s in ok if s["ttft"] is not None]
+    result = {
+        "requests": len(samples),
+        "errors": len(samples) - len(ok),
+        "error_rate": (len(samples) - len(ok)) / len(samples),
+        "error_kinds": dict(Counter(s["error"] for s in samples if s["error"])),
+        "offered_qps": offered_qps,
+        "throughput": len(ok) / wall,
+        "routing_accuracy": sum(s["agent"] == s["expected"] for s in scored) / len(scored) if scored else None,
+        "llm_calls_per_request": usage["calls"] / len(samples),
+        "tokens_per_request": (usage["prompt_tokens"] + usage["completion_tokens"]) / len(samples),
+        "rate_limited": usage["rate_limited"],
+    }
+    for pct in (50, 95, 99):
+        result[f"p{pct}"] = percentile(latencies, pct) if latencies else None
+        result[f"ttft_p{pct}"] = percentile(ttfts, pct) if ttfts else None
+    return result
+
+
+def print_report(results: dict):
+    print(f"\n{'target':<10}{'ok/sent':>10}{'qps':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'ttft p50':>10}"
+          f"{'routing':>9}{'calls':>7}{'tokens':>8}")
+
+    def ms(value):
+        return f"{value * 1000:>7.0f}ms" if value is not None else f"{'-':>9}"
+
+    for target, r in results.items():
+        accuracy = f"{r['routing_accuracy']:>9.1%}" if r["routing_accuracy"] is not None else f"{'-':>9}"
+        print(f"{target:<10}{r['requests'] - r['errors']:>5}/{r['requests']:<4}{r['throughput']:>8.1f}"
+              f"{ms(r['p50'])}{ms(r['p95'])}{ms(r['p99'])}{ms(r['ttft_p50']):>10}{accuracy}"
+              f"{r['llm_calls_per_request']:>7.2f}{r['tokens_per_request']:>8.0f}")
+        if r["error_kinds"]:
+            print(f"{'':<10}errors: {', '.join(f'{k} x{v}' for k, v in sorted(r['error_kinds'].items()))}")
+        if r["rate_limited"]:
+            print(f"{'':<10}the fake LLM answered {r['rate_limited']} calls with 429")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Human-readable regressions of `results` against a saved baseline."""
+    regressions = []
+    for target, r in results.items():
+        base = baseline.get(target)
+        if not base:
+            continue
+        for key in ("p50", "p95", "p99", "ttft_p95"):
+            old, new = base.get(key), r.get(key)
+            if old is not None and new is not None and new > old * (1 + tolerance) \
+                    and new - old > MIN_LATENCY_DELTA:
+                regressions.append(f"{target}: {key} {old * 1000:.0f}ms → {new * 1000:.0f}ms")
+        if r["throughput"] < base["throughput"] * (1 - tolerance):
+            regressions.append(f"{target}: throughput {base['throughput']:.1f} → {r['throughput']:.1f} req/s")
+        if base.get("routing_accuracy") is not None and r["routing_accuracy"] is not None \
+                and r["routing_accuracy"] < base["routing_accuracy"] - 0.02:
+            regressions.append(f"{target}: routing accuracy {base['routing_accuracy']:.1%} → "
+                               f"{r['routing_accuracy']:.1%}")
+        if r["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(f"{target}: error rate {base['error_rate']:.1%} → {r['error_rate']:.1%}")
+    return regressions
+
+
+async def run_targets(args, server) -> dict:
+    import httpx
+
+    rows = load_workload(args.workload)
+    plan = plan_arrivals(rows, args.requests or len(rows), args.qps, args.arrival, args.speed, args.seed)
+    offered_qps = len(plan) / max(plan[-1][0], 1e-9)
+    print(f"{len(plan)} requests from {os.path.basename(args.workload)}, {args.arrival} arrivals at "
+          f"{offered_qps:.1f} req/s offered; fake LLM latency {args.latency}, seed {args.seed}"
+          + (f", {args.rate_limit_rate:.0%} injected 429s" if args.rate_limit_rate else ""))
+
+    if args.url:
+        transport, base_url = None, args.url
+    else:
+        from app import app
+        transport, base_url = httpx.ASGITransport(app=app), "http://replay"
+    sync_pool = ThreadPoolExecutor(max_workers=args.workers) if args.sync else None
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    results = {}
+    async with httpx.AsyncClient(transport=transport, base_url=base_url, timeout=120, limits=limits) as client:
+        for target in args.targets:
+            if not args.url:
+                reset_state()
+            before = Counter(server.app.state.usage) if server else Counter()
+            samples, wall = await replay(make_call(target, client, sync_pool), plan)
+            usage = Counter(server.app.state.usage) - before if server else Counter()
+            results[target] = summarize(samples, wall, offered_qps, usage)
+            print(f"  {target}: {wall:.1f}s")
+    if sync_pool:
+        sync_pool.shutdown()
+    return results
+
+
+async def main(args):
+    if args.url:
+        server = None
+        results = await run_targets(args, server)
+    else:
+        with FakeLLMServer(latency=args.latency, token_latency_ms=args.token_latency_ms,
+                           rate_limit_rate=args.rate_limit_rate, seed=args.seed) as server:
+            point_backend_at(server.base_url)
+            os.environ.setdefault("RESPONSE_CACHE_BACKEND", "memory")
+            os.environ.setdefault("ROUTING_MEMO_BACKEND", "memory")
+            os.environ.setdefault("SESSION_BACKEND", "memory")
+            os.environ.setdefault("LOG_FILE", "")
+            os.environ.setdefault("LOG_STDOUT", "false")
+            logging.disable(logging.WARNING)
+            results = await run_targets(args, server)
+    print_report(results)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Saved to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\n✅ No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workload", default=DEFAULT_WORKLOAD)
+    parser.add_argument("--targets", nargs="+", choices=TARGETS, default=list(TARGETS))
+    parser.add_argument("--qps", type=float, default=20.0, help="target arrival rate")
+    parser.add_argument("--arrival", choices=("poisson", "uniform", "recorded"), default="poisson",
+                        help="recorded: the workload's own timestamps, divided by --speed")
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--requests", type=int, help="requests per target (default: the workload length)")
+    parser.add_argument("--latency", default="lognormal:200:0.3", help="fake LLM latency, e.g. 200, "
+                        "lognormal:200:0.5, exponential:200, uniform:100:300, bimodal:150:2000:0.05")
+    parser.add_argument("--token-latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of LLM calls answered 429")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sync", action="store_true", help="call the sync entry points from a thread pool")
+    parser.add_argument("--workers", type=int, default=64, help="thread pool size for --sync")
+    parser.add_argument("--url", help="replay /chat and /chat/stream against a running server instead")
+    parser.add_argument("--save", help="write the results as JSON (a baseline for later runs)")
+    parser.add_argument("--baseline", help="compare with a saved run and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative slowdown")
+    args = parser.parse_args()
+    if args.url and set(args.targets) - {"chat", "stream"}:
+        parser.error("--url only supports --targets chat stream")
+    asyncio.run(main(args))
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Resilient call layer benchmark.
+Sends HR chats through /chat at a steady rate to a fake LLM that injects
+trouble into gpt-4o while gpt-4o-mini (the fallback model) stays healthy,
+with core/resilience.py off and on:
+- slow tail: 5% of gpt-4o calls take seconds instead of ~150 ms (hedging)
+- slow primary: every gpt-4o call takes 8 s, chats ask for a 3 s deadline
+  (deadline + fallback, then the circuit breaker)
+- outage: gpt-4o answers 500 (circuit breaker + fallback)
+Reports status counts, p50/p95/p99/max latency and what the call layer did.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+import uuid
+from collections import Counter
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, latency_sampler, point_backend_at
+
+SCENARIOS = {
+    "slow tail": {"latency": {"gpt-4o": "bimodal:150:4000:0.05"}, "timeout": None},
+    "slow primary": {"latency": {"gpt-4o": "8000"}, "timeout": 3.0},
+    "outage": {"failing": {"gpt-4o"}, "timeout": None},
+}
+
+
+async def run(client, requests: int, qps: float, timeout):
+    """Open-loop HR chats; returns [(status, seconds)]."""
+    async def one(i):
+        await asyncio.sleep(i / qps)
+        start = time.perf_counter()
+        response = await client.post("/chat", json={
+            "message": f"How many vacation days do I get? (employee {uuid.uuid4().hex[:8]})",
+            "agent": "HR", "timeout": timeout,
+        })
+        return response.status_code, time.perf_counter() - start
+
+    return await asyncio.gather(*[one(i) for i in range(requests)])
+
+
+def layer_stats(resilience) -> str:
+    if resilience is None:
+        return "-"
+    primary = resilience.snapshot()["models"].get("gpt-4o", {})
+    fallback = resilience.snapshot()["models"].get("gpt-4o-mini", {})
+    return (f"hedges {primary.get('hedges', 0)}, timeouts {primary.get('timeouts', 0)}, "
+            f"breaker opened {primary.get('circuit_opened', 0)}x, fallback calls {fallback.get('calls', 0)}")
+
+
+async def main(requests: int, qps: float, warmup: int):
+    with FakeLLMServer(latency_ms=150, seed=1) as server:
+        point_backend_at(server.base_url)
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["LOG_FILE"] = ""
+        os.environ["LOG_STDOUT"] = "false"
+
+        import httpx
+        from app import app
+        from core.resilience import build_resilience, set_resilience
+        logging.disable(logging.CRITICAL)
+
+        print(f"{requests} HR chats per run at {qps:.0f}/s, after {warmup} warm-up chats; "
+              f"fake LLM: gpt-4o-mini always ~150 ms")
+        print(f"{'':<28}{'200':>5}{'5xx':>5}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}  call layer")
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for name, scenario in SCENARIOS.items():
+                print(f"{name}")
+                for enabled in (False, True):
+                    resilience = build_resilience() if enabled else None
+                    set_resilience(resilience)
+                    server.app.state.model_latency = {}
+                    server.app.state.failing_models = set()
+                    # Warm-up on a healthy provider: the call layer learns gpt-4o's normal latency
+                    await run(client, warmup, qps, None)
+                    server.app.state.model_latency = {model: latency_sampler(spec)
+                                                      for model, spec in scenario.get("latency", {}).items()}
+                    server.app.state.failing_models = set(scenario.get("failing", ()))
+                    results = await run(client, requests, qps, scenario["timeout"])
+                    statuses = Counter(status for status, _ in results)
+                    latencies = [seconds for _, seconds in results]
+                    label = f"  call layer {'on' if enabled else 'off'}"
+                    print(f"{label:<28}{statuses[200]:>5}{sum(n for s, n in statuses.items() if s >= 500):>5}"
+                          + "".join(f"{percentile(latencies, pct) * 1000:>6.0f}ms" for pct in (50, 95, 99))
+                          + f"{max(latencies) * 1000:>6.0f}ms  {layer_stats(resilience)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--qps", type=float, default=20.0)
+    parser.add_argument("--warmup", type=int, default=60)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.qps, args.warmup))
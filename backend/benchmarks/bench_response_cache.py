@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Response cache benchmark.
+Replays a workload of repeated (and lightly reworded) HR questions through
+arun_hr against the local fake LLM with the cache off, in memory, in SQLite
+and in semantic mode, and reports mean latency plus cache counters. The
+SQLite run is repeated with a fresh cache object to show answers surviving a
+restart.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import tempfile
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUESTIONS = [
+    "What's the PTO policy?",
+    "How do I request leave?",
+    "How many vacation days do I get?",
+    "When is open enrollment for benefits?",
+    "How does the performance review process work?",
+    "What is the parental leave policy?",
+]
+REWORDINGS = [
+    "what is the PTO policy",
+    "How do I request leave, please?",
+    "how many vacation days do I get per year",
+    "What is the parental leave policy at the company?",
+]
+
+
+def workload(size: int, seed: int = 7):
+    rng = random.Random(seed)
+    # Popular questions dominate, like real traffic
+    weights = [1 / (rank + 1) for rank in range(len(QUESTIONS))]
+    queries = rng.choices(QUESTIONS, weights=weights, k=size)
+    for i in range(0, size, 10):
+        queries[i] = rng.choice(REWORDINGS)
+    return queries
+
+
+async def replay(arun_hr, queries):
+    start = time.perf_counter()
+    for query in queries:
+        await arun_hr(query)
+    return (time.perf_counter() - start) / len(queries)
+
+
+async def main(size: int, latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms) as server:
+        point_backend_at(server.base_url)
+
+        from agents.hr import arun_hr
+        from core.cache import MemoryBackend, ResponseCache, SQLiteBackend, set_response_cache
+        from core.clients import embeddings_model
+        logging.disable(logging.INFO)
+
+        queries = workload(size)
+        db_path = os.path.join(tempfile.mkdtemp(), "response_cache.sqlite3")
+        embeddings = embeddings_model("text-embedding-3-small")
+        modes = [
+            ("off", lambda: None),
+            ("memory", lambda: ResponseCache(MemoryBackend(256, 3600))),
+            ("sqlite (cold)", lambda: ResponseCache(SQLiteBackend(db_path, 256, 3600))),
+            ("sqlite (restart)", lambda: ResponseCache(SQLiteBackend(db_path, 256, 3600))),
+            ("memory + semantic", lambda: ResponseCache(MemoryBackend(256, 3600), embeddings, 0.85)),
+        ]
+
+        print(f"{len(queries)} HR queries, {len(set(queries))} distinct strings, fake LLM {latency_ms:.0f} ms")
+        print(f"{'mode':<20}{'mean (ms)':>10}{'hits':>6}{'semantic':>9}{'misses':>7}{'evictions':>10}")
+        for name, make_cache in modes:
+            cache = make_cache()
+            set_response_cache(cache)
+            mean = await replay(arun_hr, queries)
+            stats = cache.snapshot() if cache else {"misses": len(queries)}
+            print(f"{name:<20}{mean * 1000:10.1f}{stats.get('hits', 0):6}{stats.get('semantic_hits', 0):9}"
+                  f"{stats.get('misses', 0):7}{stats.get('evictions', 0):10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--size", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.size, args.latency_ms))
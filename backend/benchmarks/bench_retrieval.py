@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Knowledge index benchmark with the local embedding stand-in
+(core.knowledge.HashEmbeddings), on a generated corpus of handbook and
+policy documents:
+- build throughput: documents, chunks and MB per second, with one
+  ingestion process and with one per core
+- incremental re-index: a second run with some documents changed, added
+  and deleted, against the unchanged re-run and a full rebuild
+- retrieval latency: p50/p95/p99 of top-k search (query embedding
+  included) on a freshly opened index, and whether the top-k passages come
+  from the document of the question's topic
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_modes import percentile
+from core.knowledge import HashEmbeddings, KnowledgeIndex
+
+TOPICS = {
+    "vacation": "vacation days annual leave carry over request approval calendar public holidays",
+    "parental": "parental leave maternity paternity adoption weeks paid return childcare",
+    "remote": "remote work home office equipment stipend hybrid days internet coworking",
+    "expenses": "expenses travel reimbursement receipts hotel flights per diem card approval",
+    "security": "security passwords laptop encryption phishing badge incident vpn access",
+    "bonus": "bonus compensation salary review band raise equity vesting performance",
+    "onboarding": "onboarding first week buddy accounts checklist orientation training mentor",
+    "conduct": "conduct harassment respect complaint investigation ethics conflict interest",
+    "strategy": "strategy market growth revenue expansion europe product roadmap priorities",
+    "benefits": "benefits health insurance dental pension gym wellness plan enrollment",
+}
+FILLER = ("the company employees team manager policy applies please contact people operations when "
+          "questions arise section document update effective date all staff").split()
+
+
+def paragraph(rng: random.Random, topic_words: list) -> str:
+    words = [rng.choice(topic_words) if rng.random() < 0.45 else rng.choice(FILLER) for _ in range(rng.randint(40, 90))]
+    return " ".join(words).capitalize() + "."
+
+
+def write_document(path: str, topic: str, rng: random.Random):
+    topic_words = TOPICS[topic].split()
+    with open(path, "w") as f:
+        f.write(f"# {topic.title()} policy\n\n")
+        f.write("\n\n".join(paragraph(rng, topic_words) for _ in range(rng.randint(6, 20))))
+
+
+def make_corpus(directory: str, documents: int, seed: int = 0) -> dict:
+    """{path: topic} for `documents` generated handbook pages."""
+    rng = random.Random(seed)
+    corpus = {}
+    for i in range(documents):
+        topic = rng.choice(list(TOPICS))
+        path = os.path.join(directory, topic, f"{topic}-{i:05d}.md")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_document(path, topic, rng)
+        corpus[path] = topic
+    return corpus
+
+
+def corpus_bytes(corpus: dict) -> int:
+    return sum(os.path.getsize(path) for path in corpus)
+
+
+def build(index_dir: str, corpus_dir: str, workers: int, rebuild: bool = True):
+    index = KnowledgeIndex(index_dir, HashEmbeddings())
+    return index.ingest([corpus_dir], rebuild=rebuild, workers=workers)
+
+
+def churn(corpus: dict, share: float, seed: int = 1) -> str:
+    """Change, delete and add `share` of the documents each."""
+    rng = random.Random(seed)
+    paths = sorted(corpus)
+    count = max(1, int(len(paths) * share))
+    for path in rng.sample(paths, count * 2)[:count]:
+        write_document(path, corpus[path], rng)
+    for path in rng.sample([p for p in paths if os.path.exists(p)], count):
+        os.remove(path)
+        del corpus[path]
+    directory = os.path.dirname(os.path.dirname(paths[0]))
+    for i in range(count):
+        topic = rng.choice(list(TOPICS))
+        path = os.path.join(directory, topic, f"{topic}-new-{i:05d}.md")
+        write_document(path, topic, rng)
+        corpus[path] = topic
+    return f"{count} changed, {count} deleted, {count} added"
+
+
+def retrieval(index_dir: str, corpus: dict, queries: int, k: int, seed: int = 2):
+    rng = random.Random(seed)
+    index = KnowledgeIndex(index_dir, HashEmbeddings(), top_k=k, min_score=0.0)
+    start = time.perf_counter()
+    index.search("warm up: open the index")
+    open_ms = (time.perf_counter() - start) * 1000
+    latencies, hits = [], 0
+    for i in range(queries):
+        topic = rng.choice(list(TOPICS))
+        words = rng.sample(TOPICS[topic].split(), 3)
+        query = f"What does the handbook say about {' and '.join(words)}? (question {i})"
+        start = time.perf_counter()
+        passages = index.search(query)
+        latencies.append(time.perf_counter() - start)
+        hits += bool(passages) and all(passage["source"].startswith(topic) for passage in passages)
+    return index, open_ms, latencies, hits / queries
+
+
+def main(documents: int, queries: int, k: int, churn_share: float, workers: int):
+    root = tempfile.mkdtemp(prefix="bench_retrieval_")
+    try:
+        corpus_dir, index_dir = os.path.join(root, "docs"), os.path.join(root, "index")
+        corpus = make_corpus(corpus_dir, documents)
+        megabytes = corpus_bytes(corpus) / 1e6
+        print(f"{documents} generated policy documents, {megabytes:.1f} MB; local hash embeddings (256 dimensions)")
+
+        print(f"\n{'build':<26}{'seconds':>9}{'docs/s':>9}{'chunks/s':>10}{'MB/s':>8}")
+        for processes in sorted({1, workers}):
+            stats = build(index_dir, corpus_dir, processes)
+            seconds = stats["seconds"]
+            print(f"{f'full, {processes} process(es)':<26}{seconds:>9.2f}{documents / seconds:>9.0f}"
+                  f"{stats['chunks'] / seconds:>10.0f}{megabytes / seconds:>8.1f}")
+        stats = build(index_dir, corpus_dir, workers, rebuild=False)
+        print(f"{'re-run, nothing changed':<26}{stats['seconds']:>9.2f}  ({stats.get('unchanged', 0)} unchanged)")
+        described = churn(corpus, churn_share)
+        stats = build(index_dir, corpus_dir, workers, rebuild=False)
+        print(f"{'incremental':<26}{stats['seconds']:>9.2f}  ({described}: {stats.get('chunks', 0)} chunks embedded)")
+
+        vectors = sum(os.path.getsize(path) for path in (os.path.join(index_dir, name) for name in os.listdir(index_dir))
+                      if path.endswith(".f32"))
+        index, open_ms, latencies, precision = retrieval(index_dir, corpus, queries, k)
+        snapshot = index.snapshot()
+        print(f"\nretrieval over {snapshot['chunks']} chunks ({vectors / 1e6:.1f} MB of vectors), top-{k}, "
+              f"{queries} queries")
+        print(f"first search (opens the index): {open_ms:.2f} ms")
+        print(f"search p50 {percentile(latencies, 50) * 1000:.3f} ms, p95 {percentile(latencies, 95) * 1000:.3f} ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.3f} ms, mean top-k scan {snapshot['avg_search_ms']:.3f} ms")
+        print(f"queries whose top-{k} passages all come from the topic's documents: {precision:.0%}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=3000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("-k", type=int, default=4)
+    parser.add_argument("--churn", type=float, default=0.02, help="share of documents changed/deleted/added")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    main(args.documents, args.queries, args.k, args.churn, args.workers)
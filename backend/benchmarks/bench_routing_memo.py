@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Routing memo benchmark.
+Runs the supervisor node twice over the same queries (with the fast-path
+router disabled so every first-time query reaches the LLM) and reports the
+mean routing latency per pass for each memo backend. A second SQLite memo
+object stands in for another uvicorn worker, and a changed prompt shows that
+old entries are invalidated.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUERIES = [
+    "Can you help me brainstorm ideas for a birthday party?",
+    "What should I focus on this week?",
+    "Tell me something interesting",
+    "Who should I ask about this?",
+    "Is this a good idea?",
+]
+
+
+async def route_pass(supreme, queries):
+    start = time.perf_counter()
+    for query in queries:
+        await supreme.asupreme_agent({"query": query, "decision": {}})
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+async def main(repeats: int, latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms) as server:
+        point_backend_at(server.base_url)
+        os.environ["FAST_ROUTER_ENABLED"] = "false"
+
+        from supreme import supreme
+        from supreme.memo import RoutingMemo, prompt_version
+        logging.disable(logging.INFO)
+
+        queries = QUERIES * repeats
+        version = prompt_version(supreme.PROMPT_SUPREME, supreme.supervisor_llm.model_name)
+        db_path = os.path.join(tempfile.mkdtemp(), "routing_memo.sqlite3")
+        modes = [
+            ("off", lambda: None),
+            ("memory", lambda: RoutingMemo(version)),
+            ("sqlite worker A", lambda: RoutingMemo(version, path=db_path)),
+            ("sqlite worker B", lambda: RoutingMemo(version, path=db_path)),
+            ("sqlite new prompt", lambda: RoutingMemo(prompt_version("edited prompt", "gpt-4o"), path=db_path)),
+        ]
+
+        print(f"{len(queries)} routing decisions per pass, fake LLM {latency_ms:.0f} ms")
+        print(f"{'memo':<20}{'pass 1 (ms)':>12}{'pass 2 (ms)':>12}{'hits':>6}{'invalidated':>12}")
+        for name, make_memo in modes:
+            supreme.routing_memo = make_memo()
+            first = await route_pass(supreme, queries)
+            second = await route_pass(supreme, queries)
+            stats = supreme.routing_memo.snapshot() if supreme.routing_memo else {}
+            print(f"{name:<20}{first:12.1f}{second:12.1f}{stats.get('hits', 0):6}{stats.get('invalidated', 0):12}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.repeats, args.latency_ms))
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Supervisor routing protocol benchmark.
+Routes queries of growing length through the supervisor (memo and fast path
+off) against the fake LLM, which charges generation time per output token:
+- echo: the former protocol, {"agent": ..., "query": "<the original query>"},
+  free-form JSON without a token cap
+- compact: {"agent": ...} only, JSON schema response_format and
+  SUPERVISOR_MAX_TOKENS
+Reports supervisor p50 latency, output tokens per call and routing
+accuracy. Then shows how the parser reads malformed replies.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import time
+
+from fake_llm import FakeLLMServer, fake_route, point_backend_at
+
+ECHO_PROMPT = """
+You are the Supreme Agent. Decide which sub-agent (HR, CEO, Developer) should handle each incoming user query.
+
+- For employee related questions, route to HR.
+- For general company related questions, route to CEO.
+- For technical questions or code-related queries, route to Developer.
+
+Respond with a JSON: {{ "agent": "<agent_name>", "query": "<the original query>" }}
+"""
+
+OPENINGS = [
+    "How many vacation days do I have left this year?",
+    "Why does the Python API return a 500 after the deploy?",
+    "What is our strategy for the European market?",
+]
+
+MALFORMED = [
+    ('fenced', '```json\n{"agent": "HR"}\n```'),
+    ('with prose', 'Sure! Here is the routing: {"agent": "Developer"} Let me know.'),
+    ('truncated', '{"agent": ["Developer", "H'),
+    ('bare label', 'Developer'),
+    ('unknown agent', '{"agent": "Legal"}'),
+]
+
+
+def make_query(words: int, rng: random.Random) -> str:
+    opening = rng.choice(OPENINGS)
+    filler = " ".join(f"detail{rng.randrange(1000)}" for _ in range(max(0, words - len(opening.split()))))
+    return f"{opening} {filler}".strip()
+
+
+def use_protocol(supreme, compact: bool, originals: dict):
+    from core.clients import chat_model
+    from core.prompting import agent_prompt
+
+    if compact:
+        for name, value in originals.items():
+            setattr(supreme, name, value)
+        return
+    supreme.supervisor_prompt = agent_prompt("SupervisorEcho", ECHO_PROMPT, routing=True)
+    supreme.supervisor_llm = chat_model(model="gpt-4o", temperature=0.0)
+    supreme.SUPERVISOR_CALL_KWARGS = {}
+
+
+async def route_all(supreme, server, queries, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, correct = [], 0
+    before = server.app.state.usage["completion_tokens"], server.app.state.usage["calls"]
+
+    async def one(query):
+        nonlocal correct
+        async with semaphore:
+            start = time.perf_counter()
+            decision = (await supreme.asupreme_agent({"query": query}))["decision"]
+            latencies.append(time.perf_counter() - start)
+            correct += supreme.AGENT_LABELS[decision["agent"]] == fake_route(supreme.supervisor_prompt.fit_input(query))
+
+    await asyncio.gather(*[one(query) for query in queries])
+    tokens = server.app.state.usage["completion_tokens"] - before[0]
+    calls = server.app.state.usage["calls"] - before[1]
+    return statistics.median(latencies), tokens / max(1, calls), correct / len(queries)
+
+
+async def main(lengths, requests: int, concurrency: int, latency_ms: float, token_latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms, token_latency_ms=token_latency_ms) as server:
+        point_backend_at(server.base_url)
+        os.environ["ROUTING_MEMO_BACKEND"] = "off"
+        os.environ["FAST_ROUTER_ENABLED"] = "false"
+        logging.disable(logging.WARNING)
+
+        from supreme import supreme
+        originals = {name: getattr(supreme, name)
+                     for name in ("supervisor_prompt", "supervisor_llm", "SUPERVISOR_CALL_KWARGS")}
+
+        print(f"{requests} supervisor calls per cell, {concurrency} concurrent; fake LLM {latency_ms:.0f} ms "
+              f"+ {token_latency_ms:.0f} ms per output token; SUPERVISOR_MAX_TOKENS={supreme.SUPERVISOR_MAX_TOKENS}")
+        print(f"{'query words':<13}{'protocol':<10}{'p50 (ms)':>10}{'output tokens':>15}{'accuracy':>10}")
+        rng = random.Random(0)
+        for words in lengths:
+            queries = [make_query(words, rng) for _ in range(requests)]
+            for compact in (False, True):
+                use_protocol(supreme, compact, originals)
+                p50, tokens, accuracy = await route_all(supreme, server, queries, concurrency)
+                print(f"{words:<13}{'compact' if compact else 'echo':<10}{p50 * 1000:>10.0f}{tokens:>15.1f}"
+                      f"{accuracy:>10.0%}")
+
+        print(f"\n{'malformed reply':<16}decision")
+        for name, reply in MALFORMED:
+            decision = supreme._parse_decision("example", reply)["decision"]
+            agents = ", ".join(supreme.AGENT_LABELS[agent] for agent in supreme.decision_agents(decision))
+            print(f"{name:<16}{agents} ({decision['source']})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[10, 100, 400, 2000], help="query lengths in words")
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=150.0)
+    parser.add_argument("--token-latency-ms", type=float, default=15.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.lengths, args.requests, args.concurrency, args.latency_ms, args.token_latency_ms))
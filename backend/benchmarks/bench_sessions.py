@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Session memory benchmark.
+1. Prompt growth: a long conversation through /chat with a session_id, under
+   full-history replay, a token-budgeted window, and a window with rolling
+   summaries. Reports the agent's prompt size and the request latency per
+   turn (the fake LLM charges prefill time per prompt word).
+2. Memory per session: many stored conversations in the in-memory and the
+   SQLite store, with and without the history budget.
+"""
+
+import argparse
+import asyncio
+import gc
+import logging
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+QUESTIONS = [
+    "How many vacation days do I get this year?",
+    "Can I carry the unused ones over to next year?",
+    "What happens to them if I change teams?",
+    "And if I go part time instead?",
+    "Who do I talk to about that?",
+]
+
+
+async def conversation_run(client, server, turns: int):
+    """One session of `turns` HR chats; per turn (agent prompt words, latency)."""
+    session_id = f"bench-{time.monotonic_ns()}"
+    rows = []
+    for turn in range(turns):
+        start = len(server.app.state.prompt_log)
+        began = time.perf_counter()
+        response = await client.post("/chat", json={
+            "message": f"{QUESTIONS[turn % len(QUESTIONS)]} (turn {turn})", "agent": "HR", "session_id": session_id,
+        })
+        response.raise_for_status()
+        latency = time.perf_counter() - began
+        agent_prompts = [words for kind, words in server.app.state.prompt_log[start:] if kind == "agent"]
+        rows.append((agent_prompts[0], latency))
+        await asyncio.sleep(0.05)  # let background summaries land between turns
+    return rows
+
+
+def fill_store(memory, sessions: int, turns: int, answer: str) -> float:
+    """Record `turns` exchanges in each of `sessions` sessions; return seconds taken."""
+    start = time.perf_counter()
+    for s in range(sessions):
+        for t in range(turns):
+            # Fresh strings per turn, as real answers would be
+            memory.record(f"session-{s}", f"{QUESTIONS[t % len(QUESTIONS)]} ({t})", f"{answer} {s}.{t}")
+    return time.perf_counter() - start
+
+
+def memory_per_session(sessions: int, turns: int, budget: int):
+    from core.sessions import MemorySessionStore, SessionMemory, SQLiteSessionStore
+
+    answer = " ".join(f"word{i}" for i in range(80))
+    print(f"\n{sessions} sessions x {turns} exchanges (answers of ~{len(answer)} characters)")
+    print(f"{'store':<34}{'per session':>14}{'record (µs)':>13}")
+    for label, history_tokens in (("memory, full history", 0), (f"memory, budget {budget} tokens", budget)):
+        gc.collect()
+        tracemalloc.start()
+        baseline = tracemalloc.get_traced_memory()[0]
+        memory = SessionMemory(MemorySessionStore(max_sessions=sessions), history_tokens)
+        seconds = fill_store(memory, sessions, turns, answer)
+        used = tracemalloc.get_traced_memory()[0] - baseline
+        tracemalloc.stop()
+        print(f"{label:<34}{used / sessions / 1024:>11.1f} KB{seconds / (sessions * turns) * 1e6:>13.0f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for label, history_tokens in (("sqlite, full history", 0), (f"sqlite, budget {budget} tokens", budget)):
+            path = os.path.join(directory, f"sessions-{history_tokens}.sqlite3")
+            memory = SessionMemory(SQLiteSessionStore(path, max_sessions=sessions), history_tokens)
+            seconds = fill_store(memory, sessions, turns, answer)
+            memory.store._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            size = os.path.getsize(path)
+            print(f"{label:<34}{size / sessions / 1024:>11.1f} KB{seconds / (sessions * turns) * 1e6:>13.0f}")
+
+
+async def main(turns: int, budget: int, sessions: int, stored_turns: int, latency_ms: float, prefill: float):
+    with FakeLLMServer(latency_ms=latency_ms, prefill_ms_per_1k=prefill) as server:
+        point_backend_at(server.base_url)
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+
+        import httpx
+        from app import app
+        from core.clients import chat_model
+        from core.sessions import MemorySessionStore, SessionMemory, llm_summarizer, set_session_memory
+        logging.disable(logging.WARNING)
+
+        summarizer = llm_summarizer(chat_model(temperature=0.0))
+        configs = [
+            ("full replay", SessionMemory(MemorySessionStore(), history_tokens=0)),
+            (f"window {budget} tok", SessionMemory(MemorySessionStore(), history_tokens=budget)),
+            (f"window {budget} + summary", SessionMemory(MemorySessionStore(), budget, summarizer)),
+        ]
+        print(f"{turns}-turn HR conversation; fake LLM {latency_ms:.0f} ms + {prefill:.0f} ms per 1k prompt words")
+        checkpoints = sorted({1, turns // 4, turns // 2, 3 * turns // 4, turns})
+        header = "".join(f"{f'turn {t}':>11}" for t in checkpoints)
+        print(f"{'agent prompt words':<28}{header}")
+
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            results = {}
+            for name, memory in configs:
+                set_session_memory(memory)
+                results[name] = await conversation_run(client, server, turns)
+                print(f"{name:<28}" + "".join(f"{results[name][t - 1][0]:>11}" for t in checkpoints))
+            print(f"{'latency (ms, last 5 turns)':<28}")
+            for name, rows in results.items():
+                print(f"  {name:<26}{statistics.median(latency for _, latency in rows[-5:]) * 1000:>11.0f}")
+            summaries = configs[2][1].snapshot().get("summaries", 0)
+            print(f"rolling summary updates: {summaries} (one LLM call each)")
+
+    memory_per_session(sessions, stored_turns, budget)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--budget", type=int, default=1500, help="SESSION_HISTORY_TOKENS")
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--stored-turns", type=int, default=100, help="exchanges per stored session")
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=50.0)
+    args = parser.parse_args()
+    asyncio.run(main(args.turns, args.budget, args.sessions, args.stored_turns, args.latency_ms,
+                     args.prefill_ms_per_1k))
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Speculative dispatch benchmark.
+Replays the recorded query fixture through arun_supreme_agent in routed mode
+and in speculative mode at widths 1 and 3 (fast path and memo disabled so
+every query needs the supervisor), reporting p50/p95 latency, LLM calls per
+query and wasted speculative calls. Finishes with a cancellation check: a
+request cancelled mid-flight must not leave sub-agent calls running.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import statistics
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+from bench_modes import FIXTURE, percentile
+
+
+async def replay(supreme, queries, mode, width, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            await supreme.arun_supreme_agent(query, mode, speculative_width=width)
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(query) for query in queries])
+    return latencies
+
+
+async def check_cancellation(supreme):
+    task = asyncio.create_task(supreme.arun_supreme_agent("Is this a good idea?", "speculative", speculative_width=3))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    leftovers = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    print(f"Cancellation check: {len(leftovers)} tasks still running after cancelling a speculative request")
+
+
+async def main(rounds, concurrency, latency_ms, token_latency_ms, sigma):
+    with FakeLLMServer(latency_ms=latency_ms, token_latency_ms=token_latency_ms, latency_sigma=sigma) as server:
+        point_backend_at(server.base_url)
+
+        from supreme import supreme
+        from core.cache import set_response_cache
+        logging.disable(logging.INFO)
+        set_response_cache(None)
+        supreme.routing_memo = None
+        supreme.FAST_ROUTER_ENABLED = False
+
+        with open(FIXTURE) as f:
+            queries = [json.loads(line)["query"] for line in f if line.strip()] * rounds
+
+        print(f"{len(queries)} queries, concurrency {concurrency}, fake LLM {latency_ms:.0f} ms "
+              f"(sigma {sigma}) + {token_latency_ms:.0f} ms/token")
+        print(f"{'mode':<18}{'p50 (ms)':>10}{'p95 (ms)':>10}{'calls/q':>9}{'wasted/q':>10}{'spec hit rate':>15}")
+        for name, mode, width in [("routed", "routed", 1), ("speculative w=1", "speculative", 1),
+                                  ("speculative w=3", "speculative", 3)]:
+            supreme.speculation_stats.clear()
+            calls_before = server.app.state.usage["calls"]
+            latencies = await replay(supreme, queries, mode, width, concurrency)
+            calls = server.app.state.usage["calls"] - calls_before
+            stats = supreme.speculation_stats
+            spec = stats["hits"] + stats["misses"]
+            hit_rate = f"{stats['hits'] / spec:15.1%}" if spec else f"{'n/a':>15}"
+            n = len(queries)
+            print(f"{name:<18}{statistics.median(latencies) * 1000:10.0f}{percentile(latencies, 95) * 1000:10.0f}"
+                  f"{calls / n:9.2f}{stats['wasted_calls'] / n:10.2f}{hit_rate}")
+
+        await check_cancellation(supreme)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--sigma", type=float, default=0.3)
+    args = parser.parse_args()
+    asyncio.run(main(args.rounds, args.concurrency, args.latency_ms, args.token_latency_ms, args.sigma))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark.
+Reports `python -X importtime` for the web app (with the heaviest modules),
+the import cost of loading every agent eagerly (what importing the app used
+to cost), and the wall-clock time from spawning uvicorn to the first /health
+response and to the first /chat answer from the fake LLM, with and without
+background preloading.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from fake_llm import FakeLLMServer
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(statement: str):
+    """Run `statement` under -X importtime; return (total µs, top cumulative entries)."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=BACKEND, capture_output=True, text=True, env=os.environ.copy(),
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.rstrip()))
+    # Top-level imports are indented by exactly one space
+    top_level = [(us, name) for us, name in rows if not name.startswith("  ")]
+    return sum(us for us, _ in top_level), sorted(rows, reverse=True)[:6]
+
+
+def wall_clock(port: int, env: dict, chat: bool):
+    """Spawn uvicorn and time the first /health (and optionally /chat) response."""
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30) as client:
+            while True:
+                try:
+                    if client.get("/health").status_code == 200:
+                        break
+                except httpx.TransportError:
+                    time.sleep(0.005)
+            health = time.perf_counter() - start
+            first_chat = None
+            if chat:
+                client.post("/chat", json={"message": "What is the company vision?"}).raise_for_status()
+                first_chat = time.perf_counter() - start
+        return health, first_chat
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main(runs: int):
+    with FakeLLMServer(latency_ms=50) as llm:
+        env = os.environ.copy()
+        env.update({"OPENAI_API_KEY": "sk-fake", "OPENAI_API_BASE": llm.base_url, "OPENAI_BASE_URL": llm.base_url})
+        os.environ.update(env)
+
+        total, top = import_times("import app")
+        eager_total, _ = import_times("import app; from core.registry import preload; preload()")
+        print(f"import app:                      {total / 1000:7.0f} ms")
+        print(f"import app + preload() (eager):  {eager_total / 1000:7.0f} ms")
+        print("heaviest imports under `import app`:")
+        for us, name in top:
+            print(f"  {us / 1000:7.0f} ms  {name.strip()}")
+
+        print(f"\n{'cold start':<28}{'/health (ms)':>14}{'first /chat (ms)':>18}   (median of {runs})")
+        for label, preload in [("lazy, no preload", "false"), ("lazy + background preload", "true")]:
+            samples = [wall_clock(8790 + i, {**env, "PRELOAD_AGENTS": preload}, chat=True) for i in range(runs)]
+            health = sorted(s[0] for s in samples)[runs // 2]
+            chat = sorted(s[1] for s in samples)[runs // 2]
+            print(f"{label:<28}{health * 1000:14.0f}{chat * 1000:18.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+    main(args.runs)
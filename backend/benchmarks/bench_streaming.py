@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-byte benchmark for /chat vs /chat/stream.
+Serves the backend with uvicorn against the local fake LLM (which streams its
+answer word by word) and reports when the routing decision, the first token
+and the full answer arrive for each endpoint.
+"""
+
+import argparse
+import json
+import logging
+import statistics
+import time
+
+from fake_llm import FakeLLMServer, ServerThread, point_backend_at
+
+
+def time_blocking(client, message: str, agent=None):
+    start = time.perf_counter()
+    response = client.post("/chat", json={"message": message, "agent": agent})
+    response.raise_for_status()
+    elapsed = time.perf_counter() - start
+    return {"agent": elapsed, "first_token": elapsed, "total": elapsed}
+
+
+def time_streaming(client, message: str, agent=None):
+    marks = {}
+    start = time.perf_counter()
+    with client.stream("POST", "/chat/stream", json={"message": message, "agent": agent}) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if not line.startswith("data: "):
+                continue
+            event = json.loads(line[len("data: "):])
+            now = time.perf_counter() - start
+            if event["type"] == "agent":
+                marks.setdefault("agent", now)
+            elif event["type"] == "token":
+                marks.setdefault("first_token", now)
+            elif event["type"] == "error":
+                raise RuntimeError(event["detail"])
+    marks["total"] = time.perf_counter() - start
+    return marks
+
+
+def report(name, samples):
+    row = [name]
+    for key in ("agent", "first_token", "total"):
+        row.append(f"{statistics.median(s[key] for s in samples) * 1000:14.0f}")
+    print(f"{row[0]:<28}" + "".join(row[1:]))
+
+
+def main(runs: int, latency_ms: float, token_latency_ms: float):
+    with FakeLLMServer(latency_ms=latency_ms, token_latency_ms=token_latency_ms) as llm:
+        point_backend_at(llm.base_url)
+
+        import httpx
+        from app import app
+        from core.cache import set_response_cache
+        logging.disable(logging.INFO)
+        set_response_cache(None)  # measure generation, not cache hits
+
+        with ServerThread(app, port=8766) as backend, httpx.Client(base_url=backend.base_url, timeout=60) as client:
+            message = "How do I request parental leave?"
+            time_streaming(client, message)  # warm up
+
+            print(f"Fake LLM: {latency_ms:.0f} ms to first token, {token_latency_ms:.0f} ms per token; median of {runs} runs")
+            print(f"{'endpoint':<28}{'agent (ms)':>14}{'1st tok (ms)':>14}{'total (ms)':>14}")
+            report("/chat (supreme)", [time_blocking(client, message) for _ in range(runs)])
+            report("/chat/stream (supreme)", [time_streaming(client, message) for _ in range(runs)])
+            report("/chat (HR direct)", [time_blocking(client, message, "HR") for _ in range(runs)])
+            report("/chat/stream (HR direct)", [time_streaming(client, message, "HR") for _ in range(runs)])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+    main(args.runs, args.latency_ms, args.token_latency_ms)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Model tiering benchmark.
+A mixed workload (greetings, short policy questions, code requests, design
+and debugging questions) goes through the supreme agent against the fake
+LLM, where gpt-4o-mini answers faster and cheaper than gpt-4o but answers
+a share of the hard questions badly (no routing JSON, an unsure answer
+without the requested code). Compared:
+- gpt-4o only: MODEL_TIERING=false
+- gpt-4o-mini only: every agent on the small tier, no escalation
+- tiers, no escalation: complexity picks the model, its answer is kept
+- tiers + escalation: answers that fail validation go to gpt-4o
+Reports p50/p95 latency, cost per 1k requests (from the fake LLM's token
+counts and core.tiers.DEFAULT_PRICES), bad answers that reached the user,
+and the share of calls that escalated. A bad answer is an unsure one or a
+request the supervisor could not route.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import time
+
+from bench_modes import percentile
+from fake_llm import FakeLLMServer, point_backend_at
+
+EASY = [
+    "Hi there!",
+    "Thanks for the help",
+    "How many vacation days do I get?",
+    "Who approves my expense report?",
+    "When is the next company all-hands?",
+    "What is our parental leave policy?",
+]
+HARD = [
+    "Write code for a Python function that retries failed API calls with backoff",
+    "Why does our Docker deploy fail with a Traceback in settings.py? How do we debug it?",
+    "Compare the trade-offs of Postgres and MongoDB for our analytics service and design the migration",
+    "Show me example code for a paginated SQL query in the reporting API",
+    "What strategy should we use to scale the engineering team, and how should we plan the hiring?",
+]
+
+
+def workload(requests: int, hard_share: float, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [f"{rng.choice(HARD if rng.random() < hard_share else EASY)} (case {i})" for i in range(requests)]
+
+
+def cost_usd(usage: dict, prices: dict) -> float:
+    return sum(counter["prompt_tokens"] * prices.get(model, (0, 0))[0]
+               + counter["completion_tokens"] * prices.get(model, (0, 0))[1]
+               for model, counter in usage.items()) / 1e6
+
+
+def usage_since(server, before: dict) -> dict:
+    return {model: counter - before.get(model, counter.__class__())
+            for model, counter in server.app.state.model_usage.items()}
+
+
+async def measure(supreme, queries, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, answers = [], []
+
+    async def one(query):
+        async with semaphore:
+            start = time.perf_counter()
+            answers.append(await supreme.arun_supreme_agent(query, "routed"))
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*[one(query) for query in queries])
+    return latencies, answers
+
+
+def fallback_routes() -> float:
+    """Routing decisions that fell back to the default agent because no agent could be parsed."""
+    from core.metrics import ROUTING_DECISIONS
+
+    return sum(count for (_, source), count in ROUTING_DECISIONS.series().items() if source == "fallback")
+
+
+async def main(requests: int, concurrency: int, hard_share: float, weak_share: float):
+    with FakeLLMServer(latency_ms=300, model_latency={"gpt-4o": "lognormal:450:0.3",
+                                                      "gpt-4o-mini": "lognormal:180:0.3"}) as server:
+        point_backend_at(server.base_url)
+        server.app.state.model_token_latency = {"gpt-4o": 6.0, "gpt-4o-mini": 2.0}
+        server.app.state.weak_models = {"gpt-4o-mini": weak_share}
+        os.environ["RESPONSE_CACHE_BACKEND"] = "off"
+        os.environ["ROUTING_MEMO_BACKEND"] = "off"
+        os.environ["FAST_ROUTER_ENABLED"] = "false"
+        logging.disable(logging.WARNING)
+
+        from core.tiers import AGENT_TIERS, DEFAULT_PRICES, DEFAULT_TIERS, ModelTiers, parse_prices, set_tiers
+        from supreme import supreme
+
+        prices = parse_prices(DEFAULT_PRICES)
+        runs = [
+            ("gpt-4o only", None),
+            ("gpt-4o-mini only", ModelTiers("gpt-4o-mini", {}, prices, escalate=False)),
+            ("tiers, no escalation", ModelTiers(DEFAULT_TIERS, AGENT_TIERS, prices, escalate=False)),
+            ("tiers + escalation", ModelTiers(DEFAULT_TIERS, AGENT_TIERS, prices, escalate=True)),
+        ]
+        print(f"{requests} requests ({hard_share:.0%} hard), {concurrency} concurrent; fake gpt-4o ~450 ms + 6 ms/word, "
+              f"gpt-4o-mini ~180 ms + 2 ms/word, gpt-4o-mini fails {weak_share:.0%} of hard questions")
+        print(f"{'':<22}{'p50 ms':>9}{'p95 ms':>9}{'$/1k req':>10}{'bad answers':>13}{'escalated':>11}")
+        results = {}
+        for run, (name, tiers) in enumerate(runs):
+            set_tiers(tiers)
+            queries = [f"{query} [run {run}]" for query in workload(requests, hard_share)]
+            fallbacks = fallback_routes()
+            before = {model: counter.copy() for model, counter in server.app.state.model_usage.items()}
+            latencies, answers = await measure(supreme, queries, concurrency)
+            usage = usage_since(server, before)
+            cost = cost_usd(usage, prices) / requests * 1000
+            unsure = sum("not sure how to answer" in answer for answer in answers)
+            bad = (unsure + fallback_routes() - fallbacks) / requests
+            escalated = "-"
+            if tiers is not None:
+                counts = [stats for models in tiers.snapshot()["agents"].values() for stats in models.values()]
+                escalated = f"{sum(s['escalated'] for s in counts) / max(sum(s['calls'] for s in counts), 1):.1%}"
+            results[name] = (percentile(latencies, 50), cost, bad)
+            print(f"{name:<22}{percentile(latencies, 50) * 1000:>9.0f}{percentile(latencies, 95) * 1000:>9.0f}"
+                  f"{cost:>10.3f}{bad:>13.1%}{escalated:>11}")
+        set_tiers(None)
+
+        base, tiered = results["gpt-4o only"], results["tiers + escalation"]
+        print(f"\ntiers + escalation vs gpt-4o only: p50 {(tiered[0] - base[0]) * 1000:+.0f} ms, "
+              f"cost {tiered[1] / base[1] - 1:+.0%}, bad answers {tiered[2]:.1%} vs {base[2]:.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--hard-share", type=float, default=0.3, help="share of hard questions in the workload")
+    parser.add_argument("--weak-share", type=float, default=0.5,
+                        help="share of hard questions gpt-4o-mini answers badly")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.concurrency, args.hard_share, args.weak_share))
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Connection reuse check for the shared LLM client factory.
+Counts the distinct TCP connections the fake LLM sees while every agent and
+the supervisor make calls, and asserts that they all share one pool: one
+connection for sequential sync calls, and no new connections when a second
+wave of concurrent async calls follows the first. Finally it checks that
+LLM_MAX_CONNECTIONS caps the connections a burst of calls can open.
+"""
+
+import asyncio
+import logging
+import os
+
+import httpx
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+SEQUENTIAL_CALLS = 5
+WAVE_SIZE = 30
+POOL_LIMIT = 8
+
+
+def main():
+    with FakeLLMServer(latency_ms=5) as server:
+        point_backend_at(server.base_url)
+
+        from langchain_openai import ChatOpenAI
+        from langchain_core.messages import HumanMessage
+        from agents.ceo import run_ceo, arun_ceo
+        from agents.developer import run_developer
+        from agents.hr import run_hr
+        from core.cache import set_response_cache
+        from core.clients import client_settings
+        from supreme.supreme import run_supreme_agent
+        logging.disable(logging.INFO)
+        set_response_cache(None)
+        connections = server.app.state.connections
+
+        # Sequential sync calls through every agent and the supervisor
+        for i in range(SEQUENTIAL_CALLS):
+            run_ceo(f"company question {i}")
+            run_hr(f"leave question {i}")
+            run_developer(f"python question {i}")
+            run_supreme_agent(f"Is this a good idea? {i}", "routed")
+        sync_connections = len(connections)
+        print(f"shared pool, sync:  {server.app.state.requests} calls over {sync_connections} connection(s)")
+        assert sync_connections == 1, "sync calls should all reuse one keep-alive connection"
+
+        # Two waves of concurrent async calls: the second wave must reuse the first wave's connections
+        async def waves():
+            await asyncio.gather(*[arun_ceo(f"wave one {i}") for i in range(WAVE_SIZE)])
+            after_first = len(connections)
+            await asyncio.gather(*[arun_ceo(f"wave two {i}") for i in range(WAVE_SIZE)])
+            return after_first, len(connections)
+
+        after_first, after_second = asyncio.run(waves())
+        print(f"shared pool, async: wave 1 opened {after_first - sync_connections} connection(s), "
+              f"wave 2 opened {after_second - after_first}")
+        assert after_second == after_first, "second async wave should reuse pooled connections"
+
+        # Pool limits from the environment cap how many connections a burst can open
+        os.environ["LLM_MAX_CONNECTIONS"] = str(POOL_LIMIT)
+        connections.clear()
+        limited = ChatOpenAI(model="gpt-4o", http_async_client=httpx.AsyncClient(**client_settings()))
+
+        async def burst():
+            await asyncio.gather(*[limited.ainvoke([HumanMessage(content=f"burst {i}")]) for i in range(WAVE_SIZE)])
+
+        asyncio.run(burst())
+        print(f"LLM_MAX_CONNECTIONS={POOL_LIMIT}: {WAVE_SIZE} concurrent calls used {len(connections)} connection(s)")
+        assert len(connections) <= POOL_LIMIT, "pool limit should cap concurrent connections"
+
+        print("OK: all agents share one connection pool")
+
+
+if __name__ == "__main__":
+    main()
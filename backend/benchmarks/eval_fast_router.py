@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Evaluate the fast-path router on a labeled query set.
+Reports, per confidence threshold, the fast-path hit rate, the accuracy of the
+fast-path answers and the time per classification. With --llm it also asks the
+supervisor LLM (the local fake by default, OpenAI with --live) for every query
+and reports how often the local prediction agrees with it.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+from fake_llm import FakeLLMServer, point_backend_at
+
+DEFAULT_DATASET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "routing_eval.jsonl")
+
+
+def load_dataset(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate_thresholds(router, rows, thresholds):
+    from supreme.router import LABEL_TO_NODE
+
+    start = time.perf_counter()
+    predictions = [router.predict(row["query"]) for row in rows]
+    per_query_us = (time.perf_counter() - start) / len(rows) * 1e6
+
+    print(f"{len(rows)} labeled queries, {per_query_us:.1f} µs per local classification")
+    print(f"{'threshold':>10} {'hit rate':>9} {'fast-path accuracy':>19}")
+    for threshold in thresholds:
+        hits = [(p, row) for p, row in zip(predictions, rows) if p.confident(threshold, router.min_score)]
+        correct = sum(p.agent == LABEL_TO_NODE[row["agent"]] for p, row in hits)
+        accuracy = f"{correct / len(hits):19.1%}" if hits else f"{'n/a':>19}"
+        print(f"{threshold:>10.2f} {len(hits) / len(rows):9.1%} {accuracy}")
+
+
+async def evaluate_llm_agreement(router, rows):
+    from supreme.supreme import PROMPT_SUPREME, SUPERVISOR_CALL_KWARGS, _parse_decision, supervisor_llm
+    from langchain.schema import HumanMessage, SystemMessage
+
+    async def llm_agent(query):
+        messages = [SystemMessage(content=PROMPT_SUPREME), HumanMessage(content=query)]
+        response = await supervisor_llm.ainvoke(messages, **SUPERVISOR_CALL_KWARGS)
+        return _parse_decision(query, response.content)["decision"]["agent"]
+
+    llm_agents = await asyncio.gather(*[llm_agent(row["query"]) for row in rows])
+    for row, agent in zip(rows, llm_agents):
+        router.record_llm_decision(router.predict(row["query"]), agent)
+    snapshot = router.snapshot()
+    print(f"Agreement with supervisor LLM: {snapshot['llm_agreement_rate']:.1%} "
+          f"({snapshot['llm_agreements']}/{snapshot['llm_compared']})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--dataset", default=DEFAULT_DATASET)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.4, 0.5, 0.6, 0.7, 0.8])
+    parser.add_argument("--llm", action="store_true", help="also measure agreement with the supervisor LLM")
+    parser.add_argument("--live", action="store_true", help="use the real OpenAI API instead of the fake LLM")
+    args = parser.parse_args()
+
+    rows = load_dataset(args.dataset)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from supreme.router import build_router
+
+    router = build_router(threshold=0.0)
+    evaluate_thresholds(router, rows, args.thresholds)
+
+    if args.llm:
+        if args.live:
+            from supreme import supreme  # noqa: F401  (needs OPENAI_API_KEY)
+            logging.disable(logging.INFO)
+            asyncio.run(evaluate_llm_agreement(router, rows))
+        else:
+            with FakeLLMServer(latency_ms=10) as server:
+                point_backend_at(server.base_url)
+                from supreme import supreme  # noqa: F401
+                logging.disable(logging.INFO)
+                asyncio.run(evaluate_llm_agreement(router, rows))
+
+
+if __name__ == "__main__":
+    main()
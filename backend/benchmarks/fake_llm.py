@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Local OpenAI-compatible stub used by the benchmarks.
+It answers /v1/chat/completions after a configurable delay, so the backend can
+be exercised end to end without network access or an API key. With a seed,
+latencies and injected rate limits repeat from run to run. Like the real
+provider it caches prompt prefixes (one word = one token here) and reports
+them as usage.prompt_tokens_details.cached_tokens. Requests that offer tools
+get app.state.tool_calls parallel calls of the first tool before the answer,
+and POST /search answers like the Serper API. Models can differ: latency and
+per-token speed per model name, and "weak" models that get a share of the
+harder questions wrong (GET /v1/models lists the names in use).
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict, deque
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Keywords the stub uses to fake the supervisor's routing decision
+ROUTING_KEYWORDS = {
+    "Developer": ["code", "python", "api", "bug", "database", "deploy", "docker", "sql", "stack"],
+    "HR": ["leave", "pto", "benefit", "salary", "hiring", "review", "employee", "vacation", "onboarding"],
+}
+
+# Questions a weak model gets wrong more often, and requests answered with a code block
+HARD_MARKERS = ["```", "traceback", "design", "architecture", "why", "trade-off", "optimiz", "refactor", "scal"]
+CODE_REQUEST_RE = re.compile(r"\b(code|function|script|example|implement)\b", re.I)
+WEAK_EASY_SHARE = 0.1  # a weak model's failure rate on easy questions, relative to hard ones
+
+# Provider-style prompt caching: prefixes of 1024+ tokens, in 128-token steps
+PREFIX_CACHE_MIN_TOKENS = 1024
+PREFIX_CACHE_STEP = 128
+
+
+def fake_routes(query: str) -> list:
+    """Every agent label whose keywords the query mentions (CEO when none does)."""
+    lowered = query.lower()
+    return [agent for agent, keywords in ROUTING_KEYWORDS.items()
+            if any(keyword in lowered for keyword in keywords)] or ["CEO"]
+
+
+def fake_route(query: str) -> str:
+    """Pick the agent label the way a reasonable supervisor would."""
+    return fake_routes(query)[0]
+
+
+EMBEDDING_DIMENSIONS = 256
+
+
+def fake_embedding(text: str):
+    """
+    Hashed bag-of-words vector: texts sharing most of their words land close
+    together, which is enough to exercise near-duplicate matching offline.
+    """
+    vector = [0.0] * EMBEDDING_DIMENSIONS
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        bucket = int(hashlib.md5(word.encode()).hexdigest(), 16) % EMBEDDING_DIMENSIONS
+        vector[bucket] += 1.0
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def is_hard(query: str) -> bool:
+    lowered = query.lower()
+    return len(query.split()) > 40 or any(marker in lowered for marker in HARD_MARKERS)
+
+
+def weak_answer_fails(model: str, query: str, rate: float) -> bool:
+    """Whether `model` (failing `rate` of hard questions) gets this one wrong; the same every time."""
+    draw = int(hashlib.md5(f"{model}|{query}".encode()).hexdigest()[:8], 16) / 0xFFFFFFFF
+    return draw < (rate if is_hard(query) else rate * WEAK_EASY_SHARE)
+
+
+def latency_sampler(spec: str):
+    """
+    A function rng -> milliseconds for a latency spec:
+    "200" or "fixed:200", "lognormal:200:0.5" (median, sigma),
+    "exponential:200" (mean), "uniform:100:300", or
+    "bimodal:150:2000:0.05" (fast ms, slow ms, fraction of slow calls).
+    """
+    kind, _, rest = spec.partition(":") if ":" in spec else ("fixed", "", spec)
+    args = [float(value) for value in rest.split(":")]
+    if kind == "fixed":
+        return lambda rng: args[0]
+    if kind == "lognormal":
+        return lambda rng: args[0] * rng.lognormvariate(0, args[1])
+    if kind == "exponential":
+        return lambda rng: rng.expovariate(1 / args[0]) if args[0] else 0.0
+    if kind == "uniform":
+        return lambda rng: rng.uniform(args[0], args[1])
+    if kind == "bimodal":
+        return lambda rng: args[1] if rng.random() < args[2] else args[0]
+    raise ValueError(f"unknown latency distribution: {spec}")
+
+
+def cached_prefix_tokens(cache: set, model: str, messages: list) -> int:
+    """Words of the longest cached prefix of this prompt; all of its prefixes are cached from now on."""
+    words = [word for m in messages for word in [f"<{m.get('role')}>", *str(m.get("content", "")).split()]]
+    digest = hashlib.sha1(model.encode())
+    cached, start = 0, 0
+    for end in range(PREFIX_CACHE_MIN_TOKENS, len(words) + 1, PREFIX_CACHE_STEP):
+        digest.update(" ".join(words[start:end]).encode())
+        start = end
+        key = digest.hexdigest()
+        if key in cache:
+            cached = end
+        else:
+            cache.add(key)
+    return cached
+
+
+def create_app(latency_ms: float = 200.0, token_latency_ms: float = 0.0, latency_sigma: float = 0.0,
+               rpm_limit: int = 0, concurrency_limit: int = 0, prefill_ms_per_1k: float = 0.0,
+               latency: str = None, rate_limit_rate: float = 0.0, seed: int = None,
+               model_latency: dict = None) -> FastAPI:
+    """
+    Build the stub app. Every completion waits latency_ms before answering
+    (scaled by a lognormal factor when latency_sigma > 0, or drawn from the
+    `latency` spec, see latency_sampler) plus prefill_ms_per_1k per thousand
+    uncached prompt words; completions also take token_latency_ms per generated word.
+    Like the real provider, it answers 429 with Retry-After once more than
+    rpm_limit completions arrive within a minute or more than
+    concurrency_limit are in progress (0 disables either limit), and for a
+    random rate_limit_rate fraction of completions. `seed` makes the random
+    draws repeatable. `model_latency` maps model names to their own latency
+    specs, and models listed in app.state.failing_models answer 500.
+    app.state.model_token_latency overrides token_latency_ms per model and
+    app.state.weak_models maps models to the share of hard questions they
+    answer badly: a routing reply without an agent, or an unsure answer
+    without the code block a code request gets.
+    """
+    app = FastAPI()
+    app.state.rng = random.Random(seed)
+    app.state.latency = latency_sampler(latency or f"lognormal:{latency_ms}:{latency_sigma}")
+    app.state.model_latency = {model: latency_sampler(spec) for model, spec in (model_latency or {}).items()}
+    app.state.failing_models = set()
+    app.state.model_token_latency = {}
+    app.state.weak_models = {}
+    app.state.rate_limit_rate = rate_limit_rate
+    app.state.rpm_limit = rpm_limit
+    app.state.concurrency_limit = concurrency_limit
+    app.state.recent = deque()  # arrival times within the last minute
+    app.state.in_progress = 0
+    app.state.prefill_ms_per_1k = prefill_ms_per_1k
+    app.state.prompt_log = []  # (kind, prompt words) of every completion
+    app.state.prefix_cache = set()  # hashes of the prompt prefixes seen so far
+    app.state.token_latency_ms = token_latency_ms
+    app.state.answer_words = 40
+    app.state.tool_calls = 2  # parallel tool calls per request that offers tools
+    app.state.fanout = False  # supervisor names every matching agent when the prompt allows a list
+    app.state.search_latency_ms = 100.0
+    app.state.requests = 0
+    app.state.usage = Counter()
+    app.state.model_usage = defaultdict(Counter)  # model -> calls, prompt/completion tokens, weak answers
+    app.state.connections = set()  # (host, port) of every client connection seen
+
+    @app.get("/v1/models")
+    async def models():
+        names = {"gpt-4o", "gpt-4o-mini", *app.state.model_latency, *app.state.model_token_latency,
+                 *app.state.weak_models, *app.state.model_usage}
+        return {"object": "list", "data": [{"id": name, "object": "model", "owned_by": "fake-llm"}
+                                           for name in sorted(names)]}
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        return {
+            "object": "list",
+            "model": body.get("model", "text-embedding-3-small"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(text))}
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        }
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        app.state.usage["searches"] += 1
+        await asyncio.sleep(app.state.search_latency_ms / 1000)
+        return {"organic": [
+            {"title": f"Result {i} for {body['q']}", "link": f"https://example.com/{i}",
+             "snippet": f"Snippet {i} about {body['q']}."}
+            for i in range(1, body.get("num", 5) + 1)
+        ]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.requests += 1
+        app.state.connections.add((request.client.host, request.client.port))
+        rejection = rate_limited(app.state)
+        if rejection:
+            return rejection
+        if body.get("model") in app.state.failing_models:
+            app.state.usage["server_errors"] += 1
+            return JSONResponse(status_code=500,
+                                content={"error": {"message": "Injected failure", "type": "server_error"}})
+        app.state.in_progress += 1
+        try:
+            return await complete(body)
+        finally:
+            app.state.in_progress -= 1
+
+    async def complete(body: dict):
+        messages = body.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        query = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+
+        prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in messages)
+        cached_tokens = min(prompt_tokens,
+                            cached_prefix_tokens(app.state.prefix_cache, body.get("model", ""), messages))
+        delay = app.state.model_latency.get(body.get("model"), app.state.latency)(app.state.rng)
+        await asyncio.sleep((delay + (prompt_tokens - cached_tokens) * app.state.prefill_ms_per_1k / 1000) / 1000)
+
+        model = body.get("model", "gpt-4o")
+        weak = weak_answer_fails(model, query, app.state.weak_models.get(model, 0.0))
+        filler = " ".join(f"word{i}" for i in range(app.state.answer_words))
+        answer = f"Stub answer to: {query} {filler}".rstrip()
+        if weak:
+            answer = f"I'm not sure how to answer: {query}"
+        elif CODE_REQUEST_RE.search(query):
+            answer += "\n```python\nprint('stub')\n```"
+        if "numbered user queries" in system:
+            kind = "supervisor"
+            numbered = re.findall(r"^(\d+)\. (.*)$", query, re.MULTILINE)
+            content = json.dumps([{"index": int(i), "agent": fake_route(text)} for i, text in numbered])
+        elif "AGENT: <" in system:
+            kind = "combined"
+            content = f"AGENT: {fake_route(query)}\n{answer}"
+        elif "Supreme Agent" in system:
+            kind = "supervisor"
+            agents = fake_routes(query)
+            agent = agents if app.state.fanout and len(agents) > 1 and '"agent": [' in system else agents[0]
+            # Echo the query only when the prompt's protocol asks for it
+            content = json.dumps({"agent": agent, "query": query} if '"query"' in system else {"agent": agent})
+            if weak:
+                content = "That question could go to more than one department."
+        elif "running summary" in system:
+            # A bounded summary: the first words of the exchanges to fold in
+            kind = "summary"
+            content = " ".join(query.split()[:100])
+        else:
+            kind = "agent"
+            content = answer
+        tool_calls = None
+        if kind == "agent" and body.get("tools") and not any(m["role"] == "tool" for m in messages):
+            kind, content = "tool_call", ""
+            name = body["tools"][0]["function"]["name"]
+            tool_calls = [
+                {"id": f"call_{uuid.uuid4().hex[:12]}", "type": "function",
+                 "function": {"name": name, "arguments": json.dumps({"query": f"{query} ({i})" if i else query})}}
+                for i in range(app.state.tool_calls)
+            ]
+        app.state.prompt_log.append((kind, prompt_tokens))
+        max_tokens = body.get("max_completion_tokens") or body.get("max_tokens")
+        truncated = bool(max_tokens) and len(content.split()) > max_tokens
+        if truncated:
+            content = " ".join(content.split()[:max_tokens])
+
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        completion_tokens = len(content.split())
+        token_latency_ms = app.state.model_token_latency.get(model, app.state.token_latency_ms)
+        app.state.model_usage[model].update(calls=1, prompt_tokens=prompt_tokens,
+                                            completion_tokens=completion_tokens, weak_answers=int(weak))
+        app.state.usage["calls"] += 1
+        app.state.usage["prompt_tokens"] += prompt_tokens
+        app.state.usage["cached_tokens"] += cached_tokens
+        app.state.usage["completion_tokens"] += completion_tokens
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": cached_tokens},
+        }
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage")
+            return StreamingResponse(
+                stream_chunks(completion_id, model, content, token_latency_ms,
+                              usage if include_usage else None, tool_calls),
+                media_type="text/event-stream",
+            )
+
+        # A non-streamed answer still costs the full generation time
+        await asyncio.sleep(completion_tokens * token_latency_ms / 1000)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content or None, "tool_calls": tool_calls}
+                if tool_calls else {"role": "assistant", "content": content},
+                "finish_reason": "tool_calls" if tool_calls else "length" if truncated else "stop",
+            }],
+            "usage": usage,
+        }
+
+    return app
+
+
+def rate_limited(state):
+    """A 429 response if this completion would exceed the simulated limits."""
+    now = time.monotonic()
+    while state.recent and now - state.recent[0] > 60:
+        state.recent.popleft()
+    if state.concurrency_limit and state.in_progress >= state.concurrency_limit:
+        retry_after = 1
+    elif state.rate_limit_rate and state.rng.random() < state.rate_limit_rate:
+        retry_after = 1
+    elif state.rpm_limit and len(state.recent) >= state.rpm_limit:
+        retry_after = math.ceil(60 - (now - state.recent[0]))
+    else:
+        state.recent.append(now)
+        return None
+    state.usage["rate_limited"] += 1
+    return JSONResponse(
+        status_code=429,
+        headers={"retry-after": str(retry_after)},
+        content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+    )
+
+
+async def stream_chunks(completion_id: str, model: str, content: str, token_latency_ms: float, usage: dict = None,
+                        tool_calls: list = None):
+    """
+    Yield the completion (or its tool calls) as OpenAI chat.completion.chunk
+    server-sent events, ending with a usage chunk when the request asked for one.
+    """
+    def chunk(delta, finish_reason=None):
+        payload = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+        return f"data: {json.dumps(payload)}\n\n"
+
+    yield chunk({"role": "assistant", "content": ""})
+    if tool_calls:
+        yield chunk({"tool_calls": [{"index": i, **call} for i, call in enumerate(tool_calls)]})
+    words = content.split(" ") if content else []
+    for i, word in enumerate(words):
+        if token_latency_ms:
+            await asyncio.sleep(token_latency_ms / 1000)
+        yield chunk({"content": word if i == 0 else f" {word}"})
+    yield chunk({}, finish_reason="tool_calls" if tool_calls else "stop")
+    if usage is not None:
+        payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                   "model": model, "choices": [], "usage": usage}
+        yield f"data: {json.dumps(payload)}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+class ServerThread:
+    """Runs an ASGI app under uvicorn in a background thread."""
+
+    def __init__(self, app, port: int):
+        self.port = port
+        self.app = app
+        config = uvicorn.Config(self.app, host="127.0.0.1", port=port, log_level="warning")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join()
+
+
+class FakeLLMServer(ServerThread):
+    """Runs the stub in a background thread for the lifetime of a benchmark."""
+
+    def __init__(self, port: int = 8765, latency_ms: float = 200.0, token_latency_ms: float = 0.0,
+                 latency_sigma: float = 0.0, rpm_limit: int = 0, concurrency_limit: int = 0,
+                 prefill_ms_per_1k: float = 0.0, latency: str = None, rate_limit_rate: float = 0.0,
+                 seed: int = None, model_latency: dict = None):
+        super().__init__(create_app(latency_ms, token_latency_ms, latency_sigma, rpm_limit, concurrency_limit,
+                                    prefill_ms_per_1k, latency, rate_limit_rate, seed, model_latency), port)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/v1"
+
+
+def point_backend_at(base_url: str):
+    """Make every ChatOpenAI client the backend creates talk to the stub."""
+    os.environ["OPENAI_API_BASE"] = base_url
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake-benchmark-key")
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+if __name__ == "__main__":
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    latency = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+    token_latency = float(os.getenv("FAKE_LLM_TOKEN_LATENCY_MS", "0"))
+    seed = os.getenv("FAKE_LLM_SEED")
+    uvicorn.run(create_app(latency, token_latency, latency=os.getenv("FAKE_LLM_LATENCY"),
+                           rate_limit_rate=float(os.getenv("FAKE_LLM_RATE_LIMIT_RATE", "0")),
+                           seed=int(seed) if seed is not None else None),
+                host="127.0.0.1", port=port)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Recorded workloads for bench_replay.py.
+A workload is JSONL, one request per line:
+    {"t": 0.42, "query": "...", "agent": "HR", "session_id": "s12"}
+`t` is the arrival time in seconds from the start of the recording, `agent`
+the expected routing label and `session_id` (optional) groups the turns of
+one conversation. Labeled rows without `t` (like data/routing_eval.jsonl)
+are valid workloads too; the replay then spaces them at the target QPS.
+
+    python workloads.py record ../supreme_agent.log -o data/recorded.jsonl
+    python workloads.py synthesize --requests 400 --qps 8 -o data/workload_office.jsonl
+"""
+
+import argparse
+import ast
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_WORKLOAD = os.path.join(DATA_DIR, "workload_office.jsonl")
+LABELED_QUERIES = os.path.join(DATA_DIR, "routing_eval.jsonl")
+
+
+def load_workload(path: str) -> list:
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_workload(rows: list, path: str):
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+
+
+def record_from_log(path: str) -> list:
+    """
+    Rebuild the traffic behind a text-format log (and its rotated backups):
+    every "Supervisor routed" line becomes a request at its log time, labeled
+    with the agent the supervisor LLM chose. Requests the fast path or the
+    routing memo answered are not in these lines, so repeats are undercounted.
+    """
+    from core.logindex import log_files, parse_line
+    from supreme.router import SUPERVISOR_LOG_RE
+
+    rows = []
+    for name in log_files(path):
+        with open(name, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                parsed = parse_line(line.rstrip("\n"))
+                match = parsed and SUPERVISOR_LOG_RE.search(parsed[2])
+                if match:
+                    rows.append({"t": parsed[0], "query": ast.literal_eval(match.group(1)), "agent": match.group(2)})
+    if rows:
+        start = rows[0]["t"]
+        for row in rows:
+            row["t"] = round(row["t"] - start, 3)
+    return rows
+
+
+def synthesize(labeled: list, requests: int, qps: float, seed: int = 0, session_share: float = 0.2,
+               zipf: float = 1.1) -> list:
+    """
+    Poisson arrivals at `qps` of labeled queries with Zipf-distributed
+    popularity (a few questions are asked over and over), with
+    `session_share` of the requests being follow-up turns of a conversation.
+    """
+    rng = random.Random(seed)
+    order = list(labeled)
+    rng.shuffle(order)
+    weights = [1 / (rank + 1) ** zipf for rank in range(len(order))]
+    rows, sessions, t = [], [], 0.0
+    while len(rows) < requests:
+        t += rng.expovariate(qps)
+        row = {"t": round(t, 3), **rng.choices(order, weights)[0]}
+        if sessions and rng.random() < session_share:
+            row["session_id"] = rng.choice(sessions)
+        elif rng.random() < session_share:
+            row["session_id"] = f"s{len(sessions)}"
+            sessions.append(row["session_id"])
+        rows.append(row)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    record = commands.add_parser("record", help="workload from the supervisor decisions in a log")
+    record.add_argument("log")
+    record.add_argument("-o", "--output", required=True)
+    synth = commands.add_parser("synthesize", help="Poisson workload over the labeled routing queries")
+    synth.add_argument("--labeled", default=LABELED_QUERIES)
+    synth.add_argument("--requests", type=int, default=400)
+    synth.add_argument("--qps", type=float, default=8.0)
+    synth.add_argument("--seed", type=int, default=0)
+    synth.add_argument("-o", "--output", default=DEFAULT_WORKLOAD)
+    args = parser.parse_args()
+
+    if args.command == "record":
+        rows = record_from_log(args.log)
+    else:
+        rows = synthesize(load_workload(args.labeled), args.requests, args.qps, args.seed)
+    save_workload(rows, args.output)
+    span = rows[-1]["t"] if rows else 0
+    print(f"{len(rows)} requests over {span:.0f}s written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,32 @@
+import asyncio
 import os
 import json
 import logging
+import time
 from dotenv import load_dotenv
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+from typing import List, Literal, Optional
 
-from supreme.supreme import run_supreme_agent
-from agents.developer import run_developer
-from agents.hr import run_hr
-from agents.ceo import run_ceo
+from core.cache import get_response_cache
+from core import metrics
+from core.jobs import RetryJob, get_job_store, get_job_workers
+from core.logs import Stopwatch, configure_logging, log_event
+from core.resilience import DeadlineExceeded, get_resilience, relay
+from core.scheduler import WAIT_BUCKETS, Overloaded, get_scheduler, request_context
+from core.sessions import conversation, get_session_memory, start_summary
+from core.singleflight import coalesce_stream, get_singleflight
+from core.tiers import get_tiers
+from core.registry import (
+    SUPREME_MODULE, aget_agent_runner, aget_batch, aget_supreme, agent_label, get_supreme, is_loaded, loaded_components
+)
 
 # Load environment
 load_dotenv()
 
-# Configure logging for chat router
-logging.basicConfig(level=logging.INFO)
+# Configure logging (LOG_FORMAT, LOG_LEVEL, ... see core.logs)
+configure_logging()
 chat_logger = logging.getLogger('ChatRouter')
 
 # Router
@@ -24,85 +35,575 @@ chat_router = APIRouter()
 class ChatRequest(BaseModel):
     message: str
     agent: Optional[str] = None  # Optional agent selection
+    mode: Optional[Literal["routed", "combined", "speculative"]] = None  # Supreme agent mode
+    priority: Optional[Literal["high", "normal", "low"]] = None  # Scheduler queue priority
+    session_id: Optional[str] = Field(default=None, max_length=128)  # Continue this conversation
+    timeout: Optional[float] = Field(default=None, gt=0, le=300)  # Seconds to answer within (default SCHEDULER_DEADLINE_SECONDS)
 
 class ChatResponse(BaseModel):
     response: str
     agent_used: Optional[str] = None
+    agents_used: Optional[List[str]] = None  # Every agent consulted on fan-out
+    session_id: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    queries: List[str]
+    mode: Optional[Literal["routed", "combined", "speculative"]] = None
+    priority: Optional[Literal["high", "normal", "low"]] = "low"  # Batch work yields to interactive chats
+    concurrency: Optional[int] = Field(default=None, ge=1, le=256)  # In-flight LLM calls for this batch
+    ordered: bool = False  # Return results in input order instead of as they complete
+
+class JobRequest(ChatRequest):
+    priority: Optional[Literal["high", "normal", "low"]] = "low"  # Jobs yield to interactive chats
+    timeout: Optional[float] = Field(default=None, gt=0, le=3600)  # Seconds the job may run (default JOBS_TIMEOUT_SECONDS)
+
+MAX_BATCH_QUERIES = int(os.getenv("SUPREME_BATCH_MAX_QUERIES", "10000"))
+JOB_TIMEOUT_SECONDS = float(os.getenv("JOBS_TIMEOUT_SECONDS", "600"))
+JOB_EVENTS_POLL_SECONDS = float(os.getenv("JOBS_EVENTS_POLL_SECONDS", "0.25"))
+
+AGENT_EMOJI = {"HR": "🏢", "CEO": "👔", "Developer": "💻"}
 
 @chat_router.post("/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     """
     Routes the user message to the specified agent or supreme agent system.
     """
-    chat_logger.info("🌐 NEW CHAT REQUEST RECEIVED")
-    chat_logger.info("=" * 50)
-    chat_logger.info(f"📨 User Message: {req.message}")
-    chat_logger.info(f"🎯 Requested Agent: {req.agent or 'None (Supreme Agent)'}")
+    chat_logger.info("🌐 NEW CHAT REQUEST: %d characters, agent %s", len(req.message), req.agent or "None (Supreme Agent)")
+    log_event("request.received", endpoint="/chat", chars=len(req.message), agent=req.agent, mode=req.mode,
+              session_id=req.session_id)
+    timer = Stopwatch()
     
     try:
-        # Route to specific agent if requested
-        if req.agent:
-            agent_name = req.agent.upper()
-            
-            if agent_name == "DEVELOPER":
-                chat_logger.info("🔄 Forwarding to Developer Agent...")
-                result = run_developer(req.message)
-                agent_used = "Developer"
-                chat_logger.info("💻 Response from Developer Agent")
-                
-            elif agent_name == "HR":
-                chat_logger.info("🔄 Forwarding to HR Agent...")
-                result = run_hr(req.message)
-                agent_used = "HR"
-                chat_logger.info("👔 Response from HR Agent")
-                
-            elif agent_name == "CEO":
-                chat_logger.info("🔄 Forwarding to CEO Agent...")
-                result = run_ceo(req.message)
-                agent_used = "CEO"
-                chat_logger.info("👔 Response from CEO Agent")
-                
-            else:
-                chat_logger.info(f"❌ Unknown agent requested: {agent_name}, falling back to Supreme Agent")
-                result = run_supreme_agent(req.message)
-                agent_used = "Supreme Agent"
-                
-        else:
-            # Use the supreme agent system when no specific agent is requested
-            chat_logger.info("🔄 Forwarding to Supreme Agent System...")
-            result = run_supreme_agent(req.message)
-            
-            # Extract agent info from the response if present
-            agent_used = None
-            if "Agent HR:" in result:
-                agent_used = "HR"
-                result = result.replace("Agent HR: ", "")
-                chat_logger.info("🏢 Response from Agent HR")
-            elif "Agent CEO:" in result:
-                agent_used = "CEO"
-                result = result.replace("Agent CEO: ", "")
-                chat_logger.info("👔 Response from Agent CEO")
-            elif "Agent Developer:" in result:
-                agent_used = "Developer"
-                result = result.replace("Agent Developer: ", "")
-                chat_logger.info("💻 Response from Agent Developer")
-            else:
-                agent_used = "Supreme Agent"
-                chat_logger.info("🤖 Response from Supreme Agent")
+        memory, window = await _session_window(req)
+        with request_context(req.priority, req.timeout), conversation(window):
+            result, agent_used, agents_used = await _run_chat(req)
+        await _remember(memory, req, result)
         
-        chat_logger.info("✅ CHAT REQUEST COMPLETED")
-        chat_logger.info(f"📤 Final Response Length: {len(result)} characters")
-        chat_logger.info(f"🎯 Agent Used: {agent_used}")
-        chat_logger.info("=" * 50)
+        chat_logger.info("✅ CHAT REQUEST COMPLETED: %d characters from %s", len(result), agent_used)
+        log_event("request.completed", endpoint="/chat", agent=agent_used, chars=len(result), ms=timer.ms)
         
-        return {"response": result, "agent_used": agent_used}
+        return {"response": result, "agent_used": agent_used, "agents_used": agents_used,
+                "session_id": req.session_id}
     
+    except Overloaded as e:
+        chat_logger.warning("🚦 CHAT REQUEST SHED: %s", e)
+        log_event("request.shed", logging.WARNING, endpoint="/chat", lane=e.lane, status=e.status_code, ms=timer.ms)
+        raise HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+    except DeadlineExceeded as e:
+        chat_logger.warning("⏱️ CHAT REQUEST TIMED OUT: %s", e)
+        log_event("request.failed", logging.WARNING, endpoint="/chat", error="DeadlineExceeded", ms=timer.ms)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
     except Exception as e:
-        chat_logger.error(f"❌ CHAT REQUEST FAILED: {str(e)}")
-        chat_logger.error("=" * 50)
+        chat_logger.error("❌ CHAT REQUEST FAILED: %s", e)
+        log_event("request.failed", logging.ERROR, endpoint="/chat", error=type(e).__name__, ms=timer.ms)
         raise HTTPException(status_code=500, detail=f"Error processing request: {str(e)}")
 
+async def _session_window(req: ChatRequest):
+    """The session memory and the history window this request continues from."""
+    memory = get_session_memory() if req.session_id else None
+    if memory is None:
+        return None, None
+    # The store may be SQLite (busy timeout included): keep it off the event loop
+    window = await asyncio.to_thread(memory.window, req.session_id)
+    chat_logger.info("🧵 Session %s: %d turns in window%s", req.session_id, len(window.turns),
+                     ", with summary" if window.summary else "")
+    return memory, window
+
+async def _remember(memory, req: ChatRequest, answer: str):
+    if memory is not None and await asyncio.to_thread(memory.record, req.session_id, req.message, answer):
+        start_summary(memory, req.session_id)
+
+async def _run_chat(req: ChatRequest):
+    """Answer one chat request; returns (response, agent_used, agents_used)."""
+    # Route to specific agent if requested
+    if req.agent:
+        label = agent_label(req.agent)
+        
+        if label:
+            chat_logger.info("🔄 Forwarding to %s Agent...", label)
+            timer = Stopwatch()
+            arun_agent = await aget_agent_runner(label)
+            result = await arun_agent(req.message)
+            agent_used = label
+            log_event("agent.completed", agent=label, chars=len(result), ms=timer.ms)
+            
+        else:
+            chat_logger.info("❌ Unknown agent requested: %s, falling back to Supreme Agent", req.agent.upper())
+            supreme = await aget_supreme()
+            result = await supreme.arun_supreme_agent(req.message, req.mode)
+            agent_used = "Supreme Agent"
+            
+    else:
+        # Use the supreme agent system when no specific agent is requested
+        chat_logger.info("🔄 Forwarding to Supreme Agent System...")
+        supreme = await aget_supreme()
+        result = await supreme.arun_supreme_agent(req.message, req.mode)
+        
+        # Extract agent info from the response if present; a fan-out answer
+        # keeps one "Agent X:" header per section
+        labels, result = supreme.split_answer(result)
+        if len(labels) > 1:
+            chat_logger.info("🔀 Response from Agents %s", ", ".join(labels))
+            return result, labels[0], labels
+        elif labels:
+            agent_used = labels[0]
+            chat_logger.info("%s Response from Agent %s", AGENT_EMOJI[agent_used], agent_used)
+        else:
+            agent_used = "Supreme Agent"
+            chat_logger.info("🤖 Response from Supreme Agent")
+
+    return result, agent_used, None
+
+def _sse(payload: dict) -> str:
+    """Format one server-sent event."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+async def _astream_direct_agent(label: str, message: str):
+    """Stream a single agent's tokens by listening to the chat model it calls."""
+    from langchain_core.runnables import RunnableLambda
+
+    arun = await aget_agent_runner(label)
+    yield "agent", label
+    streamed = False
+    async for event in relay(RunnableLambda(arun).astream_events(message, version="v2")):
+        if event["event"] == "on_chat_model_stream":
+            text = event["data"]["chunk"].content
+            if text:
+                streamed = True
+                yield "token", text
+        elif event["event"] == "on_chain_end" and not event["parent_ids"] and not streamed:
+            # Answer came from the response cache, no model call to listen to
+            yield "token", event["data"]["output"]
+
+async def _astream_supreme(message: str, mode: Optional[str]):
+    supreme = await aget_supreme()
+    async for event in supreme.astream_supreme_agent(message, mode):
+        yield event
+
+def _stream_source(req: ChatRequest):
+    """The (kind, value) events answering `req`: "agent", "agents" and "token"."""
+    # Identical streams in flight are shared: a late joiner replays what was sent so far
+    label = agent_label(req.agent) if req.agent else None
+    if label:
+        return coalesce_stream(f"{label} stream", req.message, _astream_direct_agent(label, req.message))
+    if req.agent:
+        chat_logger.info("❌ Unknown agent requested: %s, falling back to Supreme Agent", req.agent.upper())
+    return coalesce_stream("Supreme stream", req.message, _astream_supreme(req.message, req.mode), req.mode)
+
+@chat_router.post("/chat/stream")
+async def chat_stream(req: ChatRequest):
+    """
+    Same routing as /chat, but the answer is streamed as server-sent events:
+    an "agent" event with agent_used first (then an "agents" event with
+    agents_used on fan-out), "token" events as the sub-agent generates,
+    and a final "done" (or "error") event.
+    """
+    chat_logger.info("🌐 NEW STREAMING CHAT REQUEST: %d characters, agent %s", len(req.message),
+                     req.agent or "None (Supreme Agent)")
+    log_event("request.received", endpoint="/chat/stream", chars=len(req.message), agent=req.agent, mode=req.mode,
+              session_id=req.session_id)
+
+    source = _stream_source(req)
+
+    async def event_stream():
+        chunks = []
+        agent_used = agents_used = None
+        timer = Stopwatch()
+        try:
+            memory, window = await _session_window(req)
+            with request_context(req.priority, req.timeout), conversation(window):
+                async for kind, value in source:
+                    if kind == "agent":
+                        agent_used = value
+                        yield _sse({"type": "agent", "agent_used": value})
+                    elif kind == "agents":
+                        agents_used = value
+                        yield _sse({"type": "agents", "agents_used": value})
+                    else:
+                        chunks.append(value)
+                        yield _sse({"type": "token", "content": value})
+
+            response = "".join(chunks)
+            await _remember(memory, req, response)
+            chat_logger.info("✅ STREAMING CHAT REQUEST COMPLETED: %d characters from %s", len(response), agent_used)
+            log_event("request.completed", endpoint="/chat/stream", agent=agent_used, chars=len(response), ms=timer.ms)
+            yield _sse({"type": "done", "response": response, "agent_used": agent_used, "agents_used": agents_used,
+                        "session_id": req.session_id})
+
+        except Overloaded as e:
+            # Headers are already sent, so the status travels in the event
+            chat_logger.warning("🚦 STREAMING CHAT REQUEST SHED: %s", e)
+            log_event("request.shed", logging.WARNING, endpoint="/chat/stream", lane=e.lane, status=e.status_code,
+                      ms=timer.ms)
+            yield _sse({"type": "error", "status": e.status_code, "retry_after": e.retry_after, "detail": str(e)})
+
+        except DeadlineExceeded as e:
+            chat_logger.warning("⏱️ STREAMING CHAT REQUEST TIMED OUT: %s", e)
+            log_event("request.failed", logging.WARNING, endpoint="/chat/stream", error="DeadlineExceeded",
+                      ms=timer.ms)
+            yield _sse({"type": "error", "status": e.status_code, "detail": str(e)})
+
+        except Exception as e:
+            chat_logger.error("❌ STREAMING CHAT REQUEST FAILED: %s", e)
+            log_event("request.failed", logging.ERROR, endpoint="/chat/stream", error=type(e).__name__, ms=timer.ms)
+            yield _sse({"type": "error", "detail": f"Error processing request: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep nginx from buffering the stream in production
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+async def _read_batch(request: Request) -> BatchRequest:
+    """Parse a JSON BatchRequest, or a JSONL upload with options as query parameters."""
+    try:
+        if request.headers.get("content-type", "").split(";")[0].strip() == "application/json":
+            return BatchRequest(**await request.json())
+
+        queries = []
+        for line in (await request.body()).decode().splitlines():
+            if line.strip():
+                item = json.loads(line)
+                queries.append(item["message"] if isinstance(item, dict) else item)
+        return BatchRequest(queries=queries, **request.query_params)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+    except (ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch body: {str(e)}")
+
+@chat_router.post("/chat/batch")
+async def chat_batch(request: Request):
+    """
+    Run many queries through the supreme agent system. Send JSON
+    ({"queries": [...], "mode", "priority", "concurrency", "ordered"}) or a
+    JSONL upload (one query string or {"message": ...} object per line,
+    options as query parameters). Results stream back as NDJSON, one
+    "result" line per query, then a "done" summary line.
+    """
+    req = await _read_batch(request)
+    if len(req.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    chat_logger.info("📦 NEW BATCH REQUEST RECEIVED: %d queries", len(req.queries))
+    log_event("request.received", endpoint="/chat/batch", queries=len(req.queries), mode=req.mode)
+
+    batch = await aget_batch()
+
+    async def results():
+        start = time.perf_counter()
+        errors = 0
+        async for result in batch.astream_supreme_batch(
+            req.queries, req.mode, req.concurrency, ordered=req.ordered, priority=req.priority
+        ):
+            errors += "error" in result
+            yield json.dumps({"type": "result", **result}) + "\n"
+        elapsed = time.perf_counter() - start
+        chat_logger.info("✅ BATCH REQUEST COMPLETED: %d queries, %d errors, %.1fs", len(req.queries), errors, elapsed)
+        log_event("request.completed", endpoint="/chat/batch", queries=len(req.queries), errors=errors,
+                  ms=round(elapsed * 1000, 1))
+        yield json.dumps({"type": "done", "total": len(req.queries), "errors": errors, "seconds": round(elapsed, 3)}) + "\n"
+
+    return StreamingResponse(results(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+async def run_job(request: dict, report) -> dict:
+    """
+    Answer one background job the way /chat/stream answers a chat, calling
+    report() with a function that returns the partial answer so far (the
+    job workers store it every JOBS_PROGRESS_SECONDS).
+    """
+    req = JobRequest(**request)
+    chunks = []
+    agent_used = agents_used = None
+    timer = Stopwatch()
+    log_event("job.started", agent=req.agent, mode=req.mode, session_id=req.session_id)
+    try:
+        memory, window = await _session_window(req)
+        with request_context(req.priority, req.timeout or JOB_TIMEOUT_SECONDS), conversation(window):
+            async for kind, value in _stream_source(req):
+                if kind == "agent":
+                    agent_used = value
+                elif kind == "agents":
+                    agents_used = value
+                else:
+                    chunks.append(value)
+                report(lambda: {"agent_used": agent_used, "agents_used": agents_used, "partial": "".join(chunks)})
+    except Overloaded as e:
+        # Shed by the scheduler: the job goes back to the queue instead of failing
+        raise RetryJob(str(e), e.retry_after)
+
+    response = "".join(chunks)
+    await _remember(memory, req, response)
+    log_event("job.completed", agent=agent_used, chars=len(response), ms=timer.ms)
+    return {"response": response, "agent_used": agent_used, "agents_used": agents_used, "session_id": req.session_id}
+
+def _job_store():
+    store = get_job_store()
+    if store is None:
+        raise HTTPException(status_code=503, detail="Background jobs are disabled")
+    return store
+
+def _public(job: dict) -> dict:
+    """A job as clients see it (without the stored request)."""
+    return {key: value for key, value in job.items() if key != "request"}
+
+@chat_router.post("/jobs", status_code=202)
+async def submit_job(req: JobRequest):
+    """
+    Queue a chat to be answered in the background and return its job id at
+    once. Follow it with GET /jobs/{job_id} or GET /jobs/{job_id}/events.
+    """
+    store = _job_store()
+    job = await asyncio.to_thread(store.submit, req.model_dump(exclude_none=True), req.priority)
+    if job is None:
+        retry_after = max(1, round(store.snapshot()["avg_run_ms"] / 1000))
+        chat_logger.warning("🚦 JOB REJECTED: %d jobs queued", store.max_queued)
+        raise HTTPException(status_code=429, detail=f"Job queue is full ({store.max_queued} jobs queued)",
+                            headers={"Retry-After": str(retry_after)})
+    workers = get_job_workers()
+    if workers:
+        workers.wake()
+    chat_logger.info("📥 JOB QUEUED: %s, %d characters, agent %s", job["job_id"], len(req.message),
+                     req.agent or "None (Supreme Agent)")
+    log_event("job.queued", job_id=job["job_id"], chars=len(req.message), agent=req.agent, mode=req.mode,
+              session_id=req.session_id)
+    return {"job_id": job["job_id"], "status": job["status"], "position": job.get("position")}
+
+@chat_router.get("/jobs/stats")
+async def job_stats():
+    """Queued and running jobs, this process's workers and the job counters."""
+    store = get_job_store()
+    if store is None:
+        return {"enabled": False}
+    workers = get_job_workers()
+    if workers:
+        return await asyncio.to_thread(workers.snapshot)
+    return {"workers": 0, **await asyncio.to_thread(store.snapshot)}
+
+@chat_router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    A job's status ("queued", "running", "done", "failed" or "cancelled"),
+    its queue position or partial answer so far, and its result or error.
+    """
+    job = await asyncio.to_thread(_job_store().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    return _public(job)
+
+@chat_router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Follow a job as server-sent events: "status" events while it waits and
+    when an attempt starts (a new attempt starts the answer over), then the
+    same "agent", "agents" and "token" events as /chat/stream, and a final
+    "done" (or "error") event.
+    """
+    store = _job_store()
+    if await asyncio.to_thread(store.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+    async def events():
+        state, sent, agent_used, agents_used = None, 0, None, None
+        while True:
+            job = await asyncio.to_thread(store.get, job_id)
+            if job is None:
+                yield _sse({"type": "error", "status": 404, "detail": "Job deleted"})
+                return
+            if (job["status"], job["attempts"], job.get("position")) != state:
+                if state is None or job["attempts"] != state[1]:
+                    sent = 0
+                state = (job["status"], job["attempts"], job.get("position"))
+                yield _sse({"type": "status", "status": job["status"], "attempt": job["attempts"],
+                            "position": job.get("position")})
+            progress = job.get("result") or job.get("progress") or {}
+            if progress.get("agent_used") and progress["agent_used"] != agent_used:
+                agent_used = progress["agent_used"]
+                yield _sse({"type": "agent", "agent_used": agent_used})
+            if progress.get("agents_used") and progress["agents_used"] != agents_used:
+                agents_used = progress["agents_used"]
+                yield _sse({"type": "agents", "agents_used": agents_used})
+            text = progress.get("response", progress.get("partial", ""))
+            if len(text) > sent:
+                yield _sse({"type": "token", "content": text[sent:]})
+                sent = len(text)
+            if job["status"] == "done":
+                yield _sse({"type": "done", "job_id": job_id, **job["result"]})
+                return
+            if job["status"] in ("failed", "cancelled"):
+                yield _sse({"type": "error", "status": job["status"], "detail": job.get("error")})
+                return
+            await asyncio.sleep(JOB_EVENTS_POLL_SECONDS)
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@chat_router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued job, or stop a running one (within JOBS_LEASE_SECONDS / 3 on another worker process)."""
+    status = await asyncio.to_thread(_job_store().cancel, job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    if status == "running":
+        workers = get_job_workers()
+        if workers:
+            workers.cancel(job_id)
+        status = "cancelling"
+    chat_logger.info("🛑 JOB CANCEL REQUESTED: %s (%s)", job_id, status)
+    return {"job_id": job_id, "status": status}
+
+@chat_router.get("/routing/stats")
+async def routing_stats():
+    """Routing memo, fast-path, speculation and fan-out counters."""
+    if not is_loaded(SUPREME_MODULE):
+        return {"loaded": False}
+    supreme = get_supreme()
+    return {
+        "fast_path": supreme.fast_router.snapshot(),
+        "memo": supreme.routing_memo.snapshot() if supreme.routing_memo else {"enabled": False},
+        "speculative": supreme.speculation_snapshot(),
+        "fanout": supreme.fanout_snapshot(),
+    }
+
+@chat_router.get("/cache/stats")
+async def cache_stats():
+    """Hit, miss and eviction counters of the sub-agent response cache."""
+    cache = get_response_cache()
+    return cache.snapshot() if cache else {"enabled": False}
+
+@chat_router.get("/scheduler/stats")
+async def scheduler_stats():
+    """Per-agent concurrency, queue and rate-limit counters with wait histograms."""
+    scheduler = get_scheduler()
+    return scheduler.snapshot() if scheduler else {"enabled": False}
+
+@chat_router.get("/llm/stats")
+async def llm_stats():
+    """Per-model latency, hedges, timeouts and circuit breaker state of the call layer."""
+    resilience = get_resilience()
+    return resilience.snapshot() if resilience else {"enabled": False}
+
+@chat_router.get("/tiers/stats")
+async def tiers_stats():
+    """Model tier table, and calls, escalations, latency, tokens and cost per agent and model."""
+    tiers = get_tiers()
+    return tiers.snapshot() if tiers else {"enabled": False}
+
+@chat_router.get("/prompts/stats")
+async def prompts_stats():
+    """Per-agent prompt prefix size, trimmed inputs and the provider's cached-token ratio."""
+    from core.prompting import prompt_stats
+    return prompt_stats()
+
+@chat_router.get("/search/stats")
+async def search_stats():
+    """Web search provider and its result cache counters."""
+    from core.search import search_stats
+    return search_stats()
+
+@chat_router.get("/knowledge/stats")
+async def knowledge_stats():
+    """Knowledge index generation, live chunks and retrieval counters."""
+    from core.knowledge import knowledge_stats
+    return knowledge_stats()
+
+@chat_router.get("/coalescing/stats")
+async def coalescing_stats():
+    """Requests that led an upstream call vs. joined one in flight, and the coalescing ratio."""
+    flights = get_singleflight()
+    return flights.snapshot() if flights else {"enabled": False}
+
+@chat_router.get("/sessions/stats")
+async def session_stats():
+    """Session memory counters: live sessions, summaries, evictions."""
+    memory = get_session_memory()
+    return await asyncio.to_thread(memory.snapshot) if memory else {"enabled": False}
+
+@chat_router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forget a conversation."""
+    memory = get_session_memory()
+    if memory is None or not await asyncio.to_thread(memory.delete, session_id):
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return {"deleted": session_id}
+
+def _stats_lines(name: str, help_text: str, stats: dict, gauges=("entries", "sessions")) -> list:
+    """A component's stats counters as office_<name>_total{event} plus its size gauges."""
+    counts = {(key,): value for key, value in stats.items()
+              if type(value) is int and key not in gauges}
+    lines = metrics.counter_lines(f"office_{name}_total", help_text, ("event",), counts)
+    for key in gauges:
+        if key in stats:
+            lines += metrics.gauge_lines(f"office_{name}_{key}", f"Current {key}.", (), {(): stats[key]})
+    return lines
+
+def _component_lines() -> list:
+    """Scheduler, cache, routing and session state, read at scrape time."""
+    lines = []
+    scheduler = get_scheduler()
+    if scheduler:
+        lanes = dict(scheduler.lanes)
+        snapshots = {name: lane.snapshot() for name, lane in lanes.items()}
+        lines += metrics.gauge_lines("office_scheduler_in_flight", "Calls holding a lane slot.", ("lane",),
+                                     {(name,): snap["in_flight"] for name, snap in snapshots.items()})
+        lines += metrics.gauge_lines("office_scheduler_queued", "Calls waiting for a lane slot.", ("lane",),
+                                     {(name,): snap["queued"] for name, snap in snapshots.items()})
+        lines += metrics.counter_lines(
+            "office_scheduler_events_total", "Admissions, sheds and timeouts per lane.", ("lane", "event"),
+            {(name, key): value for name, snap in snapshots.items() for key, value in snap.items()
+             if type(value) is int and key not in ("max_concurrency", "max_queue", "in_flight", "queued")},
+        )
+        lines += metrics.histogram_lines("office_scheduler_wait_seconds", "Time calls waited for a lane slot.",
+                                         "lane", {name: lane.wait_seconds for name, lane in lanes.items()},
+                                         WAIT_BUCKETS)
+    resilience = get_resilience()
+    if resilience:
+        snapshots = resilience.snapshot()["models"]
+        lines += metrics.gauge_lines("office_llm_circuit_open", "1 while a model's circuit breaker is open.",
+                                     ("model",), {(model,): int(snap["circuit"] != "closed")
+                                                  for model, snap in snapshots.items()})
+    tiers = get_tiers()
+    if tiers:
+        snapshots = {(agent, model): snap for agent, models in tiers.snapshot()["agents"].items()
+                     for model, snap in models.items()}
+        lines += metrics.counter_lines("office_model_tier_cost_usd_total", "Estimated LLM cost of tiered calls.",
+                                       ("agent", "model"), {key: snap["cost_usd"] for key, snap in snapshots.items()})
+    cache = get_response_cache()
+    if cache:
+        lines += _stats_lines("response_cache", "Response cache events.", cache.snapshot())
+    if is_loaded(SUPREME_MODULE):
+        supreme = get_supreme()
+        lines += _stats_lines("fast_router", "Fast-path router events.", supreme.fast_router.snapshot())
+        if supreme.routing_memo:
+            lines += _stats_lines("routing_memo", "Routing memo events.", supreme.routing_memo.snapshot())
+    from core.knowledge import knowledge_stats
+    knowledge = knowledge_stats()
+    if "searches" in knowledge:
+        lines += _stats_lines("knowledge", "Knowledge retrieval events.", knowledge, gauges=("chunks",))
+    memory = get_session_memory()
+    if memory:
+        lines += _stats_lines("sessions", "Session memory events.", memory.snapshot())
+    store = get_job_store()
+    if store:
+        workers = get_job_workers()
+        lines += _stats_lines("jobs", "Background job events.", workers.snapshot() if workers else store.snapshot(),
+                              gauges=("queued", "running", "stored", "workers", "busy"))
+    flights = get_singleflight()
+    if flights:
+        snapshot = flights.snapshot()
+        lines += metrics.gauge_lines("office_coalescing_ratio", "Share of requests that joined a call in flight.",
+                                     (), {(): snapshot["coalescing_ratio"]})
+        lines += metrics.gauge_lines("office_coalescing_in_flight", "Shared calls in flight.", (),
+                                     {(): snapshot["in_flight"]})
+    return lines
+
+@chat_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus text exposition of stage latencies, LLM usage and component counters."""
+    return PlainTextResponse(metrics.render(_component_lines()), media_type="text/plain; version=0.0.4")
+
 @chat_router.get("/health")
 async def health_check():
-    """Simple health check endpoint."""
-    return {"status": "healthy", "message": "Chat service is running"}
+    """Simple health check endpoint; agents load lazily and need not be ready."""
+    return {"status": "healthy", "message": "Chat service is running", "loaded": loaded_components()}
@@ -0,0 +1,406 @@
+"""
+Response cache for sub-agent answers.
+
+Entries are keyed on (agent, system prompt hash, model, temperature,
+normalized query) and live in a bounded in-memory LRU or an on-disk SQLite
+table, both with TTL expiry. An optional semantic mode reuses an answer when
+the embedding of a new query is close enough to one already cached.
+
+Answers produced at temperature > 0 are not deterministic, so those calls
+bypass the cache unless RESPONSE_CACHE_ALLOW_NONDETERMINISTIC=true.
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+import numpy as np
+
+from core.metrics import CACHE_LOOKUPS
+from core.resilience import watch_fallbacks
+from core.sessions import history_key
+from core.text import normalize_query
+from core.tiers import model_key
+
+
+class MemoryBackend:
+    """Bounded LRU with per-entry TTL."""
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        """Return (value, None) on a hit, (None, reason) otherwise."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None, "expired"
+            self._entries.move_to_end(key)
+            return value, None
+
+    def set(self, key: str, value: str) -> int:
+        """Store a value; returns how many entries were evicted to make room."""
+        with self._lock:
+            self._entries[key] = (value, time.time())
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """LRU + TTL table in a SQLite file, so cached answers survive restarts."""
+
+    blocking = True  # async lookups run get/set in a thread
+
+    def __init__(self, path: str = "response_cache.sqlite3", max_entries: int = 10000,
+                 ttl_seconds: float = 3600):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None, None
+            value, stored_at = row
+            if now - stored_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None, "expired"
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return value, None
+
+    def set(self, key: str, value: str) -> int:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now),
+            )
+            overflow = len(self) - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+            return max(overflow, 0)
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class SemanticIndex:
+    """
+    Unit-length query embeddings of the cached answers as rows of one matrix,
+    so a lookup scores every entry with a single matmul. Bounded like an LRU
+    of stores: the oldest entry's row is reused for the next new key.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._rows = OrderedDict()  # exact key -> row, oldest first
+        self._keys = [None] * max_entries  # row -> exact key
+        self._contexts = np.full(max_entries, -1, dtype=np.int64)  # row -> context id
+        self._context_ids = {}
+        self._vectors = None  # (max_entries, dimensions), allocated on the first add
+        self._lock = threading.Lock()
+
+    def add(self, key: str, context: str, embedding):
+        vector = _unit(embedding)
+        with self._lock:
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            row = self._rows.pop(key, None)
+            if row is None:
+                row = len(self._rows) if len(self._rows) < self.max_entries else self._rows.popitem(last=False)[1]
+            self._rows[key] = row
+            self._keys[row] = key
+            self._contexts[row] = self._context_ids.setdefault(context, len(self._context_ids))
+            self._vectors[row] = vector
+
+    def nearest(self, context: str, embedding) -> tuple:
+        """(key, cosine similarity) of the closest entry stored under `context`, or (None, 0.0)."""
+        with self._lock:
+            context_id = self._context_ids.get(context)
+            if context_id is None or not self._rows:
+                return None, 0.0
+            used = len(self._rows)
+            scores = self._vectors[:used] @ _unit(embedding)
+            scores[self._contexts[:used] != context_id] = -np.inf
+            best = int(np.argmax(scores))
+            if scores[best] == -np.inf:
+                return None, 0.0
+            return self._keys[best], float(scores[best])
+
+    def __len__(self):
+        return len(self._rows)
+
+
+class ResponseCache:
+    """
+    Exact (and optionally semantic) cache in front of a sub-agent's LLM call.
+
+    `embeddings` is any LangChain Embeddings object; passing one enables the
+    semantic mode. The semantic index itself is kept in memory and bounded by
+    the backend's max_entries. Async lookups run a blocking backend (SQLite)
+    in a thread.
+    """
+
+    def __init__(self, backend, embeddings=None, similarity_threshold: float = 0.95,
+                 allow_nondeterministic: bool = False):
+        self.backend = backend
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.allow_nondeterministic = allow_nondeterministic
+        self.stats = Counter()
+        self._semantic_index = SemanticIndex(backend.max_entries) if embeddings is not None else None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def context(agent: str, system_prompt: str, model: str, temperature: float) -> str:
+        prompt_hash = hashlib.sha256(system_prompt.encode()).hexdigest()[:16]
+        return f"{agent}|{prompt_hash}|{model}|{temperature}"
+
+    @staticmethod
+    def key(context: str, query: str) -> str:
+        return hashlib.sha256(f"{context}|{normalize_query(query)}".encode()).hexdigest()
+
+    def cacheable(self, temperature: Optional[float]) -> bool:
+        return self.allow_nondeterministic or not temperature
+
+    def _count(self, *names, evicted: int = 0):
+        with self._lock:
+            for name in names:
+                self.stats[name] += 1
+            self.stats["evictions"] += evicted
+
+    def _exact(self, key: str):
+        value, reason = self.backend.get(key)
+        if reason == "expired":
+            self._count("expirations")
+        return value
+
+    async def _aexact(self, key: str):
+        if getattr(self.backend, "blocking", False):
+            return await asyncio.to_thread(self._exact, key)
+        return self._exact(key)
+
+    def _nearest(self, context: str, embedding):
+        key, score = self._semantic_index.nearest(context, embedding)
+        return key if score >= self.similarity_threshold else None
+
+    def _semantic(self, context: str, embedding):
+        near_key = self._nearest(context, embedding)
+        value = self._exact(near_key) if near_key else None
+        if value is not None:
+            self._count("hits", "semantic_hits")
+        return value
+
+    async def _asemantic(self, context: str, embedding):
+        near_key = self._nearest(context, embedding)
+        value = await self._aexact(near_key) if near_key else None
+        if value is not None:
+            self._count("hits", "semantic_hits")
+        return value
+
+    def _store(self, context: str, key: str, embedding, value: str):
+        evicted = self.backend.set(key, value)
+        self._count(evicted=evicted)
+        if embedding is not None:
+            self._semantic_index.add(key, context, embedding)
+
+    async def _astore(self, context: str, key: str, embedding, value: str):
+        if getattr(self.backend, "blocking", False):
+            await asyncio.to_thread(self._store, context, key, embedding, value)
+        else:
+            self._store(context, key, embedding, value)
+
+    def get_or_compute(self, agent, system_prompt, model, temperature, query, compute, should_store=None):
+        if not self.cacheable(temperature):
+            self._count("bypasses")
+            return compute()
+        context = self.context(agent, system_prompt, model, temperature)
+        key = self.key(context, query)
+        value = self._exact(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        # Only embed on an exact miss; the embedding is reused for the store
+        embedding = self.embeddings.embed_query(normalize_query(query)) if self.embeddings else None
+        if embedding is not None:
+            value = self._semantic(context, embedding)
+            if value is not None:
+                return value
+        self._count("misses")
+        value = compute()
+        if should_store is None or should_store():
+            self._store(context, key, embedding, value)
+        return value
+
+    async def aget_or_compute(self, agent, system_prompt, model, temperature, query, compute, should_store=None):
+        if not self.cacheable(temperature):
+            self._count("bypasses")
+            return await compute()
+        context = self.context(agent, system_prompt, model, temperature)
+        key = self.key(context, query)
+        value = await self._aexact(key)
+        if value is not None:
+            self._count("hits")
+            return value
+
+        embedding = await self.embeddings.aembed_query(normalize_query(query)) if self.embeddings else None
+        if embedding is not None:
+            value = await self._asemantic(context, embedding)
+            if value is not None:
+                return value
+        self._count("misses")
+        value = await compute()
+        if should_store is None or should_store():
+            await self._astore(context, key, embedding, value)
+        return value
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["entries"] = len(self.backend)
+        stats["hit_rate"] = stats.get("hits", 0) / lookups if lookups else 0.0
+        return stats
+
+
+def build_response_cache() -> Optional[ResponseCache]:
+    """Create the process-wide cache from RESPONSE_CACHE_* environment variables."""
+    backend_name = os.getenv("RESPONSE_CACHE_BACKEND", "memory").lower()
+    if backend_name in ("off", "none", "false"):
+        return None
+
+    max_entries = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+    ttl_seconds = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "3600"))
+    if backend_name == "sqlite":
+        backend = SQLiteBackend(os.getenv("RESPONSE_CACHE_PATH", "response_cache.sqlite3"), max_entries, ttl_seconds)
+    else:
+        backend = MemoryBackend(max_entries, ttl_seconds)
+
+    embeddings = None
+    if os.getenv("RESPONSE_CACHE_SEMANTIC", "false").lower() == "true":
+        from core.clients import embeddings_model
+        embeddings = embeddings_model(os.getenv("RESPONSE_CACHE_EMBEDDING_MODEL", "text-embedding-3-small"))
+
+    return ResponseCache(
+        backend,
+        embeddings=embeddings,
+        similarity_threshold=float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.95")),
+        allow_nondeterministic=os.getenv("RESPONSE_CACHE_ALLOW_NONDETERMINISTIC", "false").lower() == "true",
+    )
+
+
+_response_cache = None
+_response_cache_built = False
+_build_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """The process-wide cache, built on first use (after .env has been loaded)."""
+    global _response_cache, _response_cache_built
+    if not _response_cache_built:
+        with _build_lock:
+            if not _response_cache_built:
+                _response_cache = build_response_cache()
+                _response_cache_built = True
+    return _response_cache
+
+
+def set_response_cache(cache: Optional[ResponseCache]):
+    """Replace the process-wide cache (None disables caching)."""
+    global _response_cache, _response_cache_built
+    with _build_lock:
+        _response_cache = cache
+        _response_cache_built = True
+
+
+def cache_responses(agent: str, system_prompt: str, llm, context=None):
+    """
+    Decorate a run_*/arun_* agent function so its answers go through the
+    shared response cache. Model and temperature are read from `llm` at call
+    time so they always match the client that actually answers. `context`,
+    if given, returns more key text per call (such as the knowledge index
+    generation the answer was grounded on). With model tiers on, the key
+    names the agent's tier table instead of its model.
+    """
+    def key_context() -> str:
+        return system_prompt + history_key() + (context() if context else "")
+
+    def outcome(cache, computed) -> str:
+        return "bypass" if not cache.cacheable(llm.temperature) else "miss" if computed else "hit"
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(user_query: str) -> str:
+                cache = get_response_cache()
+                if cache is None:
+                    return await func(user_query)
+                computed = []
+                # Inside a session the answer also depends on the conversation so far;
+                # answers from the fallback model are served but not cached
+                with watch_fallbacks() as fallbacks:
+                    answer = await cache.aget_or_compute(
+                        agent, key_context(), model_key(agent, llm), llm.temperature, user_query,
+                        lambda: computed.append(True) or func(user_query), lambda: not fallbacks,
+                    )
+                CACHE_LOOKUPS.inc(agent, outcome(cache, computed))
+                return answer
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(user_query: str) -> str:
+            cache = get_response_cache()
+            if cache is None:
+                return func(user_query)
+            computed = []
+            with watch_fallbacks() as fallbacks:
+                answer = cache.get_or_compute(
+                    agent, key_context(), model_key(agent, llm), llm.temperature, user_query,
+                    lambda: computed.append(True) or func(user_query), lambda: not fallbacks,
+                )
+            CACHE_LOOKUPS.inc(agent, outcome(cache, computed))
+            return answer
+        return wrapper
+
+    return decorator
@@ -0,0 +1,192 @@
+"""
+Central factory for LLM clients.
+
+Every ChatOpenAI instance in the backend is created through chat_model(), so
+they all share one tuned httpx.Client and one httpx.AsyncClient: a single
+connection pool per process (per event loop for async calls) with
+keep-alive, bounded size, explicit timeouts and (optionally) HTTP/2. Settings come from LLM_* environment variables and
+are read when the first client is built.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+import weakref
+
+import httpx
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from core import metrics
+
+logger = logging.getLogger("LLMClients")
+
+_lock = threading.Lock()
+_http_client = None
+_async_http_client = None
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def _http2_enabled() -> bool:
+    if os.getenv("LLM_HTTP2", "false").lower() != "true":
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("LLM_HTTP2=true but the 'h2' package is not installed; using HTTP/1.1")
+        return False
+    return True
+
+
+def client_settings() -> dict:
+    """Keyword arguments shared by the sync and async httpx clients."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "200")),
+            max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE_CONNECTIONS", "50")),
+            keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 60.0),
+        ),
+        "timeout": httpx.Timeout(
+            _env_float("LLM_TIMEOUT", 60.0),
+            connect=_env_float("LLM_CONNECT_TIMEOUT", 5.0),
+            pool=_env_float("LLM_POOL_TIMEOUT", 10.0),
+        ),
+        "http2": _http2_enabled(),
+    }
+
+
+class PerLoopTransport(httpx.AsyncBaseTransport):
+    """
+    One async connection pool per event loop. Pooled connections belong to
+    the loop that opened them, and the backend runs more than one loop (the
+    server's, plus asyncio.run() in run_supreme_agent's speculative mode and
+    run_supreme_batch), so a single shared pool would hand out dead sockets.
+    """
+
+    def __init__(self, **transport_kwargs):
+        self._transport_kwargs = transport_kwargs
+        self._pools = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def _pool(self) -> httpx.AsyncHTTPTransport:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            pool = self._pools.get(loop)
+            if pool is None:
+                # A new loop: forget the pools of loops that have closed since
+                # (asyncio.run() closes its loop; the sockets died with it)
+                for closed in [other for other in self._pools if other.is_closed()]:
+                    del self._pools[closed]
+                pool = self._pools[loop] = httpx.AsyncHTTPTransport(**self._transport_kwargs)
+            return pool
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool().handle_async_request(request)
+
+    async def aclose(self):
+        """Close every loop's pool, each on its own loop."""
+        current = asyncio.get_running_loop()
+        with self._lock:
+            pools = list(self._pools.items())
+            self._pools.clear()
+        for loop, pool in pools:
+            if loop is current:
+                await pool.aclose()
+            elif loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(pool.aclose(), loop))
+            # Otherwise the loop is closed or stopped and its connections cannot be used again
+
+
+def get_http_client() -> httpx.Client:
+    """The process-wide sync client, created on first use."""
+    global _http_client
+    with _lock:
+        if _http_client is None:
+            _http_client = httpx.Client(**client_settings())
+        return _http_client
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """The process-wide async client, created on first use."""
+    global _async_http_client
+    with _lock:
+        if _async_http_client is None:
+            settings = client_settings()
+            transport = PerLoopTransport(limits=settings.pop("limits"), http2=settings["http2"])
+            _async_http_client = httpx.AsyncClient(transport=transport, **settings)
+        return _async_http_client
+
+
+class UsageCallback(BaseCallbackHandler):
+    """Records latency, token usage and errors of every chat model call in core.metrics."""
+
+    run_inline = True  # record on the calling thread, no executor hop in async runs
+
+    def __init__(self):
+        self._started = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        if metrics.METRICS_ENABLED:
+            self._started[run_id] = (time.perf_counter(), metrics.current_agent())
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self._started.pop(run_id, None)
+        if started is None:
+            return
+        start, agent = started
+        model = (response.llm_output or {}).get("model_name", "")
+        metrics.LLM_SECONDS.observe(time.perf_counter() - start, agent, model)
+        metrics.LLM_CALLS.inc(agent, model)
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    metrics.LLM_TOKENS.inc(agent, model, "prompt", amount=usage.get("input_tokens", 0))
+                    metrics.LLM_TOKENS.inc(agent, model, "completion", amount=usage.get("output_tokens", 0))
+                    cached = (usage.get("input_token_details") or {}).get("cache_read")
+                    if cached:
+                        metrics.LLM_TOKENS.inc(agent, model, "cached", amount=cached)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        if self._started.pop(run_id, None) is not None:
+            metrics.ERRORS.inc("llm", type(error).__name__)
+
+
+usage_callback = UsageCallback()
+
+
+def chat_model(model: str = "gpt-4o", temperature: float = 0.0, **kwargs):
+    """
+    Build a ChatOpenAI that talks through the shared connection pools.
+    Retries (with the OpenAI client's exponential backoff) and the request
+    timeout default to LLM_MAX_RETRIES / LLM_TIMEOUT; kwargs override them.
+    Every call is recorded by usage_callback (latency, tokens, errors).
+    """
+    kwargs.setdefault("max_retries", int(os.getenv("LLM_MAX_RETRIES", "2")))
+    kwargs.setdefault("timeout", _env_float("LLM_TIMEOUT", 60.0))
+    kwargs["callbacks"] = [usage_callback, *(kwargs.get("callbacks") or [])]
+    return ChatOpenAI(
+        model=model,
+        temperature=temperature,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        **kwargs,
+    )
+
+
+def embeddings_model(model: str = "text-embedding-3-small", **kwargs):
+    """OpenAIEmbeddings on the same shared connection pools, with chat_model's retry and timeout defaults."""
+    kwargs.setdefault("max_retries", int(os.getenv("LLM_MAX_RETRIES", "2")))
+    kwargs.setdefault("timeout", _env_float("LLM_TIMEOUT", 60.0))
+    return OpenAIEmbeddings(
+        model=model,
+        http_client=get_http_client(),
+        http_async_client=get_async_http_client(),
+        check_embedding_ctx_length=False,
+        **kwargs,
+    )
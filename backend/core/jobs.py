@@ -0,0 +1,458 @@
+"""
+Background jobs: long chats answered off the HTTP request.
+
+POST /jobs stores the chat request in a SQLite table (WAL, shared by every
+process on the host) and returns its id at once; a pool of job workers
+claims queued jobs by priority and age, runs them, and writes the partial
+answer back as it streams in and the result when it is done. Clients poll
+GET /jobs/{id} or follow GET /jobs/{id}/events.
+
+Workers run inside the API process (JOBS_WORKERS per process) or as
+separate processes (job_worker.py), so the number of jobs in flight does
+not depend on the number of HTTP workers. A running job holds a lease that
+its worker renews; a job whose worker died (crash, kill, restart) is
+claimed again once the lease runs out, and a worker that shuts down cleanly
+hands its jobs back straight away. A job that keeps failing that way, or is
+shed by the scheduler JOBS_MAX_ATTEMPTS times, is marked failed.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger("Jobs")
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+FINISHED = ("done", "failed", "cancelled")
+
+
+class JobStore:
+    """
+    Jobs in a SQLite table: request, status, lease, progress and result.
+    Every method blocks on SQLite (up to the 5 s busy timeout when another
+    process holds the write lock), so async callers run them in a thread.
+    """
+
+    def __init__(self, path: str, max_queued: int = 10000, max_attempts: int = 3, lease_seconds: float = 30,
+                 ttl_seconds: float = 7 * 86400):
+        self.max_queued = max_queued
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.ttl_seconds = ttl_seconds
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, request TEXT NOT NULL, priority INTEGER NOT NULL, "
+            "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, run_after REAL NOT NULL, "
+            "worker TEXT, lease_until REAL, cancel INTEGER NOT NULL DEFAULT 0, progress TEXT, "
+            "result TEXT, error TEXT, created_at REAL NOT NULL, started_at REAL, finished_at REAL, "
+            "updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(status, priority, created_at)")
+
+    def submit(self, request: dict, priority: str = "low") -> Optional[dict]:
+        """Queue a job; None when JOBS_MAX_QUEUED jobs are already waiting."""
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            if self._count("queued") >= self.max_queued:
+                self.stats["rejected"] += 1
+                return None
+            self._conn.execute(
+                "INSERT INTO jobs (job_id, request, priority, status, run_after, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, json.dumps(request), PRIORITIES.get(priority, 2), now, now, now),
+            )
+            self.stats["submitted"] += 1
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = self._job(row)
+            if job["status"] == "queued":
+                job["position"] = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (priority < ? OR "
+                    "(priority = ? AND created_at < ?))", (row["priority"], row["priority"], row["created_at"]),
+                ).fetchone()[0]
+            return job
+
+    def claim(self, worker: str) -> Optional[dict]:
+        """Lease the next runnable job to `worker`: queued ones first, then those whose worker was lost."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' AND run_after <= ? "
+                    "ORDER BY priority, created_at LIMIT 1", (now,),
+                ).fetchone()
+                if row is None:
+                    row = self._conn.execute(
+                        "SELECT * FROM jobs WHERE status = 'running' AND lease_until < ? LIMIT 1", (now,)
+                    ).fetchone()
+                    if row is not None:
+                        self.stats["recovered"] += 1
+                        logger.warning("♻️  Job %s lost its worker %s, claiming it again", row["job_id"], row["worker"])
+                if row is not None and row["cancel"]:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'cancelled', error = 'Cancelled', worker = NULL, finished_at = ?, "
+                        "updated_at = ? WHERE job_id = ?", (now, now, row["job_id"]),
+                    )
+                    self.stats["cancelled"] += 1
+                    row = None
+                elif row is not None and row["attempts"] >= self.max_attempts:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, worker = NULL, finished_at = ?, "
+                        "updated_at = ? WHERE job_id = ?",
+                        (f"Gave up after {row['attempts']} attempts", now, now, row["job_id"]),
+                    )
+                    self.stats["failed"] += 1
+                    row = None
+                elif row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', worker = ?, lease_until = ?, attempts = attempts + 1, "
+                        "progress = NULL, started_at = ?, updated_at = ? WHERE job_id = ?",
+                        (worker, now + self.lease_seconds, now, now, row["job_id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if row is None:
+                return None
+            self.stats["started"] += 1
+            self.stats["wait_ms"] += int((now - row["created_at"]) * 1000) if row["status"] == "queued" else 0
+            return {**self._job(row), "status": "running", "attempts": row["attempts"] + 1}
+
+    def progress(self, job_id: str, worker: str, progress: dict) -> bool:
+        """Store the partial answer; False when the job is no longer this worker's."""
+        now = time.time()
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET progress = ?, lease_until = ?, updated_at = ? "
+                "WHERE job_id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(progress), now + self.lease_seconds, now, job_id, worker),
+            ).rowcount > 0
+
+    def finish(self, job_id: str, worker: str, status: str, result: Optional[dict] = None,
+               error: Optional[str] = None, run_seconds: float = 0.0):
+        """Record the outcome: 'done' with a result, or 'failed' / 'cancelled' with an error."""
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, worker = NULL, lease_until = NULL, "
+                "finished_at = ?, updated_at = ? WHERE job_id = ? AND worker = ?",
+                (status, json.dumps(result) if result is not None else None, error, now, now, job_id, worker),
+            ).rowcount
+            if updated:
+                self.stats[status] += 1
+                self.stats["run_ms"] += int(run_seconds * 1000)
+
+    def retry(self, job_id: str, worker: str, error: str, delay: float):
+        """Queue the job again after `delay` seconds (shed by the scheduler), or fail it after max_attempts."""
+        now = time.time()
+        with self._lock:
+            updated = self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END, error = ?, "
+                "run_after = ?, worker = NULL, lease_until = NULL, progress = NULL, "
+                "finished_at = CASE WHEN attempts >= ? THEN ? END, updated_at = ? WHERE job_id = ? AND worker = ?",
+                (self.max_attempts, error, now + delay, self.max_attempts, now, now, job_id, worker),
+            ).rowcount
+            if updated:
+                self.stats["retried"] += 1
+
+    def release(self, worker: str) -> int:
+        """Hand the running jobs of `worker` back to the queue (clean shutdown)."""
+        now = time.time()
+        with self._lock:
+            released = self._conn.execute(
+                "UPDATE jobs SET status = CASE WHEN cancel THEN 'cancelled' ELSE 'queued' END, "
+                "attempts = MAX(attempts - 1, 0), worker = NULL, "
+                "lease_until = NULL, progress = NULL, finished_at = CASE WHEN cancel THEN ? END, updated_at = ? "
+                "WHERE worker = ? AND status = 'running'",
+                (now, now, worker),
+            ).rowcount
+            self.stats["released"] += released
+            return released
+
+    def renew(self, worker: str) -> list:
+        """Extend the leases of `worker`'s jobs; returns the ids of those asked to cancel."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status = 'running'",
+                (now + self.lease_seconds, worker),
+            )
+            return [row[0] for row in self._conn.execute(
+                "SELECT job_id FROM jobs WHERE worker = ? AND status = 'running' AND cancel = 1", (worker,)
+            )]
+
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued job, or ask the worker of a running one to stop; the job's status after."""
+        now = time.time()
+        with self._lock:
+            self.stats["cancelled"] += self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', error = 'Cancelled', finished_at = ?, updated_at = ? "
+                "WHERE job_id = ? AND status = 'queued'", (now, now, job_id),
+            ).rowcount
+            self._conn.execute("UPDATE jobs SET cancel = 1 WHERE job_id = ? AND status = 'running'", (job_id,))
+            row = self._conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            return row[0] if row else None
+
+    def prune(self) -> int:
+        """Delete finished jobs older than JOBS_TTL_SECONDS."""
+        with self._lock:
+            deleted = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN {FINISHED} AND finished_at < ?",
+                (time.time() - self.ttl_seconds,),
+            ).rowcount
+            self.stats["pruned"] += deleted
+            return deleted
+
+    def _count(self, status: str) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+    @staticmethod
+    def _job(row) -> dict:
+        job = {
+            "job_id": row["job_id"],
+            "status": row["status"],
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "request": json.loads(row["request"]),
+        }
+        for key in ("progress", "result"):
+            if row[key] is not None:
+                job[key] = json.loads(row[key])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+            stats = dict(self.stats)
+        wait_ms, run_ms = stats.pop("wait_ms", 0), stats.pop("run_ms", 0)
+        finished = sum(stats.get(status, 0) for status in FINISHED)
+        return {
+            **stats,
+            **{status: counts.get(status, 0) for status in ("queued", "running")},
+            "stored": sum(counts.values()),
+            "avg_wait_ms": round(wait_ms / max(stats.get("started", 0), 1), 1),
+            "avg_run_ms": round(run_ms / max(finished, 1), 1),
+        }
+
+
+# runner(request, report) -> result answers one job, calling report() as it goes with a
+# function that returns the progress so far (only called when it is due to be stored)
+Runner = Callable[[dict, Callable[[Callable[[], dict]], None]], Awaitable[dict]]
+
+
+class RetryJob(Exception):
+    """Raised by a runner to queue its job again after `delay` seconds."""
+
+    def __init__(self, reason: str, delay: float):
+        self.delay = delay
+        super().__init__(reason)
+
+
+class JobWorkers:
+    """A pool of asyncio workers taking jobs from the store."""
+
+    def __init__(self, store: JobStore, runner: Runner, workers: int = 2, poll_seconds: float = 0.5,
+                 progress_seconds: float = 0.5):
+        self.store = store
+        self.runner = runner
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.progress_seconds = progress_seconds
+        self.name = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._wake = asyncio.Event()
+        self._running = {}  # job_id -> task
+        self._tasks = []
+        self._stopping = False
+
+    def start(self):
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+        self._tasks.append(loop.create_task(self._maintain()))
+        logger.info("🧰 %d job workers started (%s)", self.workers, self.name)
+
+    async def stop(self):
+        """Stop taking jobs and hand the unfinished ones back to the queue."""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        released = await asyncio.to_thread(self.store.release, self.name)
+        logger.info("🧰 Job workers stopped, %d running jobs requeued", released)
+
+    def cancel(self, job_id: str) -> bool:
+        """Stop a job running in this process; False if it is not running here."""
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return task is not None
+
+    def wake(self):
+        """A job was just submitted in this process: claim it without waiting for the next poll."""
+        self._wake.set()
+
+    async def _work(self):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, self.name)
+            except sqlite3.Error as e:
+                logger.warning("⚠️  Claiming a job failed: %s", e)
+                job = None
+            if job is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Its own task, so DELETE /jobs/{id} cancels the job and not the worker
+            run = asyncio.get_running_loop().create_task(self._run(job))
+            self._running[job["job_id"]] = run
+            try:
+                await run
+            finally:
+                self._running.pop(job["job_id"], None)
+
+    async def _run(self, job: dict):
+        job_id = job["job_id"]
+        logger.info("▶️  Job %s started (attempt %d)", job_id, job["attempts"])
+        started = time.perf_counter()
+        flushed = 0.0
+        writing = None  # the progress write in flight, if any
+
+        def report(progress: Callable[[], dict]):
+            # Called from the runner on the loop: write in a thread, one write at a time
+            nonlocal flushed, writing
+            if writing is not None and not writing.done():
+                return
+            if time.perf_counter() - flushed >= self.progress_seconds:
+                flushed = time.perf_counter()
+                writing = asyncio.get_running_loop().create_task(
+                    asyncio.to_thread(self.store.progress, job_id, self.name, progress()))
+
+        try:
+            result = await self.runner(job["request"], report)
+        except asyncio.CancelledError:
+            if self._stopping:
+                raise
+            logger.info("🛑 Job %s cancelled", job_id)
+            await asyncio.to_thread(self.store.finish, job_id, self.name, "cancelled", error="Cancelled",
+                                    run_seconds=time.perf_counter() - started)
+            return
+        except RetryJob as e:
+            logger.warning("🔁 Job %s will be retried in %.0fs: %s", job_id, e.delay, e)
+            await asyncio.to_thread(self.store.retry, job_id, self.name, str(e), e.delay)
+            return
+        except Exception as e:
+            logger.error("❌ Job %s failed: %s", job_id, e)
+            await asyncio.to_thread(self.store.finish, job_id, self.name, "failed", error=str(e),
+                                    run_seconds=time.perf_counter() - started)
+            return
+        await asyncio.to_thread(self.store.finish, job_id, self.name, "done", result,
+                                run_seconds=time.perf_counter() - started)
+        logger.info("✅ Job %s done in %.1fs", job_id, time.perf_counter() - started)
+
+    async def _maintain(self):
+        """Renew leases, stop jobs asked to cancel and prune old ones."""
+        interval = self.store.lease_seconds / 3
+        pruned_at = 0.0
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                for job_id in await asyncio.to_thread(self.store.renew, self.name):
+                    self.cancel(job_id)
+                if time.monotonic() - pruned_at > 3600:
+                    pruned_at = time.monotonic()
+                    await asyncio.to_thread(self.store.prune)
+            except Exception as e:
+                logger.warning("⚠️  Job maintenance failed: %s", e)
+
+    def snapshot(self) -> dict:
+        return {"workers": self.workers, "busy": len(self._running), **self.store.snapshot()}
+
+
+def build_job_store() -> Optional[JobStore]:
+    """Create the job store from JOBS_* environment variables (None with JOBS_ENABLED=false)."""
+    if os.getenv("JOBS_ENABLED", "true").lower() != "true":
+        return None
+    return JobStore(
+        os.getenv("JOBS_PATH", "jobs.sqlite3"),
+        max_queued=int(os.getenv("JOBS_MAX_QUEUED", "10000")),
+        max_attempts=int(os.getenv("JOBS_MAX_ATTEMPTS", "3")),
+        lease_seconds=float(os.getenv("JOBS_LEASE_SECONDS", "30")),
+        ttl_seconds=float(os.getenv("JOBS_TTL_SECONDS", str(7 * 86400))),
+    )
+
+
+_job_store = None
+_job_store_built = False
+_job_workers = None
+_build_lock = threading.Lock()
+
+
+def get_job_store() -> Optional[JobStore]:
+    """The process-wide job store (None when jobs are disabled), built on first use."""
+    global _job_store, _job_store_built
+    if not _job_store_built:
+        with _build_lock:
+            if not _job_store_built:
+                _job_store = build_job_store()
+                _job_store_built = True
+    return _job_store
+
+
+def set_job_store(store: Optional[JobStore]):
+    """Replace the process-wide job store (None disables jobs)."""
+    global _job_store, _job_store_built
+    with _build_lock:
+        _job_store = store
+        _job_store_built = True
+
+
+def get_job_workers() -> Optional[JobWorkers]:
+    """The job workers running in this process, if any."""
+    return _job_workers
+
+
+def start_job_workers(runner: Runner, workers: Optional[int] = None) -> Optional[JobWorkers]:
+    """Start JOBS_WORKERS (or `workers`) job workers on the running loop; None when there are none to start."""
+    global _job_workers
+    store = get_job_store()
+    workers = int(os.getenv("JOBS_WORKERS", "2")) if workers is None else workers
+    if store is None or workers <= 0 or _job_workers is not None:
+        return _job_workers
+    _job_workers = JobWorkers(store, runner, workers, float(os.getenv("JOBS_POLL_SECONDS", "0.5")),
+                              float(os.getenv("JOBS_PROGRESS_SECONDS", "0.5")))
+    _job_workers.start()
+    return _job_workers
+
+
+async def stop_job_workers():
+    global _job_workers
+    if _job_workers is not None:
+        await _job_workers.stop()
+        _job_workers = None
@@ -0,0 +1,554 @@
+"""
+Company knowledge for the HR and CEO agents: handbooks and policies,
+retrieved per question and added to the prompt.
+
+ingest() (or `python ingest_docs.py <dir>`) streams the documents through a
+process pool that reads, hashes and chunks them, and with the local
+embedder also embeds them; remote embeddings are requested from the main
+process in concurrent batches. Documents are keyed by path and content
+hash, so a re-run only re-embeds what changed: new files are added,
+changed files get their chunks replaced and files that are gone are
+deleted.
+
+The index is a directory:
+- vectors.<generation>.f32: unit-length float32 embeddings, one row per
+  chunk, appended by the writer and read through a read-only numpy memmap
+- chunks.sqlite3: the text, document and liveness of every row, the
+  documents with their hashes, and the metadata (embedding model,
+  dimensions, rows, generation)
+
+Replaced and deleted chunks are only marked dead; the vectors file is
+rewritten without them once they are the majority. Readers open the index
+on first use and pick up a new generation within KNOWLEDGE_REFRESH_SECONDS.
+The mapped vectors live in the page cache, shared by every worker process.
+"""
+
+import concurrent.futures
+import fcntl
+import glob
+import itertools
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from contextlib import contextmanager
+from typing import Iterable, Iterator, List, Optional
+
+import numpy as np
+import xxhash
+
+from core.text import normalize_query
+
+logger = logging.getLogger("Knowledge")
+
+DOCUMENT_EXTENSIONS = (".md", ".markdown", ".txt", ".rst")
+WORD_RE = re.compile(r"[a-z0-9]+")
+QUERY_VECTORS = 1024  # query embeddings kept, so repeated questions skip the embedding call
+CONTEXT_HEADER = ("Company documents that may help with this question. Use them when they are relevant "
+                  "and name the document you rely on; say so when they do not cover the question.\n\n")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS docs (path TEXT PRIMARY KEY, digest TEXT NOT NULL, chunks INTEGER NOT NULL,
+                                 indexed REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, path TEXT NOT NULL, position INTEGER NOT NULL,
+                                   text TEXT NOT NULL, live INTEGER NOT NULL DEFAULT 1);
+CREATE INDEX IF NOT EXISTS chunks_live_path ON chunks (path) WHERE live = 1;
+"""
+
+
+class HashEmbeddings:
+    """
+    Offline stand-in for an embedding model: a hashed bag of words. It is
+    CPU-only and deterministic, so ingestion embeds in the worker processes;
+    retrieval quality is keyword-level. For development and the benchmarks.
+    """
+
+    local = True
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.model = f"hash-{dimensions}"
+
+    def vector(self, text: str) -> np.ndarray:
+        buckets = [xxhash.xxh32_intdigest(word) % self.dimensions for word in WORD_RE.findall(text.lower())]
+        return np.bincount(buckets, minlength=self.dimensions).astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vector(text).tolist() for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vector(text).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self.embed_query(text)
+
+
+def build_embeddings():
+    """KNOWLEDGE_EMBEDDINGS: `openai` (KNOWLEDGE_EMBEDDING_MODEL) or the local `hash` stand-in."""
+    if os.getenv("KNOWLEDGE_EMBEDDINGS", "openai").lower() == "hash":
+        return HashEmbeddings(int(os.getenv("KNOWLEDGE_HASH_DIMENSIONS", "256")))
+    from core.clients import embeddings_model
+    return embeddings_model(os.getenv("KNOWLEDGE_EMBEDDING_MODEL", "text-embedding-3-small"))
+
+
+def _unit(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _under(path: str, roots: List[str]) -> bool:
+    return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+
+def iter_documents(paths: Iterable[str]) -> Iterator[str]:
+    """Absolute paths of the documents in `paths` (files, or directories walked recursively)."""
+    for path in paths:
+        path = os.path.abspath(path)
+        if os.path.isfile(path):
+            yield path
+            continue
+        for directory, subdirectories, files in os.walk(path):
+            subdirectories.sort()
+            for name in sorted(files):
+                if name.lower().endswith(DOCUMENT_EXTENSIONS):
+                    yield os.path.join(directory, name)
+
+
+_splitters = {}
+
+
+def split_text(text: str, chunk_chars: int = 1000, overlap: int = 150) -> List[str]:
+    """Chunks of up to `chunk_chars` characters, split at paragraphs, then lines, then words."""
+    splitter = _splitters.get((chunk_chars, overlap))
+    if splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        splitter = _splitters[chunk_chars, overlap] = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_chars, chunk_overlap=overlap)
+    return [chunk for chunk in splitter.split_text(text) if chunk.strip()]
+
+
+def _prepare(path: str, known_digest: Optional[str], chunk_chars: int, overlap: int, dimensions: int):
+    """
+    Ingestion worker: (path, digest, chunks, vectors). Unchanged documents
+    come back without chunks; vectors are only computed here for the local
+    embedder (`dimensions` > 0).
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    digest = xxhash.xxh3_128_hexdigest(data)
+    if digest == known_digest:
+        return path, digest, None, None
+    chunks = split_text(data.decode("utf-8", errors="replace"), chunk_chars, overlap)
+    vectors = None
+    if dimensions and chunks:
+        embeddings = HashEmbeddings(dimensions)
+        vectors = _unit([embeddings.vector(chunk) for chunk in chunks])
+    return path, digest, chunks, vectors
+
+
+def _ordered_map(executor, func, items: Iterator[tuple], window: int) -> Iterator:
+    """executor.map with at most `window` items in flight, so documents stream through in order."""
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, *item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def _meta(db) -> dict:
+    return dict(db.execute("SELECT name, value FROM meta").fetchall())
+
+
+class KnowledgeIndex:
+    """Top-k retrieval over an index directory, and the single writer that maintains it."""
+
+    def __init__(self, directory: str, embeddings, top_k: int = 4, min_score: float = 0.3,
+                 context_tokens: int = 1200, refresh_seconds: float = 5.0):
+        self.directory = directory
+        self.embeddings = embeddings
+        self.top_k = top_k
+        self.min_score = min_score
+        self.context_tokens = context_tokens
+        self.refresh_seconds = refresh_seconds
+        self.db_path = os.path.join(directory, "chunks.sqlite3")
+        self.stats = Counter()
+        self._view = None  # (generation, vectors, dead-row mask or None)
+        self._checked = None
+        self._reader = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._query_vectors = OrderedDict()  # normalized query -> unit vector
+
+    @property
+    def model(self) -> str:
+        return getattr(self.embeddings, "model", None) or type(self.embeddings).__name__
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    # -- reading ----------------------------------------------------------
+
+    def _read(self, sql: str, args=()) -> list:
+        with self._lock:
+            if self._reader is None:
+                self._reader = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+            return self._reader.execute(sql, args).fetchall()
+
+    def _load(self):
+        """The view being served, re-read when the writer has committed a new generation."""
+        now = time.monotonic()
+        if self._checked is not None and now - self._checked < self.refresh_seconds:
+            return self._view
+        with self._load_lock:
+            if self._checked is not None and now - self._checked < self.refresh_seconds:
+                return self._view
+            self._checked = now
+            if not os.path.exists(self.db_path):
+                return None
+            meta = dict(self._read("SELECT name, value FROM meta"))
+            if not meta or (self._view is not None and self._view[0] == int(meta["generation"])):
+                return self._view
+            if meta["model"] != self.model:
+                logger.warning("⚠️  Knowledge index %s was built with %s, not %s; re-ingest with --rebuild",
+                               self.directory, meta["model"], self.model)
+                self._view = None
+                return None
+            rows, dimensions = int(meta["rows"]), int(meta["dimensions"])
+            vectors = np.zeros((0, dimensions), np.float32)
+            if rows:
+                vectors = np.memmap(self._file(meta["vectors"]), np.float32, "r", shape=(rows, dimensions))
+            dead = None
+            if int(meta["dead"]):
+                dead = np.ones(rows, bool)
+                dead[[row for (row,) in self._read("SELECT row FROM chunks WHERE live = 1")]] = False
+            self._view = (int(meta["generation"]), vectors, dead)
+            logger.info("📚 Knowledge index generation %s loaded: %d chunks, %d dimensions",
+                        meta["generation"], rows - int(meta["dead"]), dimensions)
+            return self._view
+
+    def version(self) -> str:
+        """The generation being served ('' without an index); part of the response cache key."""
+        view = self._load()
+        return f"knowledge:{view[0]}" if view else ""
+
+    def _remember(self, key: str, embedding) -> np.ndarray:
+        vector = self._query_vectors[key] = _unit(embedding)
+        while len(self._query_vectors) > QUERY_VECTORS:
+            self._query_vectors.popitem(last=False)
+        return vector
+
+    def _top(self, view, vector: np.ndarray, k: int) -> List[dict]:
+        start = time.perf_counter()
+        _, vectors, dead = view
+        passages = []
+        if len(vectors):
+            scores = np.asarray(vectors @ vector)
+            if dead is not None:
+                scores[dead] = -np.inf
+            k = min(k or self.top_k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = [int(row) for row in top[np.argsort(-scores[top])] if scores[row] >= self.min_score]
+            if top:
+                texts = {row: (path, text) for row, path, text in self._read(
+                    f"SELECT row, path, text FROM chunks WHERE live = 1 AND row IN ({','.join('?' * len(top))})", top)}
+                passages = [{"source": os.path.basename(texts[row][0]), "text": texts[row][1],
+                             "score": round(float(scores[row]), 4)} for row in top if row in texts]
+        self.stats["searches"] += 1
+        self.stats["empty"] += not passages
+        self.stats["search_ms"] += (time.perf_counter() - start) * 1000
+        return passages
+
+    def search(self, query: str, k: int = 0) -> List[dict]:
+        """The k (KNOWLEDGE_TOP_K) best passages, {source, text, score}, scoring at least min_score."""
+        view = self._load()
+        if view is None:
+            return []
+        key = normalize_query(query)
+        vector = self._query_vectors.get(key)
+        if vector is None:
+            vector = self._remember(key, self.embeddings.embed_query(key))
+        return self._top(view, vector, k)
+
+    async def asearch(self, query: str, k: int = 0) -> List[dict]:
+        view = self._load()
+        if view is None:
+            return []
+        key = normalize_query(query)
+        vector = self._query_vectors.get(key)
+        if vector is None:
+            vector = self._remember(key, await self.embeddings.aembed_query(key))
+        return self._top(view, vector, k)
+
+    def context(self, passages: List[dict]) -> str:
+        """Passages as prompt text, best first, within KNOWLEDGE_CONTEXT_TOKENS ('' for none)."""
+        from core.prompting import count_tokens
+
+        entries, used = [], count_tokens(CONTEXT_HEADER)
+        for passage in passages:
+            entry = f"[{passage['source']}]\n{passage['text']}"
+            used += count_tokens(entry)
+            if self.context_tokens and used > self.context_tokens:
+                break
+            entries.append(entry)
+        return CONTEXT_HEADER + "\n\n".join(entries) if entries else ""
+
+    def snapshot(self) -> dict:
+        view = self._view
+        searches = self.stats["searches"]
+        return {
+            "directory": self.directory,
+            "model": self.model,
+            "generation": view[0] if view else None,
+            "chunks": len(view[1]) - (int(view[2].sum()) if view[2] is not None else 0) if view else 0,
+            "searches": searches,
+            "empty": self.stats["empty"],
+            "errors": self.stats["errors"],
+            "avg_search_ms": round(self.stats["search_ms"] / searches, 3) if searches else 0.0,
+        }
+
+    # -- writing ----------------------------------------------------------
+
+    @contextmanager
+    def _writing(self):
+        """The writer's connection, under an exclusive lock on the index directory."""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(self._file(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            db = sqlite3.connect(self.db_path)
+            try:
+                db.execute("PRAGMA journal_mode=WAL")
+                db.executescript(SCHEMA)
+                yield db
+            finally:
+                db.close()
+
+    def _embed(self, pending: list, batch: int, pool) -> list:
+        """Fill in the vectors of documents the workers did not embed, in concurrent batches."""
+        texts = [chunk for _, _, chunks, vectors in pending if vectors is None for chunk in chunks]
+        if not texts:
+            return pending
+        batches = [texts[start:start + batch] for start in range(0, len(texts), batch)]
+        embedded = iter(_unit([vector for result in pool.map(self.embeddings.embed_documents, batches)
+                               for vector in result]))
+        # A document without chunks (empty file) keeps vectors None; ingest skips it
+        return [(path, digest, chunks, vectors if vectors is not None or not chunks
+                 else np.stack([next(embedded) for _ in chunks]))
+                for path, digest, chunks, vectors in pending]
+
+    @staticmethod
+    def _retire(db, path: str) -> int:
+        return db.execute("UPDATE chunks SET live = 0 WHERE path = ? AND live = 1", (path,)).rowcount
+
+    def _commit(self, db, meta: dict, rows: int, dimensions: int, vectors: str):
+        """Publish a new generation; compact the vectors file when most of it is dead."""
+        live = db.execute("SELECT COUNT(*) FROM chunks WHERE live = 1").fetchone()[0]
+        generation = int(meta.get("generation", 0)) + 1
+        values = {"model": self.model, "dimensions": dimensions, "rows": rows, "dead": rows - live,
+                  "vectors": vectors, "generation": generation}
+        if rows - live > live:
+            values.update(self._compact(db, vectors, rows, dimensions, generation))
+        db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [(k, str(v)) for k, v in values.items()])
+        db.commit()
+        for name in glob.glob(self._file("vectors.*.f32")):
+            if os.path.basename(name) != values["vectors"]:
+                os.remove(name)  # readers still mapping it keep their copy until they refresh
+        return values
+
+    def _compact(self, db, vectors: str, rows: int, dimensions: int, generation: int) -> dict:
+        """Rewrite the vectors without dead rows and renumber the chunks to match."""
+        live = np.array([row for (row,) in db.execute("SELECT row FROM chunks WHERE live = 1 ORDER BY row")],
+                        np.int64)
+        name = f"vectors.{generation}.f32"
+        with open(self._file(name), "wb") as out:
+            if len(live):
+                old = np.memmap(self._file(vectors), np.float32, "r", shape=(rows, dimensions))
+                for start in range(0, len(live), 65536):
+                    out.write(np.ascontiguousarray(old[live[start:start + 65536]]).tobytes())
+            out.flush()
+            os.fsync(out.fileno())
+        db.execute("DELETE FROM chunks WHERE live = 0")
+        # Ascending, and row n is never taken by a row that has not moved yet
+        db.executemany("UPDATE chunks SET row = ? WHERE row = ?", [(new, int(old)) for new, old in enumerate(live)])
+        logger.info("🗜️  Knowledge index compacted: %d → %d rows", rows, len(live))
+        return {"rows": len(live), "dead": 0, "vectors": name}
+
+    def ingest(self, paths: Iterable[str], prune: bool = True, rebuild: bool = False, workers: int = 0) -> dict:
+        """
+        Bring the index in line with the documents under `paths`: add new
+        ones, re-embed changed ones and, with `prune`, delete indexed ones
+        under `paths` that no longer exist. Returns document and chunk counts.
+        """
+        roots = [os.path.abspath(path) for path in paths]
+        chunk_chars = int(os.getenv("KNOWLEDGE_CHUNK_CHARS", "1000"))
+        overlap = int(os.getenv("KNOWLEDGE_CHUNK_OVERLAP", "150"))
+        batch = int(os.getenv("KNOWLEDGE_EMBED_BATCH", "64"))
+        concurrency = int(os.getenv("KNOWLEDGE_EMBED_CONCURRENCY", "4"))
+        workers = workers or int(os.getenv("KNOWLEDGE_WORKERS", "0")) or os.cpu_count() or 1
+        local = self.embeddings.dimensions if getattr(self.embeddings, "local", False) else 0
+        stats = Counter()
+        start = time.perf_counter()
+
+        with self._writing() as db:
+            meta = _meta(db)
+            if meta and meta["model"] != self.model and not rebuild:
+                raise ValueError(f"knowledge index {self.directory} was built with {meta['model']}, "
+                                 f"not {self.model}; rebuild it")
+            if meta and (rebuild or meta["model"] != self.model):
+                db.execute("DELETE FROM chunks")
+                db.execute("DELETE FROM docs")
+                meta = {"generation": meta["generation"]}
+            rows, dimensions = int(meta.get("rows", 0)), int(meta.get("dimensions", 0))
+            vectors = meta.get("vectors") or f"vectors.{int(meta.get('generation', 0)) + 1}.f32"
+            known = dict(db.execute("SELECT path, digest FROM docs").fetchall())
+            items = ((path, known.get(path), chunk_chars, overlap, local) for path in iter_documents(roots))
+            seen = set()
+
+            with open(self._file(vectors), "ab") as out, \
+                    concurrent.futures.ThreadPoolExecutor(concurrency) as embedders, \
+                    (concurrent.futures.ProcessPoolExecutor(workers) if workers > 1 else
+                     concurrent.futures.ThreadPoolExecutor(1)) as pool:
+                out.truncate(rows * dimensions * 4)  # rows of an interrupted run were never committed
+                pending, pending_chunks = [], 0
+                prepared = _ordered_map(pool, _prepare, items, workers * 4)
+                for document in itertools.chain(prepared, [None]):
+                    if document is not None:
+                        path, _, chunks, _ = document
+                        seen.add(path)
+                        if chunks is None:
+                            stats["unchanged"] += 1
+                            continue
+                        stats["updated" if path in known else "added"] += 1
+                        pending.append(document)
+                        pending_chunks += len(chunks)
+                        if pending_chunks < batch * concurrency:
+                            continue
+                    for path, digest, chunks, embedded in self._embed(pending, batch, embedders):
+                        stats["retired"] += self._retire(db, path)
+                        if chunks:
+                            dimensions = dimensions or embedded.shape[1]
+                            if embedded.shape[1] != dimensions:
+                                raise ValueError(f"{self.model} returned {embedded.shape[1]} dimensions, "
+                                                 f"the index has {dimensions}")
+                            out.write(np.ascontiguousarray(embedded, np.float32).tobytes())
+                            db.executemany("INSERT INTO chunks (row, path, position, text) VALUES (?, ?, ?, ?)",
+                                           [(rows + i, path, i, chunk) for i, chunk in enumerate(chunks)])
+                            rows += len(chunks)
+                        db.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?)",
+                                   (path, digest, len(chunks), time.time()))
+                        stats["chunks"] += len(chunks)
+                    pending, pending_chunks = [], 0
+                out.flush()
+                os.fsync(out.fileno())
+
+            if prune:
+                for path in known:
+                    if path not in seen and _under(path, roots):
+                        stats["retired"] += self._retire(db, path)
+                        db.execute("DELETE FROM docs WHERE path = ?", (path,))
+                        stats["deleted"] += 1
+            values = self._commit(db, meta, rows, dimensions, vectors)
+
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        logger.info("📥 Knowledge ingested (generation %d): %d added, %d updated, %d unchanged, %d deleted, "
+                    "%d chunks in %.1fs", values["generation"], stats["added"], stats["updated"],
+                    stats["unchanged"], stats["deleted"], stats["chunks"], stats["seconds"])
+        return dict(stats, generation=values["generation"])
+
+    def delete(self, paths: Iterable[str]) -> int:
+        """Remove the indexed documents at or under `paths`; returns how many were removed."""
+        roots = [os.path.abspath(path) for path in paths]
+        with self._writing() as db:
+            meta = _meta(db)
+            if not meta:
+                return 0
+            removed = [path for (path,) in db.execute("SELECT path FROM docs").fetchall() if _under(path, roots)]
+            for path in removed:
+                self._retire(db, path)
+                db.execute("DELETE FROM docs WHERE path = ?", (path,))
+            if removed:
+                self._commit(db, meta, int(meta["rows"]), int(meta["dimensions"]), meta["vectors"])
+        return len(removed)
+
+
+def build_knowledge() -> Optional[KnowledgeIndex]:
+    """The index reader from KNOWLEDGE_* settings (None with KNOWLEDGE_ENABLED=false)."""
+    if os.getenv("KNOWLEDGE_ENABLED", "true").lower() != "true":
+        return None
+    return KnowledgeIndex(
+        os.getenv("KNOWLEDGE_INDEX_DIR", "knowledge_index"),
+        build_embeddings(),
+        top_k=int(os.getenv("KNOWLEDGE_TOP_K", "4")),
+        min_score=float(os.getenv("KNOWLEDGE_MIN_SCORE", "0.3")),
+        context_tokens=int(os.getenv("KNOWLEDGE_CONTEXT_TOKENS", "1200")),
+        refresh_seconds=float(os.getenv("KNOWLEDGE_REFRESH_SECONDS", "5")),
+    )
+
+
+_knowledge = None
+_knowledge_built = False
+_knowledge_lock = threading.Lock()
+
+
+def get_knowledge() -> Optional[KnowledgeIndex]:
+    """The process-wide index reader, built on first use (the index itself opens on the first search)."""
+    global _knowledge, _knowledge_built
+    with _knowledge_lock:
+        if not _knowledge_built:
+            _knowledge = build_knowledge()
+            _knowledge_built = True
+        return _knowledge
+
+
+def set_knowledge(index: Optional[KnowledgeIndex]):
+    """Replace the process-wide index reader (None turns retrieval off)."""
+    global _knowledge, _knowledge_built
+    with _knowledge_lock:
+        _knowledge = index
+        _knowledge_built = True
+
+
+def knowledge_version() -> str:
+    index = get_knowledge()
+    return index.version() if index else ""
+
+
+def knowledge_context(query: str) -> str:
+    """Retrieved passages for `query` as prompt text; '' without an index, matches or on errors."""
+    index = get_knowledge()
+    if index is None:
+        return ""
+    try:
+        return index.context(index.search(query))
+    except Exception as e:
+        index.stats["errors"] += 1
+        logger.warning("⚠️  Knowledge retrieval failed (%s), answering without documents", e)
+        return ""
+
+
+async def aknowledge_context(query: str) -> str:
+    index = get_knowledge()
+    if index is None:
+        return ""
+    try:
+        return index.context(await index.asearch(query))
+    except Exception as e:
+        index.stats["errors"] += 1
+        logger.warning("⚠️  Knowledge retrieval failed (%s), answering without documents", e)
+        return ""
+
+
+def knowledge_stats() -> dict:
+    """Index generation, live chunks and search counters (without building the reader)."""
+    if not _knowledge_built:
+        return {"loaded": False}
+    return _knowledge.snapshot() if _knowledge else {"enabled": False}
@@ -0,0 +1,417 @@
+"""
+Reading large, rotated log files without loading them into memory.
+
+- tail_lines() seeks backwards from the end of the file in blocks and
+  continues into the rotated backups (supreme_agent.log.1, .2, ...) when
+  the current file is shorter than the requested number of lines.
+- follow() yields new lines as they are written, woken by inotify on Linux
+  (polling elsewhere), and carries on into the new file after a rotation.
+- LogIndex keeps a SQLite index next to the log: the byte offset, time,
+  agent, routing source, request id and duration of every stage event
+  (core.logs, text or JSON format), plus a time checkpoint per megabyte so
+  time ranges can be read without scanning from the start. Files are keyed
+  by inode, so renaming during rotation does not trigger a re-index, and
+  refresh() only reads what was appended since the last call.
+"""
+
+import ctypes
+import ctypes.util
+import json
+import os
+import re
+import select
+import sqlite3
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Iterator, List, Optional
+
+BLOCK_SIZE = 64 * 1024
+CHUNK_SIZE = 1024 * 1024  # bytes per indexing read, and per time checkpoint
+HEAD_BYTES = 256  # fingerprint that tells a reused inode from the same file
+
+EVENT_MARKER = b"office.events"
+TEXT_LINE_RE = re.compile(r"^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d),(\d{3}) - (\S+) - (\w+) - (.*)$")
+FIELD_RE = re.compile(r"(\w+)=(\S+)")
+
+
+def default_log_path() -> str:
+    return os.getenv("LOG_FILE") or "supreme_agent.log"
+
+
+def log_files(path: str) -> List[str]:
+    """The log and its RotatingFileHandler backups, oldest first."""
+    directory, base = os.path.split(os.path.abspath(path))
+    backups = []
+    try:
+        for name in os.listdir(directory):
+            suffix = name[len(base) + 1:]
+            if name.startswith(base + ".") and suffix.isdigit():
+                backups.append((int(suffix), os.path.join(directory, name)))
+    except FileNotFoundError:
+        return []
+    files = [name for _, name in sorted(backups, reverse=True)]
+    if os.path.exists(path):
+        files.append(os.path.abspath(path))
+    return files
+
+
+def _tail_file(path: str, count: int) -> List[bytes]:
+    """Up to `count` last lines of one file, reading blocks backwards from EOF."""
+    with open(path, "rb") as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            step = min(BLOCK_SIZE, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    lines = data.splitlines()
+    return lines[-count:] if count else []
+
+
+def tail_lines(path: str, count: int = 50) -> List[str]:
+    """The last `count` lines across the log and its rotated backups."""
+    lines = []
+    for name in reversed(log_files(path)):
+        lines = _tail_file(name, count - len(lines)) + lines
+        if len(lines) >= count:
+            break
+    return [line.decode("utf-8", errors="replace") for line in lines]
+
+
+class _Inotify:
+    """Wakes up when anything in a directory is written, created or renamed."""
+
+    MASK = 0x2 | 0x8 | 0x80 | 0x100  # IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+
+    def __init__(self, directory: str):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+
+    def wait(self, timeout: float):
+        if select.select([self.fd], [], [], timeout)[0]:
+            try:
+                while os.read(self.fd, 4096):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller:
+    def __init__(self, interval: float):
+        self.interval = interval
+
+    def wait(self, timeout: float):
+        time.sleep(min(self.interval, timeout))
+
+    def close(self):
+        pass
+
+
+@contextmanager
+def _watcher(directory: str, poll_interval: float, use_inotify: bool):
+    watcher = None
+    if use_inotify and hasattr(select, "select") and os.name == "posix":
+        try:
+            watcher = _Inotify(directory)
+        except (OSError, AttributeError):
+            watcher = None  # not Linux, or out of inotify instances
+    watcher = watcher or _Poller(poll_interval)
+    try:
+        yield watcher
+    finally:
+        watcher.close()
+
+
+def follow(path: str, poll_interval: float = 0.25, from_start: bool = False,
+           use_inotify: bool = True) -> Iterator[str]:
+    """
+    Yield lines appended to `path` (like tail -F). After a rotation the rest
+    of the old file is drained before switching to the new one; a truncated
+    file is read again from the start.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    f, inode, partial = None, None, b""
+    with _watcher(directory, poll_interval, use_inotify) as watcher:
+        try:
+            while True:
+                if f is None:
+                    try:
+                        f = open(path, "rb")
+                    except FileNotFoundError:
+                        watcher.wait(1.0)
+                        continue
+                    inode = os.fstat(f.fileno()).st_ino
+                    if not from_start:
+                        f.seek(0, os.SEEK_END)
+                    from_start = True  # files that appear later are read in full
+
+                data = f.read()
+                if data:
+                    *lines, partial = (partial + data).split(b"\n")
+                    for line in lines:
+                        yield line.decode("utf-8", errors="replace")
+                    continue
+
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    stat = None
+                if stat is not None and stat.st_ino != inode:
+                    f.close()
+                    f, partial = None, b""
+                    continue
+                if stat is not None and stat.st_size < f.tell():
+                    f.seek(0)
+                    partial = b""
+                    continue
+                watcher.wait(1.0)
+        finally:
+            if f is not None:
+                f.close()
+
+
+class _Clock:
+    """Local 'YYYY-mm-dd HH:MM:SS' stamps to epoch seconds, parsed once per second."""
+
+    def __init__(self):
+        self._seconds = {}
+
+    def __call__(self, stamp: str, millis: str) -> float:
+        seconds = self._seconds.get(stamp)
+        if seconds is None:
+            if len(self._seconds) > 4096:
+                self._seconds.clear()
+            seconds = self._seconds[stamp] = datetime.strptime(stamp, "%Y-%m-%d %H:%M:%S").timestamp()
+        return seconds + int(millis) / 1000
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_line(line: str, clock: Optional[_Clock] = None):
+    """(ts, logger, message, fields) of a core.logs text or JSON line, or None."""
+    if line.startswith("{"):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        fields = {k: v for k, v in record.items() if k not in ("ts", "level", "logger", "event")}
+        return record.get("ts"), record.get("logger"), record.get("event", ""), fields
+    match = TEXT_LINE_RE.match(line)
+    if not match:
+        return None
+    stamp, millis, name, _, message = match.groups()
+    ts = (clock or _Clock())(stamp, millis)
+    if name != EVENT_MARKER.decode():
+        return ts, name, message, {}
+    event, _, rest = message.partition(" ")
+    return ts, name, event, dict(FIELD_RE.findall(rest))
+
+
+def _line_time(line: bytes, clock: _Clock) -> Optional[float]:
+    if line[:1] == b"{":
+        match = re.search(rb'"ts": ([0-9.]+)', line)
+        return float(match.group(1)) if match else None
+    if line[:2] == b"20" and len(line) > 23:
+        try:
+            return clock(line[:19].decode(), line[20:23].decode())
+        except ValueError:
+            return None
+    return None
+
+
+class LogIndex:
+    """On-disk index of the stage events in a log and its rotated backups."""
+
+    def __init__(self, log_path: Optional[str] = None, index_path: Optional[str] = None):
+        self.log_path = os.path.abspath(log_path or default_log_path())
+        self.index_path = index_path or os.getenv("LOG_INDEX_PATH") or self.log_path + ".index.sqlite3"
+        self._clock = _Clock()
+        self._conn = sqlite3.connect(self.index_path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " inode INTEGER PRIMARY KEY, path TEXT NOT NULL, head BLOB NOT NULL, indexed_bytes INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " inode INTEGER NOT NULL, offset INTEGER NOT NULL, ts REAL, event TEXT NOT NULL,"
+            " agent TEXT, source TEXT, request_id TEXT, ms REAL);"
+            "CREATE TABLE IF NOT EXISTS checkpoints (inode INTEGER NOT NULL, offset INTEGER NOT NULL, ts REAL NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS entries_event_ts ON entries(event, ts);"
+            "CREATE INDEX IF NOT EXISTS entries_request ON entries(request_id);"
+            "CREATE INDEX IF NOT EXISTS checkpoints_ts ON checkpoints(inode, ts);"
+        )
+
+    def close(self):
+        self._conn.close()
+
+    def _forget(self, inode: int):
+        for table in ("files", "entries", "checkpoints"):
+            self._conn.execute(f"DELETE FROM {table} WHERE inode = ?", (inode,))
+
+    def refresh(self) -> dict:
+        """Index whatever was appended (or rotated in) since the last refresh."""
+        stats = {"files": 0, "bytes": 0, "events": 0}
+        current = {}
+        for path in log_files(self.log_path):
+            try:
+                current[os.stat(path).st_ino] = path
+            except FileNotFoundError:
+                continue  # rotated away while listing
+
+        known = {inode: (head, indexed) for inode, head, indexed in
+                 self._conn.execute("SELECT inode, head, indexed_bytes FROM files")}
+        self._conn.execute("BEGIN")
+        try:
+            for inode in set(known) - set(current):
+                self._forget(inode)  # deleted by rotation
+            for inode, path in current.items():
+                with open(path, "rb") as f:
+                    head = f.read(HEAD_BYTES)
+                    start = 0
+                    if inode in known:
+                        old_head, start = known[inode]
+                        if not head.startswith(old_head) or os.fstat(f.fileno()).st_size < start:
+                            self._forget(inode)  # truncated, or the inode was reused
+                            start = 0
+                    indexed, events = self._index(f, inode, start)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO files (inode, path, head, indexed_bytes) VALUES (?, ?, ?, ?)",
+                    (inode, path, head, indexed),
+                )
+                stats["files"] += 1
+                stats["bytes"] += indexed - start
+                stats["events"] += events
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return stats
+
+    def _index(self, f, inode: int, start: int):
+        """Index complete lines from `start`; returns (bytes indexed up to, events found)."""
+        f.seek(start)
+        offset, pending, events = start, b"", 0
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                return offset, events
+            buffer = pending + chunk
+            end = buffer.rfind(b"\n") + 1
+            buffer, pending = buffer[:end], buffer[end:]
+            if not buffer:
+                continue
+
+            first_time = _line_time(buffer[:buffer.find(b"\n")], self._clock)
+            if first_time is not None:
+                self._conn.execute("INSERT INTO checkpoints VALUES (?, ?, ?)", (inode, offset, first_time))
+
+            rows = []
+            position = buffer.find(EVENT_MARKER)
+            while position >= 0:
+                line_start = buffer.rfind(b"\n", 0, position) + 1
+                line_end = buffer.find(b"\n", position)
+                row = self._event_row(buffer[line_start:line_end])
+                if row:
+                    rows.append((inode, offset + line_start, *row))
+                position = buffer.find(EVENT_MARKER, line_end)
+            self._conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            events += len(rows)
+            offset += len(buffer)
+
+    def _event_row(self, line: bytes):
+        parsed = parse_line(line.decode("utf-8", errors="replace"), self._clock)
+        if not parsed or parsed[1] != EVENT_MARKER.decode():
+            return None
+        ts, _, event, fields = parsed
+        return (ts, event, fields.get("agent"), fields.get("source"), fields.get("request_id"),
+                _number(fields.get("ms")))
+
+    def events(self, event: Optional[str] = None, agent: Optional[str] = None, source: Optional[str] = None,
+               request_id: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+               limit: Optional[int] = None) -> List[dict]:
+        """Indexed events matching every given filter, oldest first."""
+        filters = {"event = ?": event, "agent = ?": agent, "source = ?": source, "request_id = ?": request_id,
+                   "ts >= ?": since, "ts <= ?": until}
+        clauses = [clause for clause, value in filters.items() if value is not None]
+        sql = ("SELECT f.path, e.offset, e.ts, e.event, e.agent, e.source, e.request_id, e.ms "
+               "FROM entries e JOIN files f ON f.inode = e.inode")
+        if clauses:
+            sql += " WHERE " + " AND ".join(f"e.{clause}" for clause in clauses)
+        sql += " ORDER BY e.ts, e.offset"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        params = [value for value in filters.values() if value is not None]
+        columns = ("path", "offset", "ts", "event", "agent", "source", "request_id", "ms")
+        return [dict(zip(columns, row)) for row in self._conn.execute(sql, params)]
+
+    def latency_percentiles(self, event: str = "request.completed", since: Optional[float] = None,
+                            until: Optional[float] = None, percentiles=(50, 95, 99)) -> dict:
+        """Per agent: count and nearest-rank percentiles of `ms` for one event type."""
+        filters = {"ts >= ?": since, "ts <= ?": until}
+        clauses = ["event = ?", "ms IS NOT NULL"] + [clause for clause, value in filters.items() if value is not None]
+        rows = self._conn.execute(
+            f"SELECT COALESCE(agent, '-'), ms FROM entries WHERE {' AND '.join(clauses)} ORDER BY 1, 2",
+            [event] + [value for value in filters.values() if value is not None],
+        )
+        by_agent = {}
+        for agent, ms in rows:
+            by_agent.setdefault(agent, []).append(ms)
+        report = {}
+        for agent, values in by_agent.items():
+            stats = {"count": len(values)}
+            for p in percentiles:
+                stats[f"p{p}"] = values[min(len(values) - 1, max(0, -(-p * len(values) // 100) - 1))]
+            report[agent] = stats
+        return report
+
+    def lines_for(self, entries: List[dict]) -> Iterator[str]:
+        """The raw log lines of events returned by events()."""
+        handles = {}
+        try:
+            for entry in entries:
+                f = handles.get(entry["path"])
+                if f is None:
+                    f = handles[entry["path"]] = open(entry["path"], "rb")
+                f.seek(entry["offset"])
+                yield f.readline().rstrip(b"\n").decode("utf-8", errors="replace")
+        finally:
+            for f in handles.values():
+                f.close()
+
+    def lines_between(self, since: float, until: Optional[float] = None) -> Iterator[str]:
+        """Every line logged in [since, until], starting from the nearest checkpoint."""
+        files = self._conn.execute(
+            "SELECT f.inode, f.path, MIN(c.ts) FROM files f LEFT JOIN checkpoints c ON c.inode = f.inode "
+            "GROUP BY f.inode ORDER BY MIN(c.ts)"
+        ).fetchall()
+        for position, (inode, path, _) in enumerate(files):
+            later = files[position + 1][2] if position + 1 < len(files) else None
+            if later is not None and later <= since:
+                continue  # the next file already starts before the range
+            row = self._conn.execute(
+                "SELECT MAX(offset) FROM checkpoints WHERE inode = ? AND ts <= ?", (inode, since)
+            ).fetchone()
+            with open(path, "rb") as f:
+                f.seek(row[0] or 0)
+                ts = None
+                for raw in f:
+                    ts = _line_time(raw, self._clock) or ts  # continuation lines inherit the time
+                    if ts is None or ts < since:
+                        continue
+                    if until is not None and ts > until:
+                        return
+                    yield raw.rstrip(b"\n").decode("utf-8", errors="replace")
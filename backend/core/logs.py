@@ -0,0 +1,222 @@
+"""
+Logging setup for the backend.
+
+LOG_FORMAT=text (default) keeps the readable emoji narrative of every stage.
+LOG_FORMAT=json switches the narrative off and writes one JSON object per
+stage event instead (request received, routed, agent answered, request
+completed), each tagged with the request id.
+
+Either way, records go through a QueueHandler: the request path only
+enqueues the record, and a QueueListener thread formats it and writes it to
+stdout and a size-rotated log file. Message formatting is lazy (%-style
+arguments are only merged on the writer thread, and disabled levels are
+never formatted at all). LOG_SAMPLE_RATE keeps the INFO-level logs of only
+a fraction of requests; warnings and errors are always kept.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+EVENTS_LOGGER = "office.events"
+events_logger = logging.getLogger(EVENTS_LOGGER)
+
+_request_id = contextvars.ContextVar("request_id", default=None)
+_sampled = contextvars.ContextVar("log_sampled", default=True)
+_listener = None
+_configured = False
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_scope(request_id: Optional[str] = None, sample_rate: Optional[float] = None):
+    """Tag every log record inside the block with a request id and a sampling decision."""
+    if sample_rate is None:
+        sample_rate = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+    id_token = _request_id.set(request_id or uuid.uuid4().hex[:16])
+    sampled_token = _sampled.set(sample_rate >= 1.0 or random.random() < sample_rate)
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(id_token)
+        _sampled.reset(sampled_token)
+
+
+def log_event(event: str, level: int = logging.INFO, **fields):
+    """Emit one structured stage event, e.g. log_event("route.decided", agent="HR")."""
+    if level < logging.WARNING and not _sampled.get():
+        return
+    if events_logger.isEnabledFor(level):
+        events_logger.log(level, event, extra={"fields": fields})
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps the request id on each record and drops unsampled INFO/DEBUG records."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING and not _sampled.get():
+            return False
+        record.request_id = _request_id.get()
+        return True
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread. (The stock
+    prepare() merges the message arguments on the calling thread.) Records
+    whose arguments are not plain values are formatted here to be safe.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Traceback objects are not safe to hand to another thread
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if record.args and not all(isinstance(arg, (str, int, float, bool, type(None))) for arg in
+                                   (record.args if isinstance(record.args, tuple) else ())):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class TextFormatter(logging.Formatter):
+    """The classic format, plus key=value pairs for stage events."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        if getattr(record, "request_id", None) and record.name == EVENTS_LOGGER:
+            line += f" request_id={record.request_id}"
+        return line
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+def _handlers(formatter: logging.Formatter) -> list:
+    handlers = []
+    if os.getenv("LOG_STDOUT", "true").lower() == "true":
+        handlers.append(logging.StreamHandler(sys.stdout))
+    log_file = os.getenv("LOG_FILE", "supreme_agent.log")
+    if log_file:
+        handlers.append(logging.handlers.RotatingFileHandler(
+            log_file,
+            maxBytes=int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+            backupCount=int(os.getenv("LOG_BACKUP_COUNT", "5")),
+            encoding="utf-8",
+            delay=True,
+        ))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
+
+
+def configure_logging(force: bool = False):
+    """
+    Install the handlers described by the LOG_* environment variables on the
+    root logger. Safe to call more than once; force=True rebuilds them.
+    """
+    global _listener, _configured
+    if _configured and not force:
+        return
+    stop_logging()
+
+    json_mode = os.getenv("LOG_FORMAT", "text").lower() == "json"
+    level = getattr(logging, os.getenv("LOG_LEVEL", "INFO").upper(), logging.INFO)
+    handlers = _handlers(JsonFormatter() if json_mode else TextFormatter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    if os.getenv("LOG_ASYNC", "true").lower() == "true":
+        front = DeferredQueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(front.queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        front_handlers = [front]
+    else:
+        front_handlers = handlers
+    for handler in front_handlers:
+        handler.addFilter(RequestContextFilter())
+        root.addHandler(handler)
+
+    # JSON mode keeps only stage events and warnings; the narrative is never formatted
+    root.setLevel(max(level, logging.WARNING) if json_mode else level)
+    events_logger.setLevel(level)
+    _configured = True
+
+
+def stop_logging():
+    """Flush and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware: every HTTP request runs in a request_scope (reusing an
+    incoming X-Request-ID) and the id is echoed in the response headers.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        incoming = dict(scope["headers"]).get(b"x-request-id")
+        with request_scope(incoming.decode()[:64] if incoming else None) as request_id:
+            async def send_with_id(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", []).append((b"x-request-id", request_id.encode()))
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
+
+
+class Stopwatch:
+    """Milliseconds since creation, for stage event durations."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    @property
+    def ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 1)
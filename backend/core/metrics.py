@@ -0,0 +1,297 @@
+"""
+In-process metrics, exposed in the Prometheus text format on /metrics.
+
+The hot path only updates counters and cumulative histograms under a
+per-metric lock. Nothing is formatted until /metrics is scraped.
+
+- stage(name, agent) times one stage of a request (supervisor, graph node,
+  agent function, ...) into office_stage_seconds. Errors that escape it are
+  counted in office_errors_total. Inside a stage, LLM calls are attributed
+  to its agent.
+- core.clients attaches a callback to every chat model that records
+  per-call LLM latency, call counts, errors and the token counts from each
+  response's usage_metadata (prompt, completion and provider-cached).
+- MetricsMiddleware times every HTTP request by route template and status.
+
+METRICS_ENABLED=false turns the stages and the callback into no-ops.
+METRICS_TRACING=true also opens an OpenTelemetry span per stage. This
+needs the opentelemetry-api package and an SDK configured to export the
+spans.
+"""
+
+import bisect
+import contextvars
+import functools
+import inspect
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Iterable
+
+logger = logging.getLogger("Metrics")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+_agent = contextvars.ContextVar("metrics_agent", default="")
+
+
+class Histogram:
+    """Cumulative bucket counts, sum and count, like a Prometheus histogram."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list:
+        return list(itertools.accumulate(self.counts))
+
+    def snapshot(self) -> dict:
+        cumulative = self.cumulative()
+        buckets = {str(bound): cumulative[i] for i, bound in enumerate(self.buckets)}
+        buckets["+Inf"] = cumulative[-1]
+        return {"buckets": buckets, "count": self.count, "sum": round(self.sum, 6)}
+
+
+def _label_text(names, values) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Metric:
+    """A named counter or histogram with one series per combination of label values."""
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Iterable[str] = (), buckets=None):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else LATENCY_BUCKETS
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount: float = 1):
+        with self._lock:
+            self._series[labels] = self._series.get(labels, 0) + amount
+
+    def observe(self, value: float, *labels):
+        with self._lock:
+            histogram = self._series.get(labels)
+            if histogram is None:
+                histogram = self._series[labels] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def value(self, *labels):
+        """Current counter value, or the Histogram, of one series (for tests and benchmarks)."""
+        with self._lock:
+            return self._series.get(labels)
+
+    def series(self) -> dict:
+        """A copy of all series: label values -> counter value or Histogram."""
+        with self._lock:
+            return dict(self._series)
+
+    def render(self) -> list:
+        with self._lock:
+            series = [(labels, value if self.kind == "counter" else (value.cumulative(), value.sum, value.count))
+                      for labels, value in sorted(self._series.items())]
+        return render_series(self.name, self.help_text, self.kind, self.labelnames, series, self.buckets)
+
+
+def render_series(name, help_text, kind, labelnames, series, buckets=None) -> list:
+    """
+    Exposition lines for one metric. `series` holds (label values, value)
+    pairs; for histograms the value is (cumulative counts, sum, count).
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+    for labels, value in series:
+        label_text = _label_text(labelnames, labels)
+        if kind != "histogram":
+            lines.append(f"{name}{{{label_text}}} {_number(value)}" if label_text else f"{name} {_number(value)}")
+            continue
+        cumulative, total, count = value
+        prefix = f"{label_text}," if label_text else ""
+        for bound, observed in zip(list(buckets) + ["+Inf"], cumulative):
+            le = bound if bound == "+Inf" else _number(bound)
+            lines.append(f'{name}_bucket{{{prefix}le="{le}"}} {observed}')
+        suffix = f"{{{label_text}}}" if label_text else ""
+        lines.append(f"{name}_sum{suffix} {_number(total)}")
+        lines.append(f"{name}_count{suffix} {count}")
+    return lines
+
+
+REGISTRY = []
+
+
+def counter(name: str, help_text: str, labelnames: Iterable[str] = ()) -> Metric:
+    metric = Metric(name, help_text, "counter", labelnames)
+    REGISTRY.append(metric)
+    return metric
+
+
+def histogram(name: str, help_text: str, labelnames: Iterable[str] = (), buckets=None) -> Metric:
+    metric = Metric(name, help_text, "histogram", labelnames, buckets)
+    REGISTRY.append(metric)
+    return metric
+
+
+STAGE_SECONDS = histogram("office_stage_seconds", "Time spent in each stage of a request.", ("stage", "agent"))
+ERRORS = counter("office_errors_total", "Exceptions raised out of a stage or an LLM call.", ("stage", "error"))
+LLM_SECONDS = histogram("office_llm_seconds", "Latency of individual LLM calls.", ("agent", "model"))
+LLM_CALLS = counter("office_llm_calls_total", "LLM calls made.", ("agent", "model"))
+LLM_TOKENS = counter("office_llm_tokens_total", "Tokens reported in LLM usage metadata.", ("agent", "model", "kind"))
+LLM_HEDGES = counter("office_llm_hedges_total", "Hedged duplicate LLM requests, by whether the hedge won.",
+                     ("model", "outcome"))
+LLM_FALLBACKS = counter("office_llm_fallbacks_total", "Calls answered by the fallback model, by reason.",
+                        ("model", "fallback", "reason"))
+PROMPT_TRIMMED = counter("office_prompt_trimmed_total",
+                         "User messages cut to the input budget and history turns dropped for the prompt budget.",
+                         ("agent", "part"))
+ROUTING_DECISIONS = counter("office_routing_decisions_total", "Routing decisions by agent and source.",
+                            ("agent", "source"))
+COALESCED_REQUESTS = counter("office_coalesced_requests_total",
+                             "Calls that led an upstream call, joined one in flight, or left it abandoned.",
+                             ("scope", "role"))
+TIER_CALLS = counter("office_model_tier_calls_total",
+                     "Tiered LLM calls by agent and model, answered or escalated to the next tier.",
+                     ("agent", "model", "outcome"))
+CACHE_LOOKUPS = counter("office_response_cache_lookups_total", "Response cache outcomes per agent.",
+                        ("agent", "outcome"))
+HTTP_SECONDS = histogram("office_http_request_seconds", "HTTP request duration by route and status.",
+                         ("route", "method", "status"))
+
+
+def render(extra: Iterable[str] = ()) -> str:
+    """The whole registry (plus pre-rendered `extra` lines) in the Prometheus text format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(extra)
+    return "\n".join(lines) + "\n"
+
+
+def _tracer():
+    if os.getenv("METRICS_TRACING", "false").lower() != "true":
+        return None
+    try:
+        from opentelemetry import trace
+    except ImportError:
+        logger.warning("METRICS_TRACING=true but opentelemetry-api is not installed; spans are disabled")
+        return None
+    return trace.get_tracer("office.backend")
+
+
+_TRACER = _tracer()
+
+
+def current_agent() -> str:
+    return _agent.get()
+
+
+class stage:
+    """Time the block as one stage; LLM calls inside it are attributed to `agent`."""
+
+    __slots__ = ("name", "agent", "_start", "_token", "_span")
+
+    def __init__(self, name: str, agent: str = ""):
+        self.name = name
+        self.agent = agent
+
+    def __enter__(self):
+        self._start = None
+        if not METRICS_ENABLED:
+            return self
+        self._token = _agent.set(self.agent) if self.agent else None
+        self._span = _TRACER.start_as_current_span(self.name, attributes={"agent": self.agent}) if _TRACER else None
+        if self._span is not None:
+            self._span.__enter__()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._start is None:
+            return False
+        STAGE_SECONDS.observe(time.perf_counter() - self._start, self.name, self.agent)
+        if exc_type is not None and issubclass(exc_type, Exception):
+            ERRORS.inc(self.name, exc_type.__name__)
+        if self._span is not None:
+            self._span.__exit__(exc_type, exc, tb)
+        if self._token is not None:
+            _agent.reset(self._token)
+        return False
+
+
+def instrumented(stage_name: str, agent: str):
+    """Decorate a sync or async function so every call runs inside stage(stage_name, agent)."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with stage(stage_name, agent):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name, agent):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+class MetricsMiddleware:
+    """ASGI middleware: office_http_request_seconds by route template, method and status."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            HTTP_SECONDS.observe(time.perf_counter() - start, getattr(route, "path", "unmatched"),
+                                 scope["method"], status[0])
+
+
+def histogram_lines(name: str, help_text: str, labelname: str, histograms: dict, buckets) -> list:
+    """Exposition lines for Histogram objects kept elsewhere, keyed by one label value."""
+    series = [((key,), (h.cumulative(), h.sum, h.count)) for key, h in sorted(histograms.items())]
+    return render_series(name, help_text, "histogram", (labelname,), series, buckets)
+
+
+def gauge_lines(name: str, help_text: str, labelnames: Iterable[str], values: dict) -> list:
+    """Exposition lines for a gauge; `values` maps label value tuples to numbers."""
+    return render_series(name, help_text, "gauge", tuple(labelnames), sorted(values.items()))
+
+
+def counter_lines(name: str, help_text: str, labelnames: Iterable[str], values: dict) -> list:
+    """Exposition lines for counters kept elsewhere (e.g. a component's stats Counter)."""
+    return render_series(name, help_text, "counter", tuple(labelnames), sorted(values.items()))
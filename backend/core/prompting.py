@@ -0,0 +1,216 @@
+"""
+Prompt assembly: one static prefix per agent and a token budget per call.
+
+Providers cache the longest prompt prefix they have seen recently (OpenAI:
+prompts of 1024+ tokens, in 128-token steps) and prefill and bill cached
+tokens at a fraction of the cost. AgentPrompt builds an agent's system
+message once and always lays a call out as
+
+    system prompt (static) -> session summary -> history turns -> user message
+
+so all but the new user message repeats the previous turn of the same
+session byte for byte. Nothing per-request (dates, ids, notes) belongs in
+the system prompt.
+
+Tokens are counted with tiktoken when its encoding can be loaded
+(PROMPT_TOKENIZER=tiktoken, the default; offline hosts need the encoding
+in TIKTOKEN_CACHE_DIR) and with the 4-characters-per-token estimate
+otherwise. A user message over its budget (PROMPT_INPUT_TOKENS, or
+PROMPT_ROUTING_INPUT_TOKENS for the supervisor) is compressed first
+(trailing spaces, blank-line runs and repeated lines collapsed) and then
+cut in the middle, keeping its head and tail. If system + history + message
+still exceed PROMPT_MAX_TOKENS the oldest history turns are dropped.
+"""
+
+import functools
+import logging
+import os
+import re
+import threading
+from collections import Counter
+from typing import Optional
+
+from core import metrics
+from core.text import estimate_tokens
+
+logger = logging.getLogger("Prompting")
+
+PROMPT_TOKENIZER = os.getenv("PROMPT_TOKENIZER", "tiktoken").lower()
+TRUNCATION_MARKER = "\n\n[... {omitted} tokens omitted ...]\n\n"
+
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+_TRAILING_SPACE_RE = re.compile(r"[ \t]+\n")
+
+_encodings = {}
+_encoding_lock = threading.Lock()
+
+
+def _encoding(model: str):
+    """The tiktoken encoding for `model` (None when tiktoken or its files are unavailable)."""
+    if PROMPT_TOKENIZER != "tiktoken":
+        return None
+    with _encoding_lock:
+        if model not in _encodings:
+            try:
+                import tiktoken
+                try:
+                    _encodings[model] = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    _encodings[model] = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                logger.warning("⚠️  tiktoken unavailable for %s (%s), estimating tokens from length", model, e)
+                _encodings[model] = None
+        return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoding = _encoding(model)
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _within(text: str, budget: int, model: str) -> bool:
+    # Every token is at least one byte, so short texts need no tokenizer pass
+    return len(text.encode("utf-8")) <= budget or count_tokens(text, model) <= budget
+
+
+def compress_text(text: str) -> str:
+    """Lossless-enough shrinking: trailing spaces, blank-line runs and repeated lines collapsed."""
+    lines, previous, repeats = [], None, 0
+    for line in _TRAILING_SPACE_RE.sub("\n", text).split("\n"):
+        if line == previous and line.strip():
+            repeats += 1
+            continue
+        if repeats:
+            lines.append(f"[previous line repeated {repeats} more times]")
+        lines.append(line)
+        previous, repeats = line, 0
+    if repeats:
+        lines.append(f"[previous line repeated {repeats} more times]")
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def truncate_tokens(text: str, budget: int, model: str = "gpt-4o") -> str:
+    """Cut `text` to about `budget` tokens, keeping the first two thirds and the last third."""
+    encoding = _encoding(model)
+    if encoding is None:
+        total = estimate_tokens(text)
+        if total <= budget:
+            return text
+        head, tail = budget * 2 // 3, budget // 3
+        return text[:head * 4] + TRUNCATION_MARKER.format(omitted=total - budget) + text[len(text) - tail * 4:]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= budget:
+        return text
+    head, tail = budget * 2 // 3, budget // 3
+    return (encoding.decode(tokens[:head]) + TRUNCATION_MARKER.format(omitted=len(tokens) - budget)
+            + encoding.decode(tokens[len(tokens) - tail:]))
+
+
+class AgentPrompt:
+    """The static system prefix of one agent and the budgets its calls are fitted to."""
+
+    def __init__(self, agent: str, system: str, model: str = "gpt-4o", input_tokens: int = 4000,
+                 max_tokens: int = 8000):
+        from langchain_core.messages import SystemMessage
+
+        self.agent = agent
+        self.model = model
+        self.input_tokens = input_tokens
+        self.max_tokens = max_tokens
+        self.system_message = SystemMessage(content=system)
+        self.prefix_tokens = count_tokens(system, model)
+        self.stats = Counter()
+        _prompts[agent] = self
+
+    @functools.cached_property
+    def template(self):
+        """ChatPromptTemplate for tool-calling agents, built once (the system prompt is not templated)."""
+        from langchain_core.prompts import ChatPromptTemplate
+
+        return ChatPromptTemplate.from_messages([
+            self.system_message,
+            ("placeholder", "{chat_history}"),
+            ("human", "{input}"),
+            ("placeholder", "{agent_scratchpad}"),
+        ])
+
+    def fit_input(self, text: str) -> str:
+        """The user message, compressed and cut to the input budget if it is over it."""
+        self.stats["calls"] += 1
+        if not self.input_tokens or _within(text, self.input_tokens, self.model):
+            return text
+        fitted = compress_text(text)
+        if not _within(fitted, self.input_tokens, self.model):
+            fitted = truncate_tokens(fitted, self.input_tokens, self.model)
+        self.stats["trimmed_inputs"] += 1
+        self.stats["input_tokens_saved"] += count_tokens(text, self.model) - count_tokens(fitted, self.model)
+        metrics.PROMPT_TRIMMED.inc(self.agent, "input")
+        logger.info("✂️  %s input trimmed to the %d-token budget (%d chars → %d)",
+                    self.agent, self.input_tokens, len(text), len(fitted))
+        return fitted
+
+    def fit_history(self, history: list, input_text: str) -> list:
+        """Drop the oldest turns (the summary stays) while the whole prompt is over max_tokens."""
+        if not self.max_tokens or not history:
+            return history
+        budget = self.max_tokens - self.prefix_tokens - count_tokens(input_text, self.model)
+        if sum(len(message.content.encode("utf-8")) for message in history) <= budget:
+            return history
+        sizes = [count_tokens(message.content, self.model) for message in history]
+        summary = 1 if history[0].type == "system" else 0
+        first = summary
+        while first < len(history) and sum(sizes[:summary]) + sum(sizes[first:]) > budget:
+            first += 1
+        if first == summary:
+            return history
+        self.stats["dropped_turns"] += first - summary
+        metrics.PROMPT_TRIMMED.inc(self.agent, "history", amount=first - summary)
+        return history[:summary] + history[first:]
+
+    def context_messages(self, context: str) -> list:
+        """Retrieved documents as a system message after the history, so the cached prefix stays intact."""
+        from langchain_core.messages import SystemMessage
+
+        return [SystemMessage(content=context)] if context else []
+
+    def messages(self, query: str, history: Optional[list] = None, context: str = "") -> list:
+        """[system prefix, *session history, retrieved context, user message], fitted to the budgets."""
+        from langchain_core.messages import HumanMessage
+
+        if history is None:
+            from core.sessions import history_messages
+            history = history_messages()
+        query = self.fit_input(query)
+        return [self.system_message, *self.fit_history(history, context + query), *self.context_messages(context),
+                HumanMessage(content=query)]
+
+    def snapshot(self) -> dict:
+        return {"prefix_tokens": self.prefix_tokens, "input_tokens": self.input_tokens,
+                "max_tokens": self.max_tokens, **self.stats}
+
+
+_prompts = {}
+
+
+def agent_prompt(agent: str, system: str, model: str = "gpt-4o", routing: bool = False) -> AgentPrompt:
+    """An AgentPrompt with the PROMPT_* budgets (PROMPT_ROUTING_INPUT_TOKENS when `routing`)."""
+    input_tokens = (int(os.getenv("PROMPT_ROUTING_INPUT_TOKENS", "512")) if routing
+                    else int(os.getenv("PROMPT_INPUT_TOKENS", "4000")))
+    return AgentPrompt(agent, system, model, input_tokens, int(os.getenv("PROMPT_MAX_TOKENS", "8000")))
+
+
+def prompt_stats() -> dict:
+    """Per-agent prefix size, trimming counters and the share of prompt tokens the provider served from cache."""
+    tokens = Counter()
+    for (agent, _model, kind), value in metrics.LLM_TOKENS.series().items():
+        tokens[agent, kind] += value
+    agents = {}
+    for agent in sorted(set(_prompts) | {agent for agent, _kind in tokens}):
+        stats = _prompts[agent].snapshot() if agent in _prompts else {}
+        prompt, cached = tokens[agent, "prompt"], tokens[agent, "cached"]
+        stats.update(prompt_tokens=prompt, cached_tokens=cached,
+                     cached_ratio=round(cached / prompt, 4) if prompt else 0.0)
+        agents[agent] = stats
+    return {"tokenizer": PROMPT_TOKENIZER, "agents": agents}
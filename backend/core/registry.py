@@ -0,0 +1,93 @@
+"""
+Lazy registry of the office agents and the supreme graph.
+
+Importing an agent module pulls in LangChain, builds its ChatOpenAI client and
+checks OPENAI_API_KEY; importing supreme.supreme also compiles the graph.
+Nothing here imports them until they are first used, so the web app can start
+(and answer /health) without paying for any of it. preload() warms everything
+up ahead of the first request.
+"""
+
+import asyncio
+import importlib
+import logging
+
+logger = logging.getLogger("AgentRegistry")
+
+# label -> (module, sync runner, async runner)
+AGENTS = {
+    "HR": ("agents.hr", "run_hr", "arun_hr"),
+    "CEO": ("agents.ceo", "run_ceo", "arun_ceo"),
+    "Developer": ("agents.developer", "run_developer", "arun_developer"),
+}
+
+SUPREME_MODULE = "supreme.supreme"
+BATCH_MODULE = "supreme.batch"
+
+# Modules whose import has fully finished (sys.modules also holds half-imported ones)
+_ready = set()
+
+
+def _import(module_name: str):
+    module = importlib.import_module(module_name)
+    _ready.add(module_name)
+    return module
+
+
+def agent_label(name: str):
+    """Map a case-insensitive agent name to its registry label (None if unknown)."""
+    return next((label for label in AGENTS if label.upper() == name.upper()), None)
+
+
+def get_agent_runner(label: str, asynchronous: bool = True):
+    """Return run_<agent> (or arun_<agent>), importing the agent on first use."""
+    module_name, sync_name, async_name = AGENTS[label]
+    module = _import(module_name)
+    return getattr(module, async_name if asynchronous else sync_name)
+
+
+def get_supreme():
+    """The supreme.supreme module, with its graph compiled on first use."""
+    return _import(SUPREME_MODULE)
+
+
+def get_batch():
+    """The supreme.batch module (loads the supreme graph too)."""
+    return _import(BATCH_MODULE)
+
+
+async def aget_agent_runner(label: str, asynchronous: bool = True):
+    """get_agent_runner for async callers: a cold import runs off the event loop."""
+    if is_loaded(AGENTS[label][0]):
+        return get_agent_runner(label, asynchronous)
+    return await asyncio.to_thread(get_agent_runner, label, asynchronous)
+
+
+async def aget_supreme():
+    if is_loaded(SUPREME_MODULE):
+        return get_supreme()
+    return await asyncio.to_thread(get_supreme)
+
+
+async def aget_batch():
+    if is_loaded(BATCH_MODULE):
+        return get_batch()
+    return await asyncio.to_thread(get_batch)
+
+
+def is_loaded(module_name: str) -> bool:
+    return module_name in _ready
+
+
+def loaded_components() -> dict:
+    components = {label: is_loaded(module) for label, (module, _, _) in AGENTS.items()}
+    components["Supreme"] = is_loaded(SUPREME_MODULE)
+    return components
+
+
+def preload():
+    """Import every agent and compile the supreme graph."""
+    for label in AGENTS:
+        get_agent_runner(label)
+    get_supreme()
+    logger.info("Agents and supreme graph preloaded")
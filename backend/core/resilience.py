@@ -0,0 +1,500 @@
+"""
+Resilient LLM calls: deadlines, hedged requests, circuit breakers and fallback.
+
+Every chat model call in the backend goes through call_llm() / acall_llm():
+- The request deadline set by the HTTP layer (core.scheduler.request_context)
+  bounds the whole call, the OpenAI client's own retries included; when it
+  passes without an answer the call raises DeadlineExceeded (HTTP 504).
+- If no answer has arrived after the model's recent p95 latency, a duplicate
+  request is sent and the first answer wins (the other is cancelled). Hedges
+  are capped at LLM_HEDGE_MAX_RATIO of the calls, so a slow provider never
+  sees double the load.
+- Each model has a circuit breaker: after LLM_BREAKER_FAILURES consecutive
+  failures or timeouts it is skipped for LLM_BREAKER_COOLDOWN seconds, then
+  one probe call decides whether to close it again.
+- A cheaper, faster model (LLM_FALLBACK_MODEL) answers when the breaker is
+  open, when the primary fails or times out, and straight away when the time
+  left is below the primary's p95 latency. Fallback answers are not cached.
+
+Streamed calls (made inside streaming(), where the caller relays the
+model's tokens as they arrive) are not hedged and only fall back before the
+primary starts, so a client never sees two answers
+interleaved. Sync calls run their attempts on a small thread pool; a losing
+sync attempt cannot be cancelled and finishes in the background.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from concurrent import futures
+from contextlib import contextmanager
+from typing import Optional
+
+from core.metrics import LLM_FALLBACKS, LLM_HEDGES
+from core.scheduler import Overloaded, current_deadline
+
+logger = logging.getLogger("LLMResilience")
+
+LATENCY_WINDOW = 256  # recent calls per model used for the hedge delay
+HEDGE_CREDIT_CAP = 5.0
+
+_fallbacks = contextvars.ContextVar("llm_fallbacks", default=None)
+_streaming = contextvars.ContextVar("llm_streaming", default=False)
+
+
+class DeadlineExceeded(TimeoutError):
+    """No model answered before the request deadline; maps to HTTP 504."""
+
+    status_code = 504
+
+    def __init__(self, model: str, waited: float):
+        self.model = model
+        super().__init__(f"{model} did not answer within the request deadline ({waited:.1f}s)")
+
+
+class CircuitOpen(Overloaded):
+    """The model's breaker is open and there is no fallback; a 503 with Retry-After."""
+
+    def __init__(self, model: str, retry_after: float):
+        super().__init__(model, "circuit open", retry_after)
+
+
+def _status(error: Exception) -> Optional[int]:
+    return getattr(error, "status_code", None)
+
+
+def _should_fall_back(error: Exception) -> bool:
+    """Server errors, timeouts and rate limits; not requests the provider rejected as invalid."""
+    status = _status(error)
+    return status is None or status >= 500 or status in (408, 409, 429)
+
+
+def is_streaming() -> bool:
+    """True inside streaming(): the caller relays the model's tokens as they arrive."""
+    return _streaming.get()
+
+
+@contextmanager
+def streaming():
+    """Mark the calls made inside the block as streamed (no hedges, no fallback once started)."""
+    token = _streaming.set(True)
+    try:
+        yield
+    finally:
+        _streaming.reset(token)
+
+
+async def relay(events):
+    """Iterate an astream_events() iterator with the calls it makes marked as streamed."""
+    with streaming():
+        async for event in events:
+            yield event
+
+
+@contextmanager
+def watch_fallbacks():
+    """Collect the fallback models that answered calls made inside the block."""
+    used = []
+    token = _fallbacks.set(used)
+    try:
+        yield used
+    finally:
+        _fallbacks.reset(token)
+
+
+class CircuitBreaker:
+    """Closed -> open after `failures` consecutive failures -> half open (one probe) after `cooldown`."""
+
+    def __init__(self, failures: int = 5, cooldown: float = 30.0):
+        self.threshold = failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started = None
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if time.monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            # One probe at a time; a probe that never reported back expires after a cooldown
+            probing = self.probe_started is not None and now - self.probe_started < self.cooldown
+            if probing or now - self.opened_at < self.cooldown:
+                self.stats["rejected"] += 1
+                return False
+            self.probe_started = now
+            return True
+
+    def retry_after(self) -> float:
+        if self.opened_at is None:
+            return 0.0
+        return max(1.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started = None
+
+    def record_failure(self) -> bool:
+        """Count a failure; True if it opened the circuit."""
+        with self._lock:
+            self.failures += 1
+            if self.probe_started is not None or (self.opened_at is None and self.failures >= self.threshold):
+                self.opened_at = time.monotonic()
+                self.probe_started = None
+                self.stats["opened"] += 1
+                return True
+            return False
+
+
+class ModelHealth:
+    """Recent latencies, hedge budget and circuit breaker of one model."""
+
+    def __init__(self, model: str, breaker: CircuitBreaker, hedge_ratio: float):
+        self.model = model
+        self.breaker = breaker
+        self.hedge_ratio = hedge_ratio
+        self.hedge_credits = 0.0
+        self.stats = Counter()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._lock = threading.Lock()
+
+    def quantile(self, q: float, min_samples: int = 1) -> Optional[float]:
+        with self._lock:
+            if len(self._latencies) < max(1, min_samples):
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def started(self):
+        with self._lock:
+            self.stats["calls"] += 1
+            self.hedge_credits = min(HEDGE_CREDIT_CAP, self.hedge_credits + self.hedge_ratio)
+
+    def take_hedge(self) -> bool:
+        with self._lock:
+            if self.hedge_credits < 1:
+                self.stats["hedges_skipped"] += 1
+                return False
+            self.hedge_credits -= 1
+            self.stats["hedges"] += 1
+            return True
+
+    def succeeded(self, seconds: float):
+        with self._lock:
+            self._latencies.append(seconds)
+        self.breaker.record_success()
+
+    def failed(self, error: Exception, seconds: float):
+        with self._lock:
+            self.stats["timeouts" if isinstance(error, DeadlineExceeded) else "errors"] += 1
+            if isinstance(error, DeadlineExceeded):
+                # At least this slow: keep the tail in the window
+                self._latencies.append(seconds)
+        if _should_fall_back(error) and self.breaker.record_failure():
+            logger.warning("🔌 Circuit for %s opened after %d failures (%s)", self.model, self.breaker.failures,
+                           type(error).__name__)
+
+    def snapshot(self) -> dict:
+        p50, p95 = self.quantile(0.5), self.quantile(0.95)
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            **stats,
+            "p50": round(p50, 4) if p50 is not None else None,
+            "p95": round(p95, 4) if p95 is not None else None,
+            "circuit": self.breaker.state,
+            "circuit_opened": self.breaker.stats["opened"],
+            "circuit_rejected": self.breaker.stats["rejected"],
+        }
+
+
+class _Race:
+    """Bookkeeping of one primary attempt and its optional hedge, shared by the sync and async loops."""
+
+    def __init__(self, health: ModelHealth, budget: float, hedge_delay: Optional[float]):
+        self.health = health
+        self.start = time.monotonic()
+        self.end = self.start + budget
+        self.hedge_delay = hedge_delay
+        self.hedge = None
+        self.error = None
+
+    def timeout(self) -> float:
+        now = time.monotonic()
+        timeout = self.end - now
+        if self.hedge is None and self.hedge_delay is not None:
+            timeout = min(timeout, self.start + self.hedge_delay - now)
+        return max(0.0, timeout)
+
+    def hedge_due(self) -> bool:
+        if self.hedge is not None or self.hedge_delay is None or time.monotonic() < self.start + self.hedge_delay:
+            return False
+        if not self.health.take_hedge():
+            self.hedge_delay = None  # out of hedge budget: just wait for the first attempt
+            return False
+        return True
+
+    def settle(self, done, pending) -> tuple:
+        """(True, answer) once an attempt succeeds, (False, None) to keep waiting; raises when all is lost."""
+        elapsed = time.monotonic() - self.start
+        for attempt in done:
+            error = attempt.exception()
+            if error is None:
+                self.health.succeeded(elapsed)
+                if self.hedge is not None:
+                    LLM_HEDGES.inc(self.health.model, "won" if attempt is self.hedge else "lost")
+                return True, attempt.result()
+            self.error = error
+        if not pending:
+            self.health.failed(self.error, elapsed)
+            raise self.error
+        if time.monotonic() >= self.end:
+            error = DeadlineExceeded(self.health.model, elapsed)
+            self.health.failed(error, elapsed)
+            raise error
+        return False, None
+
+
+def _with_tools(llm, tools):
+    """The client with `tools` bound (each attempt, fallback included, gets the same tools)."""
+    return llm.bind_tools(tools) if tools else llm
+
+
+def _detached(kwargs: dict) -> dict:
+    """Call kwargs for a hedge: no parent callbacks, so its tokens never reach a stream."""
+    config = dict(kwargs.get("config") or {}, callbacks=[])
+    return {**kwargs, "config": config}
+
+
+class Resilience:
+    """Per-model health, fallback clients and the call loops."""
+
+    def __init__(self, hedging: bool = True, hedge_quantile: float = 0.95, hedge_min_samples: int = 20,
+                 hedge_min_delay: float = 0.05, hedge_max_ratio: float = 0.1, breaker_failures: int = 5,
+                 breaker_cooldown: float = 30.0, fallback_model: Optional[str] = "gpt-4o-mini",
+                 fallback_reserve: float = 2.0, timeout: float = 60.0, sync_workers: int = 32):
+        self.hedging = hedging
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.hedge_max_ratio = hedge_max_ratio
+        self.breaker_failures = breaker_failures
+        self.breaker_cooldown = breaker_cooldown
+        self.fallback_model = fallback_model or None
+        self.fallback_reserve = fallback_reserve
+        self.timeout = timeout
+        self.models = {}
+        self._fallback_clients = {}
+        self._pool = futures.ThreadPoolExecutor(max_workers=sync_workers, thread_name_prefix="llm-call")
+        self._lock = threading.Lock()
+
+    def health(self, model: str) -> ModelHealth:
+        with self._lock:
+            if model not in self.models:
+                breaker = CircuitBreaker(self.breaker_failures, self.breaker_cooldown)
+                self.models[model] = ModelHealth(model, breaker, self.hedge_max_ratio if self.hedging else 0.0)
+            return self.models[model]
+
+    def fallback_for(self, llm):
+        """
+        A client for the fallback model with the caller's temperature and
+        output cap (None if it is the same model), so a capped caller such as
+        the supervisor stays capped when it falls back.
+        """
+        if self.fallback_model is None or llm.model_name == self.fallback_model:
+            return None
+        key = (llm.temperature, llm.max_tokens)
+        with self._lock:
+            if key not in self._fallback_clients:
+                from core.clients import chat_model
+                self._fallback_clients[key] = chat_model(model=self.fallback_model, temperature=llm.temperature,
+                                                         max_tokens=llm.max_tokens)
+            return self._fallback_clients[key]
+
+    def _remaining(self) -> Optional[float]:
+        deadline = current_deadline()
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _skip_primary(self, health: ModelHealth, fallback) -> Optional[str]:
+        """Why the primary should not be tried at all ("deadline", "circuit_open"), or None."""
+        remaining = self._remaining()
+        if fallback is not None and remaining is not None:
+            p95 = health.quantile(0.95, self.hedge_min_samples)
+            if p95 is not None and p95 > remaining:
+                return "deadline"
+        if not health.breaker.allow():
+            if fallback is None:
+                raise CircuitOpen(health.model, health.breaker.retry_after())
+            return "circuit_open"
+        return None
+
+    def _budget(self, model: str, reserve: float = 0.0) -> float:
+        remaining = self._remaining()
+        if remaining is None:
+            return self.timeout
+        if remaining <= 0:
+            raise DeadlineExceeded(model, 0.0)
+        # Keep time for the fallback, but never less than half of what is left
+        return min(self.timeout, max(remaining - reserve, remaining / 2))
+
+    def _hedge_delay(self, health: ModelHealth, hedge: bool) -> Optional[float]:
+        if not (hedge and self.hedging):
+            return None
+        delay = health.quantile(self.hedge_quantile, self.hedge_min_samples)
+        return None if delay is None else max(delay, self.hedge_min_delay)
+
+    def _note_fallback(self, llm, fallback, reason: str):
+        LLM_FALLBACKS.inc(llm.model_name, fallback.model_name, reason)
+        logger.warning("🪂 %s → %s (%s)", llm.model_name, fallback.model_name, reason)
+        used = _fallbacks.get()
+        if used is not None:
+            used.append(fallback.model_name)
+
+    async def _acall(self, llm, messages, kwargs, budget: float, hedge: bool, tools=None):
+        health = self.health(llm.model_name)
+        health.started()
+        race = _Race(health, budget, self._hedge_delay(health, hedge))
+        llm = _with_tools(llm, tools)
+        pending = {asyncio.ensure_future(llm.ainvoke(messages, **kwargs))}
+        try:
+            while True:
+                done, pending = await asyncio.wait(pending, timeout=race.timeout(),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                finished, answer = race.settle(done, pending)
+                if finished:
+                    return answer
+                if race.hedge_due():
+                    race.hedge = asyncio.ensure_future(llm.ainvoke(messages, **_detached(kwargs)))
+                    pending.add(race.hedge)
+        finally:
+            for attempt in pending:
+                attempt.cancel()
+
+    def _call(self, llm, messages, kwargs, budget: float, hedge: bool, tools=None):
+        health = self.health(llm.model_name)
+        health.started()
+        race = _Race(health, budget, self._hedge_delay(health, hedge))
+        llm = _with_tools(llm, tools)
+        pending = {self._pool.submit(contextvars.copy_context().run, llm.invoke, messages, **kwargs)}
+        while True:
+            done, pending = futures.wait(pending, timeout=race.timeout(), return_when=futures.FIRST_COMPLETED)
+            finished, answer = race.settle(done, pending)
+            if finished:
+                return answer
+            if race.hedge_due():
+                race.hedge = self._pool.submit(contextvars.copy_context().run, llm.invoke, messages,
+                                               **_detached(kwargs))
+                pending.add(race.hedge)
+
+    async def ainvoke(self, llm, messages, tools=None, **kwargs):
+        fallback = self.fallback_for(llm)
+        streaming = is_streaming()
+        budget = self._budget(llm.model_name, self.fallback_reserve if fallback is not None else 0.0)
+        reason = self._skip_primary(self.health(llm.model_name), fallback)
+        if reason is None:
+            try:
+                return await self._acall(llm, messages, kwargs, budget, not streaming, tools)
+            except Exception as e:
+                if fallback is None or streaming or not _should_fall_back(e):
+                    raise
+                reason = "timeout" if isinstance(e, DeadlineExceeded) else "error"
+        self._note_fallback(llm, fallback, reason)
+        return await self._acall(fallback, messages, kwargs, self._budget(fallback.model_name), False, tools)
+
+    def invoke(self, llm, messages, tools=None, **kwargs):
+        fallback = self.fallback_for(llm)
+        streaming = is_streaming()
+        budget = self._budget(llm.model_name, self.fallback_reserve if fallback is not None else 0.0)
+        reason = self._skip_primary(self.health(llm.model_name), fallback)
+        if reason is None:
+            try:
+                return self._call(llm, messages, kwargs, budget, not streaming, tools)
+            except Exception as e:
+                if fallback is None or streaming or not _should_fall_back(e):
+                    raise
+                reason = "timeout" if isinstance(e, DeadlineExceeded) else "error"
+        self._note_fallback(llm, fallback, reason)
+        return self._call(fallback, messages, kwargs, self._budget(fallback.model_name), False, tools)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            models = dict(self.models)
+        return {
+            "hedging": self.hedging,
+            "fallback_model": self.fallback_model,
+            "models": {model: health.snapshot() for model, health in models.items()},
+        }
+
+
+def build_resilience() -> Optional[Resilience]:
+    """Create the call layer from LLM_* environment variables (None when LLM_RESILIENCE=false)."""
+    if os.getenv("LLM_RESILIENCE", "true").lower() != "true":
+        return None
+    return Resilience(
+        hedging=os.getenv("LLM_HEDGING", "true").lower() == "true",
+        hedge_quantile=float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")),
+        hedge_min_samples=int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20")),
+        hedge_min_delay=float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.05")),
+        hedge_max_ratio=float(os.getenv("LLM_HEDGE_MAX_RATIO", "0.1")),
+        breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+        breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", "30")),
+        fallback_model=os.getenv("LLM_FALLBACK_MODEL", "gpt-4o-mini"),
+        fallback_reserve=float(os.getenv("LLM_FALLBACK_RESERVE_SECONDS", "2")),
+        timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+    )
+
+
+_resilience = None
+_resilience_built = False
+_resilience_lock = threading.Lock()
+
+
+def get_resilience() -> Optional[Resilience]:
+    """The process-wide call layer (None when disabled), built on first use."""
+    global _resilience, _resilience_built
+    with _resilience_lock:
+        if not _resilience_built:
+            _resilience = build_resilience()
+            _resilience_built = True
+        return _resilience
+
+
+def set_resilience(resilience: Optional[Resilience]):
+    """Replace the process-wide call layer (benchmarks use this to switch settings)."""
+    global _resilience, _resilience_built
+    with _resilience_lock:
+        _resilience = resilience
+        _resilience_built = True
+
+
+def call_llm(llm, messages, tools=None, **kwargs):
+    """
+    llm.invoke(messages) under the request deadline, with hedging, circuit
+    breaking and fallback; `tools` are bound to whichever model answers.
+    """
+    resilience = get_resilience()
+    if resilience is None:
+        return _with_tools(llm, tools).invoke(messages, **kwargs)
+    return resilience.invoke(llm, messages, tools, **kwargs)
+
+
+async def acall_llm(llm, messages, tools=None, **kwargs):
+    """Async counterpart of call_llm."""
+    resilience = get_resilience()
+    if resilience is None:
+        return await _with_tools(llm, tools).ainvoke(messages, **kwargs)
+    return await resilience.ainvoke(llm, messages, tools, **kwargs)
@@ -0,0 +1,529 @@
+"""
+Admission control for LLM calls.
+
+Every agent call (and every supervisor / combined-mode call) runs inside a
+slot of its lane. A lane is a per-agent concurrency limit with a bounded,
+priority-ordered wait queue in front of it. Calls also draw from the token
+buckets of the model they use: provider rate limits are per model, so all
+lanes on gpt-4o share one requests-per-minute and one tokens-per-minute
+budget.
+
+Work that cannot be served in time is shed instead of piling up:
+- a full queue, or an expected wait beyond the request deadline -> 503
+- a rate-limit wait beyond the request deadline -> 429
+Both raise Overloaded, carrying a Retry-After estimate for the HTTP layer.
+
+Queue depth on arrival and time spent waiting are recorded per lane as
+cumulative histograms (Prometheus style). Settings come from SCHEDULER_*
+environment variables, read when the scheduler is first used.
+"""
+
+import asyncio
+import contextvars
+import functools
+import heapq
+import inspect
+import itertools
+import math
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from typing import Optional
+
+from core.metrics import Histogram
+from core.sessions import history_texts
+from core.text import estimate_tokens
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+WAIT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+DEPTH_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+_priority = contextvars.ContextVar("scheduler_priority", default="normal")
+_deadline = contextvars.ContextVar("scheduler_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """A call was shed instead of queued; maps to an HTTP status with Retry-After."""
+
+    def __init__(self, lane: str, reason: str, retry_after: float, status_code: int = 503):
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.status_code = status_code
+        super().__init__(f"{lane} is overloaded ({reason}), retry after {self.retry_after}s")
+
+
+@contextmanager
+def request_context(priority: Optional[str] = None, deadline_seconds: Optional[float] = None):
+    """
+    Set the priority and deadline of every scheduled call made inside the
+    block (including graph nodes and tasks it spawns).
+    """
+    if deadline_seconds is None:
+        deadline_seconds = float(os.getenv("SCHEDULER_DEADLINE_SECONDS", "30"))
+    priority_token = _priority.set(priority or "normal")
+    deadline_token = _deadline.set(time.monotonic() + deadline_seconds if deadline_seconds > 0 else None)
+    try:
+        yield
+    finally:
+        _priority.reset(priority_token)
+        _deadline.reset(deadline_token)
+
+
+def current_deadline() -> Optional[float]:
+    """time.monotonic() deadline of the current request, or None."""
+    return _deadline.get()
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units per minute, holding at most one minute's worth.
+    take() may push the level below zero: the debt is a reservation that later
+    callers wait out, which keeps admission first come, first served.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60.0
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # A single call larger than the whole bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + min(amount, self.capacity))
+
+
+class ModelLimiter:
+    """Requests-per-minute and tokens-per-minute budgets of one model."""
+
+    def __init__(self, model: str, rpm: float = 0, tpm: float = 0):
+        self.model = model
+        self.requests = TokenBucket(rpm) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm) if tpm > 0 else None
+        self.paused_until = 0.0
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int, lane: str, deadline: Optional[float]) -> float:
+        """Reserve budget for one call and return how long to wait before sending it."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.paused_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.delay(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.delay(tokens, now))
+            if deadline is not None and now + wait > deadline:
+                self.stats["shed"] += 1
+                raise Overloaded(lane, f"{self.model} rate limit", wait, status_code=429)
+            if self.requests:
+                self.requests.take(1)
+            if self.tokens:
+                self.tokens.take(tokens)
+            if wait > 0:
+                self.stats["throttled"] += 1
+            return wait
+
+    def refund(self, tokens: int):
+        """Give back a reservation whose call was never sent."""
+        with self._lock:
+            if self.requests:
+                self.requests.refund(1)
+            if self.tokens:
+                self.tokens.refund(tokens)
+
+    def pause(self, seconds: float):
+        """The provider answered 429: hold every call to this model for a while."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.stats["provider_429"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            stats = dict(self.stats)
+            if self.requests:
+                self.requests._refill(now)
+                stats["requests_available"] = round(self.requests.level, 2)
+            if self.tokens:
+                self.tokens._refill(now)
+                stats["tokens_available"] = round(self.tokens.level, 2)
+            stats["paused_for"] = round(max(0.0, self.paused_until - now), 3)
+            return stats
+
+
+class _Waiter:
+    """A queued call; woken from whichever thread releases a slot."""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.granted = False
+        self._loop = loop
+        self._future = loop.create_future() if loop else None
+        self._event = None if loop else threading.Event()
+
+    def grant(self):
+        self.granted = True
+        if self._future is None:
+            self._event.set()
+        else:
+            self._loop.call_soon_threadsafe(_resolve, self._future)
+
+    def wait(self, timeout: Optional[float]):
+        self._event.wait(timeout)
+
+    async def await_grant(self, timeout: Optional[float]):
+        await asyncio.wait({self._future}, timeout=timeout)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class Lane:
+    """Concurrency limit of one agent with a bounded priority queue in front."""
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, service_time: float = 2.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.in_flight = 0
+        # Moving average of how long a call holds its slot, for wait estimates
+        self.service_time = service_time
+        self.stats = Counter()
+        self.queue_depth = Histogram(DEPTH_BUCKETS)
+        self.wait_seconds = Histogram(WAIT_BUCKETS)
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def expected_wait(self, queued: int) -> float:
+        return (queued // self.max_concurrency + 1) * self.service_time
+
+    def _admit(self, priority: str, deadline: Optional[float], loop=None) -> Optional[_Waiter]:
+        """Take a slot now (None) or queue up (a waiter); raise Overloaded to shed."""
+        with self._lock:
+            queued = len(self._waiters)
+            self.queue_depth.observe(queued)
+            if self.in_flight < self.max_concurrency and not queued:
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                return None
+
+            expected = self.expected_wait(queued)
+            # Low priority work only gets half the queue, so it is shed first
+            limit = self.max_queue // 2 if priority == "low" else self.max_queue
+            if queued >= limit:
+                self.stats["shed_queue_full"] += 1
+                raise Overloaded(self.name, "queue full", expected)
+            if deadline is not None and time.monotonic() + expected > deadline:
+                self.stats["shed_deadline"] += 1
+                raise Overloaded(self.name, "deadline", expected)
+
+            waiter = _Waiter(loop)
+            heapq.heappush(self._waiters, (PRIORITIES.get(priority, 1), next(self._sequence), waiter))
+            self.stats["enqueued"] += 1
+            return waiter
+
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Drop a waiter that gave up; True if it had been granted a slot meanwhile."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+            heapq.heapify(self._waiters)
+            return False
+
+    def _timed_out(self, waiter: _Waiter):
+        if self._abandon(waiter):
+            return
+        with self._lock:
+            self.stats["shed_deadline"] += 1
+            expected = self.expected_wait(len(self._waiters))
+        raise Overloaded(self.name, "deadline", expected)
+
+    def release(self, held_for: float):
+        with self._lock:
+            self.service_time = 0.8 * self.service_time + 0.2 * held_for
+            self.in_flight -= 1
+            if self._waiters and self.in_flight < self.max_concurrency:
+                _, _, waiter = heapq.heappop(self._waiters)
+                self.in_flight += 1
+                self.stats["admitted"] += 1
+                waiter.grant()
+
+    def acquire(self, priority: str, deadline: Optional[float]):
+        waiter = self._admit(priority, deadline)
+        if waiter is not None:
+            waiter.wait(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            if not waiter.granted:
+                self._timed_out(waiter)
+
+    async def aacquire(self, priority: str, deadline: Optional[float]):
+        waiter = self._admit(priority, deadline, asyncio.get_running_loop())
+        if waiter is None:
+            return
+        try:
+            await waiter.await_grant(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        except asyncio.CancelledError:
+            # e.g. a losing speculative branch: hand on a slot granted in the meantime
+            if self._abandon(waiter):
+                self.release(0.0)
+            raise
+        if not waiter.granted:
+            self._timed_out(waiter)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": len(self._waiters),
+                "service_time": round(self.service_time, 4),
+                **dict(self.stats),
+                "queue_depth": self.queue_depth.snapshot(),
+                "wait_seconds": self.wait_seconds.snapshot(),
+            }
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Seconds to back off if `error` is a provider 429 (openai.RateLimitError)."""
+    if getattr(error, "status_code", None) != 429:
+        return None
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after", "1"))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
+
+
+class Scheduler:
+    """Lanes by agent name and rate limiters by model, created on first use."""
+
+    def __init__(self, max_concurrency: int = 64, max_queue: int = 256, rpm: float = 0, tpm: float = 0,
+                 completion_tokens: int = 512, service_time: float = 2.0):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.rpm = rpm
+        self.tpm = tpm
+        self.completion_tokens = completion_tokens
+        self.service_time = service_time
+        self.lanes = {}
+        self.limiters = {}
+        self._lock = threading.Lock()
+
+    def lane(self, name: str) -> Lane:
+        with self._lock:
+            if name not in self.lanes:
+                prefix = f"SCHEDULER_{name.upper()}_"
+                self.lanes[name] = Lane(
+                    name,
+                    max_concurrency=int(os.getenv(prefix + "MAX_CONCURRENCY", self.max_concurrency)),
+                    max_queue=int(os.getenv(prefix + "MAX_QUEUE", self.max_queue)),
+                    service_time=self.service_time,
+                )
+            return self.lanes[name]
+
+    def limiter(self, model: str) -> ModelLimiter:
+        with self._lock:
+            if model not in self.limiters:
+                self.limiters[model] = ModelLimiter(model, self.rpm, self.tpm)
+            return self.limiters[model]
+
+    @contextmanager
+    def slot(self, lane_name: str, model: Optional[str], *texts: str):
+        """Hold a slot of `lane_name` (and rate budget of `model`, if given) around a blocking call."""
+        lane = self.lane(lane_name)
+        start = time.monotonic()
+        lane.acquire(_priority.get(), _deadline.get())
+        held_from = time.monotonic()
+        try:
+            with self.throttle(lane_name, model, *texts):
+                lane.wait_seconds.observe(time.monotonic() - start)
+                yield
+        finally:
+            lane.release(time.monotonic() - held_from)
+
+    @asynccontextmanager
+    async def aslot(self, lane_name: str, model: Optional[str], *texts: str):
+        """slot() for coroutines: queueing and throttling never block the event loop."""
+        lane = self.lane(lane_name)
+        start = time.monotonic()
+        await lane.aacquire(_priority.get(), _deadline.get())
+        held_from = time.monotonic()
+        try:
+            async with self.athrottle(lane_name, model, *texts):
+                lane.wait_seconds.observe(time.monotonic() - start)
+                yield
+        finally:
+            lane.release(time.monotonic() - held_from)
+
+    @contextmanager
+    def throttle(self, lane_name: str, model: Optional[str], *texts: str):
+        """Wait for the rate budget of `model` around one call (None: nothing to reserve)."""
+        if model is None:
+            yield
+            return
+        limiter = self.limiter(model)
+        tokens = estimate_tokens(*texts, completion_tokens=self.completion_tokens)
+        time.sleep(limiter.reserve(tokens, lane_name, _deadline.get()))
+        try:
+            yield
+        except Exception as e:
+            backoff = _retry_after(e)
+            if backoff is not None:
+                limiter.pause(backoff)
+            raise
+
+    @asynccontextmanager
+    async def athrottle(self, lane_name: str, model: Optional[str], *texts: str):
+        if model is None:
+            yield
+            return
+        limiter = self.limiter(model)
+        tokens = estimate_tokens(*texts, completion_tokens=self.completion_tokens)
+        wait = limiter.reserve(tokens, lane_name, _deadline.get())
+        if wait:
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                limiter.refund(tokens)
+                raise
+        try:
+            yield
+        except Exception as e:
+            backoff = _retry_after(e)
+            if backoff is not None:
+                limiter.pause(backoff)
+            raise
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            lanes, limiters = dict(self.lanes), dict(self.limiters)
+        return {
+            "lanes": {name: lane.snapshot() for name, lane in lanes.items()},
+            "models": {model: limiter.snapshot() for model, limiter in limiters.items()},
+        }
+
+
+def build_scheduler() -> Optional[Scheduler]:
+    """Create the scheduler from SCHEDULER_* environment variables."""
+    if os.getenv("SCHEDULER_ENABLED", "true").lower() != "true":
+        return None
+    return Scheduler(
+        max_concurrency=int(os.getenv("SCHEDULER_MAX_CONCURRENCY", "64")),
+        max_queue=int(os.getenv("SCHEDULER_MAX_QUEUE", "256")),
+        rpm=float(os.getenv("SCHEDULER_RPM", "0")),
+        tpm=float(os.getenv("SCHEDULER_TPM", "0")),
+        completion_tokens=int(os.getenv("SCHEDULER_COMPLETION_TOKENS", "512")),
+        service_time=float(os.getenv("SCHEDULER_SERVICE_TIME_SECONDS", "2")),
+    )
+
+
+_scheduler = None
+_scheduler_built = False
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> Optional[Scheduler]:
+    """The process-wide scheduler (None when disabled), built on first use."""
+    global _scheduler, _scheduler_built
+    with _scheduler_lock:
+        if not _scheduler_built:
+            _scheduler = build_scheduler()
+            _scheduler_built = True
+        return _scheduler
+
+
+def set_scheduler(scheduler: Optional[Scheduler]):
+    """Replace the process-wide scheduler (benchmarks use this to switch settings)."""
+    global _scheduler, _scheduler_built
+    with _scheduler_lock:
+        _scheduler = scheduler
+        _scheduler_built = True
+
+
+@contextmanager
+def slot(lane_name: str, model: Optional[str], *texts: str):
+    """Scheduler slot around a blocking LLM call; a no-op when scheduling is off."""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield
+        return
+    with scheduler.slot(lane_name, model, *texts):
+        yield
+
+
+@asynccontextmanager
+async def aslot(lane_name: str, model: Optional[str], *texts: str):
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield
+        return
+    async with scheduler.aslot(lane_name, model, *texts):
+        yield
+
+
+@contextmanager
+def throttle(lane_name: str, model: Optional[str], *texts: str):
+    """Rate budget of `model` around one call made inside a slot that reserved none."""
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield
+        return
+    with scheduler.throttle(lane_name, model, *texts):
+        yield
+
+
+@asynccontextmanager
+async def athrottle(lane_name: str, model: Optional[str], *texts: str):
+    scheduler = get_scheduler()
+    if scheduler is None:
+        yield
+        return
+    async with scheduler.athrottle(lane_name, model, *texts):
+        yield
+
+
+def scheduled(lane_name: str, system_prompt: str, llm, budget=None):
+    """
+    Decorate a run_*/arun_* agent function so each call waits for a slot of
+    `lane_name`. Goes below @cache_responses: cache hits skip the queue.
+    `budget(llm)`, if given, names the model whose rate budget the slot
+    reserves at call time (None when the calls inside reserve their own,
+    as model tiers do); by default it is `llm`'s.
+    """
+    def model() -> Optional[str]:
+        return budget(llm) if budget else llm.model_name
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(user_query: str) -> str:
+                async with aslot(lane_name, model(), system_prompt, user_query, *history_texts()):
+                    return await func(user_query)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(user_query: str) -> str:
+            with slot(lane_name, model(), system_prompt, user_query, *history_texts()):
+                return func(user_query)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,171 @@
+"""
+Web search for the agents' tool calls.
+
+A search provider is any object with search(query) and async asearch(query)
+returning a list of {"title", "link", "snippet"} dicts. SerperSearch talks
+to the Serper API over the shared connection pools; SERPER_BASE_URL points
+it at another server with the same API (the benchmarks use the one in
+benchmarks/fake_llm.py). CachedSearch keeps results in a size-bounded TTL
+cache keyed on the normalized query, so repeated questions skip the round
+trip.
+
+search_tools() exposes the process-wide provider as a LangChain tool with a
+native coroutine: the async AgentExecutor awaits it on the event loop
+without a thread hop, and runs the tool calls of one step concurrently.
+"""
+
+import os
+import threading
+from collections import Counter
+from typing import List
+
+from core.cache import MemoryBackend
+from core.text import normalize_query
+
+SEARCH_TOOL_DESCRIPTION = (
+    "Search the web for current information such as labor law, benefits "
+    "benchmarks or company news. Input: a search query."
+)
+
+
+def _organic_results(data: dict, limit: int) -> List[dict]:
+    return [
+        {"title": item.get("title", ""), "link": item.get("link", ""), "snippet": item.get("snippet", "")}
+        for item in data.get("organic", [])[:limit]
+    ]
+
+
+class SerperSearch:
+    """Google results through the Serper API (https://serper.dev)."""
+
+    def __init__(self, api_key: str, base_url: str = "https://google.serper.dev", results: int = 5,
+                 timeout: float = 10.0):
+        self.api_key = api_key
+        self.url = f"{base_url.rstrip('/')}/search"
+        self.results = results
+        self.timeout = timeout
+
+    def _request(self, query: str) -> dict:
+        return {"headers": {"X-API-KEY": self.api_key}, "json": {"q": query, "num": self.results},
+                "timeout": self.timeout}
+
+    def search(self, query: str) -> List[dict]:
+        from core.clients import get_http_client
+
+        response = get_http_client().post(self.url, **self._request(query))
+        response.raise_for_status()
+        return _organic_results(response.json(), self.results)
+
+    async def asearch(self, query: str) -> List[dict]:
+        from core.clients import get_async_http_client
+
+        response = await get_async_http_client().post(self.url, **self._request(query))
+        response.raise_for_status()
+        return _organic_results(response.json(), self.results)
+
+
+class CachedSearch:
+    """A provider behind a bounded TTL cache; failed searches are not cached."""
+
+    def __init__(self, provider, max_entries: int = 1024, ttl_seconds: float = 900):
+        self.provider = provider
+        self.cache = MemoryBackend(max_entries, ttl_seconds)
+        self.stats = Counter()
+
+    def _lookup(self, query: str):
+        key = normalize_query(query)
+        results, _ = self.cache.get(key)
+        self.stats["hits" if results is not None else "misses"] += 1
+        return key, results
+
+    def _store(self, key: str, results: List[dict]):
+        self.stats["evictions"] += self.cache.set(key, results)
+
+    def search(self, query: str) -> List[dict]:
+        key, results = self._lookup(query)
+        if results is None:
+            results = self.provider.search(query)
+            self._store(key, results)
+        return results
+
+    async def asearch(self, query: str) -> List[dict]:
+        key, results = self._lookup(query)
+        if results is None:
+            results = await self.provider.asearch(query)
+            self._store(key, results)
+        return results
+
+    def snapshot(self) -> dict:
+        return {"entries": len(self.cache), **self.stats}
+
+
+def format_results(results: List[dict]) -> str:
+    """Search results as the text the model reads."""
+    if not results:
+        return "No results found."
+    return "\n".join(f"{i}. {r['title']} ({r['link']})\n   {r['snippet']}" for i, r in enumerate(results, 1))
+
+
+def build_search():
+    """The search provider from SEARCH_* / SERPER_* settings (None without SERPER_API_KEY)."""
+    provider_name = os.getenv("SEARCH_PROVIDER", "serper").lower()
+    api_key = os.getenv("SERPER_API_KEY")
+    if provider_name != "serper" or not api_key:
+        return None
+    provider = SerperSearch(
+        api_key,
+        base_url=os.getenv("SERPER_BASE_URL", "https://google.serper.dev"),
+        results=int(os.getenv("SEARCH_RESULTS", "5")),
+        timeout=float(os.getenv("SEARCH_TIMEOUT", "10")),
+    )
+    ttl_seconds = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900"))
+    if ttl_seconds <= 0:
+        return provider
+    return CachedSearch(provider, int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1024")), ttl_seconds)
+
+
+_search = None
+_search_built = False
+_search_lock = threading.Lock()
+
+
+def get_search():
+    """The process-wide search provider (None when search is off), built on first use."""
+    global _search, _search_built
+    with _search_lock:
+        if not _search_built:
+            _search = build_search()
+            _search_built = True
+        return _search
+
+
+def set_search(provider):
+    """Replace the process-wide search provider (benchmarks plug in stubs or other cache settings)."""
+    global _search, _search_built
+    with _search_lock:
+        _search = provider
+        _search_built = True
+
+
+def search_tools() -> list:
+    """[web_search] as a LangChain tool when a provider is configured, else []."""
+    if get_search() is None:
+        return []
+    from langchain_core.tools import StructuredTool
+
+    def web_search(query: str) -> str:
+        return format_results(get_search().search(query))
+
+    async def aweb_search(query: str) -> str:
+        return format_results(await get_search().asearch(query))
+
+    return [StructuredTool.from_function(func=web_search, coroutine=aweb_search, name="web_search",
+                                         description=SEARCH_TOOL_DESCRIPTION)]
+
+
+def search_stats() -> dict:
+    provider = get_search()
+    if provider is None:
+        return {"enabled": False}
+    return {"enabled": True, "provider": type(getattr(provider, "provider", provider)).__name__,
+            **(provider.snapshot() if hasattr(provider, "snapshot") else {})}
@@ -0,0 +1,440 @@
+"""
+Session memory: bounded, summarized conversation history per session id.
+
+A session keeps a rolling summary plus the recent turns. Agents see the
+summary and the newest turns that fit in SESSION_HISTORY_TOKENS (the window
+start advances in half-budget steps, so consecutive prompts share a prefix
+the provider can cache); once the stored turns outgrow that budget, the
+oldest ones are folded into the summary by one LLM call (old summary +
+overflow only, so the cost per update stays constant), off the request path.
+Prompt size therefore stays flat no matter how long a conversation runs.
+
+Sessions live in an in-memory LRU or a SQLite table (shared by every worker
+on the host), both with idle-time expiry. The history of the current request
+is carried in a context variable, like the scheduler context, so agents and
+graph nodes pick it up without changing their signatures.
+"""
+
+import asyncio
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from core.text import estimate_tokens
+
+logger = logging.getLogger("SessionMemory")
+
+_history = contextvars.ContextVar("session_history", default=None)
+_background = set()
+
+
+@dataclass
+class Session:
+    summary: str = ""
+    turns: List[dict] = field(default_factory=list)  # {"role": "user" | "assistant", "content": ...}
+    summarized_turns: int = 0
+    updated_at: float = field(default_factory=time.time)
+
+    def to_json(self) -> str:
+        return json.dumps({"summary": self.summary, "turns": self.turns, "summarized_turns": self.summarized_turns})
+
+    @classmethod
+    def from_json(cls, data: str, updated_at: float) -> "Session":
+        return cls(updated_at=updated_at, **json.loads(data))
+
+
+@dataclass
+class HistoryWindow:
+    """What the agents see of a session: the summary and the newest turns."""
+    summary: str = ""
+    turns: List[dict] = field(default_factory=list)
+
+    def key(self) -> str:
+        """Fingerprint of the window, so cached answers are only reused in the same context."""
+        if not self.summary and not self.turns:
+            return ""
+        return hashlib.sha256(json.dumps([self.summary, self.turns]).encode()).hexdigest()[:16]
+
+    def texts(self) -> List[str]:
+        return [self.summary] + [turn["content"] for turn in self.turns]
+
+
+class MemorySessionStore:
+    """Bounded LRU of sessions with idle-time expiry."""
+
+    def __init__(self, max_sessions: int = 10000, ttl_seconds: float = 86400):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.stats = Counter()
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and time.time() - session.updated_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.stats["expirations"] += 1
+                session = None
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def put(self, session_id: str, session: Session):
+        with self._lock:
+            self._put(session_id, session)
+
+    def update(self, session_id: str, change: Callable[[Optional[Session]], Optional[Session]]) -> Optional[Session]:
+        """Read, change and store a session atomically; `change` returns the session to store (None: no write)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None and time.time() - session.updated_at > self.ttl_seconds:
+                del self._sessions[session_id]
+                self.stats["expirations"] += 1
+                session = None
+            session = change(session)
+            if session is not None:
+                self._put(session_id, session)
+            return session
+
+    def _put(self, session_id: str, session: Session):
+        session.updated_at = time.time()
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+class SQLiteSessionStore:
+    """Sessions in a SQLite table (WAL), LRU-bounded by last update."""
+
+    def __init__(self, path: str, max_sessions: int = 10000, ttl_seconds: float = 86400):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            "session_id TEXT PRIMARY KEY, data TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_updated ON sessions(updated_at)")
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            return self._get(session_id)
+
+    def put(self, session_id: str, session: Session):
+        with self._lock:
+            self._put(session_id, session)
+
+    def update(self, session_id: str, change: Callable[[Optional[Session]], Optional[Session]]) -> Optional[Session]:
+        """
+        Read, change and store a session in one write transaction, so workers
+        appending to the same session never overwrite each other's turns.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                session = change(self._get(session_id))
+                if session is not None:
+                    self._put(session_id, session)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return session
+
+    def _get(self, session_id: str) -> Optional[Session]:
+        row = self._conn.execute(
+            "SELECT data, updated_at FROM sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        if time.time() - row[1] > self.ttl_seconds:
+            self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            self.stats["expirations"] += 1
+            return None
+        return Session.from_json(row[0], row[1])
+
+    def _put(self, session_id: str, session: Session):
+        session.updated_at = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO sessions (session_id, data, updated_at) VALUES (?, ?, ?)",
+            (session_id, session.to_json(), session.updated_at),
+        )
+        overflow = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_sessions
+        if overflow > 0:
+            self._conn.execute(
+                "DELETE FROM sessions WHERE session_id IN "
+                "(SELECT session_id FROM sessions ORDER BY updated_at LIMIT ?)",
+                (overflow,),
+            )
+            self.stats["evictions"] += overflow
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,)).rowcount > 0
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+
+def _token_count(turns: List[dict]) -> int:
+    return estimate_tokens(*(turn["content"] for turn in turns))
+
+
+class SessionMemory:
+    """Token-budgeted history windows with incremental rolling summaries."""
+
+    def __init__(self, store, history_tokens: int = 1500, summarizer=None):
+        self.store = store
+        # 0 replays the whole history (no window, no summary)
+        self.history_tokens = history_tokens
+        self.summarizer = summarizer
+        self.stats = Counter()
+        self._summarizing = set()
+        self._lock = threading.Lock()
+
+    def window(self, session_id: str) -> HistoryWindow:
+        session = self.store.get(session_id)
+        self.stats["hits" if session else "misses"] += 1
+        if session is None:
+            return HistoryWindow()
+        if not self.history_tokens:
+            return HistoryWindow(session.summary, list(session.turns))
+
+        # The window starts at an anchor (an exchange boundary, one every half
+        # budget of stored history) so consecutive turns share the same start
+        # and the provider's prompt prefix cache keeps hitting; it moves on
+        # in half-budget steps instead of one exchange per turn
+        sizes = [_token_count([turn]) for turn in session.turns]
+        total, consumed, anchor = sum(sizes), 0, 0
+        for start in range(0, len(sizes), 2):
+            if consumed >= anchor:
+                if total - consumed <= self.history_tokens:
+                    return HistoryWindow(session.summary, list(session.turns[start:]))
+                anchor = consumed + max(1, self.history_tokens // 2)
+            consumed += sum(sizes[start:start + 2])
+
+        # No anchor fits (an oversize last exchange): the newest turns that fit
+        turns, used = [], 0
+        for turn in reversed(session.turns):
+            used += _token_count([turn])
+            if used > self.history_tokens:
+                break
+            turns.append(turn)
+        return HistoryWindow(session.summary, turns[::-1])
+
+    def record(self, session_id: str, user_message: str, answer: str) -> bool:
+        """Append one exchange; True if the session should now be summarized."""
+        def append(session: Optional[Session]) -> Session:
+            session = session or Session()
+            session.turns.append({"role": "user", "content": user_message})
+            session.turns.append({"role": "assistant", "content": answer})
+            if self.history_tokens:
+                # Hard bound in case summaries fall behind (or are disabled)
+                while _token_count(session.turns) > 4 * self.history_tokens and len(session.turns) > 2:
+                    del session.turns[:2]
+                    self.stats["dropped_turns"] += 2
+            return session
+
+        # The store makes the read-append-write atomic (across workers with SQLite)
+        session = self.store.update(session_id, append)
+        self.stats["recorded"] += 1
+        return bool(self.history_tokens) and _token_count(session.turns) > self.history_tokens
+
+    def _overflow(self, session: Session) -> int:
+        """How many of the oldest turns (whole exchanges) to fold into the summary."""
+        keep_tokens, keep = 0, 0
+        for turn in reversed(session.turns):
+            if keep_tokens + _token_count([turn]) > self.history_tokens // 2:
+                break
+            keep_tokens += _token_count([turn])
+            keep += 1
+        overflow = len(session.turns) - keep
+        return overflow - overflow % 2
+
+    async def asummarize(self, session_id: str):
+        """Fold the turns that overflow the window into the rolling summary."""
+        if self.summarizer is None:
+            return
+        with self._lock:
+            if session_id in self._summarizing:
+                return
+            self._summarizing.add(session_id)
+        try:
+            # Store calls may block on SQLite: run them in a thread
+            session = await asyncio.to_thread(self.store.get, session_id)
+            count = self._overflow(session) if session else 0
+            if not count:
+                return
+            folded = session.turns[:count]
+            summary = await self.summarizer(session.summary, folded)
+
+            def fold(session: Optional[Session]) -> Optional[Session]:
+                # Another worker may have summarized or trimmed the session meanwhile
+                if session is None or session.turns[:count] != folded:
+                    return None
+                session.summary = summary
+                del session.turns[:count]
+                session.summarized_turns += count
+                return session
+
+            if await asyncio.to_thread(self.store.update, session_id, fold) is None:
+                return
+            self.stats["summaries"] += 1
+            logger.info("📝 Session %s: folded %d turns into the summary", session_id, count)
+        except Exception as e:
+            self.stats["summary_errors"] += 1
+            logger.warning("⚠️  Summarizing session %s failed: %s", session_id, e)
+        finally:
+            with self._lock:
+                self._summarizing.discard(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        return self.store.delete(session_id)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update(self.store.stats)
+        stats["sessions"] = len(self.store)
+        stats["history_tokens"] = self.history_tokens
+        return stats
+
+
+def llm_summarizer(llm):
+    """Summarizer that updates the running summary with the folded turns."""
+    from langchain_core.messages import HumanMessage, SystemMessage
+
+    from prompts import PROMPT_SUMMARY
+    from core.metrics import stage
+    from core.resilience import acall_llm
+    from core.scheduler import aslot
+
+    async def summarize(summary: str, turns: List[dict]) -> str:
+        exchanges = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        messages = [
+            SystemMessage(content=PROMPT_SUMMARY),
+            HumanMessage(content=f"Current summary:\n{summary or '(empty)'}\n\nExchanges:\n{exchanges}"),
+        ]
+        with stage("summary", "Summary"):
+            async with aslot("Summary", llm.model_name, *(message.content for message in messages)):
+                return (await acall_llm(llm, messages)).content.strip()
+
+    return summarize
+
+
+def build_session_memory() -> Optional[SessionMemory]:
+    """Create the session memory from SESSION_* environment variables."""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    if backend in ("off", "none", "false"):
+        return None
+
+    max_sessions = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+    ttl_seconds = float(os.getenv("SESSION_TTL_SECONDS", "86400"))
+    if backend == "sqlite":
+        store = SQLiteSessionStore(os.getenv("SESSION_PATH", "sessions.sqlite3"), max_sessions, ttl_seconds)
+    else:
+        store = MemorySessionStore(max_sessions, ttl_seconds)
+
+    summarizer = None
+    if os.getenv("SESSION_SUMMARIZE", "true").lower() == "true":
+        from core.clients import chat_model
+        summarizer = llm_summarizer(chat_model(model=os.getenv("SESSION_SUMMARY_MODEL", "gpt-4o"), temperature=0.0))
+
+    return SessionMemory(store, int(os.getenv("SESSION_HISTORY_TOKENS", "1500")), summarizer)
+
+
+_session_memory = None
+_session_memory_built = False
+_build_lock = threading.Lock()
+
+
+def get_session_memory() -> Optional[SessionMemory]:
+    """The process-wide session memory (None when disabled), built on first use."""
+    global _session_memory, _session_memory_built
+    if not _session_memory_built:
+        with _build_lock:
+            if not _session_memory_built:
+                _session_memory = build_session_memory()
+                _session_memory_built = True
+    return _session_memory
+
+
+def set_session_memory(memory: Optional[SessionMemory]):
+    """Replace the process-wide session memory (None disables it)."""
+    global _session_memory, _session_memory_built
+    with _build_lock:
+        _session_memory = memory
+        _session_memory_built = True
+
+
+@contextmanager
+def conversation(window: Optional[HistoryWindow]):
+    """Make `window` the history every agent call inside the block sees."""
+    token = _history.set(window)
+    try:
+        yield
+    finally:
+        _history.reset(token)
+
+
+def current_history() -> Optional[HistoryWindow]:
+    return _history.get()
+
+
+def history_messages() -> list:
+    """The current session history as LangChain messages (empty outside a session)."""
+    window = _history.get()
+    if window is None:
+        return []
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+    messages = []
+    if window.summary:
+        messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{window.summary}"))
+    for turn in window.turns:
+        message_class = HumanMessage if turn["role"] == "user" else AIMessage
+        messages.append(message_class(content=turn["content"]))
+    return messages
+
+
+def history_key() -> str:
+    window = _history.get()
+    return window.key() if window else ""
+
+
+def history_texts() -> List[str]:
+    window = _history.get()
+    return window.texts() if window else []
+
+
+def start_summary(memory: SessionMemory, session_id: str):
+    """Summarize in the background, at low priority, so the reply is not delayed."""
+    from core.scheduler import request_context
+
+    with request_context("low", deadline_seconds=0):
+        task = asyncio.get_running_loop().create_task(memory.asummarize(session_id))
+    # The loop only keeps weak references to tasks
+    _background.add(task)
+    task.add_done_callback(_background.discard)
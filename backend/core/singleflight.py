@@ -0,0 +1,234 @@
+"""
+Single-flight coalescing of identical concurrent requests.
+
+When an announcement goes out, many people ask the same question within
+seconds, long before the first answer can reach the response cache. Calls
+that share a key while one is in flight do not start their own: they wait
+for the first call's result (or follow its stream) and get the same answer
+or the same error. Keys combine a scope (the agent, or the supreme agent
+and its mode), the normalized query and the session history, so only
+interchangeable requests share a call. Nothing is kept once a call is
+done; repeats after that are the response cache's job.
+
+An async shared call runs as a task of its own, in the context of the
+request that started it (its priority, deadline and session window). A
+waiter that is cancelled, such as a client that disconnects, only stops
+waiting; the shared call is cancelled when its last waiter has left. Sync
+callers coalesce across threads the same way.
+"""
+
+import asyncio
+import functools
+import inspect
+import os
+import threading
+from collections import Counter
+from typing import Optional
+
+from core.metrics import COALESCED_REQUESTS
+from core.sessions import history_key
+from core.text import normalize_query
+
+
+class _Flight:
+    """One upstream call and the callers waiting on it."""
+
+    def __init__(self):
+        self.waiters = 1
+        self.task = None  # async: the shared task
+        self.events = []  # streams: everything produced so far, for late joiners
+        self.wakeup = asyncio.Event()  # streams: replaced and set on every new event
+        self.done = threading.Event()  # sync: set with value or error
+        self.value = None
+        self.error = None
+
+    def notify(self):
+        wakeup, self.wakeup = self.wakeup, asyncio.Event()
+        wakeup.set()
+
+
+class SingleFlight:
+    """Coalesces concurrent calls with the same key into one."""
+
+    def __init__(self):
+        self._sync = {}  # key -> _Flight
+        self._async = {}  # (loop, key) -> _Flight; each loop only touches its own entries
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def _count(self, scope: str, role: str):
+        COALESCED_REQUESTS.inc(scope, role)
+        with self._lock:
+            self.stats[role] += 1
+
+    def _join(self, scope: str, flights: dict, key):
+        """(flight, leader): the flight in progress for `key` with one more waiter, or a new one to lead."""
+        with self._lock:
+            flight = flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = flights[key] = _Flight()
+            else:
+                flight.waiters += 1
+        self._count(scope, "leader" if leader else "follower")
+        return flight, leader
+
+    def _land(self, flights: dict, key, flight: _Flight):
+        with self._lock:
+            if flights.get(key) is flight:
+                del flights[key]
+        if flight.task is not None:
+            # Waiters re-raise errors themselves; keep asyncio from logging them when none is left
+            flight.task.cancelled() or flight.task.exception()
+            flight.notify()
+
+    async def _leave(self, scope: str, flight: _Flight):
+        """A waiter stopped waiting; cancel the shared call (and let it unwind) if nobody is left."""
+        flight.waiters -= 1
+        if flight.waiters == 0 and not flight.task.done():
+            flight.task.cancel()
+            self._count(scope, "abandoned")
+            await asyncio.wait([flight.task])
+
+    def do(self, scope: str, key, compute):
+        """compute(), or the result of the identical call already running in another thread."""
+        flight, leader = self._join(scope, self._sync, key)
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(self._sync, key, flight)
+            flight.done.set()
+
+    async def ado(self, scope: str, key, compute):
+        """await compute(), or share the identical call already in flight on this event loop."""
+        key = (asyncio.get_running_loop(), key)
+        flight, leader = self._join(scope, self._async, key)
+        if leader:
+            flight.task = asyncio.ensure_future(compute())
+            flight.task.add_done_callback(lambda _: self._land(self._async, key, flight))
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if not flight.task.done():
+                await self._leave(scope, flight)
+            raise
+
+    async def astream(self, scope: str, key, source):
+        """
+        Iterate the async iterator `source`, or follow the identical stream
+        already in flight: a follower first gets everything produced so far,
+        then the rest as it arrives. Unused sources are never started.
+        """
+        key = (asyncio.get_running_loop(), key)
+        flight, leader = self._join(scope, self._async, key)
+        if leader:
+            flight.task = asyncio.ensure_future(self._pump(flight, source))
+            flight.task.add_done_callback(lambda _: self._land(self._async, key, flight))
+
+        position = 0
+        try:
+            while True:
+                wakeup = flight.wakeup
+                if position < len(flight.events):
+                    position += 1
+                    yield flight.events[position - 1]
+                elif flight.task.done():
+                    if not flight.task.cancelled() and flight.task.exception():
+                        raise flight.task.exception()
+                    return
+                else:
+                    await wakeup.wait()
+        finally:
+            await self._leave(scope, flight)
+
+    @staticmethod
+    async def _pump(flight: _Flight, source):
+        async for event in source:
+            flight.events.append(event)
+            flight.notify()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+            in_flight = len(self._sync) + len(self._async)
+        requests = stats.get("leader", 0) + stats.get("follower", 0)
+        return {
+            "leaders": stats.get("leader", 0),
+            "followers": stats.get("follower", 0),
+            "abandoned": stats.get("abandoned", 0),
+            "in_flight": in_flight,
+            "coalescing_ratio": stats.get("follower", 0) / requests if requests else 0.0,
+        }
+
+
+def request_key(query: str, *parts) -> tuple:
+    """Coalescing key of a query in the current session context."""
+    return (*parts, normalize_query(query), history_key())
+
+
+_singleflight = None
+_singleflight_built = False
+_singleflight_lock = threading.Lock()
+
+
+def get_singleflight() -> Optional[SingleFlight]:
+    """The process-wide coalescer (None with COALESCE_ENABLED=false), built on first use."""
+    global _singleflight, _singleflight_built
+    with _singleflight_lock:
+        if not _singleflight_built:
+            enabled = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+            _singleflight = SingleFlight() if enabled else None
+            _singleflight_built = True
+        return _singleflight
+
+
+def set_singleflight(singleflight: Optional[SingleFlight]):
+    """Replace the process-wide coalescer (None turns coalescing off)."""
+    global _singleflight, _singleflight_built
+    with _singleflight_lock:
+        _singleflight = singleflight
+        _singleflight_built = True
+
+
+def coalesce(scope: str):
+    """Decorate a run_*/arun_* agent function so identical concurrent calls share one run."""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(user_query: str) -> str:
+                flights = get_singleflight()
+                if flights is None:
+                    return await func(user_query)
+                return await flights.ado(scope, request_key(user_query, scope), lambda: func(user_query))
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(user_query: str) -> str:
+            flights = get_singleflight()
+            if flights is None:
+                return func(user_query)
+            return flights.do(scope, request_key(user_query, scope), lambda: func(user_query))
+        return wrapper
+
+    return decorator
+
+
+async def coalesce_stream(scope: str, query: str, source, *parts):
+    """Yield from `source`, shared with identical streams in flight (see SingleFlight.astream)."""
+    flights = get_singleflight()
+    if flights is None:
+        async for event in source:
+            yield event
+        return
+    async for event in flights.astream(scope, request_key(query, scope, *parts), source):
+        yield event
@@ -0,0 +1,19 @@
+"""Text helpers shared by the routing, caching, scheduling and session layers."""
+
+import re
+
+_PUNCTUATION_RE = re.compile(r"[^\w\s]")
+
+
+def normalize_query(text: str) -> str:
+    """
+    Canonical form of a user query for cache and memo keys: lowercase,
+    punctuation dropped, whitespace collapsed. "What's the PTO policy?" and
+    "whats the  pto policy" normalize to the same string.
+    """
+    return " ".join(_PUNCTUATION_RE.sub("", text.lower()).split())
+
+
+def estimate_tokens(*texts: str, completion_tokens: int = 0) -> int:
+    """Rough token count (4 characters per token) plus the expected completion."""
+    return sum(len(text) for text in texts) // 4 + completion_tokens
@@ -0,0 +1,296 @@
+"""
+Model tiers: a cheaper, faster model for easy calls, the full model for hard ones.
+
+Every agent has an ordered tier list, smallest model first, each with the
+highest complexity score it takes on. MODEL_TIERS applies to every agent
+and MODEL_TIERS_<AGENT> overrides it for one: "gpt-4o-mini:0.35,gpt-4o"
+sends queries scoring up to 0.35 to gpt-4o-mini and the rest to gpt-4o.
+estimate_complexity() scores a query from 0 to 1 on cheap text features:
+length, code and stack traces, design and reasoning words, several
+questions in one; greetings and thanks score 0.
+
+An answer that fails validation is asked again of the next tier up:
+empty, cut off at the token limit, unbalanced code fences, a refusal, no
+code block for a code request, an error, or the caller's own check (such
+as an unparseable routing reply). The last tier's answer is kept either
+way. Streamed calls are never escalated, since their tokens are already
+on the wire. Each call still goes through core.resilience (deadline,
+hedging, circuit breaker, fallback) and draws from the scheduler's rate
+budget of the model that is actually called; the agent's scheduler slot
+only holds the lane (see budget_model). Response cache keys and the
+routing memo version name the tier table instead of the agent's model
+(model_key), so answers from one setup are not served under another.
+
+Tiering is opt-in: MODEL_TIERING=true.
+
+Calls, escalations, latency, tokens and cost (MODEL_PRICES, USD per
+million input/output tokens) are counted per agent and model; see
+GET /tiers/stats.
+"""
+
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, List, NamedTuple, Optional
+
+from core.metrics import TIER_CALLS
+from core.resilience import acall_llm, call_llm, is_streaming
+from core.scheduler import athrottle, throttle
+from core.text import estimate_tokens
+
+DEFAULT_TIERS = "gpt-4o-mini:0.35,gpt-4o"
+# Routing is a three-way classification: the small model unless its reply is unusable
+AGENT_TIERS = {"Supervisor": "gpt-4o-mini:1,gpt-4o", "Developer": "gpt-4o-mini:0.25,gpt-4o"}
+DEFAULT_PRICES = "gpt-4o=2.5/10,gpt-4o-mini=0.15/0.6"
+
+GREETING_RE = re.compile(r"^\s*(hi|hello|hey|thanks|thank you|good (morning|afternoon|evening)|bye)\b", re.I)
+CODE_RE = re.compile(r"```|Traceback|\bdef |\bclass |\w+\(\)|\w+\.(py|js|ts|sql|java|go|yaml)\b|[{};]\s*$", re.M)
+REASONING_RE = re.compile(r"\b(why|design|architect\w*|compare|trade-?offs?|optimi[sz]\w*|strategy|strategic|"
+                          r"refactor\w*|debug\w*|scal\w+|migrat\w+|evaluate|plan|pros and cons)\b", re.I)
+CODE_REQUEST_RE = re.compile(r"\b(write|implement|show|give)\b.*\b(code|function|script|class|query|example)\b",
+                             re.I | re.S)
+REFUSAL_RE = re.compile(r"\b(I('m| am) not sure|I (cannot|can't|don't know)|as an AI)\b", re.I)
+
+
+class Tier(NamedTuple):
+    model: str
+    max_complexity: float
+
+
+def parse_tiers(spec: str) -> List[Tier]:
+    """'model:max,model:max,model' → tiers; a tier without a bound takes everything."""
+    tiers = []
+    for part in spec.split(","):
+        model, _, bound = part.strip().partition(":")
+        if model:
+            tiers.append(Tier(model, float(bound) if bound else 1.0))
+    return tiers
+
+
+def parse_prices(spec: str) -> dict:
+    """'model=input/output,...' (USD per million tokens) → {model: (input, output)}."""
+    prices = {}
+    for part in spec.split(","):
+        model, _, price = part.strip().partition("=")
+        if price:
+            prompt, _, completion = price.partition("/")
+            prices[model] = (float(prompt), float(completion or prompt))
+    return prices
+
+
+def estimate_complexity(query: str) -> float:
+    """A 0..1 difficulty score from the query text alone (no model call)."""
+    tokens = estimate_tokens(query)
+    if tokens < 16 and GREETING_RE.match(query):
+        return 0.0
+    score = min(tokens / 400, 0.4)
+    if CODE_RE.search(query):
+        score += 0.3
+    score += 0.15 * min(len(REASONING_RE.findall(query)), 2)
+    if query.count("?") > 1:
+        score += 0.1
+    return round(min(score, 1.0), 3)
+
+
+def check_answer(agent: str, query: str, message, validate: Optional[Callable] = None) -> Optional[str]:
+    """Why the answer should go to a larger model ('empty', 'truncated', ...), or None if it is fine."""
+    text = message.content if isinstance(message.content, str) else str(message.content or "")
+    if not text.strip():
+        return "empty"
+    if (getattr(message, "response_metadata", None) or {}).get("finish_reason") == "length" and validate is None:
+        return "truncated"
+    if validate is not None:
+        return validate(text)
+    if text.count("```") % 2:
+        return "unclosed_code"
+    if REFUSAL_RE.search(text[:300]):
+        return "refusal"
+    if agent == "Developer" and CODE_REQUEST_RE.search(query) and "```" not in text:
+        return "missing_code"
+    return None
+
+
+class ModelTiers:
+    """The tier table, the clients per tier and the per-agent, per-model counters."""
+
+    def __init__(self, default: str = DEFAULT_TIERS, overrides: Optional[dict] = None, prices: Optional[dict] = None,
+                 escalate: bool = True):
+        self.default = parse_tiers(default)
+        self.overrides = {agent.upper(): parse_tiers(spec) for agent, spec in (overrides or {}).items()}
+        self.prices = prices if prices is not None else parse_prices(DEFAULT_PRICES)
+        self.escalate = escalate
+        self.stats = defaultdict(Counter)  # (agent, model) -> calls, escalated, failures, ms, tokens
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def tiers(self, agent: str) -> List[Tier]:
+        return self.overrides.get(agent.upper(), self.default)
+
+    def plan(self, agent: str, query: str) -> List[str]:
+        """The models to try for `query`, in order: the first tier that takes its score, then the larger ones."""
+        tiers = self.tiers(agent)
+        complexity = estimate_complexity(query)
+        first = next((i for i, tier in enumerate(tiers) if complexity <= tier.max_complexity), len(tiers) - 1)
+        return [tier.model for tier in tiers[first:]]
+
+    def client(self, llm, model: str):
+        """`llm` itself for its own model, else a client for `model` with the same settings."""
+        if model == llm.model_name:
+            return llm
+        key = (model, llm.temperature, llm.max_tokens)
+        with self._lock:
+            if key not in self._clients:
+                from core.clients import chat_model
+                self._clients[key] = chat_model(model=model, temperature=llm.temperature, max_tokens=llm.max_tokens)
+            return self._clients[key]
+
+    def _record(self, agent: str, model: str, started: float, response=None, failure: Optional[str] = None,
+                escalated: bool = False):
+        usage = getattr(response, "usage_metadata", None) or {}
+        prompt_tokens, completion_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+        price = self.prices.get(model, (0.0, 0.0))
+        with self._lock:
+            stats = self.stats[agent, model]
+            stats["calls"] += 1
+            stats["escalated"] += escalated
+            if failure:
+                stats[f"failed_{failure}"] += 1
+            stats["ms"] += (time.perf_counter() - started) * 1000
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["micro_usd"] += (prompt_tokens * price[0] + completion_tokens * price[1])
+        TIER_CALLS.inc(agent, model, "escalated" if escalated else "answered")
+
+    def _attempts(self, agent: str, llm, query: str):
+        """(client, model, last) for every tier of the plan; last is set where escalation stops."""
+        models = self.plan(agent, query)
+        may_escalate = self.escalate and not is_streaming()
+        for i, model in enumerate(models):
+            yield self.client(llm, model), model, i == len(models) - 1 or not may_escalate
+
+    def call(self, agent: str, llm, query: str, messages, validate: Optional[Callable] = None, **kwargs):
+        """call_llm on the tier for `query`, moving up a tier while the answer fails validation."""
+        texts = [str(message.content) for message in messages]
+        for client, model, last in self._attempts(agent, llm, query):
+            started = time.perf_counter()
+            try:
+                with throttle(agent, model, *texts):
+                    response = call_llm(client, messages, **kwargs)
+            except Exception:
+                self._record(agent, model, started, failure="error", escalated=not last)
+                if last:
+                    raise
+                continue
+            failure = check_answer(agent, query, response, validate)
+            self._record(agent, model, started, response, failure, escalated=bool(failure) and not last)
+            if last or not failure:
+                return response
+
+    async def acall(self, agent: str, llm, query: str, messages, validate: Optional[Callable] = None, **kwargs):
+        texts = [str(message.content) for message in messages]
+        for client, model, last in self._attempts(agent, llm, query):
+            started = time.perf_counter()
+            try:
+                async with athrottle(agent, model, *texts):
+                    response = await acall_llm(client, messages, **kwargs)
+            except Exception:
+                self._record(agent, model, started, failure="error", escalated=not last)
+                if last:
+                    raise
+                continue
+            failure = check_answer(agent, query, response, validate)
+            self._record(agent, model, started, response, failure, escalated=bool(failure) and not last)
+            if last or not failure:
+                return response
+
+    def spec(self, agent: str) -> str:
+        return ",".join(f"{tier.model}:{tier.max_complexity:g}" for tier in self.tiers(agent))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = {key: Counter(counter) for key, counter in self.stats.items()}
+        agents = defaultdict(dict)
+        for (agent, model), counter in sorted(stats.items()):
+            calls = counter.pop("calls")
+            agents[agent][model] = {
+                "calls": calls,
+                "escalated": counter.pop("escalated", 0),
+                "avg_ms": round(counter.pop("ms") / calls, 1),
+                "prompt_tokens": counter.pop("prompt_tokens"),
+                "completion_tokens": counter.pop("completion_tokens"),
+                "cost_usd": round(counter.pop("micro_usd") / 1e6, 6),
+                **counter,
+            }
+        return {
+            "escalate": self.escalate,
+            "tiers": {agent: self.spec(agent) for agent in ("Supervisor", "HR", "CEO", "Developer")},
+            "agents": dict(agents),
+        }
+
+
+def build_tiers() -> Optional[ModelTiers]:
+    """The tier table from MODEL_TIERS / MODEL_TIERS_<AGENT> (None unless MODEL_TIERING=true)."""
+    if os.getenv("MODEL_TIERING", "false").lower() != "true":
+        return None
+    overrides = dict(AGENT_TIERS)
+    prefix = "MODEL_TIERS_"
+    overrides.update({name[len(prefix):]: spec for name, spec in os.environ.items()
+                      if name.startswith(prefix) and spec})
+    return ModelTiers(
+        default=os.getenv("MODEL_TIERS", DEFAULT_TIERS),
+        overrides={agent.upper(): spec for agent, spec in overrides.items()},
+        prices=parse_prices(os.getenv("MODEL_PRICES", DEFAULT_PRICES)),
+        escalate=os.getenv("MODEL_TIER_ESCALATION", "true").lower() == "true",
+    )
+
+
+_tiers = None
+_tiers_built = False
+_tiers_lock = threading.Lock()
+
+
+def get_tiers() -> Optional[ModelTiers]:
+    """The process-wide tier table (None when tiering is off), built on first use."""
+    global _tiers, _tiers_built
+    with _tiers_lock:
+        if not _tiers_built:
+            _tiers = build_tiers()
+            _tiers_built = True
+        return _tiers
+
+
+def set_tiers(tiers: Optional[ModelTiers]):
+    """Replace the process-wide tier table (None sends every call to the agent's own model)."""
+    global _tiers, _tiers_built
+    with _tiers_lock:
+        _tiers = tiers
+        _tiers_built = True
+
+
+def model_key(agent: str, llm) -> str:
+    """What answered `agent`'s calls, for cache keys and memo versions: its model, or its tier table."""
+    tiers = get_tiers()
+    return llm.model_name if tiers is None else f"tiers:{tiers.spec(agent)}"
+
+
+def budget_model(llm) -> Optional[str]:
+    """The model a scheduler slot around tiered calls reserves: none when tiering is on (each tier reserves its own)."""
+    return llm.model_name if get_tiers() is None else None
+
+
+def call_tiered(agent: str, llm, query: str, messages, validate: Optional[Callable] = None, **kwargs):
+    """The agent's answer from the model tier that fits `query`, or from `llm` when tiering is off."""
+    tiers = get_tiers()
+    if tiers is None:
+        return call_llm(llm, messages, **kwargs)
+    return tiers.call(agent, llm, query, messages, validate, **kwargs)
+
+
+async def acall_tiered(agent: str, llm, query: str, messages, validate: Optional[Callable] = None, **kwargs):
+    """Async counterpart of call_tiered."""
+    tiers = get_tiers()
+    if tiers is None:
+        return await acall_llm(llm, messages, **kwargs)
+    return await tiers.acall(agent, llm, query, messages, validate, **kwargs)
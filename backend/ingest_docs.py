@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Ingest company handbooks and policies into the knowledge index that the HR
+and CEO agents retrieve from (see core/knowledge.py). Re-runs are
+incremental: only new and changed documents are embedded, and documents
+removed from the given directories are dropped from the index.
+"""
+
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from core.knowledge import KnowledgeIndex, build_embeddings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("paths", nargs="+", help="documents or directories (.md, .markdown, .txt, .rst)")
+    parser.add_argument("--index", default=os.getenv("KNOWLEDGE_INDEX_DIR", "knowledge_index"),
+                        help="index directory (KNOWLEDGE_INDEX_DIR)")
+    parser.add_argument("--workers", type=int, default=0, help="ingestion processes (default: one per core)")
+    parser.add_argument("--keep-missing", action="store_true",
+                        help="keep indexed documents that are no longer on disk")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="drop the index first (needed after changing the embedding model)")
+    parser.add_argument("--delete", action="store_true", help="remove the given documents from the index instead")
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    index = KnowledgeIndex(args.index, build_embeddings())
+    if args.delete:
+        print(f"🗑️  Removed {index.delete(args.paths)} documents from {args.index}")
+        return
+    stats = index.ingest(args.paths, prune=not args.keep_missing, rebuild=args.rebuild, workers=args.workers)
+    print(f"📚 {args.index} generation {stats['generation']}: {stats.get('added', 0)} added, "
+          f"{stats.get('updated', 0)} updated, {stats.get('unchanged', 0)} unchanged, "
+          f"{stats.get('deleted', 0)} deleted, {stats.get('chunks', 0)} chunks embedded in {stats['seconds']:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
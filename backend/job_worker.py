@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Run background job workers without the HTTP API, so the number of jobs in
+flight is set apart from the number of API workers (see core/jobs.py).
+Run the API with JOBS_WORKERS=0 and start as many of these as needed,
+pointed at the same JOBS_PATH. SIGTERM / Ctrl-C hands running jobs back
+to the queue.
+
+Workers log to stdout only: several processes rotating the API's LOG_FILE
+would lose segments. JOB_WORKER_LOG_FILE gives each worker a file of its
+own ("{pid}" is replaced by the process id).
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import signal
+
+from dotenv import load_dotenv
+
+logger = logging.getLogger("JobWorker")
+
+
+async def serve(workers: int):
+    from chat import run_job
+    from core.jobs import start_job_workers, stop_job_workers
+    from core.registry import preload
+
+    pool = start_job_workers(run_job, workers)
+    if pool is None:
+        logger.error("❌ No job workers started (JOBS_ENABLED=false or --workers 0)")
+        return
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
+    # Load the agents now rather than on the first job
+    await loop.run_in_executor(None, preload)
+    await stop.wait()
+    await stop_job_workers()
+
+
+def main():
+    load_dotenv()
+    # Before chat is imported, which configures logging
+    os.environ["LOG_FILE"] = os.getenv("JOB_WORKER_LOG_FILE", "").format(pid=os.getpid())
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("JOBS_WORKER_CONCURRENCY", "4")),
+                        help="jobs run at once by this process (JOBS_WORKER_CONCURRENCY)")
+    args = parser.parse_args()
+    asyncio.run(serve(args.workers))
+
+
+if __name__ == "__main__":
+    main()
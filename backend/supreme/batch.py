@@ -0,0 +1,227 @@
+"""
+Batch execution of the supreme agent for offline jobs (FAQ generation,
+regression runs over thousands of questions).
+
+In routed mode, queries the routing memo and fast-path router cannot place
+are classified `chunk_size` at a time with one multi-item supervisor call,
+and each query is handed to its sub-agent as soon as its chunk is
+classified. The other modes run arun_supreme_agent per query. At most
+`concurrency` LLM calls of a batch are in flight; results are yielded as
+they complete, or in input order.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Iterable, List, Optional
+
+from langchain.schema import HumanMessage, SystemMessage
+
+from prompts import PROMPT_SUPREME_BATCH
+from core.logs import Stopwatch, log_event
+from core.metrics import stage
+from core.registry import aget_agent_runner
+from core.resilience import DeadlineExceeded, acall_llm
+from core.scheduler import Overloaded, aslot, request_context
+from supreme import supreme
+
+logger = logging.getLogger("SupremeBatch")
+
+BATCH_CHUNK_SIZE = int(os.getenv("SUPREME_BATCH_CHUNK_SIZE", "20"))
+BATCH_CONCURRENCY = int(os.getenv("SUPREME_BATCH_CONCURRENCY", "16"))
+BATCH_TOKENS_PER_QUERY = 24
+
+LABEL_TO_NODE = {label: node for node, label in supreme.AGENT_LABELS.items()}
+
+
+def _classification_messages(queries: List[str]):
+    # One query per numbered line, so newlines inside a query are flattened;
+    # each query is cut to the supervisor's routing budget
+    fit = supreme.supervisor_prompt.fit_input
+    numbered = "\n".join(f"{i}. {' '.join(fit(query).split())}" for i, query in enumerate(queries, 1))
+    return [SystemMessage(content=PROMPT_SUPREME_BATCH), HumanMessage(content=numbered)]
+
+
+def _parse_batch_decisions(reply: str, count: int) -> dict:
+    """Map position -> agent node from the supervisor's JSON array; bad items are left out."""
+    cleaned = reply.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.strip("`").strip()
+        if cleaned.startswith("json"):
+            cleaned = cleaned[4:]
+    try:
+        items = json.loads(cleaned)
+    except json.JSONDecodeError as e:
+        logger.warning("❌ Batch routing reply is not JSON: %s", e)
+        return {}
+
+    decisions = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        index, agent = item.get("index"), item.get("agent")
+        node = LABEL_TO_NODE.get(agent) or (agent if agent in supreme.AGENT_LABELS else None)
+        if isinstance(index, int) and 1 <= index <= count and node:
+            decisions[index - 1] = node
+    return decisions
+
+
+async def _aclassify(queries: List[str], semaphore: asyncio.Semaphore) -> list:
+    """Routing decisions for a chunk of queries, with at most one batched LLM call."""
+    decisions = [None] * len(queries)
+    pending = []
+    for i, query in enumerate(queries):
+        update, prediction = await supreme._alocal_route(query)
+        if update:
+            decisions[i] = update["decision"]
+        else:
+            pending.append((i, query, prediction))
+    if not pending:
+        return decisions
+
+    messages = _classification_messages([query for _, query, _ in pending])
+    logger.info("🤔 Classifying %d queries in one supervisor call...", len(pending))
+    with stage("supervisor_batch", "Supervisor"):
+        async with semaphore:
+            async with aslot("Supervisor", supreme.supervisor_llm.model_name, *supreme._texts(messages)):
+                # One short {"index", "agent"} item per query, past the single-route token cap
+                reply = (await acall_llm(supreme.supervisor_llm, messages,
+                                         max_tokens=BATCH_TOKENS_PER_QUERY * len(pending))).content
+    parsed = _parse_batch_decisions(reply, len(pending))
+
+    for position, (i, query, prediction) in enumerate(pending):
+        node = parsed.get(position)
+        if node is None:
+            # Missing from the batch reply: ask the supervisor about this query alone
+            async with semaphore:
+                decisions[i] = (await supreme.asupreme_agent({"query": query}))["decision"]
+            continue
+        if prediction is not None:
+            supreme.fast_router.record_llm_decision(prediction, node)
+        if supreme.routing_memo is not None:
+            await supreme.routing_memo.aset(query, node)
+        decisions[i] = {"agent": node, "source": "llm_batch"}
+    return decisions
+
+
+def _error(index: int, query: str, error: Exception) -> dict:
+    logger.error("❌ Batch item %d failed: %s", index, error)
+    result = {"index": index, "query": query, "error": str(error)}
+    if isinstance(error, Overloaded):
+        result["status"] = error.status_code
+        result["retry_after"] = error.retry_after
+    elif isinstance(error, DeadlineExceeded):
+        result["status"] = error.status_code
+    return result
+
+
+async def _adispatch(index: int, query: str, decision: dict, semaphore, results: asyncio.Queue):
+    # Memoized or re-asked decisions can fan out to several agents
+    labels = [supreme.AGENT_LABELS[agent] for agent in supreme.decision_agents(decision)]
+    try:
+        async with semaphore:
+            runners = [await aget_agent_runner(label) for label in labels]
+            answers = await asyncio.gather(*[arun_agent(query) for arun_agent in runners])
+    except Exception as e:
+        await results.put(_error(index, query, e))
+        return
+    result = {"index": index, "query": query, "agent_used": labels[0], "response": answers[0],
+              "routing": decision["source"]}
+    if len(labels) > 1:
+        result["agents_used"] = labels
+        result["response"] = "\n\n".join(f"Agent {label}: {answer}" for label, answer in zip(labels, answers))
+    await results.put(result)
+
+
+async def _arun_routed_chunk(chunk: list, semaphore, results: asyncio.Queue):
+    try:
+        decisions = await _aclassify([query for _, query in chunk], semaphore)
+    except Exception as e:
+        for index, query in chunk:
+            await results.put(_error(index, query, e))
+        return
+    await asyncio.gather(*[
+        _adispatch(index, query, decision, semaphore, results)
+        for (index, query), decision in zip(chunk, decisions)
+    ])
+
+
+async def _arun_single(index: int, query: str, mode: str, semaphore, results: asyncio.Queue):
+    try:
+        async with semaphore:
+            reply = await supreme.arun_supreme_agent(query, mode)
+    except Exception as e:
+        await results.put(_error(index, query, e))
+        return
+    labels, response = supreme.split_answer(reply)
+    result = {
+        "index": index,
+        "query": query,
+        "agent_used": labels[0] if labels else "Supreme Agent",
+        "response": response,
+        "routing": mode,
+    }
+    if len(labels) > 1:
+        result["agents_used"] = labels
+    await results.put(result)
+
+
+async def astream_supreme_batch(queries: Iterable[str], mode: Optional[str] = None,
+                                concurrency: Optional[int] = None, chunk_size: Optional[int] = None,
+                                ordered: bool = False, priority: str = "low"):
+    """
+    Run every query through the supreme agent and yield one result dict per
+    query ({"index", "query", "agent_used", "response", "routing"}, plus
+    "agents_used" on fan-out, or {"index", "query", "error"}) as it
+    completes, or in input order.
+    Batch calls queue at `priority` in the scheduler and have no deadline.
+    """
+    queries = list(queries)
+    mode = (mode or supreme.SUPREME_MODE).lower()
+    if mode not in supreme.MODES:
+        raise ValueError(f"Unknown supreme agent mode: {mode} (expected one of {', '.join(supreme.MODES)})")
+
+    logger.info("📦 BATCH STARTED: %d queries, mode %s", len(queries), mode)
+    timer = Stopwatch()
+    semaphore = asyncio.Semaphore(concurrency or BATCH_CONCURRENCY)
+    results = asyncio.Queue()
+    indexed = list(enumerate(queries))
+    # Tasks copy the scheduler context when they are created
+    with request_context(priority, deadline_seconds=0):
+        if mode == "routed":
+            size = chunk_size or BATCH_CHUNK_SIZE
+            jobs = [_arun_routed_chunk(indexed[start:start + size], semaphore, results)
+                    for start in range(0, len(indexed), size)]
+        else:
+            jobs = [_arun_single(index, query, mode, semaphore, results) for index, query in indexed]
+        tasks = [asyncio.create_task(job) for job in jobs]
+
+    try:
+        next_index, buffered = 0, {}
+        for _ in range(len(queries)):
+            result = await results.get()
+            if not ordered:
+                yield result
+                continue
+            buffered[result["index"]] = result
+            while next_index in buffered:
+                yield buffered.pop(next_index)
+                next_index += 1
+        logger.info("📦 BATCH COMPLETED: %d queries", len(queries))
+        log_event("batch.completed", queries=len(queries), mode=mode, ms=timer.ms)
+    finally:
+        # Stops the remaining work if the consumer goes away early
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def run_supreme_batch(queries: Iterable[str], mode: Optional[str] = None, concurrency: Optional[int] = None,
+                      chunk_size: Optional[int] = None, priority: str = "low") -> List[dict]:
+    """Blocking counterpart of astream_supreme_batch; returns every result in input order."""
+    async def collect():
+        return [result async for result in astream_supreme_batch(
+            queries, mode, concurrency, chunk_size, ordered=True, priority=priority
+        )]
+    return asyncio.run(collect())
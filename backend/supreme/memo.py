@@ -0,0 +1,122 @@
+"""
+Memo of supervisor routing decisions (normalized query -> agent node).
+
+The supervisor runs at temperature 0, so a query it has already classified
+does not need another LLM round trip. Entries are scoped to a hash of the
+supervisor prompt and model: editing PROMPT_SUPREME (or switching models)
+makes every old entry unreachable, and stale rows are purged on startup.
+The SQLite backend lets every uvicorn worker on the host share one memo.
+"""
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Optional
+
+from core.text import normalize_query
+
+
+def prompt_version(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\n{prompt}".encode()).hexdigest()[:16]
+
+
+class RoutingMemo:
+    """Bounded LRU memo; in memory, or in a SQLite file when `path` is given."""
+
+    def __init__(self, version: str, max_entries: int = 5000, path: Optional[str] = None):
+        self.version = version
+        self.max_entries = max_entries
+        self.path = path
+        self.stats = Counter()
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS routing_memo ("
+                "query TEXT PRIMARY KEY, version TEXT NOT NULL, agent TEXT NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS routing_memo_accessed ON routing_memo(accessed_at)")
+            purged = self._conn.execute("DELETE FROM routing_memo WHERE version != ?", (version,)).rowcount
+            self.stats["invalidated"] += purged
+
+    def get(self, query: str) -> Optional[str]:
+        key = normalize_query(query)
+        with self._lock:
+            if self._conn is None:
+                agent = self._entries.get(key)
+                if agent is not None:
+                    self._entries.move_to_end(key)
+            else:
+                row = self._conn.execute(
+                    "SELECT agent FROM routing_memo WHERE query = ? AND version = ?", (key, self.version)
+                ).fetchone()
+                agent = row[0] if row else None
+                if agent is not None:
+                    self._conn.execute("UPDATE routing_memo SET accessed_at = ? WHERE query = ?", (time.time(), key))
+            self.stats["hits" if agent is not None else "misses"] += 1
+            return agent
+
+    def set(self, query: str, agent: str):
+        key = normalize_query(query)
+        with self._lock:
+            if self._conn is None:
+                self._entries[key] = agent
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats["evictions"] += 1
+                return
+
+            self._conn.execute(
+                "INSERT OR REPLACE INTO routing_memo (query, version, agent, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, self.version, agent, time.time()),
+            )
+            overflow = self._conn.execute("SELECT COUNT(*) FROM routing_memo").fetchone()[0] - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM routing_memo WHERE query IN "
+                    "(SELECT query FROM routing_memo ORDER BY accessed_at LIMIT ?)",
+                    (overflow,),
+                )
+                self.stats["evictions"] += overflow
+
+    async def aget(self, query: str) -> Optional[str]:
+        """get() for the event loop: SQLite lookups run in a thread."""
+        if self._conn is None:
+            return self.get(query)
+        return await asyncio.to_thread(self.get, query)
+
+    async def aset(self, query: str, agent: str):
+        if self._conn is None:
+            return self.set(query, agent)
+        await asyncio.to_thread(self.set, query, agent)
+
+    def __len__(self):
+        if self._conn is None:
+            return len(self._entries)
+        return self._conn.execute("SELECT COUNT(*) FROM routing_memo").fetchone()[0]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats.get("hits", 0) + stats.get("misses", 0)
+        stats["entries"] = len(self)
+        stats["hit_rate"] = stats.get("hits", 0) / lookups if lookups else 0.0
+        return stats
+
+
+def build_memo(prompt: str, model: str) -> Optional[RoutingMemo]:
+    """Create the routing memo from ROUTING_MEMO_* environment variables."""
+    backend = os.getenv("ROUTING_MEMO_BACKEND", "memory").lower()
+    if backend in ("off", "none", "false"):
+        return None
+    path = os.getenv("ROUTING_MEMO_PATH", "routing_memo.sqlite3") if backend == "sqlite" else None
+    max_entries = int(os.getenv("ROUTING_MEMO_MAX_ENTRIES", "5000"))
+    return RoutingMemo(prompt_version(prompt, model), max_entries=max_entries, path=path)
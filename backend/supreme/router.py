@@ -0,0 +1,217 @@
+"""
+Local fast-path router for the Supreme Agent.
+
+Scores a query against each sub-agent with keyword rules plus a small TF-IDF
+nearest-centroid model trained on labeled routing examples (and, optionally,
+on decisions the supervisor LLM logged to supreme_agent.log). Confident
+predictions skip the supervisor LLM call; everything else falls through to it.
+"""
+
+import ast
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+EXAMPLES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "routing_examples.jsonl")
+
+LABEL_TO_NODE = {
+    "HR": "agent_hr",
+    "CEO": "agent_ceo",
+    "Developer": "agent_developer",
+}
+
+# Keyword rules: a hit adds RULE_WEIGHT to the label's score
+RULES = {
+    "agent_hr": re.compile(
+        r"\b(pto|leave|vacation|time off|holiday|benefits?|insurance|salary|salaries|payroll|bonus|"
+        r"hiring|hire|recruit\w*|onboarding|probation|performance review|promotion|harass\w*|"
+        r"employees?|maternity|paternity|parental|sick|resign\w*|enrollment|coworker|manager)\b"
+    ),
+    "agent_ceo": re.compile(
+        r"\b(strategy|strategic|vision|mission|revenue|profit\w*|market|markets|competitors?|"
+        r"quarter|investors?|funding|ipo|acquisitions?|board|business|outlook|goals)\b"
+    ),
+    "agent_developer": re.compile(
+        r"\b(code|coding|python|java|javascript|typescript|react|node\.?js|golang|rust|sql|"
+        r"database|postgres\w*|mongodb|api|apis|bug|bugs|debug\w*|error|exception|typeerror|"
+        r"docker|kubernetes|deploy\w*|ci/cd|pipeline|git|refactor\w*|function|unit tests?|"
+        r"algorithm|complexity|cache|caching|script|microservices?|schema)\b"
+    ),
+}
+RULE_WEIGHT = 0.35
+# A share of the total says nothing when the total is tiny ("a", "who are
+# you"): the winner also needs this much absolute score, more than one
+# rule hit on its own
+MIN_SCORE = 0.5
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _tokens(text: str):
+    return TOKEN_RE.findall(text.lower())
+
+
+@dataclass
+class RoutePrediction:
+    agent: str
+    confidence: float
+    scores: dict
+
+    def confident(self, threshold: float, min_score: float = MIN_SCORE) -> bool:
+        return self.confidence >= threshold and self.scores.get(self.agent, 0.0) >= min_score
+
+
+class FastRouter:
+    """Keyword rules + TF-IDF nearest-centroid classifier over the three agents."""
+
+    def __init__(self, threshold: float = 0.6, min_score: float = MIN_SCORE):
+        self.threshold = threshold
+        self.min_score = min_score
+        self.idf = {}
+        self.centroids = {}
+        self._lock = threading.Lock()
+        self.stats = Counter()
+
+    def fit(self, examples):
+        """Train on (query, agent_node) pairs."""
+        docs = [(Counter(_tokens(query)), agent) for query, agent in examples]
+        if not docs:
+            return self
+
+        df = Counter()
+        for counts, _ in docs:
+            df.update(counts.keys())
+        self.idf = {term: math.log((1 + len(docs)) / (1 + n)) + 1 for term, n in df.items()}
+
+        sums = {}
+        for counts, agent in docs:
+            centroid = sums.setdefault(agent, Counter())
+            for term, weight in self._vector(counts).items():
+                centroid[term] += weight
+        self.centroids = {agent: self._unit(vector) for agent, vector in sums.items()}
+        return self
+
+    def _vector(self, counts):
+        return self._unit({term: tf * self.idf[term] for term, tf in counts.items() if term in self.idf})
+
+    @staticmethod
+    def _unit(vector):
+        norm = math.sqrt(sum(v * v for v in vector.values()))
+        return {term: v / norm for term, v in vector.items()} if norm else {}
+
+    def predict(self, query: str) -> RoutePrediction:
+        """Score the query; confidence is the winner's share of the total score (see MIN_SCORE)."""
+        vector = self._vector(Counter(_tokens(query)))
+        lowered = query.lower()
+        scores = {}
+        for agent in RULES:
+            centroid = self.centroids.get(agent, {})
+            similarity = sum(weight * centroid.get(term, 0.0) for term, weight in vector.items())
+            rule_hits = len(RULES[agent].findall(lowered))
+            scores[agent] = similarity + RULE_WEIGHT * min(rule_hits, 2)
+
+        total = sum(scores.values())
+        best = max(scores, key=scores.get)
+        confidence = scores[best] / total if total else 0.0
+        return RoutePrediction(agent=best, confidence=confidence, scores=scores)
+
+    def route(self, query: str) -> tuple:
+        """
+        Return (agent_node or None, prediction). The agent is only returned when
+        the prediction clears the threshold; None means ask the supervisor LLM.
+        """
+        prediction = self.predict(query)
+        with self._lock:
+            self.stats["requests"] += 1
+            if prediction.confident(self.threshold, self.min_score):
+                self.stats["fast_path_hits"] += 1
+                return prediction.agent, prediction
+            self.stats["fallthroughs"] += 1
+        return None, prediction
+
+    def record_llm_decision(self, prediction: RoutePrediction, llm_agent: str):
+        """Track how often the local prediction agrees with the supervisor LLM."""
+        with self._lock:
+            self.stats["llm_compared"] += 1
+            if prediction.agent == llm_agent:
+                self.stats["llm_agreements"] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        requests = stats.get("requests", 0)
+        compared = stats.get("llm_compared", 0)
+        stats["threshold"] = self.threshold
+        stats["min_score"] = self.min_score
+        stats["fast_path_hit_rate"] = stats.get("fast_path_hits", 0) / requests if requests else 0.0
+        stats["llm_agreement_rate"] = stats.get("llm_agreements", 0) / compared if compared else None
+        return stats
+
+
+def load_examples(path: str = EXAMPLES_FILE):
+    """Read labeled {"query", "agent"} JSONL rows as (query, agent_node) pairs."""
+    examples = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                examples.append((row["query"], LABEL_TO_NODE.get(row["agent"], row["agent"])))
+    return examples
+
+
+# Written by supreme._parse_decision: ✅ Supervisor routed '<query>' → <label>
+SUPERVISOR_LOG_RE = re.compile(r"✅ Supervisor routed (['\"].*['\"]) → (\w+)\s*$")
+
+
+def load_examples_from_log(path: str = "supreme_agent.log"):
+    """
+    Recover (query, agent_node) pairs from decisions the supervisor LLM logged
+    ("Supervisor routed" lines, or the older "Incoming Query" / "Selected
+    Agent" pairs). Fast-path decisions are logged differently, so the router
+    never retrains on its own output.
+    """
+    examples = []
+    query = None
+    try:
+        with open(path, errors="replace") as f:
+            for line in f:
+                match = SUPERVISOR_LOG_RE.search(line)
+                if match:
+                    label = match.group(2)
+                    if label in LABEL_TO_NODE:
+                        try:
+                            examples.append((ast.literal_eval(match.group(1)), LABEL_TO_NODE[label]))
+                        except (ValueError, SyntaxError):
+                            # Truncated or garbled line: skip it rather than fail the import
+                            continue
+                elif "📝 Incoming Query: " in line:
+                    query = line.split("📝 Incoming Query: ", 1)[1].strip()
+                elif "• Selected Agent: " in line and query:
+                    label = line.split("• Selected Agent: ", 1)[1].strip().replace("Agent ", "")
+                    if label in LABEL_TO_NODE:
+                        examples.append((query, LABEL_TO_NODE[label]))
+                    query = None
+    except FileNotFoundError:
+        pass
+    return examples
+
+
+def build_router(threshold: Optional[float] = None, log_path: Optional[str] = None,
+                 min_score: Optional[float] = None) -> FastRouter:
+    """Create a router trained on the bundled examples plus any logged decisions."""
+    if threshold is None:
+        threshold = float(os.getenv("FAST_ROUTER_THRESHOLD", "0.6"))
+    if min_score is None:
+        min_score = float(os.getenv("FAST_ROUTER_MIN_SCORE", str(MIN_SCORE)))
+    if log_path is None:
+        log_path = os.getenv("FAST_ROUTER_TRAIN_LOG")
+
+    examples = load_examples()
+    if log_path:
+        examples += load_examples_from_log(log_path)
+    return FastRouter(threshold=threshold, min_score=min_score).fit(examples)
@@ -1,223 +1,688 @@
+import asyncio
 import json
 import logging
-from typing import TypedDict, Annotated
-from langchain_openai import ChatOpenAI
+import re
+from collections import Counter
+from typing import TypedDict, Annotated, Optional
 from langgraph.graph import StateGraph, START, END
+from langgraph.types import Send
 from langgraph.graph.message import add_messages
-from langchain.schema import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableLambda
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from prompts import PROMPT_SUPREME
-from agents.hr import run_hr
-from agents.ceo import run_ceo
-from agents.developer import run_developer
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('supreme_agent.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+from prompts import PROMPT_SUPREME, PROMPT_COMBINED
+from supreme.router import build_router
+from supreme.memo import build_memo
+from core.clients import chat_model
+from core.registry import get_agent_runner, aget_agent_runner
+from core.resilience import acall_llm, call_llm, relay
+from core.scheduler import slot, aslot
+from core.logs import Stopwatch, configure_logging, log_event
+from core.metrics import ROUTING_DECISIONS, instrumented
+from core.prompting import agent_prompt
+from core.singleflight import get_singleflight, request_key
+from core.tiers import acall_tiered, budget_model, call_tiered, model_key
+
+# Configure logging (LOG_FORMAT, LOG_FILE, ... see core.logs)
+configure_logging()
 logger = logging.getLogger('SupremeAgent')
 
 # Define the state structure
 class State(TypedDict):
     messages: Annotated[list, add_messages]
+    query: str  # the user's message, as the agents receive it
     decision: dict
+    mode: str
+
+# Display names for the graph's agent nodes
+AGENT_LABELS = {
+    "agent_hr": "HR",
+    "agent_ceo": "CEO",
+    "agent_developer": "Developer",
+}
+
+# Supervisor LLM. Compact routing protocol: the reply only names the agent(s),
+# constrained by a JSON schema (structured outputs) and capped at
+# SUPERVISOR_MAX_TOKENS, so decode time no longer grows with the query. Set
+# SUPERVISOR_STRUCTURED_OUTPUT=false for servers without json_schema support.
+SUPERVISOR_MAX_TOKENS = int(os.getenv("SUPERVISOR_MAX_TOKENS", "24"))
+SUPERVISOR_STRUCTURED_OUTPUT = os.getenv("SUPERVISOR_STRUCTURED_OUTPUT", "true").lower() == "true"
+_AGENT_ENUM = {"type": "string", "enum": ["HR", "CEO", "Developer"]}
+ROUTING_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "route",
+        "strict": True,
+        "schema": {
+            "type": "object",
+            "properties": {"agent": {"anyOf": [_AGENT_ENUM, {"type": "array", "items": _AGENT_ENUM}]}},
+            "required": ["agent"],
+            "additionalProperties": False,
+        },
+    },
+}
+SUPERVISOR_CALL_KWARGS = {"response_format": ROUTING_RESPONSE_FORMAT} if SUPERVISOR_STRUCTURED_OUTPUT else {}
+supervisor_llm = chat_model(model="gpt-4o", temperature=0.0, max_tokens=SUPERVISOR_MAX_TOKENS or None)
+# Routing only needs the gist of a message: PROMPT_ROUTING_INPUT_TOKENS
+supervisor_prompt = agent_prompt("Supervisor", PROMPT_SUPREME, supervisor_llm.model_name, routing=True)
+
+# Local classifier that answers confident routing decisions without the LLM
+# (threshold via FAST_ROUTER_THRESHOLD, disable with FAST_ROUTER_ENABLED=false)
+FAST_ROUTER_ENABLED = os.getenv("FAST_ROUTER_ENABLED", "true").lower() == "true"
+fast_router = build_router()
+
+# Memo of earlier supervisor decisions, scoped to the current PROMPT_SUPREME
+# (ROUTING_MEMO_BACKEND=memory|sqlite|off; sqlite is shared by all workers)
+routing_memo = build_memo(PROMPT_SUPREME, model_key("Supervisor", supervisor_llm))
+
+# Execution modes: "routed" (supervisor call, then sub-agent call),
+# "combined" (one call picks the persona and answers) or "speculative"
+# (supervisor and likely sub-agents run at the same time). SUPREME_MODE sets
+# the default; callers can override it per request.
+MODES = ("routed", "combined", "speculative")
+SUPREME_MODE = os.getenv("SUPREME_MODE", "routed").lower()
+combined_llm = chat_model(model="gpt-4o", temperature=0.3)
+combined_prompt = agent_prompt("Combined", PROMPT_COMBINED, combined_llm.model_name)
+
+# How many candidate sub-agents speculative mode starts next to the supervisor
+SPECULATIVE_WIDTH = int(os.getenv("SPECULATIVE_WIDTH", "1"))
+speculation_stats = Counter()
 
-# Supervisor LLM
-supervisor_llm = ChatOpenAI(model="gpt-4o", temperature=0.0)
+# Fan-out: the supervisor may name several agents for a query that spans
+# departments; they answer as parallel branches and "aggregate" joins the
+# answers. FANOUT_MAX_AGENTS caps the width (1 turns fan-out off).
+FANOUT_MAX_AGENTS = max(1, int(os.getenv("FANOUT_MAX_AGENTS", "2")))
+fanout_stats = Counter()
+COMBINED_HEADER_RE = re.compile(r"^\s*AGENT:\s*(HR|CEO|Developer)\s*$", re.IGNORECASE)
+ROUTE_OBJECT_RE = re.compile(r"\{.*\}", re.DOTALL)
+ROUTE_LABEL_RE = re.compile(r"\b(HR|CEO|Developer|agent_hr|agent_ceo|agent_developer)\b")
+
+# Map agent names to internal routing names
+AGENT_NODES = {
+    "HR": "agent_hr",
+    "CEO": "agent_ceo",
+    "Developer": "agent_developer",
+    "agent_hr": "agent_hr",
+    "agent_ceo": "agent_ceo",
+    "agent_developer": "agent_developer"
+}
+
+def _texts(messages):
+    """Message contents, for the scheduler's token estimate."""
+    return [message.content for message in messages]
 
 # Define supervisor as a React-style agent that chooses sub-agents as tools
-def supreme_agent(state: State):
-    # Build prompt with conversation history
-    history = state["messages"]
-    user_query = history[-1] if isinstance(history[-1], str) else history[-1].content
+def _supervisor_prompt(state: State):
+    """Log the routing criteria and build the supervisor messages for the latest query."""
+    user_query = state["query"]
     
-    logger.info("=" * 80)
     logger.info("🧠 SUPREME AGENT - ROUTING DECISION")
-    logger.info("=" * 80)
-    logger.info(f"📝 Incoming Query: {user_query}")
-    logger.info(f"📋 Decision Criteria:")
-    logger.info(f"   • Employee related questions → HR")
-    logger.info(f"   • General company related questions → CEO")
-    logger.info(f"   • Technical questions or code-related queries → Developer")
     
-    prompt = SystemMessage(content=PROMPT_SUPREME)
-    user_msg = HumanMessage(content=user_query)
+    return user_query, supervisor_prompt.messages(user_query, history=[])
 
-    # Supervisor decides which agent to call
-    logger.info("🤔 Analyzing query with GPT-4o...")
-    decision_response = supervisor_llm.invoke([prompt, user_msg]).content
-    logger.info(f"🎯 Raw LLM Decision Response: {decision_response}")
-    
-    try:
-        # Clean up the response in case it's wrapped in markdown code blocks
-        cleaned_response = decision_response.strip()
-        if cleaned_response.startswith('```json'):
-            cleaned_response = cleaned_response[7:]  # Remove ```json
-        if cleaned_response.endswith('```'):
-            cleaned_response = cleaned_response[:-3]  # Remove ```
-        cleaned_response = cleaned_response.strip()
-        
-        decision = json.loads(cleaned_response)
-        raw_agent_name = decision.get("agent", "unknown")
-        
-        # Map agent names to internal routing names
-        agent_mapping = {
-            "HR": "agent_hr",
-            "CEO": "agent_ceo", 
-            "Developer": "agent_developer",
-            "agent_hr": "agent_hr",
-            "agent_ceo": "agent_ceo",
-            "agent_developer": "agent_developer"
-        }
-        
-        agent_name = agent_mapping.get(raw_agent_name, "agent_ceo")  # Default to CEO
-        agent_display = f"Agent {raw_agent_name}" if raw_agent_name in ["HR", "CEO", "Developer"] else raw_agent_name
-        
-        # Update the decision with the mapped agent name
-        decision["agent"] = agent_name
-        
-        logger.info(f"✅ Decision Successfully Parsed:")
-        logger.info(f"   • Selected Agent: {agent_display}")
-        logger.info(f"   • Query to Process: {decision.get('query', 'N/A')}")
-        logger.info("=" * 80)
-        
-        return {"decision": decision}
-    except json.JSONDecodeError as e:
-        logger.warning(f"❌ JSON Parsing Failed: {e}")
-        logger.warning(f"🔄 Falling back to CEO Agent")
-        # Fallback to agent_ceo if parsing fails
-        fallback_decision = {"agent": "agent_ceo", "query": user_query}
-        logger.info(f"✅ Fallback Decision: CEO Agent")
-        logger.info("=" * 80)
-        return {"decision": fallback_decision}
-
-# Wrap agent_1 and agent_2 as tools for the supervisor
-def tool_hr(state: State):
-    decision = state["decision"]
-    query = decision["query"]
+def decision_agents(decision: dict) -> list:
+    """The agent nodes a decision consults, primary first."""
+    return decision.get("agents") or [decision["agent"]]
+
+def _set_agents(decision: dict, agents: list) -> dict:
+    # "agent" stays the primary node for single-agent consumers (memo, batch, speculation)
+    decision["agent"] = agents[0]
+    if len(agents) > 1:
+        decision["agents"] = agents
+    else:
+        decision.pop("agents", None)
+    return decision
+
+def _reply_agents(reply: str) -> list:
+    """Agent names in a supervisor reply: its JSON object's "agent", else any labels it mentions."""
+    match = ROUTE_OBJECT_RE.search(reply)  # tolerates code fences and text around the object
+    if match:
+        try:
+            named = json.loads(match.group(0)).get("agent")
+            return named if isinstance(named, list) else [named]
+        except (json.JSONDecodeError, AttributeError) as e:
+            logger.warning("❌ JSON Parsing Failed: %s, looking for agent names instead", e)
+    # Truncated or free-text reply
+    return ROUTE_LABEL_RE.findall(reply)
+
+def _route_check(reply: str) -> Optional[str]:
+    """Tier validation of a supervisor reply: 'no_agent' unless it names a known agent."""
+    return None if any(AGENT_NODES.get(name) for name in _reply_agents(reply) if isinstance(name, str)) else "no_agent"
+
+def _parse_decision(user_query: str, decision_response: str):
+    """Turn the supervisor's raw reply into a routing decision for the graph."""
+    logger.debug("🎯 Raw LLM Decision Response: %s", decision_response)
     
-    logger.info("🏢 AGENT HR - PROCESSING QUERY")
-    logger.info("=" * 60)
-    logger.info(f"📝 Query: {query}")
-    logger.info("⚙️  Processing with HR agent (web search capability)...")
+    named = [AGENT_NODES.get(name) for name in _reply_agents(decision_response) if isinstance(name, str)]
+    agents = list(dict.fromkeys(agent for agent in named if agent))[:FANOUT_MAX_AGENTS]
+    if not agents:
+        logger.warning("❌ No agent in supervisor reply %r, falling back to CEO Agent", decision_response[:200])
+        return {"decision": {"agent": "agent_ceo", "source": "fallback"}}
     
-    result = run_hr(query)
+    logger.info("✅ Supervisor routed %r → %s", user_query, AGENT_LABELS[agents[0]])
+    if len(agents) > 1:
+        logger.info("🔀 Fanning out to %s", ", ".join(AGENT_LABELS[agent] for agent in agents))
     
-    logger.info(f"✅ Agent HR Response Generated:")
-    logger.info(f"📄 Response Preview: {result[:200]}{'...' if len(result) > 200 else ''}")
-    logger.info("=" * 60)
+    return {"decision": _set_agents({"source": "llm"}, agents)}
+
+def _fast_route(user_query: str):
+    """Try the local router first; returns (decision update or None, prediction)."""
+    if not FAST_ROUTER_ENABLED:
+        return None, None
+
+    agent, prediction = fast_router.route(user_query)
+    if agent:
+        logger.info("⚡ Fast-path routing → %s (confidence %.2f)", AGENT_LABELS[agent], prediction.confidence)
+        return {"decision": {"agent": agent, "source": "fast_path"}}, prediction
+
+    logger.info("🐢 Fast-path not confident (%.2f < %s)", prediction.confidence, fast_router.threshold)
+    return None, prediction
+
+def _memoized(agent: Optional[str]):
+    if not agent:
+        return None
+    # Fan-out decisions are memoized as "agent_hr,agent_developer"
+    agents = agent.split(",")[:FANOUT_MAX_AGENTS]
+    logger.info("🧾 Memoized routing → %s", ", ".join(AGENT_LABELS[agent] for agent in agents))
+    return {"decision": _set_agents({"source": "memo"}, agents)}
+
+def _local_route(user_query: str):
+    """Answer from the routing memo, then the fast-path router, without the LLM."""
+    memoized = _memoized(routing_memo.get(user_query)) if routing_memo is not None else None
+    return (memoized, None) if memoized else _fast_route(user_query)
+
+async def _alocal_route(user_query: str):
+    """_local_route for the event loop: a SQLite memo is read in a thread."""
+    memoized = _memoized(await routing_memo.aget(user_query)) if routing_memo is not None else None
+    return (memoized, None) if memoized else _fast_route(user_query)
+
+def _route_event(update: dict, timer: Stopwatch) -> dict:
+    """Emit the route.decided stage event for a routing update and pass it on."""
+    decision = update["decision"]
+    labels = [AGENT_LABELS[agent] for agent in decision_agents(decision)]
+    for label in labels:
+        ROUTING_DECISIONS.inc(label, decision["source"])
+    log_event("route.decided", agent=labels[0], source=decision["source"], ms=timer.ms,
+              agents=labels if len(labels) > 1 else None)
+    return update
+
+def _parsed_decision(user_query: str, decision_response: str, prediction):
+    update = _parse_decision(user_query, decision_response)
+    if prediction is not None:
+        fast_router.record_llm_decision(prediction, update["decision"]["agent"])
+    return update
+
+def _memo_entry(decision: dict) -> Optional[str]:
+    if routing_memo is not None and decision["source"] == "llm":
+        return ",".join(decision_agents(decision))
+    return None
+
+def _llm_decision(user_query: str, decision_response: str, prediction):
+    update = _parsed_decision(user_query, decision_response, prediction)
+    entry = _memo_entry(update["decision"])
+    if entry:
+        routing_memo.set(user_query, entry)
+    return update
+
+async def _allm_decision(user_query: str, decision_response: str, prediction):
+    update = _parsed_decision(user_query, decision_response, prediction)
+    entry = _memo_entry(update["decision"])
+    if entry:
+        await routing_memo.aset(user_query, entry)
+    return update
+
+@instrumented("supervisor", "Supervisor")
+def supreme_agent(state: State):
+    timer = Stopwatch()
+    user_query, messages = _supervisor_prompt(state)
+    local_decision, prediction = _local_route(user_query)
+    if local_decision:
+        return _route_event(local_decision, timer)
+
+    # Supervisor decides which agent to call
+    logger.info("🤔 Analyzing query with the supervisor model...")
+    with slot("Supervisor", budget_model(supervisor_llm), *_texts(messages)):
+        decision_response = call_tiered("Supervisor", supervisor_llm, user_query, messages, _route_check,
+                                        **SUPERVISOR_CALL_KWARGS).content
+    return _route_event(_llm_decision(user_query, decision_response, prediction), timer)
+
+@instrumented("supervisor", "Supervisor")
+async def asupreme_agent(state: State):
+    timer = Stopwatch()
+    user_query, messages = _supervisor_prompt(state)
+    local_decision, prediction = await _alocal_route(user_query)
+    if local_decision:
+        return _route_event(local_decision, timer)
+
+    # Supervisor decides which agent to call
+    logger.info("🤔 Analyzing query with the supervisor model...")
+    async with aslot("Supervisor", budget_model(supervisor_llm), *_texts(messages)):
+        decision_response = (await acall_tiered("Supervisor", supervisor_llm, user_query, messages, _route_check,
+                                                **SUPERVISOR_CALL_KWARGS)).content
+    return _route_event(await _allm_decision(user_query, decision_response, prediction), timer)
+
+# Wrap the sub-agents as tools for the supervisor
+def _log_agent_start(banner: str, label: str, capability: str, query: str) -> Stopwatch:
+    logger.info("%s: processing with %s agent (%s)...", banner, label, capability)
+    return Stopwatch()
+
+def _agent_result(label: str, result: str, timer: Optional[Stopwatch] = None):
+    logger.info("✅ Agent %s Response Generated: %d characters", label, len(result))
+    logger.debug("📄 Response Preview: %.200s", result)
+    log_event("agent.completed", agent=label, chars=len(result), ms=timer.ms if timer else None)
     
-    return {"messages": [f"Agent HR: {result}"]}
+    return {"messages": [f"Agent {label}: {result}"]}
 
+@instrumented("node", "HR")
+def tool_hr(state: State):
+    query = state["query"]
+    timer = _log_agent_start("🏢 AGENT HR - PROCESSING QUERY", "HR", "web search capability", query)
+    run_hr = get_agent_runner("HR", asynchronous=False)
+    return _agent_result("HR", run_hr(query), timer)
+
+@instrumented("node", "HR")
+async def atool_hr(state: State):
+    query = state["query"]
+    timer = _log_agent_start("🏢 AGENT HR - PROCESSING QUERY", "HR", "web search capability", query)
+    arun_hr = await aget_agent_runner("HR")
+    return _agent_result("HR", await arun_hr(query), timer)
+
+@instrumented("node", "CEO")
 def tool_ceo(state: State):
-    decision = state["decision"]
-    query = decision["query"]
-    
-    logger.info("👔 AGENT CEO - PROCESSING QUERY")
-    logger.info("=" * 60)
-    logger.info(f"📝 Query: {query}")
-    logger.info("⚙️  Processing with CEO agent (general conversation)...")
-    
-    result = run_ceo(query)
-    
-    logger.info(f"✅ Agent CEO Response Generated:")
-    logger.info(f"📄 Response Preview: {result[:200]}{'...' if len(result) > 200 else ''}")
-    logger.info("=" * 60)
-    
-    return {"messages": [f"Agent CEO: {result}"]}
+    query = state["query"]
+    timer = _log_agent_start("👔 AGENT CEO - PROCESSING QUERY", "CEO", "general conversation", query)
+    run_ceo = get_agent_runner("CEO", asynchronous=False)
+    return _agent_result("CEO", run_ceo(query), timer)
+
+@instrumented("node", "CEO")
+async def atool_ceo(state: State):
+    query = state["query"]
+    timer = _log_agent_start("👔 AGENT CEO - PROCESSING QUERY", "CEO", "general conversation", query)
+    arun_ceo = await aget_agent_runner("CEO")
+    return _agent_result("CEO", await arun_ceo(query), timer)
 
+@instrumented("node", "Developer")
 def tool_developer(state: State):
-    decision = state["decision"]
-    query = decision["query"]
-    
-    logger.info("💻 AGENT DEVELOPER - PROCESSING QUERY")
-    logger.info("=" * 60)
-    logger.info(f"📝 Query: {query}")
-    logger.info("⚙️  Processing with Developer agent (technical expertise)...")
-    
-    result = run_developer(query)
-    
-    logger.info(f"✅ Agent Developer Response Generated:")
-    logger.info(f"📄 Response Preview: {result[:200]}{'...' if len(result) > 200 else ''}")
-    logger.info("=" * 60)
-    
-    return {"messages": [f"Agent Developer: {result}"]}
+    query = state["query"]
+    timer = _log_agent_start("💻 AGENT DEVELOPER - PROCESSING QUERY", "Developer", "technical expertise", query)
+    run_developer = get_agent_runner("Developer", asynchronous=False)
+    return _agent_result("Developer", run_developer(query), timer)
+
+@instrumented("node", "Developer")
+async def atool_developer(state: State):
+    query = state["query"]
+    timer = _log_agent_start("💻 AGENT DEVELOPER - PROCESSING QUERY", "Developer", "technical expertise", query)
+    arun_developer = await aget_agent_runner("Developer")
+    return _agent_result("Developer", await arun_developer(query), timer)
+
+# Single-call mode: the persona prompts are merged into PROMPT_COMBINED and
+# the reply starts with an "AGENT: <label>" line
+def _split_combined(text: str):
+    """Split a combined reply into (agent node, answer); unlabeled replies go to CEO."""
+    first_line, _, rest = text.partition("\n")
+    match = COMBINED_HEADER_RE.match(first_line)
+    if not match:
+        logger.warning("❌ Combined reply has no AGENT header, attributing it to CEO")
+        return "agent_ceo", text.strip()
+    label = match.group(1).lower()
+    agent = {"hr": "agent_hr", "ceo": "agent_ceo", "developer": "agent_developer"}[label]
+    return agent, rest.strip()
+
+def _combined_messages(state: State):
+    query = state["query"]
+    logger.info("🧩 SINGLE-CALL MODE - ROUTING AND ANSWERING TOGETHER for %r", query)
+    return query, combined_prompt.messages(query)
+
+def _combined_result(query: str, reply: str, timer: Stopwatch):
+    agent, answer = _split_combined(reply)
+    update = _route_event({"decision": {"agent": agent, "source": "combined"}}, timer)
+    update.update(_agent_result(AGENT_LABELS[agent], answer, timer))
+    return update
+
+@instrumented("combined", "Combined")
+def combined_agent(state: State):
+    timer = Stopwatch()
+    query, messages = _combined_messages(state)
+    with slot("Combined", combined_llm.model_name, *_texts(messages)):
+        reply = call_llm(combined_llm, messages).content
+    return _combined_result(query, reply, timer)
+
+@instrumented("combined", "Combined")
+async def acombined_agent(state: State):
+    timer = Stopwatch()
+    query, messages = _combined_messages(state)
+    async with aslot("Combined", combined_llm.model_name, *_texts(messages)):
+        reply = (await acall_llm(combined_llm, messages)).content
+    return _combined_result(query, reply, timer)
+
+# Fan-out: join the branch answers in the supervisor's order; no LLM call,
+# each answer keeps its "Agent X:" header
+def _message_text(message) -> str:
+    return message if isinstance(message, str) else message.content
+
+AGENT_SECTION_RE = re.compile(r"(?:^|\n\n)Agent (HR|CEO|Developer): ")
+
+def split_answer(reply: str):
+    """(labels, text) of a final reply: a single answer loses its "Agent X: " header, a merged one keeps them."""
+    labels = list(dict.fromkeys(AGENT_SECTION_RE.findall(reply))) if reply.startswith("Agent ") else []
+    if len(labels) == 1:
+        return labels, reply.removeprefix(f"Agent {labels[0]}: ")
+    return labels, reply
+
+def merge_answers(messages: list, agents: list) -> str:
+    """The "Agent X: ..." answers for `agents`, in that order, as one message."""
+    answers = {}
+    for message in messages:
+        text = _message_text(message)
+        for agent in agents:
+            if text.startswith(f"Agent {AGENT_LABELS[agent]}: "):
+                answers[agent] = text
+    return "\n\n".join(answers[agent] for agent in agents if agent in answers)
 
-# Build the graph
+def aggregate(state: State):
+    agents = decision_agents(state["decision"])
+    if len(agents) == 1:
+        return {}
+    merged = merge_answers(state["messages"][1:], agents)
+    logger.info("🔀 Merged %d answers: %d characters", len(agents), len(merged))
+    return {"messages": [merged]}
+
+# Build the graph (every node has a sync and an async implementation so the
+# same compiled graph serves both invoke() and ainvoke())
 builder = StateGraph(State)
-builder.add_node("supervisor", supreme_agent)
-builder.add_node("agent_hr", tool_hr)
-builder.add_node("agent_ceo", tool_ceo)
-builder.add_node("agent_developer", tool_developer)
+builder.add_node("supervisor", RunnableLambda(supreme_agent, afunc=asupreme_agent))
+builder.add_node("agent_hr", RunnableLambda(tool_hr, afunc=atool_hr))
+builder.add_node("agent_ceo", RunnableLambda(tool_ceo, afunc=atool_ceo))
+builder.add_node("agent_developer", RunnableLambda(tool_developer, afunc=atool_developer))
+builder.add_node("combined", RunnableLambda(combined_agent, afunc=acombined_agent))
+
+# Start at supervisor, or answer in one call in combined mode
+def route_mode(state: State):
+    return "combined" if state.get("mode") == "combined" else "supervisor"
 
-# Start at supervisor
-builder.add_edge(START, "supervisor")
+builder.add_conditional_edges(START, route_mode, {"supervisor": "supervisor", "combined": "combined"})
 
-# Supervisor → chosen agent
+# Supervisor → chosen agent, or one parallel branch per agent on fan-out
 def route_decision(state: State):
-    return state["decision"]["agent"]
-
-builder.add_conditional_edges(
-    "supervisor",
-    route_decision,
-    {
-        "agent_hr": "agent_hr",
-        "agent_ceo": "agent_ceo",
-        "agent_developer": "agent_developer"
-    }
-)
+    decision = state["decision"]
+    agents = decision_agents(decision)
+    if len(agents) == 1:
+        return agents[0]
+    fanout_stats["requests"] += 1
+    fanout_stats["branches"] += len(agents)
+    return [Send(agent, {"query": state["query"], "decision": {**decision, "agent": agent}}) for agent in agents]
 
-# End after agent response
-builder.add_edge("agent_hr", END)
-builder.add_edge("agent_ceo", END)
-builder.add_edge("agent_developer", END)
+builder.add_conditional_edges("supervisor", route_decision, ["agent_hr", "agent_ceo", "agent_developer"])
+
+# Agents → aggregate (waits for every branch) → end
+builder.add_node("aggregate", aggregate)
+builder.add_edge("agent_hr", "aggregate")
+builder.add_edge("agent_ceo", "aggregate")
+builder.add_edge("agent_developer", "aggregate")
+builder.add_edge("aggregate", END)
+builder.add_edge("combined", END)
 
 supreme_agent_app = builder.compile()
 
-def run_supreme_agent(user_query: str) -> str:
-    """Run the supreme agent system with a user query and return the response."""
-    logger.info("🚀 SUPREME AGENT SYSTEM STARTED")
-    logger.info("=" * 80)
-    logger.info(f"🎯 Processing Query: {user_query}")
+def _initial_state(user_query: str, mode: Optional[str] = None) -> State:
+    mode = (mode or SUPREME_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Unknown supreme agent mode: {mode} (expected one of {', '.join(MODES)})")
+
+    logger.info("🚀 SUPREME AGENT SYSTEM STARTED (mode %s)", mode)
     
-    initial_state = {
+    return {
         "messages": [user_query],
-        "decision": {}
+        "query": user_query,
+        "decision": {},
+        "mode": mode
+    }
+
+def _final_response(result) -> str:
+    # Get the last message which should be the agent's response
+    if result["messages"] and len(result["messages"]) > 1:
+        last_message = result["messages"][-1]
+        final_response = last_message if isinstance(last_message, str) else (
+            last_message.content if hasattr(last_message, 'content') else str(last_message)
+        )
+        
+        logger.info("🎉 SUPREME AGENT SYSTEM COMPLETED: %s, %d characters",
+                    result.get("decision", {}).get("agent", "Unknown"), len(final_response))
+        
+        return final_response
+    
+    logger.warning("⚠️  No response generated from agents")
+    return "No response generated"
+
+# Speculative mode: start the supervisor and the most likely sub-agent(s)
+# together, keep the one the supervisor picks and cancel the rest
+ASYNC_AGENT_NODES = {
+    "agent_hr": atool_hr,
+    "agent_ceo": atool_ceo,
+    "agent_developer": atool_developer,
+}
+
+@instrumented("supervisor", "Supervisor")
+async def _allm_route(state: State, prediction):
+    timer = Stopwatch()
+    user_query, messages = _supervisor_prompt(state)
+    logger.info("🤔 Analyzing query with the supervisor model...")
+    async with aslot("Supervisor", budget_model(supervisor_llm), *_texts(messages)):
+        decision_response = (await acall_tiered("Supervisor", supervisor_llm, user_query, messages, _route_check,
+                                                **SUPERVISOR_CALL_KWARGS)).content
+    return _route_event(await _allm_decision(user_query, decision_response, prediction), timer)["decision"]
+
+async def _arun_fanout(query: str, decision: dict, running: Optional[dict] = None) -> dict:
+    """Run the decision's agents side by side, reusing `running` tasks (agent -> task), and merge."""
+    agents = decision_agents(decision)
+    running = running or {}
+    updates = await asyncio.gather(*[
+        running.get(agent) or ASYNC_AGENT_NODES[agent]({"query": query, "decision": {**decision, "agent": agent}})
+        for agent in agents
+    ])
+    if len(agents) == 1:
+        return updates[0]
+    fanout_stats["requests"] += 1
+    fanout_stats["branches"] += len(agents)
+    return {"messages": [merge_answers([m for update in updates for m in update["messages"]], agents)]}
+
+async def _arun_speculative(state: State, width: int):
+    user_query = state["query"]
+    local_decision, prediction = await _alocal_route(user_query)
+    speculation_stats["requests"] += 1
+    if local_decision:
+        # Routing is already known locally; nothing to speculate on
+        speculation_stats["local_routed"] += 1
+        decision = _route_event(local_decision, Stopwatch())["decision"]
+        update = await _arun_fanout(user_query, decision)
+        return {"messages": [user_query] + update["messages"], "decision": decision}
+
+    prior = prediction or fast_router.predict(user_query)
+    candidates = sorted(prior.scores, key=prior.scores.get, reverse=True)[:max(1, min(width, 3))]
+    logger.info("🎲 Speculating on %s while the supervisor decides", ", ".join(AGENT_LABELS[c] for c in candidates))
+
+    speculative_state = {"query": user_query, "decision": {}}
+    supervisor_task = asyncio.create_task(_allm_route(state, prediction))
+    agent_tasks = {
+        agent: asyncio.create_task(ASYNC_AGENT_NODES[agent](speculative_state)) for agent in candidates
     }
+    speculation_stats["speculative_calls"] += len(agent_tasks)
+    try:
+        decision = await supervisor_task
+        chosen = decision["agent"]
+        for agent, task in agent_tasks.items():
+            if agent not in decision_agents(decision):
+                task.cancel()
+                speculation_stats["wasted_calls"] += 1
+
+        if chosen in agent_tasks:
+            speculation_stats["hits"] += 1
+        else:
+            logger.info("🎲 Speculation missed, starting %s", AGENT_LABELS[chosen])
+            speculation_stats["misses"] += 1
+        # Speculated agents the decision fans out to are reused, not restarted
+        update = await _arun_fanout(user_query, decision, agent_tasks)
+        return {"messages": [user_query] + update["messages"], "decision": decision}
+    finally:
+        # Also reached when the caller is cancelled: never leak in-flight calls
+        pending = [task for task in (supervisor_task, *agent_tasks.values()) if not task.done()]
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+def fanout_snapshot() -> dict:
+    stats = dict(fanout_stats)
+    requests = stats.get("requests", 0)
+    stats["max_agents"] = FANOUT_MAX_AGENTS
+    stats["mean_width"] = stats.get("branches", 0) / requests if requests else 0.0
+    return stats
+
+def speculation_snapshot() -> dict:
+    stats = dict(speculation_stats)
+    calls = stats.get("speculative_calls", 0)
+    stats["width"] = SPECULATIVE_WIDTH
+    stats["wasted_ratio"] = stats.get("wasted_calls", 0) / calls if calls else 0.0
+    return stats
+
+def _flight_key(state: State, *parts) -> tuple:
+    return request_key(state["query"], "Supreme", state["mode"], *parts)
+
+def run_supreme_agent(user_query: str, mode: Optional[str] = None) -> str:
+    """Run the supreme agent system with a user query and return the response."""
+    initial_state = _initial_state(user_query, mode)
+    if initial_state["mode"] == "speculative":
+        # Speculation needs an event loop to run calls side by side
+        return asyncio.run(arun_supreme_agent(user_query, mode))
+    
+    def answer():
+        return _final_response(supreme_agent_app.invoke(initial_state))
     
     try:
-        result = supreme_agent_app.invoke(initial_state)
-        
-        # Get the last message which should be the agent's response
-        if result["messages"] and len(result["messages"]) > 1:
-            last_message = result["messages"][-1]
-            final_response = last_message if isinstance(last_message, str) else (
-                last_message.content if hasattr(last_message, 'content') else str(last_message)
-            )
-            
-            logger.info("🎉 SUPREME AGENT SYSTEM COMPLETED")
-            logger.info("=" * 80)
-            logger.info(f"📤 Final Response: {final_response[:200]}{'...' if len(final_response) > 200 else ''}")
-            logger.info(f"📊 Agent Decision: {result.get('decision', {}).get('agent', 'Unknown')}")
-            logger.info("=" * 80)
-            
-            return final_response
+        # Identical concurrent queries share one run (see core.singleflight)
+        flights = get_singleflight()
+        return flights.do("Supreme", _flight_key(initial_state), answer) if flights else answer()
         
-        logger.warning("⚠️  No response generated from agents")
-        return "No response generated"
+    except Exception as e:
+        logger.error("❌ Error in Supreme Agent System: %s", e)
+        raise e
+
+async def arun_supreme_agent(user_query: str, mode: Optional[str] = None,
+                             speculative_width: Optional[int] = None) -> str:
+    """Async counterpart of run_supreme_agent; every LLM call is awaited."""
+    initial_state = _initial_state(user_query, mode)
+
+    async def answer():
+        if initial_state["mode"] == "speculative":
+            result = await _arun_speculative(initial_state, speculative_width or SPECULATIVE_WIDTH)
+        else:
+            result = await supreme_agent_app.ainvoke(initial_state)
+        return _final_response(result)
+    
+    try:
+        flights = get_singleflight()
+        if flights is None:
+            return await answer()
+        return await flights.ado("Supreme", _flight_key(initial_state, speculative_width), answer)
         
     except Exception as e:
-        logger.error(f"❌ Error in Supreme Agent System: {str(e)}")
-        logger.error("=" * 80)
+        logger.error("❌ Error in Supreme Agent System: %s", e)
+        raise e
+
+async def astream_supreme_agent(user_query: str, mode: Optional[str] = None):
+    """
+    Run the supreme agent system and yield events as they happen.
+
+    Yields ("agent", label) once the query has been routed, then
+    ("token", text) for every chunk the chosen sub-agent produces. On
+    fan-out it also yields ("agents", labels) after "agent"; the primary
+    agent streams live under its "Agent X: " header and the other answers
+    follow once every branch is done.
+    """
+    initial_state = _initial_state(user_query, mode)
+    if initial_state["mode"] == "speculative":
+        # Speculative calls are not streamed; the winner is sent in one piece
+        result = await _arun_speculative(initial_state, SPECULATIVE_WIDTH)
+        agents = decision_agents(result["decision"])
+        yield "agent", AGENT_LABELS[agents[0]]
+        if len(agents) > 1:
+            yield "agents", [AGENT_LABELS[agent] for agent in agents]
+            yield "token", result["messages"][-1]
+        else:
+            yield "token", result["messages"][-1].removeprefix(f"Agent {AGENT_LABELS[agents[0]]}: ")
+        return
+
+    try:
+        streamed = routed = False
+        header = ""  # combined mode: text seen before the AGENT line is complete
+        fanout = []  # fan-out: the agent nodes, primary first
+        secondary = {}  # fan-out: finished answers of the other agents
+        async for event in relay(supreme_agent_app.astream_events(initial_state, version="v2")):
+            node = event.get("metadata", {}).get("langgraph_node")
+            output = event["data"].get("output")
+            if event["event"] == "on_chain_end" and node == "supervisor" and not routed:
+                # Ends for the node and for the runnable inside it; route once
+                if isinstance(output, dict) and "decision" in output:
+                    routed = True
+                    agents = decision_agents(output["decision"])
+                    logger.info("📡 Streaming response from %s", ", ".join(agents))
+                    yield "agent", AGENT_LABELS.get(agents[0], agents[0])
+                    if len(agents) > 1:
+                        fanout = agents
+                        yield "agents", [AGENT_LABELS[agent] for agent in agents]
+                        yield "token", f"Agent {AGENT_LABELS[agents[0]]}: "
+            elif fanout and node in AGENT_LABELS and node != fanout[0]:
+                # Secondary branches are held back and sent after the primary answer
+                if event["event"] == "on_chain_end" and isinstance(output, dict) and output.get("messages"):
+                    secondary[node] = output["messages"][-1]
+            elif event["event"] == "on_chain_end" and node == "aggregate" and fanout:
+                for agent in fanout[1:]:
+                    if agent in secondary:
+                        yield "token", f"\n\n{secondary.pop(agent)}"
+            elif event["event"] == "on_chat_model_stream" and node == "combined":
+                text = event["data"]["chunk"].content
+                if streamed:
+                    if text:
+                        yield "token", text
+                    continue
+                header += text
+                if "\n" in header:
+                    agent, _ = _split_combined(header)
+                    streamed = True
+                    logger.info("📡 Streaming response from %s", agent)
+                    yield "agent", AGENT_LABELS[agent]
+                    # Forward whatever followed the header line in the same chunks
+                    first_line, _, rest = header.partition("\n")
+                    if not COMBINED_HEADER_RE.match(first_line):
+                        rest = header
+                    if rest.strip():
+                        yield "token", rest
+            elif event["event"] == "on_chat_model_stream" and node in AGENT_LABELS:
+                text = event["data"]["chunk"].content
+                if text:
+                    streamed = True
+                    yield "token", text
+            elif event["event"] == "on_chain_end" and node in AGENT_LABELS and not streamed:
+                # Cached answers never reach a chat model; send them in one piece
+                if isinstance(output, dict) and output.get("messages"):
+                    prefix = f"Agent {AGENT_LABELS[node]}: "
+                    yield "token", output["messages"][-1].removeprefix(prefix)
+                    streamed = True
+            elif event["event"] == "on_chain_end" and node == "combined" and not streamed:
+                # Reply ended before a newline: it is all header or all answer
+                if isinstance(output, dict) and "decision" in output:
+                    agent = output["decision"]["agent"]
+                    streamed = True
+                    yield "agent", AGENT_LABELS[agent]
+                    answer = output["messages"][-1].removeprefix(f"Agent {AGENT_LABELS[agent]}: ")
+                    if answer:
+                        yield "token", answer
+
+    except Exception as e:
+        logger.error("❌ Error in Supreme Agent System: %s", e)
         raise e
 
 # # quick example usage
@@ -2,79 +2,109 @@
 """
 Test script to demonstrate Supreme Agent routing decisions.
 Run this to see how different types of queries are routed to different agents.
+By default it runs offline against the local fake LLM in benchmarks/; pass
+--live to ask the real supervisor model (needs OPENAI_API_KEY). For latency
+and throughput use benchmarks/bench_replay.py.
 """
 
-import asyncio
-import sys
+import argparse
 import os
+import re
+import sys
 
 # Add the backend directory to the path
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(BACKEND_DIR)
+sys.path.append(os.path.join(BACKEND_DIR, "benchmarks"))
+
+AGENT_PREFIX_RE = re.compile(r"^Agent (\w+): ")
 
-from supreme.supreme import run_supreme_agent
+# Test queries that should go to different agents
+TEST_QUERIES = [
+    # HR - employee related questions
+    {
+        "query": "How many vacation days do I get per year?",
+        "expected_agent": "HR",
+        "reason": "Employee benefits"
+    },
+    {
+        "query": "What is the parental leave policy?",
+        "expected_agent": "HR",
+        "reason": "Employee policy"
+    },
+
+    # CEO - general company questions
+    {
+        "query": "Can you research the current market trends in renewable energy?",
+        "expected_agent": "CEO",
+        "reason": "Market analysis"
+    },
+    {
+        "query": "What is our strategy for the next quarter?",
+        "expected_agent": "CEO",
+        "reason": "Company strategy"
+    },
+    {
+        "query": "Hello, how are you today?",
+        "expected_agent": "CEO",
+        "reason": "General conversation"
+    },
+
+    # Developer - technical or code-related questions
+    {
+        "query": "Why does my Python API return a 500 error?",
+        "expected_agent": "Developer",
+        "reason": "Debugging"
+    },
+    {
+        "query": "How should I design the database schema for orders?",
+        "expected_agent": "Developer",
+        "reason": "Database design"
+    },
+]
 
 def test_routing_decisions():
-    """Test different types of queries to see routing decisions."""
-    
-    # Test queries that should go to different agents
-    test_queries = [
-        # Should go to Agent 1 (HR) - complex/factual queries
-        {
-            "query": "What are the latest developments in artificial intelligence?",
-            "expected_agent": "agent_1",
-            "reason": "Complex factual lookup required"
-        },
-        {
-            "query": "Can you research the current market trends in renewable energy?",
-            "expected_agent": "agent_1", 
-            "reason": "Research/web search needed"
-        },
-        
-        # Should go to Agent 2 (CEO) - general conversation
-        {
-            "query": "Hello, how are you today?",
-            "expected_agent": "agent_2",
-            "reason": "Simple greeting/conversation"
-        },
-        {
-            "query": "What's your favorite color?",
-            "expected_agent": "agent_2",
-            "reason": "Simple personal question"
-        },
-        {
-            "query": "Can you help me brainstorm ideas for a birthday party?",
-            "expected_agent": "agent_2",
-            "reason": "Creative/conversational task"
-        }
-    ]
-    
+    """Test different types of queries to see routing decisions; returns the number of misroutes."""
+    from supreme.supreme import run_supreme_agent
+
     print("🧪 SUPREME AGENT ROUTING TEST")
     print("=" * 80)
-    print("This will test different queries to see how the Supreme Agent routes them.")
-    print("Watch the logs to see the decision-making process!\n")
-    
-    for i, test_case in enumerate(test_queries, 1):
-        print(f"🎯 Test Case {i}/5")
+
+    misroutes = 0
+    for i, test_case in enumerate(TEST_QUERIES, 1):
+        print(f"🎯 Test Case {i}/{len(TEST_QUERIES)}")
         print(f"Query: {test_case['query']}")
         print(f"Expected: {test_case['expected_agent']} ({test_case['reason']})")
-        print("-" * 60)
-        
+
         try:
-            # This will trigger all the logging we added
             response = run_supreme_agent(test_case['query'])
-            print(f"✅ Response received (length: {len(response)} chars)")
-        
+            match = AGENT_PREFIX_RE.match(response)
+            routed = match.group(1) if match else "Unknown"
+            if routed == test_case['expected_agent']:
+                print(f"✅ Routed to {routed} (response: {len(response)} chars)")
+            else:
+                misroutes += 1
+                print(f"❌ Routed to {routed}")
+
         except Exception as e:
+            misroutes += 1
             print(f"❌ Error: {e}")
-        
-        print("\n" + "="*80 + "\n")
-        
-        # Small delay between tests to make logs easier to read
-        import time
-        time.sleep(1)
-    
-    print("🎉 All test cases completed!")
-    print("📄 Check 'supreme_agent.log' for detailed logs")
+
+        print("-" * 80)
+
+    print(f"🎉 {len(TEST_QUERIES) - misroutes}/{len(TEST_QUERIES)} queries routed as expected")
+    return misroutes
 
 if __name__ == "__main__":
-    test_routing_decisions() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--live", action="store_true", help="use the real OpenAI API instead of the local fake LLM")
+    args = parser.parse_args()
+
+    if args.live:
+        failures = test_routing_decisions()
+    else:
+        from fake_llm import FakeLLMServer, point_backend_at
+        with FakeLLMServer(latency_ms=0, seed=0) as server:
+            point_backend_at(server.base_url)
+            failures = test_routing_decisions()
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+# Log to stdout only: no supreme_agent.log in the tree
+os.environ.setdefault("LOG_FILE", "")
+
+
+@pytest.fixture(scope="session")
+def fake_llm():
+    """The benchmarks' fake LLM (and Serper) server, answering at once."""
+    from fake_llm import FakeLLMServer, point_backend_at
+
+    with FakeLLMServer(latency_ms=0, seed=0) as server:
+        point_backend_at(server.base_url)
+        yield server
+
+
+@pytest.fixture
+def fake_server(fake_llm):
+    """The fake server with its usage counters and connection log reset."""
+    fake_llm.app.state.connections.clear()
+    fake_llm.app.state.usage.clear()
+    fake_llm.app.state.search_latency_ms = 0.0
+    return fake_llm
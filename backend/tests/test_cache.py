@@ -0,0 +1,100 @@
+"""Response cache: exact and semantic hits, expiry, bypasses and the SQLite backend."""
+
+import asyncio
+import time
+
+import pytest
+
+from core.cache import MemoryBackend, ResponseCache, SemanticIndex, SQLiteBackend
+from core.knowledge import HashEmbeddings
+
+
+class Answers:
+    """compute() stand-in that counts how often the model would have been called."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return f"answer {self.calls}"
+
+    async def acall(self):
+        return self()
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_entries=4, ttl_seconds=3600)
+    return MemoryBackend(max_entries=4, ttl_seconds=3600)
+
+
+def test_exact_hit_on_normalized_query(backend):
+    cache, answers = ResponseCache(backend), Answers()
+    assert cache.get_or_compute("HR", "prompt", "gpt-4o", 0.0, "Vacation days?", answers) == "answer 1"
+    assert cache.get_or_compute("HR", "prompt", "gpt-4o", 0.0, "  vacation DAYS? ", answers) == "answer 1"
+    # A different prompt, model or agent is a different entry
+    assert cache.get_or_compute("HR", "other prompt", "gpt-4o", 0.0, "Vacation days?", answers) == "answer 2"
+    assert cache.get_or_compute("CEO", "prompt", "gpt-4o", 0.0, "Vacation days?", answers) == "answer 3"
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_async_lookups_and_lru_bound(backend):
+    cache, answers = ResponseCache(backend), Answers()
+
+    async def ask(query):
+        return await cache.aget_or_compute("Developer", "prompt", "gpt-4o", 0.0, query, answers.acall)
+
+    async def run():
+        for i in range(5):
+            await ask(f"question {i}")
+        return await ask("question 4"), await ask("question 0")
+
+    assert asyncio.run(run()) == ("answer 5", "answer 6")  # question 0 was evicted
+    assert cache.snapshot()["evictions"] >= 1
+
+
+def test_nondeterministic_and_unstorable_answers(backend):
+    cache, answers = ResponseCache(backend), Answers()
+    cache.get_or_compute("CEO", "prompt", "gpt-4o", 0.7, "Strategy?", answers)
+    cache.get_or_compute("CEO", "prompt", "gpt-4o", 0.7, "Strategy?", answers)
+    assert answers.calls == 2 and cache.snapshot()["bypasses"] == 2
+    # A fallback model's answer is served but not stored
+    cache.get_or_compute("CEO", "prompt", "gpt-4o", 0.0, "Plan?", answers, lambda: False)
+    cache.get_or_compute("CEO", "prompt", "gpt-4o", 0.0, "Plan?", answers)
+    assert answers.calls == 4
+
+
+def test_expired_entries_are_recomputed():
+    cache, answers = ResponseCache(MemoryBackend(ttl_seconds=0.05)), Answers()
+    cache.get_or_compute("HR", "prompt", "gpt-4o", 0.0, "Benefits?", answers)
+    time.sleep(0.1)
+    assert cache.get_or_compute("HR", "prompt", "gpt-4o", 0.0, "Benefits?", answers) == "answer 2"
+    assert cache.snapshot()["expirations"] == 1
+
+
+def test_semantic_hit_within_the_same_context(backend):
+    cache, answers = ResponseCache(backend, HashEmbeddings(), similarity_threshold=0.8), Answers()
+    cache.get_or_compute("HR", "prompt", "gpt-4o", 0.0, "how many vacation days do I get per year", answers)
+
+    async def run():
+        near = await cache.aget_or_compute("HR", "prompt", "gpt-4o", 0.0,
+                                           "how many vacation days do I get each year", answers.acall)
+        other_agent = await cache.aget_or_compute("CEO", "prompt", "gpt-4o", 0.0,
+                                                  "how many vacation days do I get each year", answers.acall)
+        return near, other_agent
+
+    assert asyncio.run(run()) == ("answer 1", "answer 2")
+    assert cache.snapshot()["semantic_hits"] == 1
+
+
+def test_semantic_index_reuses_the_oldest_row():
+    index, embeddings = SemanticIndex(2), HashEmbeddings(64)
+    for key, text in (("a", "vacation days"), ("b", "expense reports"), ("c", "parental leave")):
+        index.add(key, "HR", embeddings.embed_query(text))
+    assert len(index) == 2
+    assert index.nearest("HR", embeddings.embed_query("vacation days"))[0] != "a"
+    key, score = index.nearest("HR", embeddings.embed_query("parental leave"))
+    assert key == "c" and score == pytest.approx(1.0)
+    assert index.nearest("CEO", embeddings.embed_query("parental leave")) == (None, 0.0)
@@ -0,0 +1,61 @@
+"""Connection reuse of the shared LLM clients, against the fake LLM server."""
+
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+
+def test_sync_calls_share_one_connection(fake_server):
+    from core.clients import chat_model
+
+    ceo, developer = chat_model(temperature=0.0), chat_model(model="gpt-4o-mini", temperature=0.3)
+    for i in range(5):
+        ceo.invoke([HumanMessage(content=f"company question {i}")])
+        developer.invoke([HumanMessage(content=f"python question {i}")])
+    assert len(fake_server.app.state.connections) == 1
+
+
+def test_async_waves_reuse_pooled_connections(fake_server):
+    from core.clients import chat_model
+
+    llm = chat_model()
+
+    async def waves():
+        await asyncio.gather(*[llm.ainvoke([HumanMessage(content=f"wave one {i}")]) for i in range(10)])
+        after_first = len(fake_server.app.state.connections)
+        await asyncio.gather(*[llm.ainvoke([HumanMessage(content=f"wave two {i}")]) for i in range(10)])
+        return after_first, len(fake_server.app.state.connections)
+
+    after_first, after_second = asyncio.run(waves())
+    assert after_first >= 1
+    assert after_second == after_first
+
+
+def test_per_loop_pools_are_dropped_and_closed(fake_server):
+    from core.clients import PerLoopTransport
+
+    transport = PerLoopTransport()
+
+    async def open_pool():
+        transport._pool()
+        return len(transport._pools)
+
+    # Every asyncio.run() closes its loop: the next loop's pool replaces the old one
+    assert [asyncio.run(open_pool()) for _ in range(3)] == [1, 1, 1]
+
+    async def close_all():
+        transport._pool()
+        await transport.aclose()
+        return len(transport._pools)
+
+    assert asyncio.run(close_all()) == 0
+
+
+def test_embeddings_share_the_llm_timeout(fake_server, monkeypatch):
+    from core.clients import embeddings_model
+
+    monkeypatch.setenv("LLM_TIMEOUT", "7.5")
+    assert embeddings_model().request_timeout == 7.5
+    assert embeddings_model(timeout=2.0).request_timeout == 2.0
+    vectors = embeddings_model().embed_documents(["vacation days", "expense reports"])
+    assert len(vectors) == 2
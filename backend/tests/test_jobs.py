@@ -0,0 +1,77 @@
+"""Background job store: claims, lease recovery, hand-back and attempt limits."""
+
+import asyncio
+import time
+
+import pytest
+
+from core.jobs import JobStore, JobWorkers
+
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.sqlite3"), max_attempts=2, lease_seconds=0.2)
+
+
+def test_expired_lease_is_claimed_again(store):
+    job = store.submit({"message": "long answer"}, "normal")
+    claimed = store.claim("worker-a")
+    assert claimed["job_id"] == job["job_id"]
+    # worker-a dies without renewing: nobody may take the job while its lease holds
+    assert store.claim("worker-b") is None
+    time.sleep(0.3)
+    reclaimed = store.claim("worker-b")
+    assert reclaimed["job_id"] == job["job_id"]
+    assert reclaimed["attempts"] == 2
+    # The dead worker's late writes no longer land
+    assert not store.progress(job["job_id"], "worker-a", {"partial": "stale"})
+    assert store.progress(job["job_id"], "worker-b", {"partial": "fresh"})
+
+
+def test_job_fails_after_max_attempts(store):
+    job = store.submit({"message": "crashes its worker"}, "normal")
+    for worker in ("worker-a", "worker-b"):
+        assert store.claim(worker)["job_id"] == job["job_id"]
+        time.sleep(0.3)
+    assert store.claim("worker-c") is None
+    assert store.get(job["job_id"])["status"] == "failed"
+
+
+def test_release_hands_jobs_back_at_once(store):
+    job = store.submit({"message": "interrupted"}, "low")
+    store.claim("worker-a")
+    assert store.release("worker-a") == 1
+    assert store.claim("worker-b")["job_id"] == job["job_id"]
+
+
+def test_higher_priority_is_claimed_first(store):
+    low = store.submit({"message": "batch"}, "low")
+    high = store.submit({"message": "urgent"}, "high")
+    assert store.claim("worker-a")["job_id"] == high["job_id"]
+    assert store.claim("worker-a")["job_id"] == low["job_id"]
+
+
+def test_workers_finish_a_job_recovered_from_a_dead_worker(store):
+    job = store.submit({"message": "recover me"}, "normal")
+    store.claim("dead-worker")
+
+    async def runner(request, report):
+        report(lambda: {"partial": "half"})
+        return {"response": f"answered: {request['message']}"}
+
+    async def run():
+        workers = JobWorkers(store, runner, workers=1, poll_seconds=0.05, progress_seconds=0)
+        workers.start()
+        try:
+            for _ in range(100):
+                if store.get(job["job_id"])["status"] == "done":
+                    break
+                await asyncio.sleep(0.05)
+        finally:
+            await workers.stop()
+
+    asyncio.run(run())
+    finished = store.get(job["job_id"])
+    assert finished["status"] == "done"
+    assert finished["result"] == {"response": "answered: recover me"}
+    assert finished["attempts"] == 2
@@ -0,0 +1,59 @@
+"""Knowledge index: ingest, incremental re-index and search."""
+
+import pytest
+
+from core.knowledge import HashEmbeddings, KnowledgeIndex
+
+
+class RemoteHashEmbeddings(HashEmbeddings):
+    """HashEmbeddings embedded the way a remote model is: in the writer, not the workers."""
+
+    local = False
+
+
+@pytest.fixture(params=[HashEmbeddings, RemoteHashEmbeddings], ids=["local", "remote"])
+def index(request, tmp_path):
+    return KnowledgeIndex(str(tmp_path / "index"), request.param(), min_score=0.1, refresh_seconds=0)
+
+
+def write(directory, name, text):
+    (directory / name).write_text(text)
+    return directory / name
+
+
+def test_empty_document_next_to_a_real_one(index, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write(docs, "a.md", "")
+    write(docs, "b.md", "   \n\n")
+    write(docs, "c.md", "Parental leave is sixteen weeks at full pay for every employee.")
+    stats = index.ingest([str(docs)], workers=1)
+    assert stats["added"] == 3
+    [passage] = index.search("parental leave weeks", k=1)
+    assert passage["source"] == "c.md"
+
+
+def test_changed_and_deleted_documents(index, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write(docs, "leave.md", "Vacation: employees get 25 vacation days per year.")
+    write(docs, "expenses.md", "Expense reports are approved by your manager within a week.")
+    index.ingest([str(docs)], workers=1)
+    assert index.search("vacation days", k=1)[0]["text"].endswith("25 vacation days per year.")
+
+    write(docs, "leave.md", "Vacation: employees get 30 vacation days per year.")
+    (docs / "expenses.md").unlink()
+    stats = index.ingest([str(docs)], workers=1)
+    assert stats["updated"] == 1
+    # Only live chunks come back: the old text and the deleted document are gone
+    texts = [passage["text"] for passage in index.search("vacation days expense reports manager", k=4)]
+    assert any("30 vacation days" in text for text in texts)
+    assert not any("25 vacation days" in text or "Expense reports" in text for text in texts)
+
+
+def test_unchanged_documents_are_not_re_embedded(index, tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    write(docs, "policy.md", "Remote work is allowed three days a week.")
+    index.ingest([str(docs)], workers=1)
+    assert index.ingest([str(docs)], workers=1)["unchanged"] == 1
@@ -0,0 +1,56 @@
+"""Routing memo: normalized hits, LRU bound, prompt versioning and the shared SQLite file."""
+
+import asyncio
+
+import pytest
+
+from supreme.memo import RoutingMemo
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def path(request, tmp_path):
+    return str(tmp_path / "routing_memo.sqlite3") if request.param == "sqlite" else None
+
+
+def test_hit_on_normalized_query(path):
+    memo = RoutingMemo("v1", path=path)
+    assert memo.get("How many vacation days?") is None
+    memo.set("How many vacation days?", "agent_hr")
+    assert memo.get("  how many VACATION days? ") == "agent_hr"
+    assert memo.snapshot()["hit_rate"] == 0.5
+
+
+def test_least_recently_used_entry_is_evicted(path):
+    memo = RoutingMemo("v1", max_entries=2, path=path)
+    memo.set("vacation days", "agent_hr")
+    memo.set("quarterly strategy", "agent_ceo")
+    assert memo.get("vacation days") == "agent_hr"
+    memo.set("python tests", "agent_developer")
+    assert len(memo) == 2 and memo.snapshot()["evictions"] == 1
+    assert memo.get("quarterly strategy") is None
+    assert memo.get("vacation days") == "agent_hr"
+
+
+def test_async_lookups(path):
+    memo = RoutingMemo("v1", path=path)
+
+    async def run():
+        await memo.aset("Write a python function", "agent_developer,agent_hr")
+        return await memo.aget("write a python function"), await memo.aget("something else")
+
+    assert asyncio.run(run()) == ("agent_developer,agent_hr", None)
+
+
+def test_workers_share_the_sqlite_memo(tmp_path):
+    path = str(tmp_path / "routing_memo.sqlite3")
+    first, second = RoutingMemo("v1", path=path), RoutingMemo("v1", path=path)
+    first.set("vacation days", "agent_hr")
+    assert second.get("vacation days") == "agent_hr"
+
+
+def test_new_prompt_version_purges_old_entries(tmp_path):
+    path = str(tmp_path / "routing_memo.sqlite3")
+    RoutingMemo("v1", path=path).set("vacation days", "agent_hr")
+    memo = RoutingMemo("v2", path=path)
+    assert memo.get("vacation days") is None
+    assert memo.snapshot()["invalidated"] == 1 and len(memo) == 0
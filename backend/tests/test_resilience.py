@@ -0,0 +1,83 @@
+"""LLM call resilience against the fake LLM: fallback, circuit breaker and deadlines."""
+
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from core.resilience import CircuitOpen, DeadlineExceeded, Resilience, streaming, watch_fallbacks
+from core.scheduler import request_context
+
+QUESTION = [HumanMessage(content="What is our parental leave policy?")]
+
+
+@pytest.fixture
+def degraded(fake_server):
+    """The fake server, restored to healthy models after the test."""
+    yield fake_server
+    fake_server.app.state.failing_models = set()
+    fake_server.app.state.model_latency = {}
+
+
+@pytest.fixture
+def primary():
+    from core.clients import chat_model
+
+    return chat_model(model="gpt-4o", max_retries=0)
+
+
+def test_failing_primary_falls_back(degraded, primary):
+    degraded.app.state.failing_models = {"gpt-4o"}
+    resilience = Resilience(hedging=False, fallback_model="gpt-4o-mini")
+    with watch_fallbacks() as used:
+        answer = resilience.invoke(primary, QUESTION)
+    assert answer.response_metadata["model_name"] == "gpt-4o-mini"
+    assert used == ["gpt-4o-mini"]
+    assert resilience.snapshot()["models"]["gpt-4o"]["errors"] == 1
+
+
+def test_breaker_opens_and_skips_the_primary(degraded, primary):
+    degraded.app.state.failing_models = {"gpt-4o"}
+    resilience = Resilience(hedging=False, breaker_failures=2, breaker_cooldown=60, fallback_model="gpt-4o-mini")
+    for _ in range(4):
+        asyncio.run(resilience.ainvoke(primary, QUESTION))
+    health = resilience.snapshot()["models"]["gpt-4o"]
+    assert health["circuit"] == "open"
+    assert health["calls"] == 2  # the last two calls went straight to the fallback
+    assert health["circuit_rejected"] == 2
+
+
+def test_open_breaker_without_fallback_sheds(degraded, primary):
+    degraded.app.state.failing_models = {"gpt-4o"}
+    resilience = Resilience(hedging=False, breaker_failures=1, fallback_model=None)
+    with pytest.raises(Exception):
+        resilience.invoke(primary, QUESTION)
+    with pytest.raises(CircuitOpen):
+        resilience.invoke(primary, QUESTION)
+
+
+def test_deadline_bounds_a_slow_call(degraded, primary):
+    from fake_llm import latency_sampler
+
+    degraded.app.state.model_latency = {"gpt-4o": latency_sampler("2000")}
+    resilience = Resilience(hedging=False, fallback_model=None)
+    with request_context("normal", 0.3), pytest.raises(DeadlineExceeded):
+        resilience.invoke(primary, QUESTION)
+
+
+def test_streamed_calls_do_not_fall_back_after_failing(degraded, primary):
+    degraded.app.state.failing_models = {"gpt-4o"}
+    resilience = Resilience(hedging=False, fallback_model="gpt-4o-mini")
+    with streaming(), pytest.raises(Exception):
+        asyncio.run(resilience.ainvoke(primary, QUESTION))
+
+
+def test_fallback_keeps_the_callers_output_cap(degraded):
+    from core.clients import chat_model
+
+    degraded.app.state.failing_models = {"gpt-4o"}
+    resilience = Resilience(hedging=False, fallback_model="gpt-4o-mini")
+    capped, uncapped = chat_model(max_tokens=3, max_retries=0), chat_model(max_retries=0)
+    assert len(resilience.invoke(capped, QUESTION).content.split()) == 3
+    assert len(resilience.invoke(uncapped, QUESTION).content.split()) > 3
+    assert resilience.fallback_for(capped) is not resilience.fallback_for(uncapped)
@@ -0,0 +1,50 @@
+"""The local fast router: threshold, minimum score and training from the log."""
+
+import pytest
+
+from supreme.router import FastRouter, build_router, load_examples, load_examples_from_log
+
+
+@pytest.fixture(scope="module")
+def router():
+    return build_router(threshold=0.6, log_path="", min_score=0.5)
+
+
+@pytest.mark.parametrize("query, agent", [
+    ("How many vacation days do I get per year?", "agent_hr"),
+    ("How do I fix a TypeError in my python function?", "agent_developer"),
+    ("Set up ci/cd for our golang service", "agent_developer"),
+])
+def test_clear_queries_take_the_fast_path(router, query, agent):
+    assert router.route(query)[0] == agent
+
+
+@pytest.mark.parametrize("query", ["a", "who are you", "hello", "go home", "tell me about the class schedule"])
+def test_queries_without_signal_go_to_the_supervisor(router, query):
+    routed, prediction = router.route(query)
+    assert routed is None
+    assert not prediction.confident(router.threshold, router.min_score)
+
+
+def test_min_score_rejects_a_confident_share_of_a_tiny_total(router):
+    prediction = router.predict("a")
+    assert prediction.confident(router.threshold, 0.0)
+    assert not prediction.confident(router.threshold, router.min_score)
+
+
+def test_threshold_bounds_the_fast_path():
+    examples = load_examples()
+    query = "How many vacation days do I get per year?"
+    assert FastRouter(threshold=0.5, min_score=0.0).fit(examples).route(query)[0] == "agent_hr"
+    assert FastRouter(threshold=1.01, min_score=0.0).fit(examples).route(query)[0] is None
+
+
+def test_malformed_log_lines_are_skipped(tmp_path):
+    log = tmp_path / "supreme_agent.log"
+    log.write_text(
+        "2025-01-01 - Supreme - INFO - ✅ Supervisor routed 'How do I deploy?' → Developer\n"
+        "2025-01-01 - Supreme - INFO - ✅ Supervisor routed 'cut off\\' → HR\n"
+        "2025-01-01 - Supreme - INFO - ✅ Supervisor routed \"Who approves my leave?\" → HR\n"
+    )
+    assert load_examples_from_log(str(log)) == [("How do I deploy?", "agent_developer"),
+                                                ("Who approves my leave?", "agent_hr")]
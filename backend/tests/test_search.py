@@ -0,0 +1,50 @@
+"""Web search provider, cache and tool against the fake server's Serper stub."""
+
+import asyncio
+
+import pytest
+
+from core.search import CachedSearch, SerperSearch, format_results, get_search, search_tools, set_search
+
+
+@pytest.fixture
+def serper(fake_server):
+    return SerperSearch("fake-serper-key", fake_server.base_url.rsplit("/v1", 1)[0], results=3)
+
+
+def test_serper_results(serper, fake_server):
+    results = serper.search("parental leave in Germany")
+    assert [r["link"] for r in results] == [f"https://example.com/{i}" for i in (1, 2, 3)]
+    assert results[0]["title"] == "Result 1 for parental leave in Germany"
+    assert asyncio.run(serper.asearch("overtime rules"))[2]["snippet"] == "Snippet 3 about overtime rules."
+    assert fake_server.app.state.usage["searches"] == 2
+
+
+def test_cached_search_asks_the_provider_once(serper, fake_server):
+    search = CachedSearch(serper)
+    first = search.search("Remote work stipends")
+    assert search.search("  remote WORK stipends ") == first
+    assert fake_server.app.state.usage["searches"] == 1
+    assert search.snapshot()["hits"] == 1
+
+
+def test_search_tool(serper, fake_server):
+    previous = get_search()
+    set_search(serper)
+    try:
+        [tool] = search_tools()
+        assert tool.name == "web_search"
+        text = asyncio.run(tool.ainvoke({"query": "benefits at startups"}))
+        assert text == format_results(serper.search("benefits at startups"))
+        assert text.startswith("1. Result 1 for benefits at startups (https://example.com/1)")
+    finally:
+        set_search(previous)
+
+
+def test_no_provider_means_no_tool():
+    previous = get_search()
+    set_search(None)
+    try:
+        assert search_tools() == []
+    finally:
+        set_search(previous)
@@ -0,0 +1,89 @@
+"""Session memory: windows, rolling summaries and concurrent appends on both stores."""
+
+import asyncio
+import threading
+
+import pytest
+
+from core.sessions import MemorySessionStore, SessionMemory, SQLiteSessionStore, set_session_memory
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    return MemorySessionStore()
+
+
+def test_window_replays_recorded_exchanges(store):
+    memory = SessionMemory(store, history_tokens=0)
+    assert memory.window("s1").turns == []
+    memory.record("s1", "How many vacation days?", "25 per year.")
+    memory.record("s1", "And sick days?", "Ten.")
+    window = memory.window("s1")
+    assert [turn["content"] for turn in window.turns] == ["How many vacation days?", "25 per year.",
+                                                         "And sick days?", "Ten."]
+    assert memory.delete("s1") and memory.window("s1").turns == []
+
+
+def test_concurrent_records_keep_every_turn(store, tmp_path):
+    # With SQLite, four separate stores stand in for four worker processes
+    if isinstance(store, SQLiteSessionStore):
+        memories = [SessionMemory(SQLiteSessionStore(str(tmp_path / "sessions.sqlite3")), 0) for _ in range(4)]
+    else:
+        memories = [SessionMemory(store, 0)] * 4
+
+    def talk(memory, worker):
+        for i in range(25):
+            memory.record("shared", f"question {worker}-{i}", "answer")
+
+    threads = [threading.Thread(target=talk, args=(memory, worker)) for worker, memory in enumerate(memories)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(memories[0].window("shared").turns) == 4 * 25 * 2
+
+
+def test_overflow_is_folded_into_the_summary(store):
+    folded = []
+
+    async def summarizer(summary, turns):
+        folded.extend(turns)
+        return f"{summary} {len(turns)} turns".strip()
+
+    memory = SessionMemory(store, history_tokens=100, summarizer=summarizer)
+    should_summarize = [memory.record("s1", f"question number {i} " * 5, f"answer number {i} " * 5)
+                        for i in range(6)]
+    assert should_summarize[-1]
+    asyncio.run(memory.asummarize("s1"))
+    window = memory.window("s1")
+    assert window.summary == f"{len(folded)} turns"
+    assert folded and folded[0]["content"].startswith("question number 0")
+    assert window.turns[-1]["content"].startswith("answer number 5")
+    assert memory.snapshot()["summaries"] == 1
+
+
+def test_chat_requests_share_a_session(fake_server, tmp_path):
+    import httpx
+
+    from app import app
+
+    memory = SessionMemory(SQLiteSessionStore(str(tmp_path / "sessions.sqlite3")), history_tokens=0)
+    set_session_memory(memory)
+
+    async def chat():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            for message in ("Write a python function that adds two numbers", "Now add tests for it"):
+                response = await client.post("/chat", json={"message": message, "agent": "developer",
+                                                            "session_id": "conversation-1"})
+                assert response.status_code == 200
+
+    try:
+        asyncio.run(chat())
+        turns = memory.window("conversation-1").turns
+        assert [turn["content"] for turn in turns[::2]] == ["Write a python function that adds two numbers",
+                                                             "Now add tests for it"]
+    finally:
+        set_session_memory(None)
@@ -0,0 +1,141 @@
+"""Single-flight coalescing: shared calls, shared errors, cancellation and shared streams."""
+
+import asyncio
+import threading
+
+import pytest
+
+from core.sessions import HistoryWindow, conversation
+from core.singleflight import SingleFlight, coalesce, coalesce_stream, get_singleflight, request_key, set_singleflight
+
+
+class Upstream:
+    """A slow call that counts how often it actually ran."""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self, query: str) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return f"answer to {query}"
+
+    async def stream(self, query: str):
+        self.calls += 1
+        for word in ("answer", "to", query):
+            await asyncio.sleep(self.delay / 3)
+            yield word
+
+
+@pytest.fixture
+def flights():
+    previous = get_singleflight()
+    flights = SingleFlight()
+    set_singleflight(flights)
+    yield flights
+    set_singleflight(previous)
+
+
+def test_identical_concurrent_calls_share_one_run(flights):
+    upstream = Upstream()
+
+    async def run():
+        return await asyncio.gather(
+            flights.ado("HR", request_key("Vacation days?", "HR"), lambda: upstream("a")),
+            flights.ado("HR", request_key("  vacation DAYS? ", "HR"), lambda: upstream("b")),
+            flights.ado("CEO", request_key("Vacation days?", "CEO"), lambda: upstream("c")),
+        )
+
+    assert asyncio.run(run()) == ["answer to a", "answer to a", "answer to c"]
+    assert upstream.calls == 2
+    snapshot = flights.snapshot()
+    assert (snapshot["leaders"], snapshot["followers"], snapshot["in_flight"]) == (2, 1, 0)
+
+
+def test_followers_get_the_leaders_error(flights):
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise ValueError("upstream down")
+
+    async def run():
+        return await asyncio.gather(*(flights.ado("HR", "key", failing) for _ in range(3)), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(run())] == ["upstream down"] * 3
+
+
+def test_shared_call_outlives_a_cancelled_waiter_but_not_the_last(flights):
+    upstream = Upstream(delay=0.2)
+
+    async def run():
+        first = asyncio.create_task(flights.ado("HR", "key", lambda: upstream("q")))
+        second = asyncio.create_task(flights.ado("HR", "key", lambda: upstream("q")))
+        await asyncio.sleep(0.05)
+        first.cancel()
+        answer = await second
+
+        lonely = asyncio.create_task(flights.ado("HR", "key", lambda: upstream("q")))
+        await asyncio.sleep(0.05)
+        lonely.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await lonely
+        return answer
+
+    assert asyncio.run(run()) == "answer to q"
+    assert flights.snapshot()["abandoned"] == 1
+
+
+def test_late_follower_gets_the_whole_stream(flights):
+    upstream = Upstream()
+
+    async def collect(delay):
+        await asyncio.sleep(delay)
+        return [word async for word in coalesce_stream("HR", "Vacation days?", upstream.stream("q"))]
+
+    async def run():
+        return await asyncio.gather(collect(0), collect(0.03))
+
+    assert asyncio.run(run()) == [["answer", "to", "q"]] * 2
+    assert upstream.calls == 1
+
+
+def test_sync_calls_coalesce_across_threads(flights):
+    calls, started = [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        started.set()
+        threading.Event().wait(0.1)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flights.do("HR", "key", compute)))
+    leader.start()
+    started.wait()
+    results.append(flights.do("HR", "key", compute))
+    leader.join()
+    assert results == ["answer", "answer"] and len(calls) == 1
+
+
+def test_coalesced_agent_respects_the_session_and_the_switch(flights):
+    upstream = Upstream()
+
+    @coalesce("HR")
+    async def run_hr(user_query):
+        return await upstream(user_query)
+
+    async def in_session(window):
+        with conversation(window):
+            return await run_hr("Vacation days?")
+
+    async def run():
+        earlier = HistoryWindow(turns=[{"role": "user", "content": "I work in Berlin"}])
+        # Different session histories are different questions
+        await asyncio.gather(in_session(None), in_session(None), in_session(earlier))
+        calls = upstream.calls
+        set_singleflight(None)
+        await asyncio.gather(run_hr("Vacation days?"), run_hr("Vacation days?"))
+        return calls
+
+    assert asyncio.run(run()) == 2
+    assert upstream.calls == 4
@@ -1,74 +1,104 @@
 #!/usr/bin/env python3
 """
 Log viewer for Supreme Agent routing decisions.
-This script helps you monitor the logs in real-time.
+This script helps you monitor the logs in real-time and query the stage
+events through an on-disk index (see core/logindex.py), without reading
+the whole log into memory. Rotated backups are included.
 """
 
+import argparse
 import os
+import re
 import time
-import sys
 from datetime import datetime
 
+from core.logindex import LogIndex, default_log_path, follow, tail_lines
+
+DURATION_RE = re.compile(r"^(\d+(?:\.\d+)?)([smhd])$")
+UNIT_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+def parse_time(value):
+    """'90s', '30m', '1h', '2d' (ago) or an ISO date/time, as epoch seconds."""
+    if value is None:
+        return None
+    match = DURATION_RE.match(value)
+    if match:
+        return time.time() - float(match.group(1)) * UNIT_SECONDS[match.group(2)]
+    return datetime.fromisoformat(value).timestamp()
+
 def tail_log_file(filename, lines=50):
     """Display the last N lines of a log file."""
-    try:
-        with open(filename, 'r') as f:
-            # Read all lines and get the last N
-            all_lines = f.readlines()
-            recent_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-            
-            print(f"📄 Last {len(recent_lines)} lines from {filename}:")
-            print("=" * 80)
-            
-            for line in recent_lines:
-                print(line.rstrip())
-                
-            print("=" * 80)
-            
-    except FileNotFoundError:
+    recent_lines = tail_lines(filename, lines)
+    if not recent_lines:
         print(f"❌ Log file not found: {filename}")
         print("💡 Run a test query first to generate logs!")
+        return
+
+    print(f"📄 Last {len(recent_lines)} lines from {filename}:")
+    print("=" * 80)
+    for line in recent_lines:
+        print(line)
+    print("=" * 80)
 
 def follow_log_file(filename):
-    """Follow a log file in real-time (like tail -f)."""
+    """Follow a log file in real-time (like tail -F)."""
+    print(f"👀 Following log file: {filename}")
+    print("Press Ctrl+C to stop...")
+    print("=" * 80)
     try:
-        print(f"👀 Following log file: {filename}")
-        print("Press Ctrl+C to stop...")
-        print("=" * 80)
-        
-        with open(filename, 'r') as f:
-            # Go to end of file
-            f.seek(0, 2)
-            
-            while True:
-                line = f.readline()
-                if line:
-                    print(line.rstrip())
-                else:
-                    time.sleep(0.1)
-                    
-    except FileNotFoundError:
-        print(f"❌ Log file not found: {filename}")
-        print("💡 Run a test query first to generate logs!")
+        for line in follow(filename):
+            print(line, flush=True)
     except KeyboardInterrupt:
         print("\n👋 Stopped following log file.")
 
-def view_logs_menu():
+def open_index(filename, index_path=None):
+    index = LogIndex(filename, index_path)
+    stats = index.refresh()
+    if stats["bytes"]:
+        print(f"🗂️  Indexed {stats['bytes'] / 1e6:.1f} MB, {stats['events']} new events")
+    return index
+
+def show_events(filename, args):
+    """Print the indexed events matching the filters (e.g. Developer routings in the last hour)."""
+    index = open_index(filename, args.index)
+    entries = index.events(event=args.event, agent=args.agent, source=args.source, request_id=args.request_id,
+                           since=parse_time(args.since), until=parse_time(args.until), limit=args.limit)
+    for line in index.lines_for(entries):
+        print(line)
+    print(f"🔎 {len(entries)} matching events")
+
+def show_latency(filename, args):
+    """Print p50/p95/p99 latency per agent."""
+    index = open_index(filename, args.index)
+    report = index.latency_percentiles(args.event or "request.completed", parse_time(args.since),
+                                       parse_time(args.until))
+    print(f"📊 {args.event or 'request.completed'} latency (ms) by agent")
+    print(f"{'agent':<16}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for agent, stats in sorted(report.items()):
+        print(f"{agent:<16}{stats['count']:>8}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+
+def show_range(filename, args):
+    """Print every line logged between --since and --until."""
+    index = open_index(filename, args.index)
+    for line in index.lines_between(parse_time(args.since), parse_time(args.until)):
+        print(line)
+
+def view_logs_menu(log_file):
     """Interactive menu for viewing logs."""
-    log_file = "supreme_agent.log"
-    
     while True:
         print("\n🔍 SUPREME AGENT LOG VIEWER")
         print("=" * 40)
         print("1. View recent logs (last 50 lines)")
         print("2. View recent logs (last 20 lines)")
         print("3. Follow logs in real-time")
-        print("4. Clear screen")
-        print("5. Exit")
+        print("4. Routings in the last hour")
+        print("5. Latency by agent (last hour)")
+        print("6. Clear screen")
+        print("7. Exit")
         print("=" * 40)
-        
-        choice = input("Select an option (1-5): ").strip()
-        
+
+        choice = input("Select an option (1-7): ").strip()
+
         if choice == "1":
             print("\n")
             tail_log_file(log_file, 50)
@@ -79,28 +109,65 @@ def view_logs_menu():
             print("\n")
             follow_log_file(log_file)
         elif choice == "4":
-            os.system('clear' if os.name == 'posix' else 'cls')
+            print("\n")
+            show_events(log_file, argparse.Namespace(
+                event="route.decided", agent=None, source=None, request_id=None, since="1h", until=None,
+                limit=None, index=None))
         elif choice == "5":
+            print("\n")
+            show_latency(log_file, argparse.Namespace(event=None, since="1h", until=None, index=None))
+        elif choice == "6":
+            os.system('clear' if os.name == 'posix' else 'cls')
+        elif choice == "7":
             print("👋 Goodbye!")
             break
         else:
-            print("❌ Invalid choice. Please select 1-5.")
+            print("❌ Invalid choice. Please select 1-7.")
 
 def main():
     """Main function."""
-    if len(sys.argv) > 1:
-        if sys.argv[1] == "--follow":
-            follow_log_file("supreme_agent.log")
-        elif sys.argv[1] == "--tail":
-            lines = int(sys.argv[2]) if len(sys.argv) > 2 else 50
-            tail_log_file("supreme_agent.log", lines)
-        else:
-            print("Usage:")
-            print("  python view_logs.py                 # Interactive menu")
-            print("  python view_logs.py --follow        # Follow logs in real-time")
-            print("  python view_logs.py --tail [lines]  # Show last N lines")
+    parser = argparse.ArgumentParser(
+        description="Supreme Agent log viewer (no arguments opens the interactive menu)",
+        epilog="examples:\n"
+               "  python view_logs.py --tail 100\n"
+               "  python view_logs.py --follow\n"
+               "  python view_logs.py --events --event route.decided --agent Developer --since 1h\n"
+               "  python view_logs.py --events --request-id 3f2a9c0d1e7b4a65\n"
+               "  python view_logs.py --latency --since 24h\n"
+               "  python view_logs.py --range --since 2026-10-18T09:00 --until 2026-10-18T09:05",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    parser.add_argument("--file", default=default_log_path(), help="log file (default: $LOG_FILE or supreme_agent.log)")
+    parser.add_argument("--index", help="index file (default: $LOG_INDEX_PATH or <file>.index.sqlite3)")
+    action = parser.add_mutually_exclusive_group()
+    action.add_argument("--tail", nargs="?", type=int, const=50, metavar="LINES", help="show the last N lines")
+    action.add_argument("--follow", action="store_true", help="follow the log in real time")
+    action.add_argument("--events", action="store_true", help="list indexed stage events")
+    action.add_argument("--latency", action="store_true", help="latency percentiles by agent")
+    action.add_argument("--range", action="store_true", help="every line between --since and --until")
+    parser.add_argument("--event", help="event name, e.g. route.decided, request.completed")
+    parser.add_argument("--agent")
+    parser.add_argument("--source", help="routing source: llm, fast_path, memo, combined, ...")
+    parser.add_argument("--request-id")
+    parser.add_argument("--since", help="30m, 1h, 2d or an ISO date/time")
+    parser.add_argument("--until")
+    parser.add_argument("--limit", type=int)
+    args = parser.parse_args()
+
+    if args.tail is not None:
+        tail_log_file(args.file, args.tail)
+    elif args.follow:
+        follow_log_file(args.file)
+    elif args.events:
+        show_events(args.file, args)
+    elif args.latency:
+        show_latency(args.file, args)
+    elif args.range:
+        if not args.since:
+            parser.error("--range needs --since")
+        show_range(args.file, args)
     else:
-        view_logs_menu()
+        view_logs_menu(args.file)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()